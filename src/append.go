@@ -0,0 +1,216 @@
+package main
+
+import (
+	"fmt"
+	"hash/crc64"
+	"os"
+	"path/filepath"
+	"sync"
+)
+
+// isAppendRequest reports whether edit_file only appends new_string. Appends
+// with a precondition take the read-modify-write path, which can hash the
+// current content.
+func isAppendRequest(input EditFileRequest, precondition *writePrecondition) bool {
+	return input.Content == nil && input.OldString == nil && input.OldText == nil &&
+		(input.NewString != nil || input.NewText != nil) &&
+		len(input.Edits) == 0 && !hasRangeArgs(input) && precondition == nil &&
+		(input.ReturnDiff == nil || !*input.ReturnDiff) && !isRegexRequest(input) && !isFuzzyRequest(input)
+}
+
+// appendRequest is one caller's append waiting for a group commit
+type appendRequest struct {
+	text       []byte
+	durability string
+	wake       chan struct{} // signalled when done, or when the caller becomes the leader
+	done       bool
+
+	written int64 // bytes added for this request, including a separating newline
+	version fileVersion
+	err     error
+}
+
+// appendQueue holds the appends to one file waiting for the current leader
+type appendQueue struct {
+	pending []*appendRequest
+	active  bool // a leader is writing a batch
+}
+
+// appendCommitter coalesces concurrent appends to the same file. The first
+// caller becomes the leader and writes its append; appends arriving while it
+// writes (and syncs) are queued and written by the next leader in a single
+// write and at most one sync. Appends never read more than the last byte of
+// the file, so their cost doesn't depend on the file size.
+type appendCommitter struct {
+	mu     sync.Mutex
+	queues map[string]*appendQueue
+}
+
+func newAppendCommitter() *appendCommitter {
+	return &appendCommitter{queues: make(map[string]*appendQueue)}
+}
+
+// append adds text to the end of path, on a new line if the file doesn't end
+// with one, creating the file if needed
+func (c *appendCommitter) append(path string, text []byte, durability string) (int64, fileVersion, error) {
+	key := canonicalPath(path)
+	req := &appendRequest{text: text, durability: durability, wake: make(chan struct{}, 1)}
+
+	c.mu.Lock()
+	q := c.queues[key]
+	if q == nil {
+		q = &appendQueue{}
+		c.queues[key] = q
+	}
+	q.pending = append(q.pending, req)
+	if q.active {
+		c.mu.Unlock()
+		<-req.wake
+		if req.done {
+			return req.written, req.version, req.err
+		}
+		// Leadership was handed over to this request
+		c.mu.Lock()
+	}
+	q.active = true
+	batch := q.pending
+	q.pending = nil
+	c.mu.Unlock()
+
+	commitAppends(path, batch)
+
+	c.mu.Lock()
+	if len(q.pending) > 0 {
+		// The first waiting caller writes the next batch
+		next := q.pending[0]
+		next.wake <- struct{}{}
+	} else {
+		q.active = false
+		delete(c.queues, key)
+	}
+	c.mu.Unlock()
+	return req.written, req.version, req.err
+}
+
+// commitAppends writes a batch of appends with one write and at most one sync
+func commitAppends(path string, batch []*appendRequest) {
+	written, version, err := writeAppends(path, batch)
+	for i, req := range batch {
+		req.written = written[i]
+		req.version = version
+		req.err = err
+		req.done = true
+		if i > 0 {
+			req.wake <- struct{}{}
+		}
+	}
+}
+
+func writeAppends(path string, batch []*appendRequest) ([]int64, fileVersion, error) {
+	written := make([]int64, len(batch))
+
+	// Appends must not interleave with read-modify-write edits of the file
+	unlock := fileLocks.lock(path)
+	defer unlock()
+
+	_, statErr := os.Stat(path)
+	existed := statErr == nil
+	f, err := os.OpenFile(path, os.O_RDWR|os.O_APPEND|os.O_CREATE, 0644)
+	if err != nil {
+		return written, fileVersion{}, fmt.Errorf("failed to open file %q: %v", path, err)
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return written, fileVersion{}, fmt.Errorf("failed to access file %q: %v", path, err)
+	}
+	size := info.Size()
+
+	// Only the last byte is needed to know whether a newline must be added
+	var last [1]byte
+	if size > 0 {
+		if _, err := f.ReadAt(last[:], size-1); err != nil {
+			return written, fileVersion{}, fmt.Errorf("failed to read file %q: %v", path, err)
+		}
+	}
+
+	durability := durabilityNone
+	var buf []byte
+	for i, req := range batch {
+		start := len(buf)
+		if (size > 0 || len(buf) > 0) && last[0] != '\n' {
+			buf = append(buf, '\n')
+			last[0] = '\n'
+		}
+		buf = append(buf, req.text...)
+		if len(req.text) > 0 {
+			last[0] = req.text[len(req.text)-1]
+		}
+		written[i] = int64(len(buf) - start)
+		if req.durability == durabilityFsync || (req.durability == durabilityFdatasync && durability == durabilityNone) {
+			durability = req.durability
+		}
+	}
+
+	n, err := f.Write(buf)
+	dirChanged(path)
+	if err == nil && n != len(buf) {
+		err = fmt.Errorf("short write: %d of %d bytes", n, len(buf))
+	}
+	if err != nil {
+		return written, fileVersion{}, fmt.Errorf("failed to write file %q: %v", path, err)
+	}
+	switch durability {
+	case durabilityFdatasync:
+		err = fdatasync(f)
+	case durabilityFsync:
+		err = f.Sync()
+		if err == nil && size == 0 {
+			// The file may have just been created
+			err = syncDir(filepath.Dir(path))
+		}
+	}
+	if err != nil {
+		return written, fileVersion{}, fmt.Errorf("failed to sync file %q: %v", path, err)
+	}
+
+	newInfo, err := f.Stat()
+	if err != nil {
+		return written, fileVersion{}, fmt.Errorf("failed to access file %q: %v", path, err)
+	}
+	version := fileVersion{modTime: newInfo.ModTime(), key: fileKeyOf(path, newInfo)}
+	// Extend the hash of the previous content when it is known
+	sum, known := uint64(0), size == 0
+	if !known {
+		sum, known = contentHashes.get(fileKeyOf(path, info))
+	}
+	if editJournal != nil {
+		// Each append is a change of its own, undone by truncating the file
+		// back to where it started
+		offset, running := size, sum
+		for i := range batch {
+			change := editJournal.begin(path, existed || i > 0, "")
+			var after fileVersion
+			if known {
+				if !change.created {
+					change.before = formatSum(running)
+				}
+				running = crc64.Update(running, crc64Table, buf[offset-size:offset-size+written[i]])
+				after.hash = formatSum(running)
+			}
+			if i == len(batch)-1 {
+				after.key = version.key
+				after.modTime = version.modTime
+			}
+			change.replaced(offset, nil, written[i])
+			editJournal.record("edit_file", change, after)
+			offset += written[i]
+		}
+	}
+	if known {
+		sum = crc64.Update(sum, crc64Table, buf)
+		contentHashes.put(version.key, sum)
+		version.hash = formatSum(sum)
+	}
+	return written, version, nil
+}
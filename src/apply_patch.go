@@ -0,0 +1,230 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"strings"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// patchTarget is a file changed by a patch, read and patched in memory
+type patchTarget struct {
+	*filePatch
+	path    string
+	deleted bool
+	existed bool
+	content []byte
+	updated []byte
+	before  fileVersion
+	notes   []string
+}
+
+func handleApplyPatch(ctx context.Context, req *mcp.CallToolRequest, input ApplyPatchRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log the request if debug mode, without the patch text
+	if logger != nil {
+		logger.Debug("apply_patch called", "bytes", len(input.Patch), "directory", input.Directory, "strip", input.Strip, "fuzz", input.Fuzz)
+	}
+
+	if input.Patch == "" {
+		return nil, nil, fmt.Errorf("invalid arguments: patch is required")
+	}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	strip := -1
+	if input.Strip != nil {
+		if *input.Strip < 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: strip must not be negative")
+		}
+		strip = *input.Strip
+	}
+	fuzz := patchDefaultFuzz
+	if input.Fuzz != nil {
+		if *input.Fuzz < 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: fuzz must not be negative")
+		}
+		fuzz = *input.Fuzz
+	}
+
+	patches, err := parsePatch(input.Patch, strip)
+	if err != nil {
+		return nil, nil, err
+	}
+	targets := make([]*patchTarget, len(patches))
+	seen := make(map[string]bool, len(patches))
+	for i, fp := range patches {
+		t := &patchTarget{filePatch: fp, path: fp.newName, deleted: fp.newName == devNull}
+		if t.deleted {
+			t.path = fp.oldName
+		}
+		if input.Directory != nil && !filepath.IsAbs(t.path) {
+			t.path = filepath.Join(*input.Directory, t.path)
+		}
+		key := canonicalPath(t.path)
+		if seen[key] {
+			return nil, nil, fmt.Errorf("invalid arguments: the patch changes %q more than once", t.path)
+		}
+		seen[key] = true
+		targets[i] = t
+	}
+
+	message, err := applyPatch(targets, fuzz, durability)
+	if err != nil {
+		return nil, nil, err
+	}
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: message},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("apply_patch RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
+
+// applyPatch patches every target or none. Each file is read once and
+// patched in memory; the new contents are staged and renamed into place
+// together by commitStaged. Files the patch deletes are moved aside first and
+// put back if the commit fails.
+func applyPatch(targets []*patchTarget, fuzz int, durability string) (string, error) {
+	paths := make([]string, len(targets))
+	for i, t := range targets {
+		paths[i] = t.path
+	}
+	unlock := fileLocks.lock(paths...)
+	defer unlock()
+
+	for _, t := range targets {
+		if err := t.patch(fuzz); err != nil {
+			return "", err
+		}
+	}
+
+	var staged []*stagedWrite
+	abort := func() {
+		for _, s := range staged {
+			s.Abort()
+		}
+	}
+	written := make(map[*patchTarget]*stagedWrite, len(targets))
+	for _, t := range targets {
+		if t.deleted {
+			continue
+		}
+		if err := createdDirs.ensureParent(t.path); err != nil {
+			abort()
+			return "", err
+		}
+		s, err := stageWrite(t.path, durability)
+		if err != nil {
+			abort()
+			return "", err
+		}
+		staged = append(staged, s)
+		if _, err := s.Write(t.updated); err != nil {
+			abort()
+			return "", fmt.Errorf("failed to write file %q: %v", t.path, err)
+		}
+		written[t] = s
+	}
+
+	// Move the deleted files aside, to be removed once the rest is committed
+	var removed []*patchTarget
+	asides := make(map[*patchTarget]string)
+	restore := func() {
+		for _, t := range removed {
+			os.Rename(asides[t], t.path)
+			dirChanged(t.path)
+		}
+	}
+	for _, t := range targets {
+		if !t.deleted {
+			continue
+		}
+		aside := filepath.Join(filepath.Dir(t.path), "."+filepath.Base(t.path)+".patch-deleted")
+		if err := os.Rename(t.path, aside); err != nil {
+			restore()
+			abort()
+			return "", fmt.Errorf("failed to delete file %q: %v", t.path, err)
+		}
+		asides[t] = aside
+		removed = append(removed, t)
+	}
+	if len(staged) > 0 {
+		if err := commitStaged(staged); err != nil {
+			restore()
+			return "", err
+		}
+	}
+	for _, t := range removed {
+		os.Remove(asides[t])
+		dirChanged(t.path)
+	}
+
+	lines := make([]string, 0, len(targets))
+	for _, t := range targets {
+		var line string
+		if t.deleted {
+			line = fmt.Sprintf("File %s deleted.", t.path)
+		} else {
+			s := written[t]
+			change := editJournal.begin(t.path, t.existed, t.before.hash)
+			change.rewritten(t.content, t.updated)
+			editJournal.record("apply_patch", change, s.version())
+			verb := "patched"
+			if !t.existed {
+				verb = "created"
+			}
+			line = fmt.Sprintf("File %s %s: %d hunks applied. Bytes written: %d. %s", t.path, verb, len(t.hunks), s.written, s.version())
+		}
+		if len(t.notes) > 0 {
+			line += " Note: " + strings.Join(t.notes, "; ") + "."
+		}
+		lines = append(lines, line)
+	}
+	return strings.Join(lines, "\n"), nil
+}
+
+// patch reads the target and applies its hunks in memory
+func (t *patchTarget) patch(fuzz int) error {
+	if t.oldName == devNull {
+		if _, err := os.Lstat(t.path); err == nil {
+			return fmt.Errorf("cannot create %q: the file already exists", t.path)
+		}
+	} else {
+		content, version, err := readFileHashed(t.path)
+		if errors.Is(err, fs.ErrNotExist) {
+			return fmt.Errorf("cannot patch %q: the file does not exist", t.path)
+		}
+		if err != nil {
+			return fmt.Errorf("failed to read file %q: %v", t.path, err)
+		}
+		t.content, t.before, t.existed = content, version, true
+	}
+
+	updated, notes, err := patchedContent(t.content, t.hunks, fuzz)
+	if err != nil {
+		return fmt.Errorf("%s: %v; nothing was changed", t.path, err)
+	}
+	if t.deleted && len(updated) > 0 {
+		return fmt.Errorf("%s: the patch deletes the file but %d bytes would remain; nothing was changed", t.path, len(updated))
+	}
+	t.updated, t.notes = updated, notes
+	return nil
+}
@@ -0,0 +1,173 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+func applyTestPatch(dir, patch string) (string, error) {
+	result, _, err := handleApplyPatch(context.Background(), nil, ApplyPatchRequest{Patch: patch, Directory: &dir})
+	if err != nil {
+		return "", err
+	}
+	return resultText(result), nil
+}
+
+func TestApplyPatchFiles(t *testing.T) {
+	dir := t.TempDir()
+	files := map[string]string{
+		"main.go":  "package main\n\n// added above the hunk\n\nimport \"fmt\"\n\nfunc main() {\n\tfmt.Println(\"hello\")\n}\n",
+		"util.go":  "package main\n\nfunc a() {}\n\nfunc b() {}\n\nfunc c() {}\n",
+		"old.go":   "package main\n",
+		"dashes.c": "-- x\n--- y\nz",
+	}
+	for name, content := range files {
+		if err := os.WriteFile(filepath.Join(dir, name), []byte(content), 0644); err != nil {
+			t.Fatal(err)
+		}
+	}
+
+	patch := `diff --git a/main.go b/main.go
+--- a/main.go
++++ b/main.go
+@@ -3,5 +3,5 @@
+ import "fmt"
+ 
+ func main() {
+-	fmt.Println("hello")
++	fmt.Println("hello, world")
+ }
+--- a/util.go	2024-01-01 00:00:00
++++ b/util.go	2024-01-02 00:00:00
+@@ -1,4 +1,4 @@
+ package util
+ 
+-func a() {}
++func a() { b() }
+ 
+@@ -7,1 +7,2 @@
+ func c() {}
++func d() {}
+--- a/old.go
++++ /dev/null
+@@ -1 +0,0 @@
+-package main
+--- /dev/null
++++ b/pkg/new.go
+@@ -0,0 +1,2 @@
++package pkg
++// new
+--- a/dashes.c
++++ b/dashes.c
+@@ -1,3 +1,3 @@
+--- x
++-- w
+ --- y
+ z
+\ No newline at end of file
+`
+	text, err := applyTestPatch(dir, patch)
+	if err != nil {
+		t.Fatal(err)
+	}
+	want := map[string]string{
+		"main.go":    strings.Replace(files["main.go"], `"hello"`, `"hello, world"`, 1),
+		"util.go":    "package main\n\nfunc a() { b() }\n\nfunc b() {}\n\nfunc c() {}\nfunc d() {}\n",
+		"pkg/new.go": "package pkg\n// new\n",
+		"dashes.c":   "-- w\n--- y\nz",
+	}
+	for name, content := range want {
+		if got, err := os.ReadFile(filepath.Join(dir, name)); err != nil || string(got) != content {
+			t.Errorf("%s: %q, %v", name, got, err)
+		}
+	}
+	if _, err := os.Stat(filepath.Join(dir, "old.go")); !os.IsNotExist(err) {
+		t.Errorf("old.go not deleted: %v", err)
+	}
+	for _, note := range []string{"hunk #1 applied at line 5 (offset 2 lines)", "hunk #1 applied at line 2 (fuzz 1)", "created", "deleted"} {
+		if !strings.Contains(text, note) {
+			t.Errorf("result lacks %q:\n%s", note, text)
+		}
+	}
+}
+
+func TestApplyPatchChangesNothingOnFailure(t *testing.T) {
+	dir := t.TempDir()
+	for _, name := range []string{"a.txt", "b.txt", "c.txt"} {
+		if err := os.WriteFile(filepath.Join(dir, name), []byte("one\ntwo\nthree\n"), 0644); err != nil {
+			t.Fatal(err)
+		}
+	}
+	patch := `--- a.txt
++++ a.txt
+@@ -2 +2 @@
+-two
++2
+--- c.txt
++++ /dev/null
+@@ -1,3 +0,0 @@
+-one
+-two
+-three
+--- b.txt
++++ b.txt
+@@ -2 +2 @@
+-four
++4
+`
+	if _, err := applyTestPatch(dir, patch); err == nil || !strings.Contains(err.Error(), "b.txt") {
+		t.Fatalf("expected b.txt not to apply, got %v", err)
+	}
+	entries, _ := os.ReadDir(dir)
+	if len(entries) != 3 {
+		t.Fatalf("files left behind: %v", entries)
+	}
+	for _, e := range entries {
+		if got, _ := os.ReadFile(filepath.Join(dir, e.Name())); string(got) != "one\ntwo\nthree\n" {
+			t.Fatalf("%s changed: %q", e.Name(), got)
+		}
+	}
+
+	// Without fuzz a hunk whose context changed doesn't apply
+	zero := 0
+	_, _, err := handleApplyPatch(context.Background(), nil, ApplyPatchRequest{
+		Patch:     "--- a.txt\n+++ a.txt\n@@ -1,3 +1,3 @@\n ONE\n-two\n+2\n three\n",
+		Directory: &dir,
+		Fuzz:      &zero,
+	})
+	if err == nil {
+		t.Fatal("applied with mismatched context and no fuzz")
+	}
+}
+
+// BenchmarkApplyPatch applies 200 hunks spread over a 200,000-line file.
+// Run with: go test ./src -run '^$' -bench ApplyPatch
+func BenchmarkApplyPatch(b *testing.B) {
+	dir := b.TempDir()
+	var content, patch strings.Builder
+	const lines, hunks = 200000, 200
+	for i := 0; i < lines; i++ {
+		fmt.Fprintf(&content, "line %d\n", i)
+	}
+	patch.WriteString("--- big.txt\n+++ big.txt\n")
+	for h := 0; h < hunks; h++ {
+		at := h*(lines/hunks) + 500
+		fmt.Fprintf(&patch, "@@ -%d,3 +%d,3 @@\n line %d\n-line %d\n+changed %d\n line %d\n", at+1, at+1, at, at+1, at+1, at+2)
+	}
+	path := filepath.Join(dir, "big.txt")
+	b.SetBytes(int64(content.Len()))
+	for i := 0; i < b.N; i++ {
+		b.StopTimer()
+		if err := os.WriteFile(path, []byte(content.String()), 0644); err != nil {
+			b.Fatal(err)
+		}
+		b.StartTimer()
+		if _, err := applyTestPatch(dir, patch.String()); err != nil {
+			b.Fatal(err)
+		}
+	}
+}
@@ -0,0 +1,313 @@
+package main
+
+import (
+	"bytes"
+	"sort"
+)
+
+// normSegment maps a run of normalized text back to the original. Within a
+// copied run the offsets advance together; a collapsed whitespace run is one
+// normalized space standing for span original bytes.
+type normSegment struct {
+	norm, orig int
+	span       int  // original bytes covered
+	collapsed  bool // a whitespace run collapsed to one space
+}
+
+// normalizedText is text with its whitespace normalized, and the map back to
+// the original offsets
+type normalizedText struct {
+	text     []byte
+	segments []normSegment
+}
+
+func isHorizontalSpace(c byte) bool {
+	return c == ' ' || c == '\t' || c == '\r' || c == '\v' || c == '\f'
+}
+
+// normalizeWhitespace drops the indentation and trailing whitespace of every
+// line and collapses the other runs of whitespace to one space, in one pass.
+// Newlines are kept. The offset map is only built when withMap is set.
+func normalizeWhitespace(src []byte, withMap bool) *normalizedText {
+	n := &normalizedText{text: make([]byte, 0, len(src))}
+	copyFrom := -1 // start of the pending copied run, -1 if none
+	flush := func(end int) {
+		if copyFrom >= 0 {
+			if withMap {
+				n.segments = append(n.segments, normSegment{norm: len(n.text), orig: copyFrom, span: end - copyFrom})
+			}
+			n.text = append(n.text, src[copyFrom:end]...)
+			copyFrom = -1
+		}
+	}
+	lineStart := true
+	for i := 0; i < len(src); {
+		c := src[i]
+		if !isHorizontalSpace(c) {
+			if copyFrom < 0 {
+				copyFrom = i
+			}
+			lineStart = c == '\n'
+			i++
+			continue
+		}
+		j := i + 1
+		for j < len(src) && isHorizontalSpace(src[j]) {
+			j++
+		}
+		flush(i)
+		if !lineStart && j < len(src) && src[j] != '\n' {
+			if withMap {
+				n.segments = append(n.segments, normSegment{norm: len(n.text), orig: i, span: j - i, collapsed: true})
+			}
+			n.text = append(n.text, ' ')
+		}
+		i = j
+	}
+	flush(len(src))
+	return n
+}
+
+// segment returns the segment holding normalized offset i
+func (n *normalizedText) segment(i int) normSegment {
+	k := sort.Search(len(n.segments), func(k int) bool { return n.segments[k].norm > i }) - 1
+	return n.segments[k]
+}
+
+// origStart maps the start of normalized offset i to the original
+func (n *normalizedText) origStart(i int) int {
+	s := n.segment(i)
+	if s.collapsed {
+		return s.orig
+	}
+	return s.orig + i - s.norm
+}
+
+// origEnd maps the end of normalized offset i-1 to the original
+func (n *normalizedText) origEnd(i int) int {
+	s := n.segment(i - 1)
+	if s.collapsed {
+		return s.orig + s.span
+	}
+	return s.orig + i - s.norm
+}
+
+// approxMaxPattern caps the pattern length of approximate searches, whose
+// cost grows with the number of 64-bit words the pattern takes
+const approxMaxPattern = 4096
+
+// approxMatch is the best approximate occurrence of a pattern
+type approxMatch struct {
+	start, end int // matched text [start, end)
+	distance   int // Levenshtein distance to the pattern
+	ambiguous  bool
+}
+
+// myersPattern is a pattern prepared for bit-parallel approximate search:
+// Myers' algorithm with the pattern split into 64-row blocks (Hyyrö's
+// formulation), so one text byte costs one step per block
+type myersPattern struct {
+	m, blocks int
+	peq       []uint64 // peq[c*blocks+b]: the rows of block b where the pattern has byte c
+	lastShift uint     // bit of row m in the last block
+}
+
+func newMyersPattern(pattern []byte) *myersPattern {
+	blocks := (len(pattern) + 63) / 64
+	p := &myersPattern{m: len(pattern), blocks: blocks, peq: make([]uint64, 256*blocks), lastShift: uint((len(pattern) - 1) % 64)}
+	for i, c := range pattern {
+		p.peq[int(c)*blocks+i/64] |= 1 << uint(i%64)
+	}
+	return p
+}
+
+// rows returns the number of pattern rows in block b
+func (p *myersPattern) rows(b int) int {
+	if b == p.blocks-1 {
+		return p.m - 64*b
+	}
+	return 64
+}
+
+// outShift returns the bit of the bottom row of block b
+func (p *myersPattern) outShift(b int) uint {
+	if b == p.blocks-1 {
+		return p.lastShift
+	}
+	return 63
+}
+
+// myersBlock advances one block by one text column given the match mask eq
+// and the horizontal delta hin (-1, 0 or 1) entering its top row; it returns
+// the new vertical deltas and the delta leaving the row at bit out
+func myersBlock(pv, mv, eq uint64, hin int, out uint) (uint64, uint64, int) {
+	hinNeg := uint64(hin>>1) & 1
+	hinPos := uint64(hin+1) >> 1
+	xv := eq | mv
+	eq |= hinNeg
+	xh := (((eq & pv) + pv) ^ pv) | eq
+	ph := mv | ^(xh | pv)
+	mh := pv & xh
+	hout := int(ph>>out&1) - int(mh>>out&1)
+	ph = ph<<1 | hinPos
+	mh = mh<<1 | hinNeg
+	return mh | ^(xv | ph), ph & xv, hout
+}
+
+// myersState holds the vertical deltas of the current text column and the
+// score at the bottom row of every block
+type myersState struct {
+	pv, mv []uint64
+	score  []int
+}
+
+func (p *myersPattern) start() *myersState {
+	s := &myersState{pv: make([]uint64, p.blocks), mv: make([]uint64, p.blocks), score: make([]int, p.blocks)}
+	for b := range s.pv {
+		s.pv[b] = ^uint64(0)
+		s.score[b] = 64*b + p.rows(b)
+	}
+	return s
+}
+
+// step advances blocks 0..last by one text byte and returns the delta
+// leaving the last one. hin is the horizontal delta of row 0: 0 when the
+// match may start anywhere, +1 when it is anchored at the first byte.
+func (p *myersPattern) step(s *myersState, c byte, hin, last int) int {
+	eqs := p.peq[int(c)*p.blocks:]
+	pvs, mvs, scores := s.pv[:last+1], s.mv[:last+1], s.score[:last+1]
+	for b := range pvs {
+		// myersBlock, inlined by hand: it is too large for the compiler to
+		// inline and this loop is where the search spends its time
+		pv, mv, eq := pvs[b], mvs[b], eqs[b]
+		out := uint(63)
+		if b == p.blocks-1 {
+			out = p.lastShift
+		}
+		hinNeg := uint64(hin>>1) & 1
+		hinPos := uint64(hin+1) >> 1
+		xv := eq | mv
+		eq |= hinNeg
+		xh := (((eq & pv) + pv) ^ pv) | eq
+		ph := mv | ^(xh | pv)
+		mh := pv & xh
+		hin = int(ph>>out&1) - int(mh>>out&1)
+		ph = ph<<1 | hinPos
+		mh = mh<<1 | hinNeg
+		pvs[b], mvs[b] = mh|^(xv|ph), ph&xv
+		scores[b] += hin
+	}
+	return hin
+}
+
+// approxSearch finds the occurrence of pattern in text with the fewest
+// edits, if it has at most maxDistance. The text is scanned once; only the
+// blocks of the pattern that can still be within maxDistance are computed
+// (Ukkonen's cut-off), so the cost is linear in the text and, for small
+// distances, nearly independent of the pattern length. The start of the
+// match is then found by a backward anchored scan of at most
+// len(pattern)+maxDistance bytes. The match is ambiguous when another,
+// non-overlapping occurrence has as few edits.
+func approxSearch(text, pattern []byte, maxDistance int) (approxMatch, bool) {
+	if len(pattern) == 0 || len(pattern) > approxMaxPattern {
+		return approxMatch{}, false
+	}
+	p := newMyersPattern(pattern)
+	k := maxDistance
+	best, firstEnd, lastEnd := k+1, -1, -1
+	if p.blocks == 1 {
+		// The common case of a pattern of a few lines, kept in registers
+		pv, mv, score, out := ^uint64(0), uint64(0), p.m, p.lastShift
+		for j, c := range text {
+			eq := p.peq[c]
+			xv := eq | mv
+			xh := (((eq & pv) + pv) ^ pv) | eq
+			ph := mv | ^(xh | pv)
+			mh := pv & xh
+			score += int(ph>>out&1) - int(mh>>out&1)
+			ph <<= 1
+			pv, mv = mh<<1|^(xv|ph), ph&xv
+			if score <= best {
+				if score < best {
+					best, firstEnd = score, j+1
+				}
+				lastEnd = j + 1
+			}
+		}
+	} else {
+		best, firstEnd, lastEnd = p.search(text, k)
+	}
+	if firstEnd < 0 {
+		return approxMatch{}, false
+	}
+
+	// Anchor the reversed pattern at the end of the match and read the text
+	// backwards until it reaches the same distance
+	reversed := make([]byte, len(pattern))
+	for i, c := range pattern {
+		reversed[len(pattern)-1-i] = c
+	}
+	rp := newMyersPattern(reversed)
+	rs := rp.start()
+	start := firstEnd
+	for j := 1; j <= firstEnd && j <= len(pattern)+best; j++ {
+		rp.step(rs, text[firstEnd-j], 1, rp.blocks-1)
+		if rs.score[rp.blocks-1] == best {
+			start = firstEnd - j
+			break
+		}
+	}
+	return approxMatch{start: start, end: firstEnd, distance: best, ambiguous: lastEnd-firstEnd > len(pattern)}, true
+}
+
+// search scans text with a pattern of several blocks, computing only the
+// band of blocks that can still be within k edits. It returns the fewest
+// edits found, if at most k, and the first and last ends with that many.
+func (p *myersPattern) search(text []byte, k int) (int, int, int) {
+	s := p.start()
+	last := (k+1+63)/64 - 1 // the band of blocks computed
+	if last >= p.blocks {
+		last = p.blocks - 1
+	}
+	best, firstEnd, lastEnd := k+1, -1, -1
+	for j, c := range text {
+		hout := p.step(s, c, 0, last)
+		if last < p.blocks-1 && s.score[last]-hout <= k && (p.peq[int(c)*p.blocks+last+1]&1 != 0 || hout < 0) {
+			// The next block may come within the distance: compute it from
+			// an all-increasing previous column
+			last++
+			s.pv[last], s.mv[last] = ^uint64(0), 0
+			var h int
+			s.pv[last], s.mv[last], h = myersBlock(s.pv[last], s.mv[last], p.peq[int(c)*p.blocks+last], hout, p.outShift(last))
+			s.score[last] = s.score[last-1] - hout + p.rows(last) + h
+		} else {
+			for last > 0 && s.score[last] >= k+64 {
+				last--
+			}
+		}
+		if last == p.blocks-1 {
+			switch score := s.score[last]; {
+			case score < best:
+				best, firstEnd, lastEnd = score, j+1, j+1
+			case score == best:
+				lastEnd = j + 1
+			}
+		}
+	}
+	return best, firstEnd, lastEnd
+}
+
+// findAll returns the offsets of the non-overlapping occurrences of pattern,
+// at most limit of them if limit is positive
+func findAll(text, pattern []byte, limit int) []int {
+	var found []int
+	for i := 0; limit <= 0 || len(found) < limit; {
+		j := bytes.Index(text[i:], pattern)
+		if j < 0 {
+			break
+		}
+		found = append(found, i+j)
+		i += j + len(pattern)
+	}
+	return found
+}
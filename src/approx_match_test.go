@@ -0,0 +1,148 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"math/rand"
+	"strings"
+	"testing"
+)
+
+// naiveApproxSearch computes the semi-global edit distance table column by
+// column and returns the smallest distance and the first end reaching it
+func naiveApproxSearch(text, pattern []byte) (distance, end int) {
+	col := make([]int, len(pattern)+1)
+	for i := range col {
+		col[i] = i
+	}
+	distance, end = len(pattern), 0
+	for j := 1; j <= len(text); j++ {
+		diag := col[0]
+		col[0] = 0
+		for i := 1; i <= len(pattern); i++ {
+			cost := 1
+			if pattern[i-1] == text[j-1] {
+				cost = 0
+			}
+			next := diag + cost
+			if col[i]+1 < next {
+				next = col[i] + 1
+			}
+			if col[i-1]+1 < next {
+				next = col[i-1] + 1
+			}
+			diag, col[i] = col[i], next
+		}
+		if col[len(pattern)] < distance {
+			distance, end = col[len(pattern)], j
+		}
+	}
+	return distance, end
+}
+
+func levenshtein(a, b []byte) int {
+	col := make([]int, len(a)+1)
+	for i := range col {
+		col[i] = i
+	}
+	for j := 1; j <= len(b); j++ {
+		diag := col[0]
+		col[0] = j
+		for i := 1; i <= len(a); i++ {
+			cost := 1
+			if a[i-1] == b[j-1] {
+				cost = 0
+			}
+			next := diag + cost
+			if col[i]+1 < next {
+				next = col[i] + 1
+			}
+			if col[i-1]+1 < next {
+				next = col[i-1] + 1
+			}
+			diag, col[i] = col[i], next
+		}
+	}
+	return col[len(a)]
+}
+
+func TestApproxSearchMatchesDynamicProgramming(t *testing.T) {
+	rng := rand.New(rand.NewSource(1))
+	gen := func(n int, alphabet string) []byte {
+		b := make([]byte, n)
+		for i := range b {
+			b[i] = alphabet[rng.Intn(len(alphabet))]
+		}
+		return b
+	}
+	for iter := 0; iter < 2000; iter++ {
+		// Patterns of one to several 64-bit blocks
+		pattern := gen(1+rng.Intn(200), "abc")
+		text := gen(rng.Intn(400), "abc")
+		if rng.Intn(2) == 0 && len(text) > 0 {
+			// Plant a damaged copy of the pattern
+			damaged := append([]byte(nil), pattern...)
+			for k := rng.Intn(4); k > 0 && len(damaged) > 1; k-- {
+				damaged[rng.Intn(len(damaged))] = 'd'
+			}
+			at := rng.Intn(len(text))
+			text = append(text[:at], append(damaged, text[at:]...)...)
+		}
+		wantDistance, wantEnd := naiveApproxSearch(text, pattern)
+		maxDistance := len(pattern) - 1
+		if rng.Intn(2) == 0 {
+			// Small bounds leave most blocks out of the computed band
+			maxDistance = rng.Intn(len(pattern)/4 + 1)
+		}
+		m, ok := approxSearch(text, pattern, maxDistance)
+		if wantDistance > maxDistance {
+			if ok {
+				t.Fatalf("found %+v, want nothing", m)
+			}
+			continue
+		}
+		if !ok || m.distance != wantDistance || m.end != wantEnd {
+			t.Fatalf("pattern %q in %q: got %+v (%v), want distance %d ending at %d", pattern, text, m, ok, wantDistance, wantEnd)
+		}
+		if d := levenshtein(pattern, text[m.start:m.end]); d != m.distance {
+			t.Fatalf("pattern %q in %q: match %q has distance %d, reported %d", pattern, text, text[m.start:m.end], d, m.distance)
+		}
+	}
+}
+
+func TestNormalizeWhitespaceMapsBack(t *testing.T) {
+	src := []byte("\tfunc  main() {\r\n\t\tx :=\t1   \n\n  }  ")
+	n := normalizeWhitespace(src, true)
+	if want := "func main() {\nx := 1\n\n}"; string(n.text) != want {
+		t.Fatalf("normalized %q, want %q", n.text, want)
+	}
+	for _, word := range []string{"func main()", "x := 1\n", "{\nx", "}"} {
+		i := bytes.Index(n.text, []byte(word))
+		start, end := n.origStart(i), n.origEnd(i+len(word))
+		got := string(src[start:end])
+		if strings.Join(strings.Fields(got), " ") != strings.Join(strings.Fields(word), " ") || isHorizontalSpace(got[0]) {
+			t.Fatalf("%q maps back to %q", word, got)
+		}
+	}
+}
+
+// BenchmarkApproxSearch shows the cost of an approximate search growing
+// linearly with the file size, and with the blocks of the pattern
+func BenchmarkApproxSearch(b *testing.B) {
+	line := []byte("\tif err := process(ctx, item); err != nil {\n\t\treturn fmt.Errorf(\"item %d: %w\", i, err)\n\t}\n")
+	for _, size := range []int{1 << 20, 8 << 20} {
+		text := bytes.Repeat(line, size/len(line))
+		for _, patternSize := range []int{40, 400} {
+			pattern := append([]byte(nil), text[size/2:size/2+patternSize]...)
+			pattern[patternSize/2] = '#'
+			b.Run(fmt.Sprintf("size=%dMB/pattern=%d", size>>20, patternSize), func(b *testing.B) {
+				b.SetBytes(int64(len(text)))
+				for i := 0; i < b.N; i++ {
+					if _, ok := approxSearch(text, pattern, patternSize/10); !ok {
+						b.Fatal("not found")
+					}
+				}
+			})
+		}
+	}
+}
@@ -0,0 +1,323 @@
+package main
+
+import (
+	"errors"
+	"fmt"
+	"hash"
+	"io"
+	"io/fs"
+	"os"
+	"path/filepath"
+)
+
+// Durability modes for file writes
+const (
+	durabilityNone      = "none"      // rely on the page cache (default)
+	durabilityFdatasync = "fdatasync" // flush file data before the rename
+	durabilityFsync     = "fsync"     // fsync the file and then its directory after the rename
+)
+
+// parseDurability validates the durability argument of a write request
+func parseDurability(value *string) (string, error) {
+	if value == nil || *value == "" {
+		return durabilityNone, nil
+	}
+	switch *value {
+	case durabilityNone, durabilityFdatasync, durabilityFsync:
+		return *value, nil
+	default:
+		return "", fmt.Errorf("invalid durability %q: must be one of none, fdatasync, fsync", *value)
+	}
+}
+
+// stagedWrite is a temporary file in the target's directory that atomically
+// replaces the target when committed. Readers see either the old or the new
+// content, never a partially written file.
+type stagedWrite struct {
+	path       string // final path (symlinks resolved)
+	tmp        *os.File
+	durability string
+	written    int64
+	hash       hash.Hash64 // of the bytes passed to Write
+	partial    bool        // ranges were added with copyRange, so hash doesn't cover the content
+	info       fs.FileInfo // of the temporary file once prepared
+	keep       bool        // a failed commit leaves the temporary file: it holds an upload's data
+}
+
+// stageWrite creates the temporary file for path. An existing file's
+// permissions are preserved; new files get 0644 like os.WriteFile would.
+func stageWrite(path, durability string) (*stagedWrite, error) {
+	// Write through symlinks instead of replacing the link itself
+	if resolved, err := filepath.EvalSymlinks(path); err == nil {
+		path = resolved
+	}
+
+	mode := fs.FileMode(0644)
+	if info, err := os.Stat(path); err == nil {
+		if !info.Mode().IsRegular() {
+			return nil, fmt.Errorf("failed to write file %q: not a regular file", path)
+		}
+		mode = info.Mode().Perm()
+	} else if !errors.Is(err, fs.ErrNotExist) {
+		return nil, fmt.Errorf("failed to access file %q: %v", path, err)
+	}
+
+	tmp, err := os.CreateTemp(filepath.Dir(path), "."+filepath.Base(path)+".tmp-*")
+	if err != nil && createdDirs.stale(filepath.Dir(path)) {
+		// The directory was removed since it was created: create it again
+		if err = createdDirs.ensureParent(path); err == nil {
+			tmp, err = os.CreateTemp(filepath.Dir(path), "."+filepath.Base(path)+".tmp-*")
+		}
+	}
+	if err != nil {
+		return nil, fmt.Errorf("failed to create temporary file for %q: %v", path, err)
+	}
+	if err := tmp.Chmod(mode); err != nil {
+		tmp.Close()
+		os.Remove(tmp.Name())
+		return nil, fmt.Errorf("failed to set permissions on temporary file for %q: %v", path, err)
+	}
+	return &stagedWrite{path: path, tmp: tmp, durability: durability, hash: newContentHash()}, nil
+}
+
+// Write appends to the staged content, counting and hashing the bytes written
+func (s *stagedWrite) Write(p []byte) (int, error) {
+	n, err := s.tmp.Write(p)
+	s.written += int64(n)
+	s.hash.Write(p[:n])
+	return n, err
+}
+
+// version is the hash and modification time of the committed file. The hash
+// is left empty when ranges were added with copyRange, as it only covers the
+// content passed to Write.
+func (s *stagedWrite) version() fileVersion {
+	v := fileVersion{}
+	if !s.partial {
+		v.hash = formatHash(s.hash)
+	}
+	if s.info != nil {
+		v.modTime = s.info.ModTime()
+		v.key = fileKeyOf(s.path, s.info)
+	}
+	return v
+}
+
+// remember records the hash of the committed file for later appends
+func (s *stagedWrite) remember(sum uint64) {
+	if s.info != nil {
+		contentHashes.put(fileKeyOf(s.path, s.info), sum)
+	}
+}
+
+// copyRange appends n bytes of src starting at offset. Between regular files
+// os.File.ReadFrom uses copy_file_range(2) on Linux, so the data is copied
+// (or reflinked) in the kernel; it falls back to a user-space copy elsewhere.
+func (s *stagedWrite) copyRange(src *os.File, offset, n int64) error {
+	if n == 0 {
+		return nil
+	}
+	s.partial = true
+	if _, err := src.Seek(offset, io.SeekStart); err != nil {
+		return err
+	}
+	copied, err := s.tmp.ReadFrom(io.LimitReader(src, n))
+	s.written += copied
+	if err != nil {
+		return err
+	}
+	if copied != n {
+		return fmt.Errorf("short copy: %d of %d bytes", copied, n)
+	}
+	return nil
+}
+
+// prepare flushes the temporary file according to the durability mode and
+// closes it. The temporary file is discarded on failure.
+func (s *stagedWrite) prepare() error {
+	if s.durability == durabilityFdatasync || s.durability == durabilityFsync {
+		sync := fdatasync
+		if s.durability == durabilityFsync {
+			sync = (*os.File).Sync
+		}
+		if err := sync(s.tmp); err != nil {
+			s.tmp.Close()
+			s.discard()
+			return fmt.Errorf("failed to sync file %q: %v", s.path, err)
+		}
+	}
+	if info, err := s.tmp.Stat(); err == nil {
+		s.info = info
+	}
+	if err := s.tmp.Close(); err != nil {
+		s.discard()
+		return fmt.Errorf("failed to write file %q: %v", s.path, err)
+	}
+	return nil
+}
+
+// Commit flushes the temporary file and renames it over the target
+func (s *stagedWrite) Commit() error {
+	if err := s.prepare(); err != nil {
+		return err
+	}
+	if err := os.Rename(s.tmp.Name(), s.path); err != nil {
+		s.discard()
+		return fmt.Errorf("failed to replace file %q: %v", s.path, err)
+	}
+	dirChanged(s.path)
+	if !s.partial {
+		s.remember(s.hash.Sum64())
+	}
+	if s.durability == durabilityFsync {
+		// Persist the rename itself
+		if err := syncDir(filepath.Dir(s.path)); err != nil {
+			return fmt.Errorf("failed to sync directory of %q: %v", s.path, err)
+		}
+	}
+	return nil
+}
+
+// discard removes the temporary file after a failed commit, unless it is kept
+func (s *stagedWrite) discard() {
+	if !s.keep {
+		os.Remove(s.tmp.Name())
+	}
+	dirChanged(s.path)
+}
+
+// Abort discards the temporary file
+func (s *stagedWrite) Abort() {
+	s.tmp.Close()
+	os.Remove(s.tmp.Name())
+	dirChanged(s.path)
+}
+
+func syncDir(dir string) error {
+	d, err := os.Open(dir)
+	if err != nil {
+		return err
+	}
+	defer d.Close()
+	return d.Sync()
+}
+
+// writeFileAtomic replaces path with content via a temporary file and a
+// rename. The result is verified from the write count instead of a stat.
+func writeFileAtomic(path string, content []byte, durability string) (fileVersion, error) {
+	s, err := stageWrite(path, durability)
+	if err != nil {
+		return fileVersion{}, err
+	}
+	if _, err := s.Write(content); err != nil {
+		s.Abort()
+		return fileVersion{}, fmt.Errorf("failed to write file %q: %v", path, err)
+	}
+	if s.written != int64(len(content)) {
+		s.Abort()
+		return fileVersion{}, fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", path, len(content), s.written)
+	}
+	if err := s.Commit(); err != nil {
+		return fileVersion{}, err
+	}
+	return s.version(), nil
+}
+
+// writeFileFrom replaces path with the content read from r, streamed into
+// the temporary file through a fixed buffer, and returns its size
+func writeFileFrom(path string, r io.Reader, durability string) (int64, fileVersion, error) {
+	s, err := stageWrite(path, durability)
+	if err != nil {
+		return 0, fileVersion{}, err
+	}
+	if _, err := io.Copy(s, r); err != nil {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("failed to write file %q: %w", path, err)
+	}
+	if err := s.Commit(); err != nil {
+		return 0, fileVersion{}, err
+	}
+	return s.written, s.version(), nil
+}
+
+// commitStaged replaces several files together: either every target gets its
+// new content or none does. All temporary files are flushed first, then the
+// existing targets are kept as hard-link backups while the renames run, so a
+// failed rename restores the files already replaced.
+func commitStaged(staged []*stagedWrite) error {
+	if len(staged) == 1 {
+		return staged[0].Commit()
+	}
+
+	abortAll := func() {
+		for _, s := range staged {
+			s.Abort()
+		}
+	}
+	for _, s := range staged {
+		if err := s.prepare(); err != nil {
+			abortAll()
+			return err
+		}
+	}
+
+	backups := make([]string, len(staged)) // "" when the target did not exist
+	removeBackups := func() {
+		for _, b := range backups {
+			if b != "" {
+				os.Remove(b)
+			}
+		}
+	}
+	for i, s := range staged {
+		backup := s.tmp.Name() + ".orig"
+		if err := os.Link(s.path, backup); err == nil {
+			backups[i] = backup
+		} else if !errors.Is(err, fs.ErrNotExist) {
+			removeBackups()
+			abortAll()
+			return fmt.Errorf("failed to back up file %q: %v", s.path, err)
+		}
+	}
+
+	defer func() {
+		for _, s := range staged {
+			dirChanged(s.path)
+		}
+	}()
+	for i, s := range staged {
+		if err := os.Rename(s.tmp.Name(), s.path); err != nil {
+			// Put back the files replaced so far
+			for j := i - 1; j >= 0; j-- {
+				if backups[j] != "" {
+					os.Rename(backups[j], staged[j].path)
+					backups[j] = ""
+				} else {
+					os.Remove(staged[j].path)
+				}
+			}
+			removeBackups()
+			abortAll()
+			return fmt.Errorf("failed to replace file %q: %v", s.path, err)
+		}
+	}
+	removeBackups()
+	for _, s := range staged {
+		if !s.partial {
+			s.remember(s.hash.Sum64())
+		}
+	}
+
+	synced := make(map[string]bool)
+	for _, s := range staged {
+		dir := filepath.Dir(s.path)
+		if s.durability != durabilityFsync || synced[dir] {
+			continue
+		}
+		synced[dir] = true
+		if err := syncDir(dir); err != nil {
+			return fmt.Errorf("failed to sync directory of %q: %v", s.path, err)
+		}
+	}
+	return nil
+}
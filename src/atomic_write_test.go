@@ -0,0 +1,147 @@
+package main
+
+import (
+	"bytes"
+	"context"
+	"encoding/base64"
+	"fmt"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+func TestWriteFileAtomic(t *testing.T) {
+	dir := t.TempDir()
+	path := filepath.Join(dir, "file.txt")
+	if err := os.WriteFile(path, []byte("old content"), 0600); err != nil {
+		t.Fatal(err)
+	}
+
+	for _, mode := range []string{durabilityNone, durabilityFdatasync, durabilityFsync} {
+		content := []byte("new content: " + mode)
+		if _, err := writeFileAtomic(path, content, mode); err != nil {
+			t.Fatalf("%s: %v", mode, err)
+		}
+		got, err := os.ReadFile(path)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if string(got) != string(content) {
+			t.Fatalf("%s: got %q, want %q", mode, got, content)
+		}
+		info, err := os.Stat(path)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if info.Mode().Perm() != 0600 {
+			t.Fatalf("%s: mode %v not preserved", mode, info.Mode().Perm())
+		}
+	}
+
+	entries, err := os.ReadDir(dir)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if len(entries) != 1 {
+		t.Fatalf("temporary files left behind: %d entries", len(entries))
+	}
+}
+
+func TestParseDurability(t *testing.T) {
+	if mode, err := parseDurability(nil); err != nil || mode != durabilityNone {
+		t.Fatalf("default: got %q, %v", mode, err)
+	}
+	bad := "always"
+	if _, err := parseDurability(&bad); err == nil {
+		t.Fatal("expected an error for an unknown mode")
+	}
+}
+
+// BenchmarkWriteFile compares in-place writes with atomic writes in every
+// durability mode. Run with: go test ./src -run '^$' -bench WriteFile
+func BenchmarkWriteFile(b *testing.B) {
+	for _, size := range []int{4 << 10, 1 << 20} {
+		content := make([]byte, size)
+		for i := range content {
+			content[i] = byte('a' + i%26)
+		}
+
+		b.Run(fmt.Sprintf("inplace/%dKB", size>>10), func(b *testing.B) {
+			path := filepath.Join(b.TempDir(), "file")
+			b.SetBytes(int64(size))
+			for i := 0; i < b.N; i++ {
+				if err := os.WriteFile(path, content, 0644); err != nil {
+					b.Fatal(err)
+				}
+			}
+		})
+		for _, mode := range []string{durabilityNone, durabilityFdatasync, durabilityFsync} {
+			mode := mode
+			b.Run(fmt.Sprintf("%s/%dKB", mode, size>>10), func(b *testing.B) {
+				path := filepath.Join(b.TempDir(), "file")
+				b.SetBytes(int64(size))
+				for i := 0; i < b.N; i++ {
+					if _, err := writeFileAtomic(path, content, mode); err != nil {
+						b.Fatal(err)
+					}
+				}
+			})
+		}
+	}
+}
+
+func TestWriteFileBase64(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "blob.bin")
+	content := make([]byte, 100000)
+	for i := range content {
+		content[i] = byte(i * 31)
+	}
+	encoding := contentBase64
+	// Line breaks, as written by base64(1), are ignored
+	encoded := base64.StdEncoding.EncodeToString(content)
+	wrapped := ""
+	for len(encoded) > 76 {
+		wrapped, encoded = wrapped+encoded[:76]+"\n", encoded[76:]
+	}
+	wrapped += encoded
+	if _, _, err := handleWriteFile(context.Background(), nil, WriteFileRequest{Filename: path, Content: wrapped, Encoding: &encoding}); err != nil {
+		t.Fatal(err)
+	}
+	if got, _ := os.ReadFile(path); !bytes.Equal(got, content) {
+		t.Fatal("decoded content differs")
+	}
+
+	// Invalid base64 leaves the file untouched
+	_, _, err := handleWriteFile(context.Background(), nil, WriteFileRequest{Filename: path, Content: "AAAA*AAA", Encoding: &encoding})
+	if err == nil || !strings.Contains(err.Error(), "not valid base64") {
+		t.Fatalf("invalid base64: %v", err)
+	}
+	if got, _ := os.ReadFile(path); !bytes.Equal(got, content) {
+		t.Fatal("file changed by a failed write")
+	}
+	entries, _ := os.ReadDir(filepath.Dir(path))
+	if len(entries) != 1 {
+		t.Fatalf("temporary files left behind: %d entries", len(entries))
+	}
+}
+
+// BenchmarkWriteFileBase64 writes base64 content decoded on the fly. B/op
+// stays a few KB whatever the size: the decoded content is streamed, never
+// held whole.
+func BenchmarkWriteFileBase64(b *testing.B) {
+	content := make([]byte, 8<<20)
+	for i := range content {
+		content[i] = byte(i * 31)
+	}
+	encoded := base64.StdEncoding.EncodeToString(content)
+	path := filepath.Join(b.TempDir(), "blob.bin")
+	b.ReportAllocs()
+	b.SetBytes(int64(len(content)))
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		if _, _, err := writeFileFrom(path, contentReader(encoded, contentBase64), durabilityNone); err != nil {
+			b.Fatal(err)
+		}
+	}
+}
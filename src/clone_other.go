@@ -0,0 +1,13 @@
+//go:build !linux
+
+package main
+
+import (
+	"errors"
+	"os"
+)
+
+// cloneFile is not supported outside Linux; copies fall back to a regular copy
+func cloneFile(dst, src *os.File) error {
+	return errors.ErrUnsupported
+}
@@ -7,8 +7,16 @@ import (
 )
 
 var (
-	debugMode     bool
-	logger        *slog.Logger
+	debugMode      bool
+	logger         *slog.Logger
+	listCache      *dirCache // nil when the list_files cache is disabled
+	fileMetaCache  = newMetadataCache(metadataCacheEntries)
+	fileLocks      = newPathLockManager() // serializes mutations of the same file
+	contentHashes  = newHashCache(hashCacheEntries)
+	patternCache   = newRegexCache(regexCacheEntries)
+	createdDirs    = newDirCreator(createdDirEntries)
+	fileAppends    = newAppendCommitter()
+	editJournal    *changeJournal // nil when the edit journal is disabled
 	activeCommands = &commandTracker{
 		commands: make(map[*exec.Cmd]context.CancelFunc),
 	}
@@ -0,0 +1,220 @@
+package main
+
+import (
+	"bytes"
+	"errors"
+	"fmt"
+	"hash"
+	"hash/crc64"
+	"io"
+	"io/fs"
+	"os"
+	"strings"
+	"sync"
+	"time"
+)
+
+// File content hashes are CRC-64 (ECMA) checksums. They are cheap to compute
+// in the same pass that reads or writes a file and stable across restarts,
+// which is all optimistic concurrency checks need.
+var crc64Table = crc64.MakeTable(crc64.ECMA)
+
+func newContentHash() hash.Hash64 {
+	return crc64.New(crc64Table)
+}
+
+func formatHash(h hash.Hash64) string {
+	return formatSum(h.Sum64())
+}
+
+func formatSum(sum uint64) string {
+	return fmt.Sprintf("%016x", sum)
+}
+
+// hashCacheEntries caps the number of file versions whose hash is remembered
+const hashCacheEntries = 10000
+
+// hashCache remembers the content hash of file versions this server has read
+// or written, keyed by file identity, size and mtime, so that an append can
+// extend the hash instead of reading the whole file again
+type hashCache struct {
+	mu      sync.Mutex
+	max     int
+	entries map[fileKey]uint64
+}
+
+func newHashCache(max int) *hashCache {
+	return &hashCache{max: max, entries: make(map[fileKey]uint64)}
+}
+
+func (c *hashCache) get(key fileKey) (uint64, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	sum, ok := c.entries[key]
+	return sum, ok
+}
+
+// evictHalf makes room in a bounded cache by dropping an arbitrary half of
+// its entries; map iteration order is randomized
+func evictHalf[K comparable, V any](m map[K]V) {
+	n := len(m) / 2
+	for k := range m {
+		if n == 0 {
+			break
+		}
+		delete(m, k)
+		n--
+	}
+}
+
+func (c *hashCache) put(key fileKey, sum uint64) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if _, ok := c.entries[key]; !ok && len(c.entries) >= c.max {
+		evictHalf(c.entries)
+	}
+	c.entries[key] = sum
+}
+
+// fileVersion identifies the content of a file after a read or a write. The
+// hash is empty when it is not known (appends to files not seen before).
+type fileVersion struct {
+	hash    string
+	modTime time.Time
+	key     fileKey // identity, size and mtime of the file
+}
+
+func (v fileVersion) String() string {
+	if v.hash == "" {
+		return fmt.Sprintf("Modified: %s", v.modTime.Format(time.RFC3339Nano))
+	}
+	return fmt.Sprintf("Hash: %s. Modified: %s", v.hash, v.modTime.Format(time.RFC3339Nano))
+}
+
+// readFileHashed reads a whole file and hashes it in the same pass
+func readFileHashed(path string) ([]byte, fileVersion, error) {
+	f, err := os.Open(path)
+	if err != nil {
+		return nil, fileVersion{}, err
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return nil, fileVersion{}, err
+	}
+
+	h := newContentHash()
+	var buf bytes.Buffer
+	buf.Grow(int(info.Size()) + bytes.MinRead)
+	if _, err := buf.ReadFrom(io.TeeReader(f, h)); err != nil {
+		return nil, fileVersion{}, err
+	}
+	key := fileKeyOf(path, info)
+	if int64(buf.Len()) == info.Size() {
+		contentHashes.put(key, h.Sum64())
+	}
+	return buf.Bytes(), fileVersion{hash: formatHash(h), modTime: info.ModTime(), key: key}, nil
+}
+
+// hashFile hashes a file without keeping its content. A missing file has
+// the empty hash.
+func hashFile(path string) (string, error) {
+	f, err := os.Open(path)
+	if errors.Is(err, fs.ErrNotExist) {
+		return "", nil
+	}
+	if err != nil {
+		return "", err
+	}
+	defer f.Close()
+	h := newContentHash()
+	if _, err := io.Copy(h, f); err != nil {
+		return "", err
+	}
+	return formatHash(h), nil
+}
+
+// writePrecondition is the optimistic concurrency check of a write: the
+// file must still have the hash or modification time the caller last saw
+type writePrecondition struct {
+	hash  *string // "" requires the file not to exist
+	mtime *time.Time
+}
+
+// parsePrecondition returns nil when the request has no precondition
+func parsePrecondition(expectedHash, expectedMtime *string) (*writePrecondition, error) {
+	if expectedHash == nil && expectedMtime == nil {
+		return nil, nil
+	}
+	p := &writePrecondition{}
+	if expectedHash != nil {
+		sum := strings.ToLower(*expectedHash)
+		if sum != "" && (len(sum) != 16 || strings.Trim(sum, hexDigits) != "") {
+			return nil, fmt.Errorf("invalid expected_hash %q: must be 16 hex digits, or empty for a file that must not exist", *expectedHash)
+		}
+		p.hash = &sum
+	}
+	if expectedMtime != nil {
+		t, err := time.Parse(time.RFC3339Nano, *expectedMtime)
+		if err != nil {
+			return nil, fmt.Errorf("invalid expected_mtime %q: must be an RFC3339 timestamp", *expectedMtime)
+		}
+		p.mtime = &t
+	}
+	return p, nil
+}
+
+func (p *writePrecondition) needsHash() bool {
+	return p != nil && p.hash != nil
+}
+
+// checkMtime compares the file modification time. A timestamp without
+// fractional seconds only has to match to the second.
+func (p *writePrecondition) checkMtime(path string) error {
+	if p == nil || p.mtime == nil {
+		return nil
+	}
+	info, err := os.Stat(path)
+	if errors.Is(err, fs.ErrNotExist) {
+		return fmt.Errorf("precondition failed for %q: file does not exist", path)
+	}
+	if err != nil {
+		return fmt.Errorf("failed to access file %q: %v", path, err)
+	}
+	got := info.ModTime()
+	if p.mtime.Nanosecond() == 0 {
+		got = got.Truncate(time.Second)
+	}
+	if !got.Equal(*p.mtime) {
+		return fmt.Errorf("precondition failed for %q: file was modified at %s, expected %s",
+			path, info.ModTime().Format(time.RFC3339Nano), p.mtime.Format(time.RFC3339Nano))
+	}
+	return nil
+}
+
+// checkHash compares the hash of the current content ("" if the file is missing)
+func (p *writePrecondition) checkHash(path, current string) error {
+	if !p.needsHash() || *p.hash == current {
+		return nil
+	}
+	if current == "" {
+		return fmt.Errorf("precondition failed for %q: file does not exist", path)
+	}
+	if *p.hash == "" {
+		return fmt.Errorf("precondition failed for %q: file already exists", path)
+	}
+	return fmt.Errorf("precondition failed for %q: file hash is %s, expected %s", path, current, *p.hash)
+}
+
+// checkFileHash hashes the file to verify an expected hash, for writes that
+// don't read the file anyway
+func (p *writePrecondition) checkFileHash(path string) error {
+	if !p.needsHash() {
+		return nil
+	}
+	current, err := hashFile(path)
+	if err != nil {
+		return fmt.Errorf("failed to read file %q: %v", path, err)
+	}
+	return p.checkHash(path, current)
+}
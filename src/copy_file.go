@@ -0,0 +1,349 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"strings"
+	"sync/atomic"
+	"syscall"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// treeCopy copies a file, a symlink or a directory tree on the server,
+// without the data passing through the client. Every file is cloned with a
+// reflink when the filesystem supports it, and copied by the kernel with
+// copy_file_range otherwise; either way it is staged in a temporary file and
+// renamed into place, so a destination is never seen half-written.
+type treeCopy struct {
+	durability string
+	overwrite  bool
+	tool       string // journal the copied files under this tool, "" not to
+	noClone    atomic.Bool
+
+	files, bytes, cloned, dirs, links atomic.Int64
+}
+
+// copyJob is a regular file of the tree waiting to be copied
+type copyJob struct {
+	src, dst string
+	info     fs.FileInfo
+}
+
+// run copies src to dst. The directories and symlinks of a tree are created
+// while it is walked; its files are then copied in parallel.
+func (c *treeCopy) run(src, dst string) error {
+	info, err := os.Lstat(src)
+	if err != nil {
+		return fmt.Errorf("failed to access %q: %v", src, err)
+	}
+	if !info.IsDir() {
+		if err := createdDirs.ensureParent(dst); err != nil {
+			return err
+		}
+		return c.entry(src, dst, info)
+	}
+	if inside(dst, src) {
+		return fmt.Errorf("invalid arguments: cannot copy %q into itself", src)
+	}
+	if err := createdDirs.ensureParent(dst); err != nil {
+		return err
+	}
+
+	var jobs []copyJob
+	var restrictive []copyJob // directories created writable, their mode set at the end
+	err = filepath.WalkDir(src, func(path string, d fs.DirEntry, err error) error {
+		if err != nil {
+			return err
+		}
+		rel, err := filepath.Rel(src, path)
+		if err != nil {
+			return err
+		}
+		target := filepath.Join(dst, rel)
+		info, err := d.Info()
+		if err != nil {
+			return err
+		}
+		if !d.IsDir() {
+			if info.Mode().IsRegular() {
+				jobs = append(jobs, copyJob{src: path, dst: target, info: info})
+				return nil
+			}
+			return c.entry(path, target, info)
+		}
+		perm := info.Mode().Perm()
+		err = os.Mkdir(target, perm|0700)
+		dirChanged(target)
+		if err != nil {
+			if !c.overwrite || !errors.Is(err, fs.ErrExist) {
+				return fmt.Errorf("failed to create directory %q: %v", target, err)
+			}
+			if existing, err := os.Stat(target); err != nil || !existing.IsDir() {
+				return fmt.Errorf("failed to create directory %q: a file is in the way", target)
+			}
+		} else if perm&0700 != 0700 {
+			restrictive = append(restrictive, copyJob{dst: target, info: info})
+		}
+		c.dirs.Add(1)
+		return nil
+	})
+	if err != nil {
+		return fmt.Errorf("failed to copy %q: %v", src, err)
+	}
+
+	errs := make([]error, len(jobs))
+	forEachFile(len(jobs), func(i int) {
+		errs[i] = c.entry(jobs[i].src, jobs[i].dst, jobs[i].info)
+	})
+	for i := len(restrictive) - 1; i >= 0; i-- {
+		os.Chmod(restrictive[i].dst, restrictive[i].info.Mode().Perm())
+		dirChanged(restrictive[i].dst)
+	}
+	failed, first := 0, error(nil)
+	for _, err := range errs {
+		if err != nil {
+			if first == nil {
+				first = err
+			}
+			failed++
+		}
+	}
+	if failed > 0 {
+		return fmt.Errorf("%d of %d files not copied; the first error: %v", failed, len(jobs), first)
+	}
+	return nil
+}
+
+// entry copies one file or symlink
+func (c *treeCopy) entry(src, dst string, info fs.FileInfo) error {
+	unlock := fileLocks.lock(dst)
+	defer unlock()
+	if existing, err := os.Lstat(dst); err == nil {
+		if !c.overwrite {
+			return fmt.Errorf("%q already exists (set overwrite to replace it)", dst)
+		}
+		if existing.IsDir() {
+			return fmt.Errorf("cannot replace directory %q with a file", dst)
+		}
+	}
+
+	switch {
+	case info.Mode()&fs.ModeSymlink != 0:
+		target, err := os.Readlink(src)
+		if err != nil {
+			return fmt.Errorf("failed to read symlink %q: %v", src, err)
+		}
+		if c.overwrite {
+			os.Remove(dst)
+		}
+		err = os.Symlink(target, dst)
+		dirChanged(dst)
+		if err != nil {
+			return fmt.Errorf("failed to create symlink %q: %v", dst, err)
+		}
+		c.links.Add(1)
+		return nil
+	case !info.Mode().IsRegular():
+		return fmt.Errorf("cannot copy %q: not a regular file, directory or symlink", src)
+	}
+
+	in, err := os.Open(src)
+	if err != nil {
+		return fmt.Errorf("failed to open file %q: %v", src, err)
+	}
+	defer in.Close()
+	var change *journalChange
+	if c.tool != "" {
+		change = editJournal.beginRewrite(dst)
+	}
+	s, err := stageWrite(dst, c.durability)
+	if err != nil {
+		return err
+	}
+	if err := s.tmp.Chmod(info.Mode().Perm()); err != nil {
+		s.Abort()
+		return fmt.Errorf("failed to set permissions of %q: %v", dst, err)
+	}
+	cloned := false
+	if !c.noClone.Load() {
+		if err := cloneFile(s.tmp, in); err == nil {
+			cloned = true
+			s.partial, s.written = true, info.Size()
+		} else {
+			// Not a copy-on-write filesystem, or not the same one: don't try
+			// again for the rest of the tree
+			c.noClone.Store(true)
+		}
+	}
+	if !cloned {
+		if err := s.copyRange(in, 0, info.Size()); err != nil {
+			s.Abort()
+			return fmt.Errorf("failed to copy %q to %q: %v", src, dst, err)
+		}
+	}
+	if err := s.Commit(); err != nil {
+		return err
+	}
+	if c.tool != "" {
+		change.rewrittenAll(s.written)
+		editJournal.record(c.tool, change, s.version())
+	}
+	c.files.Add(1)
+	c.bytes.Add(s.written)
+	if cloned {
+		c.cloned.Add(1)
+	}
+	return nil
+}
+
+func (c *treeCopy) summary() string {
+	s := fmt.Sprintf("%d files (%d bytes, %d reflinked)", c.files.Load(), c.bytes.Load(), c.cloned.Load())
+	if n := c.dirs.Load(); n > 0 {
+		s += fmt.Sprintf(", %d directories", n)
+	}
+	if n := c.links.Load(); n > 0 {
+		s += fmt.Sprintf(", %d symlinks", n)
+	}
+	return s
+}
+
+// inside reports whether path is dir or below it
+func inside(path, dir string) bool {
+	rel, err := filepath.Rel(canonicalPath(dir), canonicalPath(path))
+	return err == nil && rel != ".." && !strings.HasPrefix(rel, ".."+string(filepath.Separator))
+}
+
+// parseCopyRequest validates the arguments shared by copy_file and move_file
+func parseCopyRequest(input CopyFileRequest) (string, bool, error) {
+	if input.Source == "" || input.Destination == "" {
+		return "", false, fmt.Errorf("invalid arguments: source and destination are required")
+	}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return "", false, fmt.Errorf("invalid arguments: %v", err)
+	}
+	if canonicalPath(input.Source) == canonicalPath(input.Destination) {
+		return "", false, fmt.Errorf("invalid arguments: source and destination are the same file")
+	}
+	return durability, input.Overwrite != nil && *input.Overwrite, nil
+}
+
+func handleCopyFile(ctx context.Context, req *mcp.CallToolRequest, input CopyFileRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log full request if debug mode
+	if logger != nil {
+		reqJSON, _ := json.MarshalIndent(req, "", "  ")
+		logger.Debug("copy_file REQUEST", "request", string(reqJSON))
+		logger.Debug("copy_file called", "source", input.Source, "destination", input.Destination)
+	}
+
+	durability, overwrite, err := parseCopyRequest(input)
+	if err != nil {
+		return nil, nil, err
+	}
+	c := &treeCopy{durability: durability, overwrite: overwrite, tool: "copy_file"}
+	if err := c.run(input.Source, input.Destination); err != nil {
+		return nil, nil, err
+	}
+	message := fmt.Sprintf("Copied %s to %s: %s", input.Source, input.Destination, c.summary())
+	return copyResult("copy_file", message), nil, nil
+}
+
+// handleMoveFile renames the source when it is on the same filesystem as
+// the destination; otherwise it is copied and then removed
+func handleMoveFile(ctx context.Context, req *mcp.CallToolRequest, input CopyFileRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log full request if debug mode
+	if logger != nil {
+		reqJSON, _ := json.MarshalIndent(req, "", "  ")
+		logger.Debug("move_file REQUEST", "request", string(reqJSON))
+		logger.Debug("move_file called", "source", input.Source, "destination", input.Destination)
+	}
+
+	durability, overwrite, err := parseCopyRequest(input)
+	if err != nil {
+		return nil, nil, err
+	}
+	info, err := os.Lstat(input.Source)
+	if err != nil {
+		return nil, nil, fmt.Errorf("failed to access %q: %v", input.Source, err)
+	}
+	if info.IsDir() && inside(input.Destination, input.Source) {
+		return nil, nil, fmt.Errorf("invalid arguments: cannot move %q into itself", input.Source)
+	}
+	if err := createdDirs.ensureParent(input.Destination); err != nil {
+		return nil, nil, err
+	}
+
+	// The locks are released before a copy across filesystems, which locks
+	// every file it writes
+	unlock := fileLocks.lock(input.Source, input.Destination)
+	if existing, err := os.Lstat(input.Destination); err == nil {
+		if !overwrite {
+			unlock()
+			return nil, nil, fmt.Errorf("%q already exists (set overwrite to replace it)", input.Destination)
+		}
+		if existing.IsDir() != info.IsDir() {
+			unlock()
+			return nil, nil, fmt.Errorf("cannot replace %q: one is a directory and the other is not", input.Destination)
+		}
+	}
+	err = os.Rename(input.Source, input.Destination)
+	treeChanged(input.Source)
+	treeChanged(input.Destination)
+	unlock()
+	var message string
+	switch {
+	case err == nil:
+		if durability == durabilityFsync {
+			// Persist the rename in both directories
+			for _, dir := range []string{filepath.Dir(input.Source), filepath.Dir(input.Destination)} {
+				if err := syncDir(dir); err != nil {
+					return nil, nil, fmt.Errorf("failed to sync directory %q: %v", dir, err)
+				}
+			}
+		}
+		message = fmt.Sprintf("Moved %s to %s (renamed)", input.Source, input.Destination)
+	case errors.Is(err, syscall.EXDEV):
+		c := &treeCopy{durability: durability, overwrite: overwrite}
+		if err := c.run(input.Source, input.Destination); err != nil {
+			return nil, nil, fmt.Errorf("failed to move %q across filesystems, the source is kept: %v", input.Source, err)
+		}
+		err := os.RemoveAll(input.Source)
+		treeChanged(input.Source)
+		if err != nil {
+			return nil, nil, fmt.Errorf("copied %q to %q but failed to remove the source: %v", input.Source, input.Destination, err)
+		}
+		message = fmt.Sprintf("Moved %s to %s (copied across filesystems, then removed): %s", input.Source, input.Destination, c.summary())
+	default:
+		return nil, nil, fmt.Errorf("failed to move %q to %q: %v", input.Source, input.Destination, err)
+	}
+	return copyResult("move_file", message), nil, nil
+}
+
+func copyResult(tool, message string) *mcp.CallToolResult {
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: message},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug(tool+" RESPONSE", "response", string(resultJSON))
+	}
+	return result
+}
@@ -0,0 +1,100 @@
+package main
+
+import (
+	"context"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+func resultText(result *mcp.CallToolResult) string {
+	return result.Content[0].(*mcp.TextContent).Text
+}
+
+func TestCopyFileTree(t *testing.T) {
+	root := t.TempDir()
+	src := filepath.Join(root, "src")
+	files := scaffold(src, 50)
+	writeFiles(t, WriteFilesRequest{Files: files})
+	if err := os.Symlink("pkg0", filepath.Join(src, "link")); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.Chmod(files[3].Filename, 0600); err != nil {
+		t.Fatal(err)
+	}
+
+	dst := filepath.Join(root, "copies", "dst")
+	result, _, err := handleCopyFile(context.Background(), nil, CopyFileRequest{Source: src, Destination: dst})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if text := resultText(result); !strings.Contains(text, "50 files") || !strings.Contains(text, "1 symlinks") {
+		t.Fatalf("unexpected result: %s", text)
+	}
+	for _, f := range files {
+		copied := filepath.Join(dst, strings.TrimPrefix(f.Filename, src))
+		if got, err := os.ReadFile(copied); err != nil || string(got) != f.Content {
+			t.Fatalf("%s: %q, %v", copied, got, err)
+		}
+	}
+	if info, err := os.Stat(filepath.Join(dst, strings.TrimPrefix(files[3].Filename, src))); err != nil || info.Mode().Perm() != 0600 {
+		t.Fatalf("permissions not copied: %v, %v", info.Mode(), err)
+	}
+	if target, err := os.Readlink(filepath.Join(dst, "link")); err != nil || target != "pkg0" {
+		t.Fatalf("symlink: %q, %v", target, err)
+	}
+
+	// An existing destination is kept unless overwrite is set
+	if _, _, err := handleCopyFile(context.Background(), nil, CopyFileRequest{Source: files[0].Filename, Destination: filepath.Join(dst, "link")}); err == nil {
+		t.Fatal("copy replaced an existing file")
+	}
+	if _, _, err := handleCopyFile(context.Background(), nil, CopyFileRequest{Source: src, Destination: filepath.Join(src, "pkg1", "inner")}); err == nil {
+		t.Fatal("copied a directory into itself")
+	}
+	yes := true
+	single := filepath.Join(dst, "single.go")
+	for _, f := range files[:2] {
+		if _, _, err := handleCopyFile(context.Background(), nil, CopyFileRequest{Source: f.Filename, Destination: single, Overwrite: &yes}); err != nil {
+			t.Fatal(err)
+		}
+	}
+	if got, _ := os.ReadFile(single); string(got) != files[1].Content {
+		t.Fatalf("overwritten copy: %q", got)
+	}
+}
+
+func TestMoveFile(t *testing.T) {
+	root := t.TempDir()
+	files := scaffold(filepath.Join(root, "a"), 10)
+	writeFiles(t, WriteFilesRequest{Files: files})
+
+	moved := filepath.Join(root, "b", "c")
+	result, _, err := handleMoveFile(context.Background(), nil, CopyFileRequest{Source: filepath.Join(root, "a"), Destination: moved})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if text := resultText(result); !strings.Contains(text, "renamed") {
+		t.Fatalf("unexpected result: %s", text)
+	}
+	if _, err := os.Stat(filepath.Join(root, "a")); !os.IsNotExist(err) {
+		t.Fatalf("source still exists: %v", err)
+	}
+	first := filepath.Join(moved, strings.TrimPrefix(files[0].Filename, filepath.Join(root, "a")))
+	if got, err := os.ReadFile(first); err != nil || string(got) != files[0].Content {
+		t.Fatalf("%s: %q, %v", first, got, err)
+	}
+
+	other := filepath.Join(moved, "other.go")
+	if err := os.WriteFile(other, []byte("other"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	if _, _, err := handleMoveFile(context.Background(), nil, CopyFileRequest{Source: first, Destination: other}); err == nil {
+		t.Fatal("move replaced an existing file")
+	}
+	if _, _, err := handleMoveFile(context.Background(), nil, CopyFileRequest{Source: moved, Destination: filepath.Join(moved, "sub")}); err == nil {
+		t.Fatal("moved a directory into itself")
+	}
+}
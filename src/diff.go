@@ -0,0 +1,434 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"hash/maphash"
+	"io"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+)
+
+const (
+	// diffDefaultContext is the number of unchanged lines shown around a change
+	diffDefaultContext = 3
+	// diffMaxBytes caps the changed text kept for a diff; further changes are only counted
+	diffMaxBytes = 64 << 10
+	// diffMaxLine caps how far a diff looks for the ends of a line
+	diffMaxLine = 64 << 10
+)
+
+// diffLine is one line of a hunk
+type diffLine struct {
+	kind byte   // ' ', '-' or '+'
+	text []byte // including its newline, if any
+}
+
+// diffHunk is a run of changed lines with their context
+type diffHunk struct {
+	oldStart, newStart int // 1-based line numbers of the first line
+	lines              []diffLine
+}
+
+// writeUnifiedDiff formats hunks as a unified diff of one file
+func writeUnifiedDiff(b *strings.Builder, oldName, newName string, hunks []diffHunk) {
+	if len(hunks) == 0 {
+		return
+	}
+	fmt.Fprintf(b, "--- %s\n+++ %s\n", oldName, newName)
+	for _, h := range hunks {
+		oldCount, newCount := 0, 0
+		for _, l := range h.lines {
+			if l.kind != '+' {
+				oldCount++
+			}
+			if l.kind != '-' {
+				newCount++
+			}
+		}
+		fmt.Fprintf(b, "@@ -%s +%s @@\n", hunkRange(h.oldStart, oldCount), hunkRange(h.newStart, newCount))
+		for _, l := range h.lines {
+			b.WriteByte(l.kind)
+			b.Write(l.text)
+			if len(l.text) == 0 || l.text[len(l.text)-1] != '\n' {
+				b.WriteString("\n\\ No newline at end of file\n")
+			}
+		}
+	}
+}
+
+// diffName prefixes a path for a diff header. The leading separator of an
+// absolute path is dropped so that the a/ and b/ prefixes stay one level.
+func diffName(prefix, path string) string {
+	return prefix + strings.TrimLeft(filepath.ToSlash(path), "/")
+}
+
+// hunkRange formats the start,count part of a hunk header. An empty range
+// is given by the line before it, as diff(1) does.
+func hunkRange(start, count int) string {
+	if count == 0 {
+		start--
+	}
+	if count == 1 {
+		return strconv.Itoa(start)
+	}
+	return fmt.Sprintf("%d,%d", start, count)
+}
+
+// splitDiffLines splits text after each newline; the last line may have none
+func splitDiffLines(text []byte) [][]byte {
+	lines := make([][]byte, 0, bytes.Count(text, []byte{'\n'})+1)
+	for len(text) > 0 {
+		i := bytes.IndexByte(text, '\n')
+		if i < 0 {
+			lines = append(lines, text)
+			break
+		}
+		lines = append(lines, text[:i+1])
+		text = text[i+1:]
+	}
+	return lines
+}
+
+// diffRegion is a region replaced by an edit
+type diffRegion struct {
+	offset   int64 // start in the new content
+	line     int   // 1-based line of the start in the old content
+	addLines int   // lines added by the earlier regions
+	old, new []byte
+}
+
+// editDiff collects the regions an edit replaces, as the replacement finds
+// them, and renders a unified diff from those regions and the lines around
+// them only: the rest of the file is never compared or read. All methods are
+// no-ops on a nil diff (no diff requested).
+type editDiff struct {
+	context  int
+	regions  []diffRegion
+	shift    int64 // bytes added by the regions so far
+	addLines int   // lines added by the regions so far
+	kept     int64
+	omitted  int // regions not kept because the diff grew too large
+	// Once a region is omitted, so are the ones after it: the diff shows the
+	// changes before cut, in the new content
+	truncated bool
+	cut       int64
+}
+
+// newEditDiff returns the diff collector of a request, nil if no diff was requested
+func newEditDiff(returnDiff *bool, diffContext *int) (*editDiff, error) {
+	if returnDiff == nil || !*returnDiff {
+		if diffContext != nil {
+			return nil, fmt.Errorf("invalid arguments: diff_context requires return_diff")
+		}
+		return nil, nil
+	}
+	d := &editDiff{context: diffDefaultContext}
+	if diffContext != nil {
+		if *diffContext < 0 {
+			return nil, fmt.Errorf("invalid arguments: diff_context must not be negative")
+		}
+		d.context = *diffContext
+	}
+	return d, nil
+}
+
+// replaced records that old, at offset and line of the original content,
+// was replaced with new. Replacements must be recorded in order.
+func (d *editDiff) replaced(offset int64, line int, old, new []byte) {
+	if d == nil {
+		return
+	}
+	if d.truncated || d.kept+int64(len(old)+len(new)) > diffMaxBytes {
+		d.skipped(offset)
+	} else {
+		d.regions = append(d.regions, diffRegion{offset: offset + d.shift, line: line, addLines: d.addLines, old: old, new: new})
+		d.kept += int64(len(old) + len(new))
+	}
+	d.shift += int64(len(new) - len(old))
+	d.addLines += bytes.Count(new, []byte{'\n'}) - bytes.Count(old, []byte{'\n'})
+}
+
+// skipped omits the region at offset of the original content, and every
+// region after it
+func (d *editDiff) skipped(offset int64) {
+	if d == nil {
+		return
+	}
+	if !d.truncated {
+		d.truncated = true
+		d.cut = offset + d.shift
+	}
+	d.omitted++
+}
+
+// rewritten records a change of the whole content from old to new as the
+// region between their common prefix and suffix
+func (d *editDiff) rewritten(old, new []byte) {
+	if d == nil {
+		return
+	}
+	prefix := 0
+	for prefix < len(old) && prefix < len(new) && old[prefix] == new[prefix] {
+		prefix++
+	}
+	suffix := 0
+	for suffix < len(old)-prefix && suffix < len(new)-prefix && old[len(old)-1-suffix] == new[len(new)-1-suffix] {
+		suffix++
+	}
+	if prefix == len(old) && prefix == len(new) {
+		return
+	}
+	line := bytes.Count(old[:prefix], []byte{'\n'}) + 1
+	d.replaced(int64(prefix), line, old[prefix:len(old)-suffix], new[prefix:len(new)-suffix])
+}
+
+// renderFile renders the diff reading the context from the file as written
+func (d *editDiff) renderFile(filename string) (string, error) {
+	if d == nil {
+		return "", nil
+	}
+	f, err := os.Open(filename)
+	if err != nil {
+		return "", fmt.Errorf("failed to read file %q: %v", filename, err)
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return "", fmt.Errorf("failed to access file %q: %v", filename, err)
+	}
+	return d.render(filename, f, info.Size()), nil
+}
+
+// diffGroup is a run of changed lines, in a span of whole lines of the new
+// content touched by one or more regions
+type diffGroup struct {
+	start, end       int64 // in the new content
+	oldLine, newLine int   // line numbers of start
+	lines            []diffLine
+}
+
+// render formats the diff; r holds the new content
+func (d *editDiff) render(filename string, r io.ReaderAt, size int64) string {
+	if d == nil {
+		return ""
+	}
+	regions, omitted := d.regions, d.omitted
+	if d.truncated {
+		// Nothing from the line of the first omitted region on is shown
+		size = lineStart(r, d.cut)
+		for len(regions) > 0 && regions[len(regions)-1].offset+int64(len(regions[len(regions)-1].new)) >= size {
+			regions = regions[:len(regions)-1]
+			omitted++
+		}
+	}
+	var groups []*diffGroup
+	for i := 0; i < len(regions); {
+		// Regions touching the same lines are compared as one span. A region
+		// at the end of the content is on its last line, which the span reaches
+		// when it ends there.
+		first := regions[i]
+		start := lineStart(r, first.offset)
+		end := lineEnd(r, first.offset+int64(len(first.new)), size)
+		j := i + 1
+		for j < len(regions) && (regions[j].offset < end || end == size) {
+			last := regions[j]
+			end = max(end, lineEnd(r, last.offset+int64(len(last.new)), size))
+			j++
+		}
+		groups = append(groups, newDiffGroups(r, start, end, regions[i:j])...)
+		i = j
+	}
+
+	var b strings.Builder
+	writeUnifiedDiff(&b, diffName("a/", filename), diffName("b/", filename), groupHunks(r, size, groups, d.context))
+	if omitted > 0 {
+		fmt.Fprintf(&b, "... %d more changes not shown\n", omitted)
+	}
+	return b.String()
+}
+
+// newDiffGroups builds the changed lines of the span [start, end) of the new
+// content. The lines of the span before and after are compared with
+// diffLines, so lines that are the same on both sides are not shown as
+// changed; each run of changed lines between them is a group of its own.
+func newDiffGroups(r io.ReaderAt, start, end int64, regions []diffRegion) []*diffGroup {
+	newText := make([]byte, end-start)
+	if _, err := r.ReadAt(newText, start); err != nil && err != io.EOF {
+		return nil
+	}
+	var oldText []byte
+	pos := start
+	for _, reg := range regions {
+		oldText = append(oldText, newText[pos-start:reg.offset-start]...)
+		oldText = append(oldText, reg.old...)
+		pos = reg.offset + int64(len(reg.new))
+	}
+	oldText = append(oldText, newText[pos-start:]...)
+
+	oldLines, newLines := splitDiffLines(oldText), splitDiffLines(newText)
+	seed := maphash.MakeSeed()
+	hash := func(lines [][]byte) []uint64 {
+		hashes := make([]uint64, len(lines))
+		for i, l := range lines {
+			hashes[i] = maphash.Bytes(seed, l)
+		}
+		return hashes
+	}
+	deleted, inserted := diffLines(hash(oldLines), hash(newLines))
+
+	var groups []*diffGroup
+	oldLine, newLine := regions[0].line, regions[0].line+regions[0].addLines
+	offset := start
+	i, j := 0, 0
+	for i < len(oldLines) || j < len(newLines) {
+		if i < len(oldLines) && j < len(newLines) && !deleted[i] && !inserted[j] {
+			offset += int64(len(newLines[j]))
+			i++
+			j++
+			continue
+		}
+		g := &diffGroup{start: offset, oldLine: oldLine + i, newLine: newLine + j}
+		var added []diffLine
+		for (i < len(oldLines) && deleted[i]) || (j < len(newLines) && inserted[j]) {
+			for ; i < len(oldLines) && deleted[i]; i++ {
+				g.lines = append(g.lines, diffLine{kind: '-', text: oldLines[i]})
+			}
+			for ; j < len(newLines) && inserted[j]; j++ {
+				added = append(added, diffLine{kind: '+', text: newLines[j]})
+				offset += int64(len(newLines[j]))
+			}
+		}
+		g.lines = append(g.lines, added...)
+		g.end = offset
+		groups = append(groups, g)
+	}
+	return groups
+}
+
+// groupHunks adds context lines around the groups, merging groups whose
+// context would overlap into one hunk
+func groupHunks(r io.ReaderAt, size int64, groups []*diffGroup, context int) []diffHunk {
+	var hunks []diffHunk
+	for i := 0; i < len(groups); {
+		g := groups[i]
+		before := linesBefore(r, g.start, context)
+		h := diffHunk{oldStart: g.oldLine - len(before), newStart: g.newLine - len(before)}
+		for _, l := range before {
+			h.lines = append(h.lines, diffLine{kind: ' ', text: l})
+		}
+		h.lines = append(h.lines, g.lines...)
+		end := g.end
+		for i++; ; i++ {
+			limit := size
+			if i < len(groups) {
+				limit = groups[i].start
+			}
+			gap, reached := linesAfter(r, end, limit, 2*context+1)
+			if i < len(groups) && reached && len(gap) <= 2*context {
+				// Close enough to the next group to share the context
+				for _, l := range gap {
+					h.lines = append(h.lines, diffLine{kind: ' ', text: l})
+				}
+				h.lines = append(h.lines, groups[i].lines...)
+				end = groups[i].end
+				continue
+			}
+			if len(gap) > context {
+				gap = gap[:context]
+			}
+			for _, l := range gap {
+				h.lines = append(h.lines, diffLine{kind: ' ', text: l})
+			}
+			break
+		}
+		hunks = append(hunks, h)
+	}
+	return hunks
+}
+
+// readWindow reads r[start:end) clamped to what can be read
+func readWindow(r io.ReaderAt, start, end int64) []byte {
+	buf := make([]byte, end-start)
+	n, _ := r.ReadAt(buf, start)
+	return buf[:n]
+}
+
+// lineStart returns the start of the line containing pos, looking back at
+// most diffMaxLine bytes
+func lineStart(r io.ReaderAt, pos int64) int64 {
+	for size := int64(512); ; size *= 4 {
+		from := max(0, pos-size)
+		window := readWindow(r, from, pos)
+		if i := bytes.LastIndexByte(window, '\n'); i >= 0 {
+			return from + int64(i) + 1
+		}
+		if from == 0 || size >= diffMaxLine {
+			return from
+		}
+	}
+}
+
+// lineEnd returns the end of the line containing pos, after its newline,
+// looking ahead at most diffMaxLine bytes. A position at the start of a line
+// belongs to that line, unless it is the end of the content.
+func lineEnd(r io.ReaderAt, pos, limit int64) int64 {
+	for size := int64(512); ; size *= 4 {
+		to := min(limit, pos+size)
+		window := readWindow(r, pos, to)
+		if i := bytes.IndexByte(window, '\n'); i >= 0 {
+			return pos + int64(i) + 1
+		}
+		if to == limit || size >= diffMaxLine {
+			return to
+		}
+	}
+}
+
+// linesBefore returns up to n whole lines ending at pos, a line start
+func linesBefore(r io.ReaderAt, pos int64, n int) [][]byte {
+	if n == 0 || pos == 0 {
+		return nil
+	}
+	for size := int64(512); ; size *= 4 {
+		from := max(0, pos-size)
+		window := readWindow(r, from, pos)
+		// Newlines at the end of the previous lines; the last is at pos-1
+		if bytes.Count(window, []byte{'\n'}) > n || from == 0 || size >= diffMaxLine*int64(n) {
+			lines := splitDiffLines(window)
+			if from > 0 && len(lines) > 0 {
+				lines = lines[1:] // partial line
+			}
+			if len(lines) > n {
+				lines = lines[len(lines)-n:]
+			}
+			return lines
+		}
+	}
+}
+
+// linesAfter returns up to n whole lines starting at pos and not going past
+// limit, and whether limit was reached
+func linesAfter(r io.ReaderAt, pos, limit int64, n int) ([][]byte, bool) {
+	if n == 0 || pos >= limit {
+		return nil, pos >= limit
+	}
+	for size := int64(512); ; size *= 4 {
+		to := min(limit, pos+size)
+		window := readWindow(r, pos, to)
+		if bytes.Count(window, []byte{'\n'}) >= n || to == limit || size >= diffMaxLine*int64(n) {
+			lines := splitDiffLines(window)
+			complete := to == limit
+			if !complete && len(lines) > 0 && lines[len(lines)-1][len(lines[len(lines)-1])-1] != '\n' {
+				lines = lines[:len(lines)-1] // partial line
+			}
+			if len(lines) > n {
+				lines = lines[:n]
+				complete = false
+			}
+			return lines, complete
+		}
+	}
+}
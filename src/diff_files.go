@@ -0,0 +1,221 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"hash/maphash"
+	"os"
+	"strings"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// changeBlock is a run of deleted lines a[a0:a1] replaced by the inserted
+// lines b[b0:b1]; one of the runs may be empty
+type changeBlock struct {
+	a0, a1, b0, b1 int
+}
+
+// lineDiff is the comparison of two files
+type lineDiff struct {
+	blocks         []changeBlock
+	removed, added int
+}
+
+// compareLines diffs two files line by line
+func compareLines(a, b *fileLines) *lineDiff {
+	deleted, inserted := diffLines(a.hashes, b.hashes)
+	d := &lineDiff{}
+	for i, j := 0, 0; i < len(deleted) || j < len(inserted); {
+		if i < len(deleted) && j < len(inserted) && !deleted[i] && !inserted[j] {
+			i++
+			j++
+			continue
+		}
+		c := changeBlock{a0: i, b0: j}
+		for i < len(deleted) && deleted[i] {
+			i++
+		}
+		for j < len(inserted) && inserted[j] {
+			j++
+		}
+		if i == c.a0 && j == c.b0 {
+			break // the rest of one file is unmatched in the other; not reached
+		}
+		c.a1, c.b1 = i, j
+		d.blocks = append(d.blocks, c)
+		d.removed += c.a1 - c.a0
+		d.added += c.b1 - c.b0
+	}
+	return d
+}
+
+// hunks groups the change blocks into hunks with context lines around them,
+// as long as the diff stays within maxBytes. It returns the hunks and the
+// number of hunks left out.
+func (d *lineDiff) hunks(a, b *fileLines, contextLines int, maxBytes int64) ([]diffHunk, int) {
+	var hunks []diffHunk
+	omitted := 0
+	var size int64
+	for k := 0; k < len(d.blocks); {
+		// Blocks whose context would touch form one hunk
+		last := k
+		for last+1 < len(d.blocks) && d.blocks[last+1].a0-d.blocks[last].a1 <= 2*contextLines {
+			last++
+		}
+		first, end := d.blocks[k], d.blocks[last]
+		start := first.a0 - contextLines
+		if start < 0 {
+			start = 0
+		}
+		stop := end.a1 + contextLines
+		if stop > len(a.hashes) {
+			stop = len(a.hashes)
+		}
+
+		// The size is known from the line offsets before any line is read
+		hunkSize := int64(len("@@ -1,1 +1,1 @@\n")) + 2*int64(last-k+1)
+		hunkSize += a.offsets[stop] - a.offsets[start] + int64(stop-start)
+		for _, c := range d.blocks[k : last+1] {
+			hunkSize += b.offsets[c.b1] - b.offsets[c.b0] + int64(c.b1-c.b0)
+		}
+		if omitted > 0 || size+hunkSize > maxBytes {
+			omitted++
+			k = last + 1
+			continue
+		}
+		size += hunkSize
+
+		h := diffHunk{oldStart: start + 1, newStart: first.b0 - (first.a0 - start) + 1}
+		keep := func(from, to int) {
+			for i := from; i < to; i++ {
+				h.lines = append(h.lines, diffLine{kind: ' ', text: a.line(i)})
+			}
+		}
+		keep(start, first.a0)
+		for n, c := range d.blocks[k : last+1] {
+			for i := c.a0; i < c.a1; i++ {
+				h.lines = append(h.lines, diffLine{kind: '-', text: a.line(i)})
+			}
+			for i := c.b0; i < c.b1; i++ {
+				h.lines = append(h.lines, diffLine{kind: '+', text: b.line(i)})
+			}
+			if k+n < last {
+				keep(c.a1, d.blocks[k+n+1].a0)
+			}
+		}
+		keep(end.a1, stop)
+		hunks = append(hunks, h)
+		k = last + 1
+	}
+	return hunks, omitted
+}
+
+func handleDiffFiles(ctx context.Context, req *mcp.CallToolRequest, input DiffFilesRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log the request if debug mode, without new_content
+	if logger != nil {
+		logger.Debug("diff_files called", "old_file", input.OldFile, "new_file", input.NewFile, "new_content", input.NewContent != nil)
+	}
+
+	if input.OldFile == "" {
+		return nil, nil, fmt.Errorf("invalid arguments: old_file is required")
+	}
+	if (input.NewFile == nil) == (input.NewContent == nil) {
+		return nil, nil, fmt.Errorf("invalid arguments: exactly one of new_file and new_content is required")
+	}
+	diffContext := diffDefaultContext
+	if input.DiffContext != nil {
+		if *input.DiffContext < 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: diff_context must not be negative")
+		}
+		diffContext = *input.DiffContext
+	}
+	maxBytes := int64(diffMaxBytes)
+	if input.MaxBytes != nil {
+		if *input.MaxBytes <= 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: max_bytes must be positive")
+		}
+		maxBytes = *input.MaxBytes
+	}
+
+	seed := maphash.MakeSeed()
+	oldLines, closeOld, err := hashFileLines(input.OldFile, seed)
+	if err != nil {
+		return nil, nil, err
+	}
+	defer closeOld()
+	newName := input.OldFile
+	var newLines *fileLines
+	if input.NewFile != nil {
+		newName = *input.NewFile
+		var closeNew func()
+		if newLines, closeNew, err = hashFileLines(newName, seed); err != nil {
+			return nil, nil, err
+		}
+		defer closeNew()
+	} else {
+		r := strings.NewReader(*input.NewContent)
+		if newLines, err = hashLines(r, r.Size(), seed); err != nil {
+			return nil, nil, err
+		}
+		newLines.r = r
+	}
+
+	d := compareLines(oldLines, newLines)
+	oldName, newName := diffName("a/", input.OldFile), diffName("b/", newName)
+	// The ---/+++ header counts towards max_bytes
+	hunks, omitted := d.hunks(oldLines, newLines, diffContext, maxBytes-int64(len(oldName)+len(newName)+10))
+	var message string
+	if len(d.blocks) == 0 {
+		message = "Files are identical."
+	} else {
+		message = fmt.Sprintf("Files differ: %d changes, %d lines removed, %d lines added.", len(d.blocks), d.removed, d.added)
+	}
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: message},
+		},
+	}
+	if len(d.blocks) > 0 {
+		var b strings.Builder
+		writeUnifiedDiff(&b, oldName, newName, hunks)
+		if omitted > 0 {
+			fmt.Fprintf(&b, "... %d more hunks not shown (max_bytes %d)\n", omitted, maxBytes)
+		}
+		result.Content = append(result.Content, &mcp.TextContent{Text: b.String()})
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		logger.Debug("diff_files completed", "changes", len(d.blocks), "hunks", len(hunks), "omitted", omitted)
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("diff_files RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
+
+// hashFileLines hashes the lines of a file, which is kept open to read the
+// lines the diff shows
+func hashFileLines(path string, seed maphash.Seed) (*fileLines, func(), error) {
+	f, err := os.Open(path)
+	if err != nil {
+		return nil, nil, fmt.Errorf("failed to open file %q: %v", path, err)
+	}
+	var size int64
+	if info, err := f.Stat(); err == nil {
+		size = info.Size()
+	}
+	lines, err := hashLines(f, size, seed)
+	if err != nil {
+		f.Close()
+		return nil, nil, fmt.Errorf("failed to read file %q: %v", path, err)
+	}
+	lines.r = f
+	return lines, func() { f.Close() }, nil
+}
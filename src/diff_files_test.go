@@ -0,0 +1,203 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"hash/maphash"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// lcsLength is the length of a longest common subsequence, by dynamic programming
+func lcsLength(a, b []string) int {
+	prev, cur := make([]int, len(b)+1), make([]int, len(b)+1)
+	for i := range a {
+		for j := range b {
+			switch {
+			case a[i] == b[j]:
+				cur[j+1] = prev[j] + 1
+			case prev[j+1] > cur[j]:
+				cur[j+1] = prev[j+1]
+			default:
+				cur[j+1] = cur[j]
+			}
+		}
+		prev, cur = cur, prev
+	}
+	return prev[len(b)]
+}
+
+// randomEdit returns lines drawn from a small alphabet and a copy of them
+// with random lines deleted, replaced and inserted
+func randomEdit(rng *rand.Rand, n, alphabet int) ([]string, []string) {
+	a := make([]string, n)
+	for i := range a {
+		a[i] = fmt.Sprintf("line %d\n", rng.Intn(alphabet))
+	}
+	var b []string
+	for _, l := range a {
+		switch rng.Intn(6) {
+		case 0:
+		case 1:
+			b = append(b, fmt.Sprintf("new %d\n", rng.Intn(alphabet)))
+		case 2:
+			b = append(b, l, fmt.Sprintf("line %d\n", rng.Intn(alphabet)))
+		default:
+			b = append(b, l)
+		}
+	}
+	return a, b
+}
+
+func TestDiffFilesIsMinimalAndApplies(t *testing.T) {
+	dir := t.TempDir()
+	rng := rand.New(rand.NewSource(1))
+	for iter := 0; iter < 200; iter++ {
+		a, b := randomEdit(rng, rng.Intn(60), 1+rng.Intn(8))
+		oldText, newText := strings.Join(a, ""), strings.Join(b, "")
+		if rng.Intn(4) == 0 && len(newText) > 0 {
+			newText = newText[:len(newText)-1] // no newline at the end
+		}
+		path := filepath.Join(dir, "old.txt")
+		if err := os.WriteFile(path, []byte(oldText), 0644); err != nil {
+			t.Fatal(err)
+		}
+
+		result, _, err := handleDiffFiles(context.Background(), nil, DiffFilesRequest{OldFile: path, NewContent: &newText})
+		if err != nil {
+			t.Fatal(err)
+		}
+		if oldText == newText {
+			if len(result.Content) != 1 {
+				t.Fatalf("diff of identical content: %v", result.Content)
+			}
+			continue
+		}
+		seed := maphash.MakeSeed()
+		oldLines, _ := hashLines(strings.NewReader(oldText), int64(len(oldText)), seed)
+		newLines, _ := hashLines(strings.NewReader(newText), int64(len(newText)), seed)
+		d := compareLines(oldLines, newLines)
+		common := len(oldLines.hashes) - d.removed
+		if want := lcsLength(lineStrings(oldText), lineStrings(newText)); common != want {
+			t.Fatalf("iteration %d: %d lines kept, the longest common subsequence has %d", iter, common, want)
+		}
+
+		patch := result.Content[1].(*mcp.TextContent).Text
+		// The leading separator of the absolute path is dropped
+		if header := "--- a" + path + "\n+++ b" + path + "\n"; !strings.HasPrefix(patch, header) {
+			t.Fatalf("iteration %d: the diff doesn't start with %q:\n%s", iter, header, patch)
+		}
+		files, err := parsePatch(patch, -1)
+		if err != nil {
+			t.Fatalf("iteration %d: %v\n%s", iter, err, patch)
+		}
+		patched, _, err := patchedContent([]byte(oldText), files[0].hunks, 0)
+		if err != nil || string(patched) != newText {
+			t.Fatalf("iteration %d: the diff doesn't turn old into new (%v):\n%s", iter, err, patch)
+		}
+	}
+}
+
+func TestDiffFilesPastCostLimitStillApplies(t *testing.T) {
+	// Enough changes that the search gives up on a minimal diff
+	rng := rand.New(rand.NewSource(2))
+	a, b := randomEdit(rng, 20000, 50)
+	for i := range b {
+		if rng.Intn(2) == 0 {
+			b[i] = fmt.Sprintf("line %d\n", rng.Intn(50))
+		}
+	}
+	oldText, newText := strings.Join(a, ""), strings.Join(b, "")
+	seed := maphash.MakeSeed()
+	oldLines, _ := hashLines(strings.NewReader(oldText), int64(len(oldText)), seed)
+	newLines, _ := hashLines(strings.NewReader(newText), int64(len(newText)), seed)
+	oldLines.r, newLines.r = strings.NewReader(oldText), strings.NewReader(newText)
+	d := compareLines(oldLines, newLines)
+	hunks, omitted := d.hunks(oldLines, newLines, 3, 1<<40)
+	if omitted != 0 {
+		t.Fatalf("%d hunks omitted", omitted)
+	}
+	patched, _, err := patchedContent([]byte(oldText), hunks, 0)
+	if err != nil || string(patched) != newText {
+		t.Fatalf("the diff doesn't turn old into new: %v", err)
+	}
+}
+
+func lineStrings(text string) []string {
+	var lines []string
+	for _, l := range splitDiffLines([]byte(text)) {
+		lines = append(lines, string(l))
+	}
+	return lines
+}
+
+func TestDiffFilesCapsOutput(t *testing.T) {
+	dir := t.TempDir()
+	var a, b strings.Builder
+	for i := 0; i < 1000; i++ {
+		fmt.Fprintf(&a, "line %d\n", i)
+		if i%50 == 0 {
+			fmt.Fprintf(&b, "changed %d\n", i)
+		} else {
+			fmt.Fprintf(&b, "line %d\n", i)
+		}
+	}
+	oldPath, newPath := filepath.Join(dir, "a.txt"), filepath.Join(dir, "b.txt")
+	os.WriteFile(oldPath, []byte(a.String()), 0644)
+	os.WriteFile(newPath, []byte(b.String()), 0644)
+
+	maxBytes := int64(500)
+	result, _, err := handleDiffFiles(context.Background(), nil, DiffFilesRequest{OldFile: oldPath, NewFile: &newPath, MaxBytes: &maxBytes})
+	if err != nil {
+		t.Fatal(err)
+	}
+	summary, diff := result.Content[0].(*mcp.TextContent).Text, result.Content[1].(*mcp.TextContent).Text
+	if summary != "Files differ: 20 changes, 20 lines removed, 20 lines added." {
+		t.Fatalf("summary: %s", summary)
+	}
+	if !strings.Contains(diff, "more hunks not shown") || len(diff) > 560 {
+		t.Fatalf("diff not capped (%d bytes):\n%s", len(diff), diff)
+	}
+}
+
+// BenchmarkDiffFiles compares two 500,000-line files, with 1,000 changed
+// lines and with nothing in common. Run with:
+// go test ./src -run '^$' -bench DiffFiles -benchmem
+func BenchmarkDiffFiles(b *testing.B) {
+	const lines = 500000
+	dir := b.TempDir()
+	write := func(name string, line func(i int) string) string {
+		var sb strings.Builder
+		for i := 0; i < lines; i++ {
+			sb.WriteString(line(i))
+		}
+		path := filepath.Join(dir, name)
+		if err := os.WriteFile(path, []byte(sb.String()), 0644); err != nil {
+			b.Fatal(err)
+		}
+		return path
+	}
+	old := write("old.txt", func(i int) string { return fmt.Sprintf("\tvalue := compute(%d)\n", i%5000) })
+	edited := write("edited.txt", func(i int) string {
+		if i%500 == 0 {
+			return fmt.Sprintf("\tvalue := changed(%d)\n", i)
+		}
+		return fmt.Sprintf("\tvalue := compute(%d)\n", i%5000)
+	})
+	other := write("other.txt", func(i int) string { return fmt.Sprintf("other line %d\n", i) })
+
+	for _, bc := range []struct{ name, path string }{{"edited", edited}, {"unrelated", other}} {
+		b.Run(bc.name, func(b *testing.B) {
+			for i := 0; i < b.N; i++ {
+				if _, _, err := handleDiffFiles(context.Background(), nil, DiffFilesRequest{OldFile: old, NewFile: &bc.path}); err != nil {
+					b.Fatal(err)
+				}
+			}
+		})
+	}
+}
@@ -0,0 +1,275 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"testing"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// applyUnifiedDiff applies a diff of one file to old, checking every context
+// and removed line and the line counts of the hunk headers
+func applyUnifiedDiff(old, diff string) (string, error) {
+	oldLines := strings.SplitAfter(old, "\n")
+	if oldLines[len(oldLines)-1] == "" {
+		oldLines = oldLines[:len(oldLines)-1]
+	}
+	lines := strings.SplitAfter(diff, "\n")
+	var out []string
+	pos := 0 // next old line to copy
+	for i := 0; i < len(lines); i++ {
+		header := lines[i]
+		if !strings.HasPrefix(header, "@@ ") {
+			continue
+		}
+		var oldStart, oldCount, newStart, newCount int
+		parse := func(s string) (int, int) {
+			start, count, found := strings.Cut(s, ",")
+			n, _ := strconv.Atoi(start)
+			c := 1
+			if found {
+				c, _ = strconv.Atoi(count)
+			}
+			return n, c
+		}
+		fields := strings.Fields(header)
+		oldStart, oldCount = parse(fields[1][1:])
+		newStart, newCount = parse(fields[2][1:])
+		if oldCount > 0 {
+			oldStart--
+		}
+		if oldStart < pos {
+			return "", fmt.Errorf("hunk %q overlaps the previous one", header)
+		}
+		out = append(out, oldLines[pos:oldStart]...)
+		if newCount > 0 && newStart-1 != len(out) {
+			return "", fmt.Errorf("hunk %q: new start, want %d", header, len(out)+1)
+		}
+		pos = oldStart
+		for i+1 < len(lines) && len(lines[i+1]) > 0 && strings.ContainsRune(" -+", rune(lines[i+1][0])) {
+			i++
+			kind, text := lines[i][0], lines[i][1:]
+			if i+1 < len(lines) && strings.HasPrefix(lines[i+1], "\\ No newline") {
+				text = strings.TrimSuffix(text, "\n")
+				i++
+			}
+			if kind != '+' {
+				if pos >= len(oldLines) || oldLines[pos] != text {
+					return "", fmt.Errorf("hunk %q: old line %d is not %q", header, pos+1, text)
+				}
+				pos++
+				oldCount--
+			}
+			if kind != '-' {
+				out = append(out, text)
+				newCount--
+			}
+		}
+		if oldCount != 0 || newCount != 0 {
+			return "", fmt.Errorf("hunk %q: counts off by %d and %d", header, oldCount, newCount)
+		}
+	}
+	out = append(out, oldLines[pos:]...)
+	return strings.Join(out, ""), nil
+}
+
+func editWithDiff(t *testing.T, input EditFileRequest) (string, error) {
+	t.Helper()
+	yes := true
+	input.ReturnDiff = &yes
+	result, _, err := handleEditFile(context.Background(), nil, input)
+	if err != nil {
+		return "", err
+	}
+	if len(result.Content) != 2 {
+		t.Fatalf("%d content items, want 2", len(result.Content))
+	}
+	return result.Content[1].(*mcp.TextContent).Text, nil
+}
+
+func TestEditDiffFormat(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "a.txt")
+	var content strings.Builder
+	for i := 1; i <= 20; i++ {
+		fmt.Fprintf(&content, "line %d\n", i)
+	}
+	if err := os.WriteFile(name, []byte(content.String()), 0644); err != nil {
+		t.Fatal(err)
+	}
+	old, new := "line 10\n", "ten\nTEN\n"
+	diff, err := editWithDiff(t, EditFileRequest{Filename: name, OldString: &old, NewString: &new})
+	if err != nil {
+		t.Fatal(err)
+	}
+	want := "--- a" + name + "\n+++ b" + name + "\n" +
+		"@@ -7,7 +7,8 @@\n line 7\n line 8\n line 9\n-line 10\n+ten\n+TEN\n line 11\n line 12\n line 13\n"
+	if diff != want {
+		t.Fatalf("got\n%s\nwant\n%s", diff, want)
+	}
+
+	// Appending to an unterminated file changes its last line
+	if err := os.WriteFile(name, []byte("one\ntwo"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	three := "three"
+	if diff, err = editWithDiff(t, EditFileRequest{Filename: name, NewString: &three}); err != nil {
+		t.Fatal(err)
+	}
+	want = "--- a" + name + "\n+++ b" + name + "\n" +
+		"@@ -1,2 +1,3 @@\n one\n-two\n\\ No newline at end of file\n+two\n+three\n\\ No newline at end of file\n"
+	if diff != want {
+		t.Fatalf("got\n%s\nwant\n%s", diff, want)
+	}
+}
+
+// TestEditDiffRegionAtEnd covers a change at the very end of an unterminated
+// file, which is on the last line changed before it
+func TestEditDiffRegionAtEnd(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "a.txt")
+	for _, c := range []struct{ content, old, want string }{
+		{"x\na,b,", ",", "@@ -1,2 +1,2 @@\n x\n-a,b,\n\\ No newline at end of file\n+ab\n\\ No newline at end of file\n"},
+		{"alpha\nalpha\n", "ha\n", "@@ -1,2 +1 @@\n-alpha\n-alpha\n+alpalp\n\\ No newline at end of file\n"},
+	} {
+		if err := os.WriteFile(name, []byte(c.content), 0644); err != nil {
+			t.Fatal(err)
+		}
+		empty := ""
+		diff, err := editWithDiff(t, EditFileRequest{Filename: name, OldString: &c.old, NewString: &empty})
+		if err != nil {
+			t.Fatal(err)
+		}
+		if want := "--- a" + name + "\n+++ b" + name + "\n" + c.want; diff != want {
+			t.Fatalf("%q: got\n%s\nwant\n%s", c.content, diff, want)
+		}
+		data, err := os.ReadFile(name)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if applied, err := applyUnifiedDiff(c.content, diff); err != nil || applied != string(data) {
+			t.Fatalf("%q: diff applies as %q, %v; want %q", c.content, applied, err, data)
+		}
+	}
+}
+
+// TestEditDiffUnchangedLines covers lines that are the same before and
+// after inside the lines an edit touches: they are context, not changes
+func TestEditDiffUnchangedLines(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "a.txt")
+	if err := os.WriteFile(name, []byte("one\n\ntwo\n"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	old, new := "\n", "\n\n"
+	diff, err := editWithDiff(t, EditFileRequest{Filename: name, OldString: &old, NewString: &new})
+	if err != nil {
+		t.Fatal(err)
+	}
+	want := "--- a" + name + "\n+++ b" + name + "\n" +
+		"@@ -1,3 +1,6 @@\n one\n \n+\n+\n two\n+\n"
+	if diff != want {
+		t.Fatalf("got\n%s\nwant\n%s", diff, want)
+	}
+
+	// A rewrite of the first and last of many lines is two hunks
+	var content strings.Builder
+	for i := 1; i <= 20; i++ {
+		fmt.Fprintf(&content, "line %d\n", i)
+	}
+	if err := os.WriteFile(name, []byte(content.String()), 0644); err != nil {
+		t.Fatal(err)
+	}
+	rewrite := "first\n" + strings.TrimSuffix(strings.TrimPrefix(content.String(), "line 1\n"), "line 20\n") + "last\n"
+	if diff, err = editWithDiff(t, EditFileRequest{Filename: name, Content: &rewrite}); err != nil {
+		t.Fatal(err)
+	}
+	want = "--- a" + name + "\n+++ b" + name + "\n" +
+		"@@ -1,4 +1,4 @@\n-line 1\n+first\n line 2\n line 3\n line 4\n" +
+		"@@ -17,4 +17,4 @@\n line 17\n line 18\n line 19\n-line 20\n+last\n"
+	if diff != want {
+		t.Fatalf("got\n%s\nwant\n%s", diff, want)
+	}
+}
+
+// TestEditDiffAppliesToOriginal makes random edits of every kind and checks
+// that each returned diff turns the previous content into the new one
+func TestEditDiffAppliesToOriginal(t *testing.T) {
+	useJournal(t, 1<<20, "", 0)
+	name := filepath.Join(t.TempDir(), "a.txt")
+	rng := rand.New(rand.NewSource(1))
+	long := strings.Repeat("long ", 300) // lines longer than the first window read
+	word := func() string {
+		return []string{"alpha", "beta\n", "gamma delta\n", "\n", "x", long}[rng.Intn(6)]
+	}
+	var b strings.Builder
+	for i := 0; i < 200; i++ {
+		b.WriteString(word())
+	}
+	if err := os.WriteFile(name, []byte(b.String()), 0644); err != nil {
+		t.Fatal(err)
+	}
+	str := func(s string) *string { return &s }
+	num := func(n int) *int { return &n }
+
+	applied := 0
+	for i := 0; i < 500; i++ {
+		data, err := os.ReadFile(name)
+		if err != nil {
+			t.Fatal(err)
+		}
+		before := string(data)
+		context := rng.Intn(4)
+		input := EditFileRequest{Filename: name, DiffContext: &context}
+		switch rng.Intn(6) {
+		case 0:
+			input.OldString, input.NewString = str(word()), str(word())
+		case 1:
+			input.NewString = str(word())
+		case 2:
+			input.Edits = []EditOperation{{OldString: word(), NewString: word()}, {OldString: word(), NewString: word()}}
+		case 3:
+			lines := strings.Count(before, "\n") + 1
+			first := 1 + rng.Intn(lines)
+			input.StartLine, input.EndLine, input.NewString = num(first), num(first-1+rng.Intn(3)), str(word())
+		case 4:
+			cut := rng.Intn(len(before) + 1)
+			input.Content = str(before[:cut] + word() + before[cut+rng.Intn(len(before)-cut+1):])
+		case 5:
+			regex := true
+			input.OldString, input.NewString, input.Regex = str(`a\n+(g|b)`), str("$1\n"), &regex
+		}
+		diff, err := editWithDiff(t, input)
+		if err != nil {
+			continue
+		}
+		applied++
+		after, err := os.ReadFile(name)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if string(after) == before {
+			if diff != "No changes\n" {
+				t.Fatalf("edit %d changed nothing but returned\n%s", i, diff)
+			}
+			continue
+		}
+		got, err := applyUnifiedDiff(before, diff)
+		if err != nil {
+			t.Fatalf("edit %d: %v\n%s", i, err, diff)
+		}
+		if strings.Contains(diff, "more changes not shown") {
+			// Only the first changes are shown
+			continue
+		}
+		if got != string(after) {
+			t.Fatalf("edit %d: diff applied gives\n%q\nwant\n%q\ndiff:\n%s", i, got, after, diff)
+		}
+	}
+	if applied < 300 {
+		t.Fatalf("only %d edits applied", applied)
+	}
+}
@@ -0,0 +1,420 @@
+package main
+
+import (
+	"container/list"
+	"io"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+// dirReader is the subset of *os.File used by the walkers to read directories
+type dirReader interface {
+	ReadDir(n int) ([]fs.DirEntry, error)
+	Close() error
+}
+
+// openDir opens a directory for batched reading, through the listing cache when enabled
+func openDir(path string) (dirReader, error) {
+	if listCache != nil {
+		return listCache.open(path)
+	}
+	return os.Open(path)
+}
+
+// dirChanged drops the cached listings of the directories containing paths.
+// Every change the server makes itself calls it once the change is done, so
+// that a listing that follows sees it without waiting for inotify, which
+// reports it asynchronously (or for the mtime check, which misses changes
+// within the filesystem's timestamp granularity).
+func dirChanged(paths ...string) {
+	if listCache == nil {
+		return
+	}
+	for _, path := range paths {
+		listCache.invalidate(canonicalDir(filepath.Dir(path)), false)
+	}
+}
+
+// dirsCreated drops the cached listings of the ancestors of dir, which was
+// created with its missing parents
+func dirsCreated(dir string) {
+	if listCache == nil {
+		return
+	}
+	for path := canonicalDir(dir); path != "" && filepath.Dir(path) != path; path = filepath.Dir(path) {
+		listCache.invalidate(filepath.Dir(path), false)
+	}
+}
+
+// treeChanged drops the cached listings of the directory containing path,
+// of path and of every directory below it: a directory was moved or removed
+func treeChanged(path string) {
+	if listCache == nil {
+		return
+	}
+	parent := canonicalDir(filepath.Dir(path))
+	if parent == "" {
+		return
+	}
+	listCache.invalidate(parent, false)
+	listCache.invalidate(filepath.Join(parent, filepath.Base(path)), true)
+}
+
+// canonicalDir is canonicalPath for the cache index, which keeps the empty
+// cache free of the symlink resolution
+func canonicalDir(dir string) string {
+	if listCache.empty() {
+		return ""
+	}
+	return canonicalPath(dir)
+}
+
+// cacheDir is the cache state of one directory. A directory is tracked while
+// it has a snapshot or a read in progress; its watch lives exactly as long.
+type cacheDir struct {
+	path    string
+	canon   string // the path with symlinks resolved, to find it from the paths of changed files
+	wd      int    // inotify watch descriptor, -1 if the directory is not watched
+	gen     uint64 // bumped on every change event; reads that saw another generation are not stored
+	readers int    // recordings in progress
+	entries []fs.DirEntry
+	modTime time.Time // directory mtime before the snapshot was read (unwatched directories)
+	elem    *list.Element
+}
+
+// dirCache keeps directory listings read by list_files in memory. Watched
+// snapshots hold the lstat data of their files and are dropped as soon as
+// inotify reports a change in the directory; subdirectories are stat'ed on
+// use, since a change inside one only notifies its own watch. Where inotify is not
+// available the snapshot only keeps names and types, is validated against the
+// directory mtime on every use and file metadata is read live. The total
+// number of cached entries is capped; least recently used snapshots are
+// evicted first.
+type dirCache struct {
+	mu         sync.Mutex
+	maxEntries int
+	total      int
+	dirs       map[string]*cacheDir
+	canon      map[string][]*cacheDir // by canonical path; several paths may name one directory
+	wds        map[int][]*cacheDir    // inotify returns one wd for every path naming a directory
+	lru        *list.List             // of *cacheDir with snapshots, most recently used first
+	watcher    *dirWatcher
+
+	hits   atomic.Int64
+	misses atomic.Int64
+}
+
+func newDirCache(maxEntries int) *dirCache {
+	c := &dirCache{
+		maxEntries: maxEntries,
+		dirs:       make(map[string]*cacheDir),
+		canon:      make(map[string][]*cacheDir),
+		wds:        make(map[int][]*cacheDir),
+		lru:        list.New(),
+	}
+	c.watcher = newDirWatcher(c.handleEvent)
+	return c
+}
+
+// open returns a reader serving the directory from a valid snapshot, or a
+// reader that records the live listing into the cache as it is read
+func (c *dirCache) open(path string) (dirReader, error) {
+	if entries := c.lookup(path); entries != nil {
+		c.hits.Add(1)
+		return &snapshotReader{entries: entries}, nil
+	}
+	c.misses.Add(1)
+
+	rec := c.beginRecord(path)
+	f, err := os.Open(path)
+	if err != nil {
+		c.endRecord(rec, false)
+		return nil, err
+	}
+	return &recordingReader{file: f, cache: c, rec: rec}, nil
+}
+
+func (c *dirCache) lookup(path string) []fs.DirEntry {
+	c.mu.Lock()
+	d := c.dirs[path]
+	if d == nil || d.entries == nil {
+		c.mu.Unlock()
+		return nil
+	}
+	entries, watched, modTime, gen := d.entries, d.wd >= 0, d.modTime, d.gen
+	c.lru.MoveToFront(d.elem)
+	c.mu.Unlock()
+
+	if !watched {
+		info, err := os.Stat(path)
+		if err != nil || !info.ModTime().Equal(modTime) {
+			c.mu.Lock()
+			if d.gen == gen {
+				c.invalidateLocked(d)
+			}
+			c.mu.Unlock()
+			return nil
+		}
+	}
+	return entries
+}
+
+// cacheRecording is a live read of a directory that may become a snapshot
+type cacheRecording struct {
+	path    string
+	gen     uint64
+	watched bool
+	modTime time.Time
+	entries []fs.DirEntry
+	failed  bool // too large or an entry could not be stat'ed
+}
+
+// beginRecord registers a read in progress. The watch is added before the
+// directory is read so that no change between the read and the watch is lost.
+func (c *dirCache) beginRecord(path string) *cacheRecording {
+	rec := &cacheRecording{path: path}
+	if info, err := os.Stat(path); err == nil {
+		rec.modTime = info.ModTime()
+	}
+	canon := canonicalPath(path)
+
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	d := c.dirs[path]
+	if d == nil {
+		d = &cacheDir{path: path, canon: canon, wd: -1}
+		c.dirs[path] = d
+		c.canon[canon] = append(c.canon[canon], d)
+	}
+	if d.wd < 0 && c.watcher != nil {
+		if wd, err := c.watcher.add(path); err == nil {
+			d.wd = wd
+			c.wds[wd] = append(c.wds[wd], d)
+		}
+	}
+	d.readers++
+	rec.gen = d.gen
+	rec.watched = d.wd >= 0
+	return rec
+}
+
+// endRecord stores a complete recording as the directory snapshot
+func (c *dirCache) endRecord(rec *cacheRecording, complete bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	d := c.dirs[rec.path]
+	if d == nil {
+		return
+	}
+	d.readers--
+	if complete && !rec.failed && d.gen == rec.gen && rec.watched == (d.wd >= 0) {
+		if d.entries != nil {
+			c.total -= len(d.entries)
+		} else {
+			d.elem = c.lru.PushFront(d)
+		}
+		if rec.entries == nil {
+			rec.entries = []fs.DirEntry{}
+		}
+		d.entries = rec.entries
+		d.modTime = rec.modTime
+		c.total += len(d.entries)
+		c.evictLocked()
+	}
+	c.releaseLocked(d)
+}
+
+// evictLocked drops least recently used snapshots until the cap is met
+func (c *dirCache) evictLocked() {
+	for c.total > c.maxEntries {
+		back := c.lru.Back()
+		if back == nil {
+			return
+		}
+		d := back.Value.(*cacheDir)
+		c.dropSnapshotLocked(d)
+		c.releaseLocked(d)
+	}
+}
+
+func (c *dirCache) dropSnapshotLocked(d *cacheDir) {
+	if d.entries == nil {
+		return
+	}
+	c.total -= len(d.entries)
+	d.entries = nil
+	c.lru.Remove(d.elem)
+	d.elem = nil
+}
+
+// releaseLocked forgets a directory once it has neither a snapshot nor a
+// read in progress. Its watch is removed with the last path using it.
+func (c *dirCache) releaseLocked(d *cacheDir) {
+	if d.entries != nil || d.readers > 0 {
+		return
+	}
+	if d.wd >= 0 {
+		if !removeCacheDir(c.wds, d.wd, d) {
+			c.watcher.remove(d.wd)
+		}
+		d.wd = -1
+	}
+	delete(c.dirs, d.path)
+	removeCacheDir(c.canon, d.canon, d)
+}
+
+// removeCacheDir removes d from the directories indexed under key and
+// reports whether any are left
+func removeCacheDir[K comparable](index map[K][]*cacheDir, key K, d *cacheDir) bool {
+	same := index[key]
+	for i := range same {
+		if same[i] == d {
+			same[i] = same[len(same)-1]
+			same = same[:len(same)-1]
+			break
+		}
+	}
+	if len(same) == 0 {
+		delete(index, key)
+		return false
+	}
+	index[key] = same
+	return true
+}
+
+func (c *dirCache) invalidateLocked(d *cacheDir) {
+	d.gen++
+	c.dropSnapshotLocked(d)
+	c.releaseLocked(d)
+}
+
+func (c *dirCache) empty() bool {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	return len(c.dirs) == 0
+}
+
+// invalidate drops the snapshots of the directory with canonical path dir,
+// and with below of every directory under it
+func (c *dirCache) invalidate(dir string, below bool) {
+	if dir == "" {
+		return
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	// invalidateLocked may release directories, which changes the slices
+	for _, d := range append([]*cacheDir(nil), c.canon[dir]...) {
+		c.invalidateLocked(d)
+	}
+	if !below {
+		return
+	}
+	prefix := dir + string(filepath.Separator)
+	for canon, dirs := range c.canon {
+		if strings.HasPrefix(canon, prefix) {
+			for _, d := range append([]*cacheDir(nil), dirs...) {
+				c.invalidateLocked(d)
+			}
+		}
+	}
+}
+
+// handleEvent is called by the watcher for every change notification.
+// A negative wd means events were lost and every snapshot is invalid.
+func (c *dirCache) handleEvent(wd int) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if wd < 0 {
+		for _, d := range c.dirs {
+			c.invalidateLocked(d)
+		}
+		return
+	}
+	// invalidateLocked may release directories, which changes the slice
+	for _, d := range append([]*cacheDir(nil), c.wds[wd]...) {
+		c.invalidateLocked(d)
+	}
+}
+
+// snapshotReader serves a cached listing. Batches are copied because
+// callers may modify the returned slices.
+type snapshotReader struct {
+	entries []fs.DirEntry
+	pos     int
+}
+
+func (r *snapshotReader) ReadDir(n int) ([]fs.DirEntry, error) {
+	if r.pos >= len(r.entries) {
+		return nil, io.EOF
+	}
+	end := len(r.entries)
+	if n > 0 && r.pos+n < end {
+		end = r.pos + n
+	}
+	batch := make([]fs.DirEntry, end-r.pos)
+	copy(batch, r.entries[r.pos:end])
+	r.pos = end
+	return batch, nil
+}
+
+func (r *snapshotReader) Close() error { return nil }
+
+// recordingReader reads a directory live and hands the complete listing to
+// the cache when it is closed after reaching the end
+type recordingReader struct {
+	file     *os.File
+	cache    *dirCache
+	rec      *cacheRecording
+	complete bool
+	closed   bool
+}
+
+func (r *recordingReader) ReadDir(n int) ([]fs.DirEntry, error) {
+	batch, err := r.file.ReadDir(n)
+	if err == io.EOF || (n > 0 && err == nil && len(batch) == 0) {
+		r.complete = true
+	} else if err != nil {
+		r.rec.failed = true
+	}
+
+	if !r.rec.failed {
+		if r.rec.watched {
+			// Watched snapshots keep the lstat result of files so hits need
+			// no syscalls. Subdirectories are stat'ed live: a change inside
+			// one updates its mtime but only notifies its own watch.
+			for i, d := range batch {
+				if d.IsDir() {
+					continue
+				}
+				info, err := d.Info()
+				if err != nil {
+					r.rec.failed = true
+					break
+				}
+				batch[i] = fs.FileInfoToDirEntry(info)
+			}
+		}
+		if len(r.rec.entries)+len(batch) > r.cache.maxEntries {
+			r.rec.failed = true
+			r.rec.entries = nil
+		} else {
+			r.rec.entries = append(r.rec.entries, batch...)
+		}
+	}
+	return batch, err
+}
+
+func (r *recordingReader) Close() error {
+	if r.closed {
+		return nil
+	}
+	r.closed = true
+	err := r.file.Close()
+	r.cache.endRecord(r.rec, r.complete)
+	return err
+}
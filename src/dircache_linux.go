@@ -0,0 +1,74 @@
+package main
+
+import (
+	"errors"
+	"sync/atomic"
+	"syscall"
+	"unsafe"
+)
+
+// dirWatchMask selects the inotify events that change a directory listing
+// or the metadata of its entries
+const dirWatchMask = syscall.IN_CREATE | syscall.IN_DELETE | syscall.IN_MOVED_FROM | syscall.IN_MOVED_TO |
+	syscall.IN_MODIFY | syscall.IN_ATTRIB | syscall.IN_CLOSE_WRITE |
+	syscall.IN_DELETE_SELF | syscall.IN_MOVE_SELF | syscall.IN_ONLYDIR
+
+// dirWatcher reports directory changes using raw inotify syscalls
+type dirWatcher struct {
+	fd      int
+	onEvent func(wd int)
+	broken  atomic.Bool // the event loop stopped; new watches would never fire
+}
+
+// newDirWatcher starts an inotify instance, or returns nil if inotify is unavailable
+func newDirWatcher(onEvent func(wd int)) *dirWatcher {
+	fd, err := syscall.InotifyInit1(syscall.IN_CLOEXEC)
+	if err != nil {
+		if logger != nil {
+			logger.Debug("inotify unavailable, list cache falls back to mtime checks", "error", err)
+		}
+		return nil
+	}
+	w := &dirWatcher{fd: fd, onEvent: onEvent}
+	go w.loop()
+	return w
+}
+
+func (w *dirWatcher) add(path string) (int, error) {
+	if w.broken.Load() {
+		return -1, errors.New("inotify event loop stopped")
+	}
+	return syscall.InotifyAddWatch(w.fd, path, dirWatchMask)
+}
+
+func (w *dirWatcher) remove(wd int) {
+	syscall.InotifyRmWatch(w.fd, uint32(wd))
+}
+
+func (w *dirWatcher) loop() {
+	var buf [64 * 1024]byte
+	for {
+		n, err := syscall.Read(w.fd, buf[:])
+		if err == syscall.EINTR {
+			continue
+		}
+		if err != nil || n <= 0 {
+			if logger != nil {
+				logger.Debug("inotify read failed, list cache invalidated", "error", err)
+			}
+			w.broken.Store(true)
+			w.onEvent(-1)
+			return
+		}
+
+		for offset := 0; offset+syscall.SizeofInotifyEvent <= n; {
+			event := (*syscall.InotifyEvent)(unsafe.Pointer(&buf[offset]))
+			if event.Mask&syscall.IN_Q_OVERFLOW != 0 {
+				w.onEvent(-1)
+			} else {
+				w.onEvent(int(event.Wd))
+			}
+			offset += syscall.SizeofInotifyEvent + int(event.Len)
+		}
+	}
+}
@@ -0,0 +1,19 @@
+//go:build !linux
+
+package main
+
+import "errors"
+
+// dirWatcher is not available on this platform; the list cache validates
+// snapshots with directory mtimes instead
+type dirWatcher struct{}
+
+func newDirWatcher(onEvent func(wd int)) *dirWatcher {
+	return nil
+}
+
+func (w *dirWatcher) add(path string) (int, error) {
+	return -1, errors.New("directory watching is not supported on this platform")
+}
+
+func (w *dirWatcher) remove(wd int) {}
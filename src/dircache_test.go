@@ -0,0 +1,327 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"io"
+	"os"
+	"path/filepath"
+	"sort"
+	"strings"
+	"testing"
+	"time"
+)
+
+// useListCache enables the list_files cache for one test. A deaf cache
+// watches its directories but ignores the events, so only the invalidation
+// done by the server's own writes can keep it current.
+func useListCache(t *testing.T, deaf bool) *dirCache {
+	t.Helper()
+	c := newDirCache(10000)
+	if deaf {
+		c.watcher = newDirWatcher(func(int) {})
+	}
+	saved := listCache
+	listCache = c
+	t.Cleanup(func() { listCache = saved })
+	return c
+}
+
+// checkListing compares the listing served by the cache with the directory
+func checkListing(t *testing.T, dir string) {
+	t.Helper()
+	f, err := openDir(dir)
+	if err != nil {
+		t.Fatal(err)
+	}
+	var cached []string
+	for {
+		batch, err := f.ReadDir(100)
+		for _, d := range batch {
+			info, err := d.Info()
+			if err != nil {
+				t.Fatal(err)
+			}
+			cached = append(cached, fmt.Sprintf("%s %d", d.Name(), info.Size()))
+		}
+		if err == io.EOF || len(batch) == 0 {
+			break
+		}
+		if err != nil {
+			t.Fatal(err)
+		}
+	}
+	f.Close()
+
+	entries, err := os.ReadDir(dir)
+	if err != nil {
+		t.Fatal(err)
+	}
+	var live []string
+	for _, d := range entries {
+		info, err := d.Info()
+		if err != nil {
+			t.Fatal(err)
+		}
+		live = append(live, fmt.Sprintf("%s %d", d.Name(), info.Size()))
+	}
+	sort.Strings(cached)
+	if strings.Join(cached, ", ") != strings.Join(live, ", ") {
+		t.Fatalf("stale listing of %s:\ncached: %v\nlive:   %v", dir, cached, live)
+	}
+}
+
+func TestListCacheServesSnapshots(t *testing.T) {
+	c := useListCache(t, false)
+	dir := t.TempDir()
+	writeTestFile(t, filepath.Join(dir, "a.txt"), "a")
+
+	checkListing(t, dir)
+	misses := c.misses.Load()
+	checkListing(t, dir)
+	if c.hits.Load() == 0 || c.misses.Load() != misses {
+		t.Fatalf("second listing not served from the cache: %d hits, %d misses", c.hits.Load(), c.misses.Load())
+	}
+}
+
+func TestListCacheSeesServerChanges(t *testing.T) {
+	if newDirWatcher(func(int) {}) == nil {
+		t.Skip("inotify unavailable")
+	}
+	useListCache(t, true)
+	root := t.TempDir()
+	dir := filepath.Join(root, "dir")
+	other := filepath.Join(root, "other")
+	writeTestFile(t, filepath.Join(dir, "a.txt"), "a\n")
+	writeTestFile(t, filepath.Join(other, "b.txt"), "b\n")
+	ctx := context.Background()
+
+	steps := []struct {
+		name   string
+		change func() error
+	}{
+		{"write", func() error {
+			_, err := writeFileAtomic(filepath.Join(dir, "new.txt"), []byte("new\n"), durabilityNone)
+			return err
+		}},
+		{"append", func() error {
+			_, _, err := writeAppends(filepath.Join(dir, "a.txt"), []*appendRequest{{text: []byte("more\n")}})
+			return err
+		}},
+		{"patch deletes", func() error {
+			_, _, err := handleApplyPatch(ctx, nil, ApplyPatchRequest{Patch: "--- a/new.txt\n+++ /dev/null\n@@ -1 +0,0 @@\n-new\n", Directory: &dir})
+			return err
+		}},
+		{"copy", func() error {
+			_, _, err := handleCopyFile(ctx, nil, CopyFileRequest{Source: other, Destination: filepath.Join(dir, "copy")})
+			return err
+		}},
+		{"move", func() error {
+			_, _, err := handleMoveFile(ctx, nil, CopyFileRequest{Source: filepath.Join(dir, "copy"), Destination: filepath.Join(other, "moved")})
+			return err
+		}},
+		{"parent created", func() error {
+			name := filepath.Join(dir, "x", "y", "z.txt")
+			if err := createdDirs.ensureParent(name); err != nil {
+				return err
+			}
+			_, err := writeFileAtomic(name, []byte("z\n"), durabilityNone)
+			return err
+		}},
+	}
+	listed := []string{dir, other, filepath.Join(dir, "copy"), filepath.Join(other, "moved")}
+	for _, step := range steps {
+		for _, d := range listed {
+			if _, err := os.Stat(d); err == nil {
+				checkListing(t, d)
+			}
+		}
+		if err := step.change(); err != nil {
+			t.Fatalf("%s: %v", step.name, err)
+		}
+		for _, d := range listed {
+			if _, err := os.Stat(d); err == nil {
+				checkListing(t, d)
+			}
+		}
+	}
+}
+
+func TestListCacheSymlinkedDirectory(t *testing.T) {
+	if newDirWatcher(func(int) {}) == nil {
+		t.Skip("inotify unavailable")
+	}
+	useListCache(t, true)
+	root := t.TempDir()
+	dir := filepath.Join(root, "real")
+	link := filepath.Join(root, "link")
+	writeTestFile(t, filepath.Join(dir, "a.txt"), "a")
+	if err := os.Symlink(dir, link); err != nil {
+		t.Fatal(err)
+	}
+
+	// Listed through the link, written through the real path
+	checkListing(t, link)
+	if _, err := writeFileAtomic(filepath.Join(dir, "b.txt"), []byte("b"), durabilityNone); err != nil {
+		t.Fatal(err)
+	}
+	checkListing(t, link)
+}
+
+// TestListCacheWriteThenList lists a directory right after each write, with
+// the inotify watcher running as it does in the server
+func TestListCacheWriteThenList(t *testing.T) {
+	useListCache(t, false)
+	dir := t.TempDir()
+	recursive := true
+	for i := 0; i < 200; i++ {
+		name := fmt.Sprintf("f%03d.txt", i)
+		path := filepath.Join(dir, fmt.Sprintf("d%d", i%7), name)
+		if err := createdDirs.ensureParent(path); err != nil {
+			t.Fatal(err)
+		}
+		if _, err := writeFileAtomic(path, []byte(name), durabilityNone); err != nil {
+			t.Fatal(err)
+		}
+		result, _, err := handleListFiles(context.Background(), nil, ListFilesRequest{Path: dir, Recursive: &recursive})
+		if err != nil {
+			t.Fatal(err)
+		}
+		var listing struct {
+			Files []struct {
+				Name string `json:"name"`
+			} `json:"files"`
+		}
+		if err := json.Unmarshal([]byte(resultText(result)), &listing); err != nil {
+			t.Fatal(err)
+		}
+		found := false
+		for _, f := range listing.Files {
+			found = found || f.Name == name
+		}
+		if !found {
+			t.Fatalf("run %d: %s missing from the listing", i, name)
+		}
+	}
+}
+
+func writeTestFile(t *testing.T, path, content string) {
+	t.Helper()
+	if err := os.MkdirAll(filepath.Dir(path), 0755); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.WriteFile(path, []byte(content), 0644); err != nil {
+		t.Fatal(err)
+	}
+}
+
+// waitListing retries checkListing while the watcher may not yet have
+// delivered the event of an outside change
+func waitListing(t *testing.T, dir string) {
+	t.Helper()
+	deadline := time.Now().Add(5 * time.Second)
+	for {
+		if listingCurrent(dir) {
+			return
+		}
+		if time.Now().After(deadline) {
+			checkListing(t, dir)
+			return
+		}
+		time.Sleep(10 * time.Millisecond)
+	}
+}
+
+// listingCurrent reports whether the cache serves the live names of dir
+func listingCurrent(dir string) bool {
+	f, err := openDir(dir)
+	if err != nil {
+		return false
+	}
+	defer f.Close()
+	var cached []string
+	for {
+		batch, err := f.ReadDir(100)
+		for _, d := range batch {
+			cached = append(cached, d.Name())
+		}
+		if err != nil || len(batch) == 0 {
+			break
+		}
+	}
+	entries, err := os.ReadDir(dir)
+	if err != nil {
+		return false
+	}
+	sort.Strings(cached)
+	var live []string
+	for _, d := range entries {
+		live = append(live, d.Name())
+	}
+	return strings.Join(cached, "/") == strings.Join(live, "/")
+}
+
+// TestListCacheSharedWatch lists one directory through two paths, which
+// inotify watches with a single watch descriptor
+func TestListCacheSharedWatch(t *testing.T) {
+	if newDirWatcher(func(int) {}) == nil {
+		t.Skip("inotify unavailable")
+	}
+	c := useListCache(t, false)
+	root := t.TempDir()
+	dir := filepath.Join(root, "real")
+	link := filepath.Join(root, "link")
+	writeTestFile(t, filepath.Join(dir, "a.txt"), "a")
+	if err := os.Symlink(dir, link); err != nil {
+		t.Fatal(err)
+	}
+
+	// Changes made outside the server reach both paths
+	checkListing(t, dir)
+	checkListing(t, link)
+	writeTestFile(t, filepath.Join(dir, "b.txt"), "b")
+	waitListing(t, dir)
+	waitListing(t, link)
+
+	// Dropping the snapshot of one path keeps the watch of the other
+	checkListing(t, dir)
+	checkListing(t, link)
+	c.mu.Lock()
+	c.invalidateLocked(c.dirs[link])
+	c.mu.Unlock()
+	writeTestFile(t, filepath.Join(dir, "c.txt"), "c")
+	waitListing(t, dir)
+}
+
+// TestListCacheSubdirectoryMtime changes a subdirectory of a cached listing:
+// only the subdirectory's watch (if any) is notified, yet its mtime in the
+// parent's listing must be current
+func TestListCacheSubdirectoryMtime(t *testing.T) {
+	useListCache(t, false)
+	root := t.TempDir()
+	writeTestFile(t, filepath.Join(root, "sub", "a.txt"), "a")
+	old := time.Now().Add(-time.Hour)
+	if err := os.Chtimes(filepath.Join(root, "sub"), old, old); err != nil {
+		t.Fatal(err)
+	}
+	checkListing(t, root)
+
+	writeTestFile(t, filepath.Join(root, "sub", "b.txt"), "b")
+	f, err := openDir(root)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer f.Close()
+	entries, err := f.ReadDir(-1)
+	if err != nil || len(entries) != 1 {
+		t.Fatalf("%v, %v", entries, err)
+	}
+	info, err := entries[0].Info()
+	if err != nil {
+		t.Fatal(err)
+	}
+	if !info.ModTime().After(old.Add(time.Minute)) {
+		t.Fatalf("sub listed with its old mtime %v", info.ModTime())
+	}
+}
@@ -0,0 +1,166 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"path/filepath"
+	"strings"
+)
+
+// fileEdits collects the edits of one file in request order
+type fileEdits struct {
+	filename     string
+	patterns     []string
+	replacements []string
+	indexes      []int // position of each edit in the request
+}
+
+// canonicalPath identifies a file independently of how its name was spelled
+func canonicalPath(name string) string {
+	path, err := filepath.Abs(name)
+	if err != nil {
+		return filepath.Clean(name)
+	}
+	if resolved, err := filepath.EvalSymlinks(path); err == nil {
+		return resolved
+	}
+	return path
+}
+
+// applyEditBatch applies an ordered list of edits with one read and one write
+// per file. The edits of a file are matched against its original content in a
+// single pass, so replaced text is never matched again and where two edits
+// overlap the one listed first wins. Every edit must match at least once. All
+// files are replaced together, or none is. An expected hash applies to the
+// request filename. When diff is not nil the diffs of the files are returned
+// too, rendered with its context.
+func applyEditBatch(input EditFileRequest, durability string, precondition *writePrecondition, diff *editDiff) (string, string, error) {
+	if input.Content != nil || input.OldString != nil || input.NewString != nil || input.OldText != nil || input.NewText != nil {
+		return "", "", fmt.Errorf("invalid arguments: 'edits' cannot be combined with 'content', 'old_string' or 'new_string'")
+	}
+
+	var files []*fileEdits
+	byPath := make(map[string]*fileEdits)
+	for i, edit := range input.Edits {
+		name := input.Filename
+		if edit.Filename != "" {
+			name = edit.Filename
+		}
+		if name == "" {
+			return "", "", fmt.Errorf("invalid arguments: edits[%d] has no filename", i)
+		}
+		if edit.OldString == "" {
+			return "", "", fmt.Errorf("invalid arguments: edits[%d]: old_string must not be empty", i)
+		}
+		key := canonicalPath(name)
+		f := byPath[key]
+		if f == nil {
+			f = &fileEdits{filename: name}
+			byPath[key] = f
+			files = append(files, f)
+		}
+		f.patterns = append(f.patterns, edit.OldString)
+		f.replacements = append(f.replacements, edit.NewString)
+		f.indexes = append(f.indexes, i)
+	}
+
+	// Lock every file of the batch (and the one the precondition is about)
+	paths := []string{input.Filename}
+	for _, f := range files {
+		paths = append(paths, f.filename)
+	}
+	unlock := fileLocks.lock(paths...)
+	defer unlock()
+	if err := precondition.checkMtime(input.Filename); err != nil {
+		return "", "", err
+	}
+
+	checkKey := canonicalPath(input.Filename)
+	if precondition.needsHash() && byPath[checkKey] == nil {
+		if err := precondition.checkFileHash(input.Filename); err != nil {
+			return "", "", err
+		}
+	}
+
+	staged := make([]*stagedWrite, 0, len(files))
+	abort := func() {
+		for _, s := range staged {
+			s.Abort()
+		}
+	}
+	replacements := make([]int, len(files))
+	changes := make([]*journalChange, len(files))
+	diffs := make([]*editDiff, len(files))
+	diffTexts := make([]string, len(files))
+	for i, f := range files {
+		content, current, err := readFileHashed(f.filename)
+		if err != nil {
+			abort()
+			return "", "", fmt.Errorf("failed to read file %q: %v", f.filename, err)
+		}
+		if byPath[checkKey] == f {
+			if err := precondition.checkHash(f.filename, current.hash); err != nil {
+				abort()
+				return "", "", err
+			}
+		}
+
+		r := newMultiReplacer(f.patterns, f.replacements)
+		changes[i] = editJournal.begin(f.filename, true, current.hash)
+		if diff != nil {
+			diffs[i] = &editDiff{context: diff.context}
+		}
+		if change, fileDiff := changes[i], diffs[i]; change != nil || fileDiff != nil {
+			// Deltas refer to copies of the patterns, not to the file content
+			olds := make([][]byte, len(f.patterns))
+			for j, p := range f.patterns {
+				olds[j] = []byte(p)
+			}
+			pos, lines := 0, 0 // newlines are counted up to the matches only when a diff is kept
+			r.onReplace = func(m acMatch) {
+				change.replaced(int64(m.start), olds[m.pattern], int64(len(f.replacements[m.pattern])))
+				if fileDiff != nil {
+					lines += bytes.Count(content[pos:m.start], []byte{'\n'})
+					fileDiff.replaced(int64(m.start), lines+1, olds[m.pattern], []byte(f.replacements[m.pattern]))
+					lines += bytes.Count(olds[m.pattern], []byte{'\n'})
+					pos = m.end
+				}
+			}
+		}
+		updated, counts := r.replace(content)
+		for j, n := range counts {
+			if n == 0 {
+				abort()
+				return "", "", fmt.Errorf("edits[%d]: old_string not found in %q (or only overlaps an earlier edit)", f.indexes[j], f.filename)
+			}
+			replacements[i] += n
+		}
+
+		s, err := stageWrite(f.filename, durability)
+		if err != nil {
+			abort()
+			return "", "", err
+		}
+		staged = append(staged, s)
+		diffTexts[i] = diffs[i].render(f.filename, bytes.NewReader(updated), int64(len(updated)))
+		if _, err := s.Write(updated); err != nil {
+			abort()
+			return "", "", fmt.Errorf("failed to write file %q: %v", f.filename, err)
+		}
+		if s.written != int64(len(updated)) {
+			abort()
+			return "", "", fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", f.filename, len(updated), s.written)
+		}
+	}
+
+	if err := commitStaged(staged); err != nil {
+		return "", "", err
+	}
+	lines := make([]string, len(files))
+	for i, f := range files {
+		editJournal.record("edit_file", changes[i], staged[i].version())
+		lines[i] = fmt.Sprintf("File %s updated successfully. Bytes written: %d. Replacements: %d. %s",
+			f.filename, staged[i].written, replacements[i], staged[i].version())
+	}
+	return strings.Join(lines, "\n"), strings.Join(diffTexts, ""), nil
+}
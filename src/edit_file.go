@@ -1,9 +1,11 @@
 package main
 
 import (
+	"bytes"
 	"context"
 	"encoding/json"
 	"fmt"
+	"io"
 	"os"
 	"path/filepath"
 	"strings"
@@ -23,16 +25,149 @@ func handleEditFile(ctx context.Context, req *mcp.CallToolRequest, input EditFil
 		logger.Debug("edit_file called", "filename", input.Filename)
 	}
 
-	// Create directories if needed
-	dir := filepath.Dir(input.Filename)
-	if dir != "." && dir != "" {
-		if err := os.MkdirAll(dir, 0755); err != nil {
-			return nil, nil, fmt.Errorf("failed to create directory %q: %v", dir, err)
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	precondition, err := parsePrecondition(input.ExpectedHash, input.ExpectedMtime)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	diff, err := newEditDiff(input.ReturnDiff, input.DiffContext)
+	if err != nil {
+		return nil, nil, err
+	}
+	occ, err := parseOccurrences(input)
+	if err != nil {
+		return nil, nil, err
+	}
+
+	if len(input.Edits) > 0 {
+		message, diffText, err := applyEditBatch(input, durability, precondition, diff)
+		if err != nil {
+			return nil, nil, err
+		}
+		result := editResult(message, diff, diffText)
+		if logger != nil {
+			logger.Debug("edit_file completed", "filename", input.Filename, "edits", len(input.Edits))
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+		}
+		return result, nil, nil
+	}
+
+	if isAppendRequest(input, precondition) {
+		// Append in place without reading the file; concurrent appends are group-committed
+		newText := ""
+		if input.NewString != nil {
+			newText = *input.NewString
+		} else if input.NewText != nil {
+			newText = *input.NewText
+		}
+		if err := createdDirs.ensureParent(input.Filename); err != nil {
+			return nil, nil, err
 		}
+		written, version, err := fileAppends.append(input.Filename, []byte(newText), durability)
+		if err != nil && written == 0 && createdDirs.stale(filepath.Dir(input.Filename)) {
+			// The directory was removed since it was created: create it again
+			if err := createdDirs.ensureParent(input.Filename); err != nil {
+				return nil, nil, err
+			}
+			written, version, err = fileAppends.append(input.Filename, []byte(newText), durability)
+		}
+		if err != nil {
+			return nil, nil, err
+		}
+		message := fmt.Sprintf("File %s updated successfully. Bytes written: %d. %s", input.Filename, written, version)
+		result := &mcp.CallToolResult{
+			Content: []mcp.Content{
+				&mcp.TextContent{Text: message},
+			},
+		}
+		if logger != nil {
+			logger.Debug("edit_file completed", "filename", input.Filename, "bytes_appended", written)
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+		}
+		return result, nil, nil
+	}
+
+	// Serialize read-modify-write cycles on this file
+	unlock := fileLocks.lock(input.Filename)
+	defer unlock()
+	if err := precondition.checkMtime(input.Filename); err != nil {
+		return nil, nil, err
+	}
+
+	if isFuzzyRequest(input) {
+		written, replacements, quality, version, err := applyFuzzyEdit(input, durability, precondition, occ, diff)
+		if err != nil {
+			return nil, nil, err
+		}
+		diffText, err := diff.renderFile(input.Filename)
+		if err != nil {
+			return nil, nil, err
+		}
+		message := fmt.Sprintf("File %s updated successfully. Bytes written: %d. Replacements: %d. %s. %s", input.Filename, written, replacements, quality, version)
+		result := editResult(message, diff, diffText)
+		if logger != nil {
+			logger.Debug("edit_file completed", "filename", input.Filename, "bytes_written", written, "replacements", replacements, "match", quality)
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+		}
+		return result, nil, nil
+	}
+
+	if isRegexRequest(input) {
+		written, replacements, version, err := applyRegexEdit(input, durability, precondition, occ, diff)
+		if err != nil {
+			return nil, nil, err
+		}
+		diffText, err := diff.renderFile(input.Filename)
+		if err != nil {
+			return nil, nil, err
+		}
+		message := fmt.Sprintf("File %s updated successfully. Bytes written: %d. Replacements: %d. %s", input.Filename, written, replacements, version)
+		result := editResult(message, diff, diffText)
+		if logger != nil {
+			logger.Debug("edit_file completed", "filename", input.Filename, "bytes_written", written, "replacements", replacements)
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+		}
+		return result, nil, nil
+	}
+
+	if hasRangeArgs(input) {
+		written, version, err := applyRangeEdit(input, durability, precondition, diff)
+		if err != nil {
+			return nil, nil, err
+		}
+		diffText, err := diff.renderFile(input.Filename)
+		if err != nil {
+			return nil, nil, err
+		}
+		message := fmt.Sprintf("File %s updated successfully. Bytes written: %d. %s", input.Filename, written, version)
+		result := editResult(message, diff, diffText)
+		if logger != nil {
+			logger.Debug("edit_file completed", "filename", input.Filename, "bytes_written", written)
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+		}
+		return result, nil, nil
+	}
+
+	// Create directories if needed
+	if err := createdDirs.ensureParent(input.Filename); err != nil {
+		return nil, nil, err
 	}
 
 	var content []byte
-	var err error
+	var written int64
+	var version fileVersion
+	var change *journalChange // undo information, nil when the journal is disabled
+	var base []byte           // the original content, when a diff is requested
+	replacements := -1        // reported when count or expect_unique was given
+	streamed := false         // the file was already replaced (and journaled) by the streaming mode
 
 	// Determine which parameters are provided (support both naming variants for backward compatibility)
 	hasContent := input.Content != nil
@@ -46,15 +181,16 @@ func handleEditFile(ctx context.Context, req *mcp.CallToolRequest, input EditFil
 		if input.Content == nil {
 			return nil, nil, fmt.Errorf("invalid arguments: content parameter is nil")
 		}
+		if err := precondition.checkFileHash(input.Filename); err != nil {
+			return nil, nil, err
+		}
+		change = editJournal.beginRewrite(input.Filename)
 		content = []byte(*input.Content)
+		if base, err = originalContent(input.Filename, change, diff); err != nil {
+			return nil, nil, err
+		}
 	} else if hasOldText {
 		// Text replacement mode
-		content, err = os.ReadFile(input.Filename)
-		if err != nil && !os.IsNotExist(err) {
-			return nil, nil, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
-		}
-
-		fileContent := string(content)
 		// Use old_string/new_string if available, otherwise old_text/new_text
 		var oldText string
 		if input.OldString != nil {
@@ -70,23 +206,86 @@ func handleEditFile(ctx context.Context, req *mcp.CallToolRequest, input EditFil
 		}
 
 		if oldText == "*" {
-			fileContent = newText
-		} else if strings.Contains(fileContent, oldText) {
-			fileContent = strings.ReplaceAll(fileContent, oldText, newText)
-		} else if newText != "" {
-			if fileContent != "" && !strings.HasSuffix(fileContent, "\n") {
-				fileContent += "\n"
+			if err := precondition.checkFileHash(input.Filename); err != nil {
+				return nil, nil, err
+			}
+			change = editJournal.beginRewrite(input.Filename)
+			content = []byte(newText)
+			if base, err = originalContent(input.Filename, change, diff); err != nil {
+				return nil, nil, err
+			}
+		} else {
+			f, err := os.Open(input.Filename)
+			if err != nil && !os.IsNotExist(err) {
+				return nil, nil, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+			}
+			if f != nil && oldText != "" {
+				// Stream existing files through a temporary file with fixed memory use
+				var count int
+				written, count, version, err = streamReplaceFile(f, input.Filename, oldText, newText, durability, precondition, occ, diff)
+				f.Close()
+				if err != nil {
+					return nil, nil, err
+				}
+				if occ != (occurrences{}) {
+					replacements = count
+				}
+				streamed = true
+			} else {
+				current := "" // hash of a missing file
+				if f != nil {
+					h := newContentHash()
+					content, err = io.ReadAll(io.TeeReader(f, h))
+					f.Close()
+					if err != nil {
+						return nil, nil, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+					}
+					current = formatHash(h)
+				}
+				if err := precondition.checkHash(input.Filename, current); err != nil {
+					return nil, nil, err
+				}
+				change = editJournal.begin(input.Filename, f != nil, current)
+				if change != nil {
+					change.base = content
+				}
+				base = content
+				fileContent := string(content)
+				if occ != (occurrences{}) {
+					// Matches are only counted when they are limited or must be unique
+					replacements = strings.Count(fileContent, oldText)
+					if err := occ.check(input.Filename, oldText, replacements); err != nil {
+						return nil, nil, err
+					}
+					if occ.limit > 0 && replacements > occ.limit {
+						replacements = occ.limit
+					}
+				}
+				if replacements > 0 || (replacements < 0 && strings.Contains(fileContent, oldText)) {
+					fileContent = strings.Replace(fileContent, oldText, newText, replacements)
+				} else if newText != "" {
+					if fileContent != "" && !strings.HasSuffix(fileContent, "\n") {
+						fileContent += "\n"
+					}
+					fileContent += newText
+				}
+				content = []byte(fileContent)
 			}
-			fileContent += newText
 		}
-
-		content = []byte(fileContent)
 	} else if hasNewText {
-		// Append mode
-		current, err := os.ReadFile(input.Filename)
+		// Append mode with a precondition: the current content must be hashed
+		current, old, err := readFileHashed(input.Filename)
 		if err != nil && !os.IsNotExist(err) {
 			return nil, nil, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
 		}
+		if err := precondition.checkHash(input.Filename, old.hash); err != nil {
+			return nil, nil, err
+		}
+		change = editJournal.begin(input.Filename, err == nil, old.hash)
+		if change != nil {
+			change.base = current
+		}
+		base = current
 		fileContent := string(current)
 		var newText string
 		if input.NewString != nil {
@@ -100,39 +299,70 @@ func handleEditFile(ctx context.Context, req *mcp.CallToolRequest, input EditFil
 		fileContent += newText
 		content = []byte(fileContent)
 	} else {
-		return nil, nil, fmt.Errorf("invalid arguments: must provide either 'content' (for full write), 'old_string' (for replacement/removal), or 'new_string' (for append)")
+		return nil, nil, fmt.Errorf("invalid arguments: must provide either 'content' (for full write), 'old_string' (for replacement/removal), 'new_string' (for append) or 'edits' (for a batch)")
 	}
 
-	// Write file with atomic operation for better reliability
-	err = os.WriteFile(input.Filename, content, 0644)
-	if err != nil {
-		return nil, nil, fmt.Errorf("failed to write file %q: %v", input.Filename, err)
+	diffText := ""
+	if !streamed {
+		// Write to a temporary file and rename it into place
+		version, err = writeFileAtomic(input.Filename, content, durability)
+		if err != nil {
+			return nil, nil, err
+		}
+		written = int64(len(content))
+		change.rewrittenTo(content)
+		editJournal.record("edit_file", change, version)
+		diff.rewritten(base, content)
+		diffText = diff.render(input.Filename, bytes.NewReader(content), written)
+	} else if diffText, err = diff.renderFile(input.Filename); err != nil {
+		return nil, nil, err
 	}
 
-	// Verify the write was successful by checking file size
-	info, err := os.Stat(input.Filename)
-	if err != nil {
-		return nil, nil, fmt.Errorf("failed to verify file write for %q: %v", input.Filename, err)
+	message := fmt.Sprintf("File %s updated successfully. Bytes written: %d. %s", input.Filename, written, version)
+	if replacements >= 0 {
+		message = fmt.Sprintf("File %s updated successfully. Bytes written: %d. Replacements: %d. %s", input.Filename, written, replacements, version)
 	}
+	result := editResult(message, diff, diffText)
 
-	// Check if written size matches expected size
-	if info.Size() != int64(len(content)) {
-		return nil, nil, fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", input.Filename, len(content), info.Size())
+	// Log full response if debug mode
+	if logger != nil {
+		logger.Debug("edit_file completed", "filename", input.Filename, "bytes_written", written)
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
 	}
 
-	message := fmt.Sprintf("File %s updated successfully. Bytes written: %d", input.Filename, len(content))
+	return result, nil, nil
+}
+
+// editResult returns the message of an edit, followed by its diff when one
+// was requested
+func editResult(message string, diff *editDiff, diffText string) *mcp.CallToolResult {
 	result := &mcp.CallToolResult{
 		Content: []mcp.Content{
 			&mcp.TextContent{Text: message},
 		},
 	}
-
-	// Log full response if debug mode
-	if logger != nil {
-		logger.Debug("edit_file completed", "filename", input.Filename, "bytes_written", len(content))
-		resultJSON, _ := json.MarshalIndent(result, "", "  ")
-		logger.Debug("edit_file RESPONSE", "response", string(resultJSON))
+	if diff != nil {
+		if diffText == "" {
+			diffText = "No changes\n"
+		}
+		result.Content = append(result.Content, &mcp.TextContent{Text: diffText})
 	}
+	return result
+}
 
-	return result, nil, nil
+// originalContent returns the content a full rewrite replaces when a diff is
+// requested: the copy the journal took, or else the file itself
+func originalContent(filename string, change *journalChange, diff *editDiff) ([]byte, error) {
+	if diff == nil {
+		return nil, nil
+	}
+	if change != nil && change.base != nil {
+		return change.base, nil
+	}
+	data, err := os.ReadFile(filename)
+	if err != nil && !os.IsNotExist(err) {
+		return nil, fmt.Errorf("failed to read file %q: %v", filename, err)
+	}
+	return data, nil
 }
@@ -0,0 +1,275 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"io/fs"
+	"mime"
+	"net/http"
+	"os"
+	"path/filepath"
+	"runtime"
+	"strings"
+	"sync"
+	"unicode/utf8"
+)
+
+const (
+	// metadataSampleSize is the number of leading bytes sniffed for encoding and MIME type
+	metadataSampleSize = 8192
+	// metadataCacheEntries caps the number of files whose metadata is remembered
+	metadataCacheEntries = 100000
+)
+
+// metadataFields selects the optional per-file fields of a listing
+type metadataFields struct {
+	lines    bool
+	encoding bool
+	isBinary bool
+	mime     bool
+}
+
+func parseMetadataFields(names []string) (metadataFields, error) {
+	var f metadataFields
+	for _, name := range names {
+		switch name {
+		case "lines":
+			f.lines = true
+		case "encoding":
+			f.encoding = true
+		case "is_binary":
+			f.isBinary = true
+		case "mime":
+			f.mime = true
+		default:
+			return f, fmt.Errorf("invalid field %q: must be one of lines, encoding, is_binary, mime", name)
+		}
+	}
+	return f, nil
+}
+
+func (f metadataFields) any() bool {
+	return f.lines || f.encoding || f.isBinary || f.mime
+}
+
+// fileMetadata is what is known about a file's content. The sampled fields
+// come from the first metadataSampleSize bytes; lines needs a full scan and
+// is only computed when requested.
+type fileMetadata struct {
+	encoding string
+	binary   bool
+	mime     string
+	hasLines bool
+	lines    int64
+}
+
+// metadataCache remembers file metadata keyed by file identity, size and
+// mtime, so unchanged files are never read twice
+type metadataCache struct {
+	mu      sync.Mutex
+	max     int
+	entries map[fileKey]fileMetadata
+}
+
+func newMetadataCache(max int) *metadataCache {
+	return &metadataCache{max: max, entries: make(map[fileKey]fileMetadata)}
+}
+
+func (c *metadataCache) get(key fileKey) (fileMetadata, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	meta, ok := c.entries[key]
+	return meta, ok
+}
+
+func (c *metadataCache) put(key fileKey, meta fileMetadata) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if _, ok := c.entries[key]; !ok && len(c.entries) >= c.max {
+		evictHalf(c.entries)
+	}
+	c.entries[key] = meta
+}
+
+// metadataJob is a listed file waiting for its metadata
+type metadataJob struct {
+	index int // position in the files slice
+	path  string
+	info  fs.FileInfo
+}
+
+// enrichEntries fills the requested fields of files with a pool of workers
+// reading files in parallel
+func enrichEntries(files []fileEntry, jobs []metadataJob, fields metadataFields) {
+	workers := runtime.GOMAXPROCS(0)
+	if workers > 8 {
+		workers = 8
+	}
+	if workers > len(jobs) {
+		workers = len(jobs)
+	}
+
+	ch := make(chan metadataJob)
+	var wg sync.WaitGroup
+	for i := 0; i < workers; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			buf := make([]byte, 64*1024)
+			for job := range ch {
+				meta, err := fileMetadataFor(job.path, job.info, fields.lines, buf)
+				if err != nil {
+					continue
+				}
+				applyMetadata(&files[job.index], meta, fields)
+			}
+		}()
+	}
+	for _, job := range jobs {
+		ch <- job
+	}
+	close(ch)
+	wg.Wait()
+}
+
+func applyMetadata(entry *fileEntry, meta fileMetadata, fields metadataFields) {
+	if fields.encoding {
+		entry.Encoding = meta.encoding
+	}
+	if fields.isBinary {
+		binary := meta.binary
+		entry.IsBinary = &binary
+	}
+	if fields.mime {
+		entry.MIME = meta.mime
+	}
+	if fields.lines && meta.hasLines {
+		lines := meta.lines
+		entry.Lines = &lines
+	}
+}
+
+// fileMetadataFor returns cached metadata or reads the file to compute it
+func fileMetadataFor(path string, info fs.FileInfo, needLines bool, buf []byte) (fileMetadata, error) {
+	key := fileKeyOf(path, info)
+	meta, ok := fileMetaCache.get(key)
+	if ok && (meta.hasLines || meta.binary || !needLines) {
+		return meta, nil
+	}
+
+	f, err := os.Open(path)
+	if err != nil {
+		return meta, err
+	}
+	defer f.Close()
+
+	if !ok {
+		n, err := io.ReadFull(f, buf[:metadataSampleSize])
+		if err != nil && err != io.EOF && err != io.ErrUnexpectedEOF {
+			return meta, err
+		}
+		meta = sniffContent(filepath.Ext(path), buf[:n])
+	}
+
+	if needLines && !meta.binary {
+		if _, err := f.Seek(0, io.SeekStart); err != nil {
+			return meta, err
+		}
+		lines, err := countLines(f, buf)
+		if err != nil {
+			return meta, err
+		}
+		meta.lines = lines
+		meta.hasLines = true
+	}
+
+	fileMetaCache.put(key, meta)
+	return meta, nil
+}
+
+// sniffContent classifies a file from its first bytes
+func sniffContent(ext string, sample []byte) fileMetadata {
+	sniffed := http.DetectContentType(sample)
+	meta := fileMetadata{mime: mime.TypeByExtension(ext)}
+	if meta.mime == "" {
+		meta.mime = sniffed
+	}
+
+	switch {
+	case bytes.HasPrefix(sample, []byte{0xEF, 0xBB, 0xBF}):
+		meta.encoding = "utf-8"
+	case bytes.HasPrefix(sample, []byte{0xFF, 0xFE}):
+		meta.encoding = "utf-16le"
+	case bytes.HasPrefix(sample, []byte{0xFE, 0xFF}):
+		meta.encoding = "utf-16be"
+	case bytes.IndexByte(sample, 0) >= 0:
+		meta.encoding = "binary"
+		meta.binary = true
+	case utf8.Valid(trimPartialRune(sample)):
+		meta.encoding = "utf-8"
+		if isASCII(sample) {
+			meta.encoding = "ascii"
+		}
+	case !strings.HasPrefix(sniffed, "text/"):
+		// Known binary signature (image, archive...)
+		meta.encoding = "binary"
+		meta.binary = true
+	default:
+		// Not UTF-8 and no NUL bytes: most likely a legacy 8-bit encoding
+		meta.encoding = "unknown"
+	}
+	return meta
+}
+
+// trimPartialRune drops an incomplete UTF-8 sequence cut off at the end of a sample
+func trimPartialRune(b []byte) []byte {
+	for i := 1; i <= utf8.UTFMax && i <= len(b); i++ {
+		c := b[len(b)-i]
+		if c < utf8.RuneSelf {
+			return b
+		}
+		if utf8.RuneStart(c) {
+			if !utf8.FullRune(b[len(b)-i:]) {
+				return b[:len(b)-i]
+			}
+			return b
+		}
+	}
+	return b
+}
+
+func isASCII(b []byte) bool {
+	for _, c := range b {
+		if c >= utf8.RuneSelf {
+			return false
+		}
+	}
+	return true
+}
+
+// countLines counts lines the way read_file splits them: a final line
+// without a trailing newline still counts
+func countLines(r io.Reader, buf []byte) (int64, error) {
+	var lines int64
+	var last byte
+	var seen bool
+	for {
+		n, err := r.Read(buf)
+		if n > 0 {
+			lines += int64(bytes.Count(buf[:n], []byte{'\n'}))
+			last = buf[n-1]
+			seen = true
+		}
+		if err == io.EOF {
+			break
+		}
+		if err != nil {
+			return 0, err
+		}
+	}
+	if seen && last != '\n' {
+		lines++
+	}
+	return lines, nil
+}
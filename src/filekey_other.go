@@ -0,0 +1,17 @@
+//go:build !unix
+
+package main
+
+import "io/fs"
+
+// fileKey identifies a version of a file: the same path with the same size
+// and mtime is assumed to have the same content
+type fileKey struct {
+	path  string
+	size  int64
+	mtime int64
+}
+
+func fileKeyOf(path string, info fs.FileInfo) fileKey {
+	return fileKey{path: path, size: info.Size(), mtime: info.ModTime().UnixNano()}
+}
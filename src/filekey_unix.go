@@ -0,0 +1,25 @@
+//go:build unix
+
+package main
+
+import (
+	"io/fs"
+	"syscall"
+)
+
+// fileKey identifies a version of a file: the same inode with the same size
+// and mtime is assumed to have the same content
+type fileKey struct {
+	dev, ino uint64
+	size     int64
+	mtime    int64
+}
+
+func fileKeyOf(path string, info fs.FileInfo) fileKey {
+	key := fileKey{size: info.Size(), mtime: info.ModTime().UnixNano()}
+	if st, ok := info.Sys().(*syscall.Stat_t); ok {
+		key.dev = uint64(st.Dev)
+		key.ino = uint64(st.Ino)
+	}
+	return key
+}
@@ -0,0 +1,153 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+)
+
+// fuzzyDefaultRatio sets the default edit distance allowed by a fuzzy match:
+// one edit per this many bytes of old_string (whitespace normalized)
+const fuzzyDefaultRatio = 10
+
+// textRegion is a replacement of content[start:end] with text
+type textRegion struct {
+	start, end int
+	text       []byte
+}
+
+// spliceRegions returns content with the regions, in order and not
+// overlapping, replaced; the replacements are recorded in the journal change
+// and the diff
+func spliceRegions(content []byte, regions []textRegion, change *journalChange, diff *editDiff) []byte {
+	size := len(content)
+	for _, r := range regions {
+		size += len(r.text) - (r.end - r.start)
+	}
+	updated := make([]byte, 0, size)
+	pos, lines := 0, 0 // newlines are counted up to the regions only when a diff is kept
+	for _, r := range regions {
+		updated = append(updated, content[pos:r.start]...)
+		updated = append(updated, r.text...)
+		if change != nil || diff != nil {
+			// The journal keeps copies, not the whole content
+			old := append([]byte(nil), content[r.start:r.end]...)
+			change.replaced(int64(r.start), old, int64(len(r.text)))
+			if diff != nil {
+				lines += bytes.Count(content[pos:r.start], []byte{'\n'})
+				diff.replaced(int64(r.start), lines+1, old, r.text)
+				lines += bytes.Count(old, []byte{'\n'})
+			}
+		}
+		pos = r.end
+	}
+	return append(updated, content[pos:]...)
+}
+
+// isFuzzyRequest reports whether old_string may match approximately
+func isFuzzyRequest(input EditFileRequest) bool {
+	return input.Fuzzy != nil && *input.Fuzzy
+}
+
+// applyFuzzyEdit replaces old_string like the literal mode when it occurs
+// exactly. Otherwise whitespace is normalized in the file and in old_string
+// (indentation and trailing whitespace dropped, other runs collapsed to one
+// space) and the normalized occurrences are replaced, mapped back to the
+// original text. Failing that, the best occurrence within max_distance edits
+// is replaced, if there is a single one. Every step is linear in the size of
+// the file. It returns the new file size, the number of replacements, how
+// old_string was matched and the version.
+func applyFuzzyEdit(input EditFileRequest, durability string, precondition *writePrecondition, occ occurrences, diff *editDiff) (int64, int, string, fileVersion, error) {
+	if input.Content != nil || len(input.Edits) > 0 || hasRangeArgs(input) || isRegexRequest(input) {
+		return 0, 0, "", fileVersion{}, fmt.Errorf("invalid arguments: 'fuzzy' cannot be combined with 'content', 'edits', 'regex' or a range")
+	}
+	old := ""
+	if input.OldString != nil {
+		old = *input.OldString
+	} else if input.OldText != nil {
+		old = *input.OldText
+	}
+	newText := ""
+	if input.NewString != nil {
+		newText = *input.NewString
+	} else if input.NewText != nil {
+		newText = *input.NewText
+	}
+	pattern := normalizeWhitespace([]byte(old), false).text
+	if len(pattern) == 0 {
+		return 0, 0, "", fileVersion{}, fmt.Errorf("invalid arguments: old_string must contain more than whitespace with fuzzy")
+	}
+	maxDistance := len(pattern) / fuzzyDefaultRatio
+	if input.MaxDistance != nil {
+		if *input.MaxDistance < 0 || *input.MaxDistance >= len(pattern) {
+			return 0, 0, "", fileVersion{}, fmt.Errorf("invalid arguments: max_distance must be between 0 and %d", len(pattern)-1)
+		}
+		maxDistance = *input.MaxDistance
+	}
+
+	content, current, err := readFileHashed(input.Filename)
+	if err != nil {
+		return 0, 0, "", fileVersion{}, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+	}
+	if err := precondition.checkHash(input.Filename, current.hash); err != nil {
+		return 0, 0, "", fileVersion{}, err
+	}
+
+	limit := occ.limit
+	if occ.unique {
+		limit = 2 // enough to tell that a match is not unique
+	}
+	replacement := []byte(newText)
+	var regions []textRegion
+	quality := "Match: exact"
+	if found := findAll(content, []byte(old), limit); len(found) > 0 {
+		for _, at := range found {
+			regions = append(regions, textRegion{start: at, end: at + len(old), text: replacement})
+		}
+	} else {
+		norm := normalizeWhitespace(content, true)
+		leading := len(old) > 0 && isHorizontalSpace(old[0])
+		trailing := len(old) > 0 && isHorizontalSpace(old[len(old)-1])
+		region := func(start, end int) textRegion {
+			r := textRegion{start: norm.origStart(start), end: norm.origEnd(end), text: replacement}
+			// Whitespace old_string had, but not as in the file, is replaced too
+			if leading && (start == 0 || norm.text[start-1] == '\n') {
+				for r.start > 0 && isHorizontalSpace(content[r.start-1]) {
+					r.start--
+				}
+			}
+			if trailing && (end == len(norm.text) || norm.text[end] == '\n') {
+				for r.end < len(content) && isHorizontalSpace(content[r.end]) {
+					r.end++
+				}
+			}
+			return r
+		}
+		if found := findAll(norm.text, pattern, limit); len(found) > 0 {
+			for _, at := range found {
+				regions = append(regions, region(at, at+len(pattern)))
+			}
+			quality = fmt.Sprintf("Match: whitespace-normalized at line %d", bytes.Count(content[:regions[0].start], []byte{'\n'})+1)
+		} else if m, ok := approxSearch(norm.text, pattern, maxDistance); ok {
+			if m.ambiguous {
+				return 0, 0, "", fileVersion{}, fmt.Errorf("old_string matches %q in several places with %d edits; include more context", input.Filename, m.distance)
+			}
+			regions = append(regions, region(m.start, m.end))
+			quality = fmt.Sprintf("Match: approximate at line %d, edit distance %d (similarity %d%%)",
+				bytes.Count(content[:regions[0].start], []byte{'\n'})+1, m.distance, 100-100*m.distance/len(pattern))
+		} else {
+			return 0, 0, "", fileVersion{}, fmt.Errorf("old_string not found in %q, even with whitespace normalized and up to %d edits", input.Filename, maxDistance)
+		}
+	}
+	if err := occ.check(input.Filename, old, len(regions)); err != nil {
+		return 0, 0, "", fileVersion{}, err
+	}
+
+	change := editJournal.begin(input.Filename, true, current.hash)
+	updated := spliceRegions(content, regions, change, diff)
+	version, err := writeFileAtomic(input.Filename, updated, durability)
+	if err != nil {
+		return 0, 0, "", fileVersion{}, err
+	}
+	editJournal.record("edit_file", change, version)
+	return int64(len(updated)), len(regions), quality, version, nil
+}
@@ -0,0 +1,127 @@
+package main
+
+import (
+	"fmt"
+	"path/filepath"
+	"strings"
+)
+
+// globSegment is one '/'-separated component of a compiled glob pattern
+type globSegment struct {
+	pattern    string
+	literal    bool // pattern has no wildcards and is compared directly
+	doubleStar bool // "**" matches zero or more path components
+}
+
+func (s *globSegment) matchComponent(name string) bool {
+	if s.literal {
+		return s.pattern == name
+	}
+	matched, err := filepath.Match(s.pattern, name)
+	return err == nil && matched
+}
+
+// globPattern is a glob compiled once and matched against '/'-separated
+// relative paths. Each component supports filepath.Match syntax and a
+// component of exactly "**" matches any number of directories.
+type globPattern struct {
+	segments []globSegment
+}
+
+// compileGlob compiles a '/'-separated glob pattern
+func compileGlob(pattern string) (*globPattern, error) {
+	pattern = strings.Trim(pattern, "/")
+	if pattern == "" {
+		return nil, fmt.Errorf("empty pattern")
+	}
+
+	g := &globPattern{}
+	for _, part := range strings.Split(pattern, "/") {
+		if part == "" {
+			continue
+		}
+		if part == "**" {
+			// Collapse consecutive "**" components
+			if n := len(g.segments); n > 0 && g.segments[n-1].doubleStar {
+				continue
+			}
+			g.segments = append(g.segments, globSegment{pattern: part, doubleStar: true})
+			continue
+		}
+		if _, err := filepath.Match(part, ""); err != nil {
+			return nil, fmt.Errorf("invalid pattern %q: %v", pattern, err)
+		}
+		g.segments = append(g.segments, globSegment{
+			pattern: part,
+			literal: !strings.ContainsAny(part, `*?[\`),
+		})
+	}
+	return g, nil
+}
+
+// match reports whether the whole relative path matches the pattern
+func (g *globPattern) match(path string) bool {
+	return g.matchFrom(0, filepath.ToSlash(path))
+}
+
+func (g *globPattern) matchFrom(si int, path string) bool {
+	for ; si < len(g.segments); si++ {
+		seg := &g.segments[si]
+		if seg.doubleStar {
+			if si == len(g.segments)-1 {
+				return true
+			}
+			// Try to match the rest after skipping 0, 1, 2... components
+			for {
+				if g.matchFrom(si+1, path) {
+					return true
+				}
+				if path == "" {
+					return false
+				}
+				path = skipComponent(path)
+			}
+		}
+		if path == "" {
+			return false
+		}
+		comp, rest := splitComponent(path)
+		if !seg.matchComponent(comp) {
+			return false
+		}
+		path = rest
+	}
+	return path == ""
+}
+
+// canMatchBelow reports whether any path strictly inside the directory dir
+// could match. Walkers use it to prune subtrees: literal leading components
+// such as "src" in "src/**/handlers/*.go" restrict the walk to that prefix.
+func (g *globPattern) canMatchBelow(dir string) bool {
+	path := filepath.ToSlash(dir)
+	for si := range g.segments {
+		seg := &g.segments[si]
+		if seg.doubleStar || path == "" {
+			return true
+		}
+		comp, rest := splitComponent(path)
+		if !seg.matchComponent(comp) {
+			return false
+		}
+		path = rest
+	}
+	return false
+}
+
+// splitComponent splits off the first component of a '/'-separated path
+func splitComponent(path string) (string, string) {
+	if i := strings.IndexByte(path, '/'); i >= 0 {
+		return path[:i], path[i+1:]
+	}
+	return path, ""
+}
+
+func skipComponent(path string) string {
+	_, rest := splitComponent(path)
+	return rest
+}
@@ -0,0 +1,107 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"time"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// historyDefaultLimit is the number of entries returned when no limit is given
+const historyDefaultLimit = 50
+
+type historyEntry struct {
+	ID         int64  `json:"id"`
+	Time       string `json:"time"`
+	Tool       string `json:"tool"`
+	Filename   string `json:"filename"`
+	HashBefore string `json:"hash_before,omitempty"`
+	HashAfter  string `json:"hash_after,omitempty"`
+	DeltaBytes int64  `json:"delta_bytes"`
+	// Where the delta is kept: memory, disk, none (the change created the
+	// file) or not_journaled (too large, can't be undone)
+	Stored string `json:"stored"`
+}
+
+type historyResponse struct {
+	Entries     []historyEntry `json:"entries"`
+	MemoryBytes int64          `json:"memory_bytes"`
+	MemoryLimit int64          `json:"memory_limit"`
+	DiskBytes   int64          `json:"disk_bytes,omitempty"`
+}
+
+func handleHistory(ctx context.Context, req *mcp.CallToolRequest, input HistoryRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log full request if debug mode
+	if logger != nil {
+		reqJSON, _ := json.MarshalIndent(req, "", "  ")
+		logger.Debug("history REQUEST", "request", string(reqJSON))
+		logger.Debug("history called", "filename", input.Filename, "limit", input.Limit)
+	}
+
+	if editJournal == nil {
+		return nil, nil, fmt.Errorf("the edit journal is disabled (start the server with -journal-size greater than 0)")
+	}
+	limit := historyDefaultLimit
+	if input.Limit != nil {
+		if *input.Limit <= 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: limit must be positive")
+		}
+		limit = *input.Limit
+	}
+	path := ""
+	if input.Filename != nil && *input.Filename != "" {
+		path = canonicalPath(*input.Filename)
+	}
+
+	entries := editJournal.history(path, limit)
+	stats := editJournal.stats()
+	resp := historyResponse{
+		Entries:     make([]historyEntry, len(entries)),
+		MemoryBytes: stats.MemoryBytes,
+		MemoryLimit: editJournal.maxBytes,
+		DiskBytes:   stats.DiskBytes,
+	}
+	for i, e := range entries {
+		stored := "memory"
+		switch {
+		case !e.journaled:
+			stored = "not_journaled"
+		case e.created:
+			stored = "none"
+		case e.delta == nil:
+			stored = "disk"
+		}
+		resp.Entries[i] = historyEntry{
+			ID:         e.id,
+			Time:       e.time.Format(time.RFC3339Nano),
+			Tool:       e.tool,
+			Filename:   e.filename,
+			HashBefore: e.before,
+			HashAfter:  e.after.hash,
+			DeltaBytes: e.deltaSize,
+			Stored:     stored,
+		}
+	}
+	data, _ := json.Marshal(resp)
+
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: string(data)},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		logger.Debug("history completed", "entries", len(entries))
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("history RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
@@ -0,0 +1,139 @@
+package main
+
+import (
+	"bufio"
+	"fmt"
+	"os"
+	"path/filepath"
+	"strings"
+)
+
+// ignoreFileNames are the per-directory ignore files honoured by respect_gitignore,
+// in increasing order of precedence
+var ignoreFileNames = []string{".gitignore", ".ignore"}
+
+// ignoreRule is a single compiled line of a .gitignore-style file
+type ignoreRule struct {
+	glob     *globPattern
+	negate   bool // "!pattern" re-includes a previously ignored path
+	dirOnly  bool // "pattern/" only matches directories
+	baseName bool // pattern without '/' matches the name at any depth
+}
+
+// parseIgnoreRule compiles one line of an ignore file. ok is false for
+// blank lines, comments and malformed patterns.
+func parseIgnoreRule(line string) (rule ignoreRule, ok bool) {
+	line = strings.TrimSuffix(line, "\r")
+	// Trailing spaces are ignored unless escaped with a backslash
+	if strings.HasSuffix(line, `\ `) {
+		line = strings.TrimRight(line[:len(line)-2], " ") + " "
+	} else {
+		line = strings.TrimRight(line, " ")
+	}
+	if line == "" || strings.HasPrefix(line, "#") {
+		return rule, false
+	}
+
+	if strings.HasPrefix(line, "!") {
+		rule.negate = true
+		line = line[1:]
+	} else if strings.HasPrefix(line, `\!`) || strings.HasPrefix(line, `\#`) {
+		line = line[1:]
+	}
+	if strings.HasSuffix(line, "/") {
+		rule.dirOnly = true
+		line = strings.TrimRight(line, "/")
+	}
+	if line == "" {
+		return rule, false
+	}
+
+	// A pattern is relative to the ignore file's directory if it contains a
+	// slash; otherwise it matches a name at any level below it
+	rule.baseName = !strings.Contains(line, "/")
+	glob, err := compileGlob(line)
+	if err != nil {
+		return rule, false
+	}
+	rule.glob = glob
+	return rule, true
+}
+
+// matches reports whether the rule applies to path (relative to the rule's base)
+func (r *ignoreRule) matches(path, name string, isDir bool) bool {
+	if r.dirOnly && !isDir {
+		return false
+	}
+	if r.baseName {
+		return r.glob.match(name)
+	}
+	return r.glob.match(path)
+}
+
+// ignoreScope holds the rules of one directory's ignore files and links to
+// the scope of its parent. Scopes are immutable once built, so subdirectories
+// share their ancestors' compiled rules.
+type ignoreScope struct {
+	parent *ignoreScope
+	base   string // directory of the ignore files relative to the walk root ("." for the root)
+	rules  []ignoreRule
+}
+
+// newIgnoreScope compiles a list of patterns anchored at the walk root
+func newIgnoreScope(patterns []string) (*ignoreScope, error) {
+	scope := &ignoreScope{base: "."}
+	for _, p := range patterns {
+		rule, ok := parseIgnoreRule(p)
+		if !ok {
+			if strings.TrimSpace(p) == "" || strings.HasPrefix(p, "#") {
+				continue
+			}
+			return nil, fmt.Errorf("invalid exclude pattern %q", p)
+		}
+		scope.rules = append(scope.rules, rule)
+	}
+	return scope, nil
+}
+
+// loadIgnoreScope reads the ignore files of the directory rel (relative to
+// root). It returns parent unchanged when the directory has no rules.
+func loadIgnoreScope(parent *ignoreScope, root, rel string) *ignoreScope {
+	var rules []ignoreRule
+	for _, name := range ignoreFileNames {
+		f, err := os.Open(filepath.Join(root, rel, name))
+		if err != nil {
+			continue
+		}
+		scanner := bufio.NewScanner(f)
+		for scanner.Scan() {
+			if rule, ok := parseIgnoreRule(scanner.Text()); ok {
+				rules = append(rules, rule)
+			}
+		}
+		f.Close()
+	}
+	if len(rules) == 0 {
+		return parent
+	}
+	return &ignoreScope{parent: parent, base: rel, rules: rules}
+}
+
+// ignored reports whether the entry at rel (relative to the walk root) is
+// excluded. Deeper scopes take precedence and, within a scope, the last
+// matching rule wins, following git's semantics.
+func (s *ignoreScope) ignored(rel string, isDir bool) bool {
+	rel = filepath.ToSlash(rel)
+	name := rel[strings.LastIndexByte(rel, '/')+1:]
+	for scope := s; scope != nil; scope = scope.parent {
+		path := rel
+		if scope.base != "." {
+			path = strings.TrimPrefix(rel, filepath.ToSlash(scope.base)+"/")
+		}
+		for i := len(scope.rules) - 1; i >= 0; i-- {
+			if scope.rules[i].matches(path, name, isDir) {
+				return !scope.rules[i].negate
+			}
+		}
+	}
+	return false
+}
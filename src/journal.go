@@ -0,0 +1,467 @@
+package main
+
+import (
+	"encoding/binary"
+	"errors"
+	"fmt"
+	"io/fs"
+	"os"
+	"sync"
+	"time"
+)
+
+const (
+	// deltaOpOverhead approximates the memory of a deltaOp besides its text
+	deltaOpOverhead = 48
+	// journalEntryOverhead approximates the memory of an entry besides its names and delta
+	journalEntryOverhead = 256
+)
+
+// deltaOp puts text back in place of length bytes at offset of the new content
+type deltaOp struct {
+	offset int64
+	length int64
+	text   []byte
+}
+
+// reverseDelta turns the content of a file after a change back into the
+// content before it. Ops are sorted by offset and don't overlap. Only the
+// replaced regions are kept, never a copy of the file.
+type reverseDelta struct {
+	ops  []deltaOp
+	size int64 // approximate memory use
+}
+
+// journalChange collects the reverse delta of a change while it is made. It
+// gives up once the delta grows past the journal's per-change limit, so that
+// building it never takes more memory than the journal would keep. All
+// methods are no-ops on a nil change (journal disabled).
+type journalChange struct {
+	filename string
+	created  bool   // the file didn't exist: undoing the change removes it
+	before   string // content hash before the change, "" if unknown
+	base     []byte // content before a whole-file rewrite
+
+	ops      []deltaOp
+	size     int64
+	shift    int64 // how far the recorded replacements moved the rest of the content
+	limit    int64
+	overflow bool
+}
+
+// reserve reports whether n more bytes of old text fit in the delta. When
+// they don't, the change is marked as too large to journal.
+func (c *journalChange) reserve(n int64) bool {
+	if c == nil || c.overflow {
+		return false
+	}
+	if c.size+deltaOpOverhead+n > c.limit {
+		c.overflow = true
+		c.ops = nil
+		return false
+	}
+	return true
+}
+
+// replaced records that old, found at offset of the original content, was
+// replaced with newLen bytes. Replacements must be recorded in order.
+func (c *journalChange) replaced(offset int64, old []byte, newLen int64) {
+	if !c.reserve(int64(len(old))) {
+		return
+	}
+	c.size += deltaOpOverhead + int64(len(old))
+	c.ops = append(c.ops, deltaOp{offset: offset + c.shift, length: newLen, text: old})
+	c.shift += newLen - int64(len(old))
+}
+
+// rewritten records a change of the whole content from old to new as the
+// single region between their common prefix and suffix
+func (c *journalChange) rewritten(old, new []byte) {
+	if c == nil || c.created {
+		return
+	}
+	prefix := 0
+	for prefix < len(old) && prefix < len(new) && old[prefix] == new[prefix] {
+		prefix++
+	}
+	suffix := 0
+	for suffix < len(old)-prefix && suffix < len(new)-prefix && old[len(old)-1-suffix] == new[len(new)-1-suffix] {
+		suffix++
+	}
+	if prefix == len(old) && prefix == len(new) {
+		return
+	}
+	text := old[prefix : len(old)-suffix]
+	if c.reserve(int64(len(text))) {
+		// Copy the region so the delta doesn't keep the whole old content alive
+		c.replaced(int64(prefix), append([]byte(nil), text...), int64(len(new)-prefix-suffix))
+	}
+}
+
+// rewrittenTo records a whole-file rewrite of the content read by beginRewrite
+func (c *journalChange) rewrittenTo(new []byte) {
+	if c == nil || c.overflow {
+		return
+	}
+	c.rewritten(c.base, new)
+	c.base = nil
+}
+
+// rewrittenAll records a whole-file rewrite of the content read by
+// beginRewrite when the new content, newLen bytes, isn't in memory: the old
+// content is kept whole
+func (c *journalChange) rewrittenAll(newLen int64) {
+	if c == nil || c.overflow {
+		return
+	}
+	if !c.created {
+		c.replaced(0, c.base, newLen)
+	}
+	c.base = nil
+}
+
+// journalEntry is one change of a file recorded by the journal
+type journalEntry struct {
+	id        int64
+	time      time.Time
+	tool      string
+	filename  string // as given by the caller
+	path      string // canonical path identifying the file
+	created   bool
+	journaled bool // false when the change was too large to journal
+	before    string
+	after     fileVersion    // the file right after the change
+	delta     *reverseDelta  // nil once spilled to disk
+	spilled   *journalRecord // location of the delta in the on-disk log
+	deltaSize int64
+}
+
+func (e *journalEntry) memory() int64 {
+	n := int64(journalEntryOverhead + len(e.filename) + len(e.path))
+	if e.delta != nil {
+		n += e.delta.size
+	}
+	return n
+}
+
+// journalStats are the counters of the journal since the server started
+type journalStats struct {
+	Entries     int
+	MemoryBytes int64
+	DiskBytes   int64
+	Recorded    int64
+	Spilled     int64
+	Dropped     int64
+	Undone      int64
+}
+
+// changeJournal records a reverse delta for every change made by edit_file
+// and write_file so that the latest changes of a file can be undone. Memory
+// use is capped: when the cap is exceeded the oldest deltas are moved to the
+// on-disk log if there is one, and the oldest entries are dropped otherwise.
+// A single change larger than a quarter of the cap is listed but can't be
+// undone.
+type changeJournal struct {
+	mu        sync.Mutex
+	maxBytes  int64
+	maxDelta  int64
+	used      int64
+	entries   []*journalEntry // oldest first
+	spillFrom int             // entries before this index have no delta in memory
+	nextID    int64
+	spill     *journalLog // nil when evicted deltas are dropped
+
+	recorded, spilled, dropped, reverted int64
+}
+
+// newChangeJournal creates a journal using at most maxBytes of memory. With a
+// spill directory, deltas evicted from memory are kept in a log of at most
+// maxDisk bytes.
+func newChangeJournal(maxBytes int64, spillDir string, maxDisk int64) (*changeJournal, error) {
+	j := &changeJournal{maxBytes: maxBytes, maxDelta: maxBytes / 4}
+	if spillDir != "" {
+		spill, err := newJournalLog(spillDir, maxDisk)
+		if err != nil {
+			return nil, err
+		}
+		j.spill = spill
+	}
+	return j, nil
+}
+
+// close removes the on-disk log
+func (j *changeJournal) close() {
+	if j != nil && j.spill != nil {
+		j.spill.close()
+	}
+}
+
+// begin starts recording a change of filename
+func (j *changeJournal) begin(filename string, existed bool, before string) *journalChange {
+	if j == nil {
+		return nil
+	}
+	return &journalChange{filename: filename, created: !existed, before: before, limit: j.maxDelta}
+}
+
+// beginRewrite starts a change that replaces the whole content of filename.
+// The current content is read if it is small enough to be journaled.
+func (j *changeJournal) beginRewrite(filename string) *journalChange {
+	if j == nil {
+		return nil
+	}
+	info, err := os.Stat(filename)
+	if errors.Is(err, fs.ErrNotExist) {
+		return j.begin(filename, false, "")
+	}
+	c := j.begin(filename, true, "")
+	if err != nil || !c.reserve(info.Size()) {
+		c.overflow = true
+		return c
+	}
+	content, version, err := readFileHashed(filename)
+	if err != nil {
+		c.overflow = true
+		return c
+	}
+	c.base = content
+	c.before = version.hash
+	return c
+}
+
+// record adds a committed change; after is the version of the new content
+func (j *changeJournal) record(tool string, c *journalChange, after fileVersion) {
+	if j == nil || c == nil {
+		return
+	}
+	e := &journalEntry{
+		time:      time.Now(),
+		tool:      tool,
+		filename:  c.filename,
+		path:      canonicalPath(c.filename),
+		created:   c.created,
+		journaled: c.created || !c.overflow,
+		before:    c.before,
+		after:     after,
+	}
+	if e.journaled && !e.created {
+		e.delta = &reverseDelta{ops: c.ops, size: c.size}
+		e.deltaSize = c.size
+	}
+
+	j.mu.Lock()
+	defer j.mu.Unlock()
+	j.nextID++
+	e.id = j.nextID
+	j.entries = append(j.entries, e)
+	j.used += e.memory()
+	j.recorded++
+	j.evictLocked()
+}
+
+// evictLocked moves the oldest deltas to disk, or drops the oldest entries,
+// until the memory cap is met
+func (j *changeJournal) evictLocked() {
+	for j.used > j.maxBytes && len(j.entries) > 0 {
+		if j.spill != nil && j.spillOldestLocked() {
+			continue
+		}
+		e := j.entries[0]
+		j.entries[0] = nil
+		j.entries = j.entries[1:]
+		j.used -= e.memory()
+		j.dropped++
+		if j.spillFrom > 0 {
+			j.spillFrom--
+		}
+	}
+}
+
+// spillOldestLocked writes the oldest delta still in memory to the on-disk
+// log. It returns false when there is nothing left to spill.
+func (j *changeJournal) spillOldestLocked() bool {
+	for ; j.spillFrom < len(j.entries); j.spillFrom++ {
+		e := j.entries[j.spillFrom]
+		if e.delta == nil {
+			continue
+		}
+		rec, rotated, err := j.spill.write(encodeDelta(e.delta))
+		if err != nil {
+			if logger != nil {
+				logger.Debug("journal spill failed", "error", err)
+			}
+			return false
+		}
+		j.used -= e.delta.size
+		e.delta = nil
+		e.spilled = &rec
+		j.spilled++
+		j.spillFrom++
+		if rotated {
+			j.forgetLostLocked()
+		}
+		return true
+	}
+	return false
+}
+
+// forgetLostLocked drops the entries whose delta was in a removed log segment
+func (j *changeJournal) forgetLostLocked() {
+	kept := j.entries[:0]
+	spillFrom := j.spillFrom
+	for i, e := range j.entries {
+		if e.spilled != nil && e.spilled.segment < j.spill.oldest {
+			j.used -= e.memory()
+			j.dropped++
+			if i < spillFrom {
+				j.spillFrom--
+			}
+			continue
+		}
+		kept = append(kept, e)
+	}
+	for i := len(kept); i < len(j.entries); i++ {
+		j.entries[i] = nil
+	}
+	j.entries = kept
+}
+
+// latest returns the most recent entry of the file at path, or nil
+func (j *changeJournal) latest(path string) *journalEntry {
+	j.mu.Lock()
+	defer j.mu.Unlock()
+	for i := len(j.entries) - 1; i >= 0; i-- {
+		if j.entries[i].path == path {
+			return j.entries[i]
+		}
+	}
+	return nil
+}
+
+// loadDelta returns the delta of an entry, reading it back from disk if it
+// was spilled
+func (j *changeJournal) loadDelta(e *journalEntry) (*reverseDelta, error) {
+	j.mu.Lock()
+	delta, rec := e.delta, e.spilled
+	j.mu.Unlock()
+	if delta != nil {
+		return delta, nil
+	}
+	if rec == nil || j.spill == nil {
+		return nil, fmt.Errorf("journal entry %d is no longer available", e.id)
+	}
+	data, err := j.spill.read(*rec)
+	if err != nil {
+		return nil, fmt.Errorf("failed to read journal entry %d: %v", e.id, err)
+	}
+	return decodeDelta(data)
+}
+
+// undone removes an entry whose change was reverted. The previous change of
+// the same file becomes the latest one; restored is the file's new version.
+func (j *changeJournal) undone(e *journalEntry, restored fileVersion) {
+	j.mu.Lock()
+	defer j.mu.Unlock()
+	idx := -1
+	for i := len(j.entries) - 1; i >= 0; i-- {
+		if j.entries[i] == e {
+			idx = i
+			break
+		}
+	}
+	if idx < 0 {
+		return
+	}
+	copy(j.entries[idx:], j.entries[idx+1:])
+	j.entries[len(j.entries)-1] = nil
+	j.entries = j.entries[:len(j.entries)-1]
+	if idx < j.spillFrom {
+		j.spillFrom--
+	}
+	j.used -= e.memory()
+	j.reverted++
+
+	for i := idx - 1; i >= 0; i-- {
+		if prev := j.entries[i]; prev.path == e.path {
+			prev.after.key = restored.key
+			if restored.hash != "" {
+				prev.after.hash = restored.hash
+			}
+			break
+		}
+	}
+}
+
+// history returns up to limit entries, newest first, optionally only those of one file
+func (j *changeJournal) history(path string, limit int) []journalEntry {
+	j.mu.Lock()
+	defer j.mu.Unlock()
+	var entries []journalEntry
+	for i := len(j.entries) - 1; i >= 0 && len(entries) < limit; i-- {
+		if path == "" || j.entries[i].path == path {
+			entries = append(entries, *j.entries[i])
+		}
+	}
+	return entries
+}
+
+func (j *changeJournal) stats() journalStats {
+	j.mu.Lock()
+	defer j.mu.Unlock()
+	st := journalStats{
+		Entries:     len(j.entries),
+		MemoryBytes: j.used,
+		Recorded:    j.recorded,
+		Spilled:     j.spilled,
+		Dropped:     j.dropped,
+		Undone:      j.reverted,
+	}
+	if j.spill != nil {
+		st.DiskBytes = j.spill.size()
+	}
+	return st
+}
+
+// encodeDelta serializes a delta for the on-disk log as varints
+func encodeDelta(d *reverseDelta) []byte {
+	buf := binary.AppendUvarint(nil, uint64(len(d.ops)))
+	for _, op := range d.ops {
+		buf = binary.AppendUvarint(buf, uint64(op.offset))
+		buf = binary.AppendUvarint(buf, uint64(op.length))
+		buf = binary.AppendUvarint(buf, uint64(len(op.text)))
+		buf = append(buf, op.text...)
+	}
+	return buf
+}
+
+func decodeDelta(data []byte) (*reverseDelta, error) {
+	corrupt := errors.New("corrupt journal record")
+	next := func() (uint64, error) {
+		v, n := binary.Uvarint(data)
+		if n <= 0 {
+			return 0, corrupt
+		}
+		data = data[n:]
+		return v, nil
+	}
+	count, err := next()
+	if err != nil || count > uint64(len(data)) {
+		return nil, corrupt
+	}
+	d := &reverseDelta{ops: make([]deltaOp, 0, count)}
+	for i := uint64(0); i < count; i++ {
+		var v [3]uint64
+		for k := range v {
+			if v[k], err = next(); err != nil {
+				return nil, err
+			}
+		}
+		if v[2] > uint64(len(data)) {
+			return nil, corrupt
+		}
+		d.ops = append(d.ops, deltaOp{offset: int64(v[0]), length: int64(v[1]), text: data[:v[2]]})
+		d.size += deltaOpOverhead + int64(v[2])
+		data = data[v[2]:]
+	}
+	return d, nil
+}
@@ -0,0 +1,108 @@
+package main
+
+import (
+	"fmt"
+	"os"
+	"path/filepath"
+)
+
+// journalRecord locates a spilled delta in the on-disk log
+type journalRecord struct {
+	segment int
+	offset  int64
+	length  int64
+}
+
+// journalLog is where the journal keeps deltas evicted from memory. Records
+// are appended to segment files in a directory private to this server; when
+// the current segment reaches half of the size cap a new one is started and
+// the one before the previous is removed, so at most two segments exist.
+// The directory is removed when the server exits.
+type journalLog struct {
+	dir        string
+	maxSegment int64
+	f          *os.File
+	segment    int // number of the segment being written
+	oldest     int // oldest segment still on disk
+	written    int64
+	previous   int64 // size of the previous segment
+}
+
+func newJournalLog(parent string, maxBytes int64) (*journalLog, error) {
+	if err := os.MkdirAll(parent, 0755); err != nil {
+		return nil, fmt.Errorf("failed to create journal directory %q: %v", parent, err)
+	}
+	dir, err := os.MkdirTemp(parent, "journal-*")
+	if err != nil {
+		return nil, fmt.Errorf("failed to create journal directory in %q: %v", parent, err)
+	}
+	l := &journalLog{dir: dir, maxSegment: maxBytes / 2}
+	if err := l.open(0); err != nil {
+		os.RemoveAll(dir)
+		return nil, err
+	}
+	return l, nil
+}
+
+func (l *journalLog) segmentPath(n int) string {
+	return filepath.Join(l.dir, fmt.Sprintf("segment-%06d.log", n))
+}
+
+func (l *journalLog) open(n int) error {
+	f, err := os.OpenFile(l.segmentPath(n), os.O_CREATE|os.O_RDWR|os.O_TRUNC, 0600)
+	if err != nil {
+		return fmt.Errorf("failed to create journal segment: %v", err)
+	}
+	l.f = f
+	l.segment = n
+	l.written = 0
+	return nil
+}
+
+// write appends a record. rotated reports that a segment was removed, so
+// records before l.oldest are gone.
+func (l *journalLog) write(data []byte) (rec journalRecord, rotated bool, err error) {
+	if l.written > 0 && l.written+int64(len(data)) > l.maxSegment {
+		l.f.Close()
+		l.previous = l.written
+		if err := l.open(l.segment + 1); err != nil {
+			return rec, false, err
+		}
+		if l.oldest < l.segment-1 {
+			os.Remove(l.segmentPath(l.oldest))
+			l.oldest = l.segment - 1
+			rotated = true
+		}
+	}
+	if _, err := l.f.WriteAt(data, l.written); err != nil {
+		return rec, rotated, err
+	}
+	rec = journalRecord{segment: l.segment, offset: l.written, length: int64(len(data))}
+	l.written += int64(len(data))
+	return rec, rotated, nil
+}
+
+func (l *journalLog) read(rec journalRecord) ([]byte, error) {
+	f, err := os.Open(l.segmentPath(rec.segment))
+	if err != nil {
+		return nil, err
+	}
+	defer f.Close()
+	data := make([]byte, rec.length)
+	if _, err := f.ReadAt(data, rec.offset); err != nil {
+		return nil, err
+	}
+	return data, nil
+}
+
+func (l *journalLog) size() int64 {
+	if l.oldest < l.segment {
+		return l.previous + l.written
+	}
+	return l.written
+}
+
+func (l *journalLog) close() {
+	l.f.Close()
+	os.RemoveAll(l.dir)
+}
@@ -0,0 +1,216 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+// useJournal installs a journal for the duration of a test
+func useJournal(t testing.TB, maxBytes int64, spillDir string, maxDisk int64) *changeJournal {
+	j, err := newChangeJournal(maxBytes, spillDir, maxDisk)
+	if err != nil {
+		t.Fatal(err)
+	}
+	saved := editJournal
+	editJournal = j
+	t.Cleanup(func() {
+		editJournal = saved
+		j.close()
+	})
+	return j
+}
+
+func undo(filename string) error {
+	_, _, err := handleUndo(context.Background(), nil, UndoRequest{Filename: filename})
+	return err
+}
+
+// TestUndoRestoresEveryChange applies random edits of every kind to a few
+// files and undoes them all, checking each intermediate content
+func TestUndoRestoresEveryChange(t *testing.T) {
+	useJournal(t, 1<<20, "", 0)
+	dir := t.TempDir()
+	names := []string{filepath.Join(dir, "a.txt"), filepath.Join(dir, "b.txt")}
+	rng := rand.New(rand.NewSource(1))
+	word := func() string {
+		return []string{"alpha", "beta", "gamma", "delta\n", "x"}[rng.Intn(5)]
+	}
+	str := func(s string) *string { return &s }
+	num := func(n int) *int { return &n }
+
+	type step struct {
+		filename string
+		content  *string // nil when the file didn't exist
+	}
+	var steps []step
+	snapshot := func(name string) *string {
+		data, err := os.ReadFile(name)
+		if err != nil {
+			return nil
+		}
+		return str(string(data))
+	}
+
+	ctx := context.Background()
+	for i := 0; i < 300; i++ {
+		name := names[rng.Intn(len(names))]
+		before := snapshot(name)
+		var err error
+		switch op := rng.Intn(7); {
+		case op == 0 || before == nil:
+			_, _, err = handleWriteFile(ctx, nil, WriteFileRequest{Filename: name, Content: strings.Repeat(word(), 1+rng.Intn(5))})
+		case op == 1:
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, OldString: str(word()), NewString: str(word())})
+		case op == 2:
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, NewString: str(word())})
+		case op == 3:
+			old := (*before)[:rng.Intn(len(*before)+1)]
+			if i := strings.LastIndexByte(old, '\n'); i >= 0 {
+				old = old[i+1:]
+			}
+			if old == "" {
+				continue
+			}
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, Edits: []EditOperation{{OldString: old, NewString: word()}}})
+		case op == 4:
+			lines := strings.Count(*before, "\n") + 1
+			first := 1 + rng.Intn(lines)
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, StartLine: num(first), EndLine: num(first - 1 + rng.Intn(2)), NewString: str(word())})
+		case op == 5:
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, Content: str(*before + word())})
+		case op == 6:
+			regex := true
+			_, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, OldString: str(`(a|e)(l|t)`), NewString: str("${2}$1"), Regex: &regex, Count: num(1 + rng.Intn(2))})
+		}
+		if err != nil {
+			continue
+		}
+		steps = append(steps, step{filename: name, content: before})
+	}
+
+	for i := len(steps) - 1; i >= 0; i-- {
+		if err := undo(steps[i].filename); err != nil {
+			t.Fatalf("undo %d: %v", i, err)
+		}
+		got := snapshot(steps[i].filename)
+		if (got == nil) != (steps[i].content == nil) || (got != nil && *got != *steps[i].content) {
+			t.Fatalf("undo %d of %s: got %q, want %q", i, steps[i].filename, deref(got), deref(steps[i].content))
+		}
+	}
+	for _, name := range names {
+		if err := undo(name); err == nil {
+			t.Fatalf("undo of %s succeeded with an empty journal", name)
+		}
+	}
+}
+
+func deref(s *string) string {
+	if s == nil {
+		return "<missing>"
+	}
+	return *s
+}
+
+func TestUndoRefusesModifiedFile(t *testing.T) {
+	useJournal(t, 1<<20, "", 0)
+	name := filepath.Join(t.TempDir(), "a.txt")
+	if _, _, err := handleWriteFile(context.Background(), nil, WriteFileRequest{Filename: name, Content: "one\n"}); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.WriteFile(name, []byte("changed elsewhere\n"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	if err := undo(name); err == nil || !strings.Contains(err.Error(), "modified since") {
+		t.Fatalf("undo of a modified file: %v", err)
+	}
+}
+
+// TestJournalMemoryBounded records a sustained load of changes and checks
+// that memory and disk use never exceed their caps while recent changes stay
+// undoable, from memory or from the on-disk log
+func TestJournalMemoryBounded(t *testing.T) {
+	const maxBytes, maxDisk = 256 << 10, 1 << 20
+	for _, spill := range []bool{false, true} {
+		t.Run(fmt.Sprintf("spill=%v", spill), func(t *testing.T) {
+			dir := ""
+			if spill {
+				dir = t.TempDir()
+			}
+			j, err := newChangeJournal(maxBytes, dir, maxDisk)
+			if err != nil {
+				t.Fatal(err)
+			}
+			defer j.close()
+
+			rng := rand.New(rand.NewSource(1))
+			var last *journalChange
+			for i := 0; i < 20000; i++ {
+				c := j.begin(fmt.Sprintf("file%d.txt", i%100), true, "")
+				for k := rng.Intn(4); k >= 0; k-- {
+					c.replaced(int64(rng.Intn(1000)), make([]byte, rng.Intn(2000)), int64(rng.Intn(100)))
+				}
+				j.record("edit_file", c, fileVersion{})
+				last = c
+
+				st := j.stats()
+				if st.MemoryBytes > maxBytes {
+					t.Fatalf("after %d changes: %d bytes in memory, cap %d", i+1, st.MemoryBytes, maxBytes)
+				}
+				if st.DiskBytes > maxDisk {
+					t.Fatalf("after %d changes: %d bytes on disk, cap %d", i+1, st.DiskBytes, maxDisk)
+				}
+			}
+
+			st := j.stats()
+			t.Logf("%+v", st)
+			if spill && st.Spilled == 0 {
+				t.Fatal("nothing was spilled to disk")
+			}
+			e := j.latest(canonicalPath("file99.txt"))
+			delta, err := j.loadDelta(e)
+			if err != nil {
+				t.Fatal(err)
+			}
+			if fmt.Sprint(delta.ops) != fmt.Sprint(last.ops) {
+				t.Fatal("latest delta was not kept")
+			}
+			if spill {
+				// The oldest remaining entry was spilled and can be read back
+				oldest := j.history("", st.Entries)[st.Entries-1]
+				if oldest.delta != nil {
+					t.Fatal("oldest entry is still in memory")
+				}
+				if _, err := j.loadDelta(&oldest); err != nil {
+					t.Fatal(err)
+				}
+			}
+		})
+	}
+}
+
+// BenchmarkJournalEdits measures edits with the journal enabled and reports
+// the memory it holds at the end
+func BenchmarkJournalEdits(b *testing.B) {
+	j := useJournal(b, 32<<20, "", 0)
+	name := filepath.Join(b.TempDir(), "a.txt")
+	if err := os.WriteFile(name, []byte(strings.Repeat("some line of text\n", 10000)), 0644); err != nil {
+		b.Fatal(err)
+	}
+	old, new := "line", "LINE"
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		if _, _, err := handleEditFile(context.Background(), nil, EditFileRequest{Filename: name, OldString: &old, NewString: &new}); err != nil {
+			b.Fatal(err)
+		}
+		old, new = new, old
+	}
+	b.StopTimer()
+	st := j.stats()
+	b.ReportMetric(float64(st.MemoryBytes), "journal-bytes")
+	b.ReportMetric(float64(st.Entries), "entries")
+}
@@ -0,0 +1,262 @@
+package main
+
+import (
+	"bufio"
+	"errors"
+	"hash/maphash"
+	"io"
+	"math/bits"
+)
+
+const (
+	// minDiffCost is the least number of edit steps the diff searches before
+	// it settles for an approximate split of a region; see diffCostLimit
+	minDiffCost = 256
+	// diffEffortPerLine bounds the diagonals searched in all, per line
+	// compared. Past it the regions left are reported as changed whole, so
+	// files with a great many scattered changes still compare in about linear
+	// time.
+	diffEffortPerLine = 64
+)
+
+// fileLines holds the hash and the offset of each line of a file, not its
+// text, which is read back from r for the lines a diff shows
+type fileLines struct {
+	hashes  []uint64
+	offsets []int64 // start of each line, then the size
+	r       io.ReaderAt
+}
+
+// hashLines reads r once, hashing each line with its newline. size is the
+// size of the content if known, to preallocate for its lines.
+func hashLines(r io.Reader, size int64, seed maphash.Seed) (*fileLines, error) {
+	lines := size/32 + 1 // most source lines are shorter
+	f := &fileLines{hashes: make([]uint64, 0, lines), offsets: make([]int64, 0, lines+1)}
+	br := bufio.NewReaderSize(r, 64<<10)
+	var h maphash.Hash
+	h.SetSeed(seed)
+	var pos int64
+	partial := false
+	for {
+		chunk, err := br.ReadSlice('\n')
+		if len(chunk) > 0 {
+			if !partial {
+				f.offsets = append(f.offsets, pos)
+			}
+			h.Write(chunk)
+			pos += int64(len(chunk))
+			partial = true
+		}
+		if err == nil || (err == io.EOF && partial) {
+			f.hashes = append(f.hashes, h.Sum64())
+			h.Reset()
+			partial = false
+		}
+		if err == io.EOF {
+			break
+		}
+		if err != nil && !errors.Is(err, bufio.ErrBufferFull) {
+			return nil, err
+		}
+	}
+	f.offsets = append(f.offsets, pos)
+	return f, nil
+}
+
+// line returns the text of line i
+func (f *fileLines) line(i int) []byte {
+	return readWindow(f.r, f.offsets[i], f.offsets[i+1])
+}
+
+// diffLines marks the lines of a deleted and of b inserted by a shortest
+// edit script turning a into b. The common prefix and suffix are skipped and
+// lines that occur on one side only are marked without being compared, which
+// doesn't change the result since they can't be matched. The rest goes to
+// Myers' linear-space divide and conquer over the line hashes.
+func diffLines(a, b []uint64) (deleted, inserted []bool) {
+	deleted, inserted = make([]bool, len(a)), make([]bool, len(b))
+	lo := 0
+	for lo < len(a) && lo < len(b) && a[lo] == b[lo] {
+		lo++
+	}
+	hiA, hiB := len(a), len(b)
+	for hiA > lo && hiB > lo && a[hiA-1] == b[hiB-1] {
+		hiA--
+		hiB--
+	}
+
+	sides := make(map[uint64]uint8)
+	for _, h := range a[lo:hiA] {
+		sides[h] |= 1
+	}
+	for _, h := range b[lo:hiB] {
+		sides[h] |= 2
+	}
+	d := &myersDiff{
+		deleted:  deleted,
+		inserted: inserted,
+		a:        make([]uint64, 0, hiA-lo),
+		b:        make([]uint64, 0, hiB-lo),
+		aLines:   make([]int32, 0, hiA-lo),
+		bLines:   make([]int32, 0, hiB-lo),
+	}
+	for i := lo; i < hiA; i++ {
+		if sides[a[i]]&2 == 0 {
+			deleted[i] = true
+		} else {
+			d.a = append(d.a, a[i])
+			d.aLines = append(d.aLines, int32(i))
+		}
+	}
+	for i := lo; i < hiB; i++ {
+		if sides[b[i]]&1 == 0 {
+			inserted[i] = true
+		} else {
+			d.b = append(d.b, b[i])
+			d.bLines = append(d.bLines, int32(i))
+		}
+	}
+	sides = nil // not needed during the comparison
+
+	d.limit = diffCostLimit(len(d.a) + len(d.b))
+	d.effort = diffEffortPerLine*(len(d.a)+len(d.b)) + 1<<20
+	d.v1, d.v2 = make([]int, 2*d.limit+2), make([]int, 2*d.limit+2)
+	d.compare(0, len(d.a), 0, len(d.b))
+	return deleted, inserted
+}
+
+// diffCostLimit bounds the edit steps searched for the middle snake of a
+// region, as diff(1) does: past it, the region is split where the search got
+// furthest. The diff is then no longer minimal, but its time stays near
+// linear for files that have little in common.
+func diffCostLimit(n int) int {
+	limit := 1 << (bits.Len(uint(n)) / 2)
+	if limit < minDiffCost {
+		limit = minDiffCost
+	}
+	return limit
+}
+
+// myersDiff compares the lines left of two files after the prefilter.
+// aLines and bLines map them back to their line numbers.
+type myersDiff struct {
+	a, b              []uint64
+	aLines, bLines    []int32
+	deleted, inserted []bool
+	limit             int
+	effort            int   // diagonals left to search
+	v1, v2            []int // furthest reaching paths, forward and backward
+}
+
+// compare marks the differences of a[aLo:aHi] and b[bLo:bHi]
+func (d *myersDiff) compare(aLo, aHi, bLo, bHi int) {
+	for aLo < aHi && bLo < bHi && d.a[aLo] == d.b[bLo] {
+		aLo++
+		bLo++
+	}
+	for aLo < aHi && bLo < bHi && d.a[aHi-1] == d.b[bHi-1] {
+		aHi--
+		bHi--
+	}
+	if aLo < aHi && bLo < bHi && d.effort > 0 {
+		x, y := d.split(aLo, aHi, bLo, bHi)
+		if (x > aLo || y > bLo) && (x < aHi || y < bHi) {
+			d.compare(aLo, x, bLo, y)
+			d.compare(x, aHi, y, bHi)
+			return
+		}
+	}
+	for i := aLo; i < aHi; i++ {
+		d.deleted[d.aLines[i]] = true
+	}
+	for i := bLo; i < bHi; i++ {
+		d.inserted[d.bLines[i]] = true
+	}
+}
+
+// split returns a point where the region can be divided into two halves
+// whose shortest edit scripts make one for the whole: the end of the forward
+// path where it meets the backward one. Both searches keep a single array of
+// diagonals bounded by the cost limit.
+func (d *myersDiff) split(aLo, aHi, bLo, bHi int) (int, int) {
+	n, m := aHi-aLo, bHi-bLo
+	maxD := (n + m + 1) / 2
+	if maxD > d.limit {
+		maxD = d.limit
+	}
+	offset, vLen := maxD, 2*maxD+2
+	v1, v2 := d.v1[:vLen], d.v2[:vLen]
+	for i := range v1 {
+		v1[i], v2[i] = -1, -1
+	}
+	v1[offset+1], v2[offset+1] = 0, 0
+	delta := n - m
+	front := delta%2 != 0 // the forward path detects the overlap
+	k1start, k1end, k2start, k2end := 0, 0, 0, 0
+	for step := 0; step < maxD; step++ {
+		d.effort -= 2 * step
+		for k1 := -step + k1start; k1 <= step-k1end; k1 += 2 {
+			k1o := offset + k1
+			var x1 int
+			if k1 == -step || (k1 != step && v1[k1o-1] < v1[k1o+1]) {
+				x1 = v1[k1o+1]
+			} else {
+				x1 = v1[k1o-1] + 1
+			}
+			y1 := x1 - k1
+			for x1 < n && y1 < m && d.a[aLo+x1] == d.b[bLo+y1] {
+				x1++
+				y1++
+			}
+			v1[k1o] = x1
+			switch {
+			case x1 > n:
+				k1end += 2 // off the right of the grid
+			case y1 > m:
+				k1start += 2 // off the bottom
+			case front:
+				if k2o := offset + delta - k1; k2o >= 0 && k2o < vLen && v2[k2o] != -1 && x1 >= n-v2[k2o] {
+					return aLo + x1, bLo + y1
+				}
+			}
+		}
+		for k2 := -step + k2start; k2 <= step-k2end; k2 += 2 {
+			k2o := offset + k2
+			var x2 int
+			if k2 == -step || (k2 != step && v2[k2o-1] < v2[k2o+1]) {
+				x2 = v2[k2o+1]
+			} else {
+				x2 = v2[k2o-1] + 1
+			}
+			y2 := x2 - k2
+			for x2 < n && y2 < m && d.a[aHi-1-x2] == d.b[bHi-1-y2] {
+				x2++
+				y2++
+			}
+			v2[k2o] = x2
+			switch {
+			case x2 > n:
+				k2end += 2
+			case y2 > m:
+				k2start += 2
+			case !front:
+				if k1o := offset + delta - k2; k1o >= 0 && k1o < vLen && v1[k1o] != -1 {
+					x1 := v1[k1o]
+					if y1 := x1 - (k1o - offset); x1 >= n-x2 {
+						return aLo + x1, bLo + y1
+					}
+				}
+			}
+		}
+	}
+
+	// Too costly: split where the forward search got furthest
+	bestX, bestY := 0, 0
+	for k := -maxD + 1; k < maxD; k++ {
+		x := v1[offset+k]
+		if y := x - k; x >= 0 && x <= n && y >= 0 && y <= m && x+y > bestX+bestY {
+			bestX, bestY = x, y
+		}
+	}
+	return aLo + bestX, bLo + bestY
+}
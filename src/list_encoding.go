@@ -0,0 +1,263 @@
+package main
+
+import (
+	"encoding/json"
+	"fmt"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"time"
+	"unicode/utf8"
+)
+
+// Output encodings of list_files
+const (
+	listFormatEntries = "entries"
+	listFormatCompact = "compact"
+	listFormatTree    = "tree"
+)
+
+// listEncoder turns walker entries into the list_files JSON response
+type listEncoder interface {
+	add(e walkEntry)
+	count() int
+	finish(nextCursor string) []byte
+}
+
+func newListEncoder(format string) (listEncoder, error) {
+	switch format {
+	case "", listFormatEntries:
+		return &entriesEncoder{files: []fileEntry{}}, nil
+	case listFormatCompact:
+		return &compactEncoder{}, nil
+	case listFormatTree:
+		return &treeEncoder{}, nil
+	default:
+		return nil, fmt.Errorf("invalid format %q: must be one of entries, compact, tree", format)
+	}
+}
+
+// entriesEncoder produces the default {"files": [...]} response
+type entriesEncoder struct {
+	files  []fileEntry
+	fields metadataFields // content metadata to add to file entries
+	root   string         // directory the entry paths are relative to
+	jobs   []metadataJob
+}
+
+func (enc *entriesEncoder) add(e walkEntry) {
+	entry := fileEntry{
+		Name:     e.Info.Name(),
+		Type:     "directory",
+		Modified: e.Info.ModTime().Format(time.RFC3339),
+	}
+	if !e.Info.IsDir() {
+		entry.Type = "file"
+		size := e.Info.Size()
+		entry.Size = &size
+		if enc.fields.any() && e.Info.Mode().IsRegular() {
+			enc.jobs = append(enc.jobs, metadataJob{
+				index: len(enc.files),
+				path:  filepath.Join(enc.root, e.Rel),
+				info:  e.Info,
+			})
+		}
+	}
+	enc.files = append(enc.files, entry)
+}
+
+func (enc *entriesEncoder) count() int { return len(enc.files) }
+
+func (enc *entriesEncoder) finish(nextCursor string) []byte {
+	if len(enc.jobs) > 0 {
+		enrichEntries(enc.files, enc.jobs, enc.fields)
+	}
+	data, _ := json.Marshal(listFilesResponse{Files: enc.files, NextCursor: nextCursor})
+	return data
+}
+
+// compactEncoder writes parallel arrays of relative paths, types ("f"/"d"),
+// sizes (null for directories) and mtimes (Unix seconds). Each column is
+// encoded as entries arrive, so no per-entry structs are kept.
+type compactEncoder struct {
+	paths, types, sizes, mtimes []byte
+	n                           int
+}
+
+func (enc *compactEncoder) add(e walkEntry) {
+	if enc.n > 0 {
+		enc.paths = append(enc.paths, ',')
+		enc.types = append(enc.types, ',')
+		enc.sizes = append(enc.sizes, ',')
+		enc.mtimes = append(enc.mtimes, ',')
+	}
+	enc.n++
+	enc.paths = appendJSONString(enc.paths, filepath.ToSlash(e.Rel))
+	if e.Info.IsDir() {
+		enc.types = append(enc.types, `"d"`...)
+		enc.sizes = append(enc.sizes, "null"...)
+	} else {
+		enc.types = append(enc.types, `"f"`...)
+		enc.sizes = strconv.AppendInt(enc.sizes, e.Info.Size(), 10)
+	}
+	enc.mtimes = strconv.AppendInt(enc.mtimes, e.Info.ModTime().Unix(), 10)
+}
+
+func (enc *compactEncoder) count() int { return enc.n }
+
+func (enc *compactEncoder) finish(nextCursor string) []byte {
+	out := make([]byte, 0, len(enc.paths)+len(enc.types)+len(enc.sizes)+len(enc.mtimes)+128)
+	out = append(out, `{"format":"compact","paths":[`...)
+	out = append(out, enc.paths...)
+	out = append(out, `],"types":[`...)
+	out = append(out, enc.types...)
+	out = append(out, `],"sizes":[`...)
+	out = append(out, enc.sizes...)
+	out = append(out, `],"mtimes":[`...)
+	out = append(out, enc.mtimes...)
+	out = append(out, ']')
+	out = appendNextCursor(out, nextCursor)
+	return append(out, '}')
+}
+
+// treeEncoder writes entries as nested nodes so that path prefixes are
+// shared: directories are {"name","mtime","children":[...]} and files are
+// {"name","size","mtime"}. It relies on the walker's depth-first order and
+// streams nodes as they arrive, keeping only the stack of open directories.
+// Ancestors that were filtered out are written with name and children only.
+type treeEncoder struct {
+	buf   []byte
+	open  []string // names of the directories whose children array is open
+	first []bool   // per level: no child written yet (index 0 is the top level)
+	n     int
+}
+
+func (enc *treeEncoder) add(e walkEntry) {
+	if enc.buf == nil {
+		enc.buf = append(enc.buf, `{"format":"tree","tree":[`...)
+		enc.first = []bool{true}
+	}
+	enc.n++
+
+	parts := strings.Split(filepath.ToSlash(e.Rel), "/")
+	parents := parts[:len(parts)-1]
+
+	// Close directories that are not ancestors of this entry
+	common := 0
+	for common < len(enc.open) && common < len(parents) && enc.open[common] == parents[common] {
+		common++
+	}
+	for len(enc.open) > common {
+		enc.closeDir()
+	}
+	// Open ancestors that were not reported themselves
+	for _, name := range parents[common:] {
+		enc.beginNode()
+		enc.buf = append(enc.buf, `{"name":`...)
+		enc.buf = appendJSONString(enc.buf, name)
+		enc.openDir(name)
+	}
+
+	enc.beginNode()
+	enc.buf = append(enc.buf, `{"name":`...)
+	enc.buf = appendJSONString(enc.buf, parts[len(parts)-1])
+	if !e.Info.IsDir() {
+		enc.buf = append(enc.buf, `,"size":`...)
+		enc.buf = strconv.AppendInt(enc.buf, e.Info.Size(), 10)
+	}
+	enc.buf = append(enc.buf, `,"mtime":`...)
+	enc.buf = strconv.AppendInt(enc.buf, e.Info.ModTime().Unix(), 10)
+	if e.Info.IsDir() {
+		enc.openDir(parts[len(parts)-1])
+	} else {
+		enc.buf = append(enc.buf, '}')
+	}
+}
+
+// beginNode writes the separator before a node at the current level
+func (enc *treeEncoder) beginNode() {
+	level := len(enc.open)
+	if !enc.first[level] {
+		enc.buf = append(enc.buf, ',')
+	}
+	enc.first[level] = false
+}
+
+func (enc *treeEncoder) openDir(name string) {
+	enc.buf = append(enc.buf, `,"children":[`...)
+	enc.open = append(enc.open, name)
+	enc.first = append(enc.first, true)
+}
+
+func (enc *treeEncoder) closeDir() {
+	enc.buf = append(enc.buf, "]}"...)
+	enc.open = enc.open[:len(enc.open)-1]
+	enc.first = enc.first[:len(enc.first)-1]
+}
+
+func (enc *treeEncoder) count() int { return enc.n }
+
+func (enc *treeEncoder) finish(nextCursor string) []byte {
+	if enc.buf == nil {
+		enc.buf = append(enc.buf, `{"format":"tree","tree":[`...)
+	}
+	for len(enc.open) > 0 {
+		enc.closeDir()
+	}
+	enc.buf = append(enc.buf, ']')
+	enc.buf = appendNextCursor(enc.buf, nextCursor)
+	return append(enc.buf, '}')
+}
+
+func appendNextCursor(buf []byte, nextCursor string) []byte {
+	if nextCursor == "" {
+		return buf
+	}
+	buf = append(buf, `,"next_cursor":`...)
+	return appendJSONString(buf, nextCursor)
+}
+
+const hexDigits = "0123456789abcdef"
+
+// appendJSONString appends s as a quoted JSON string. Invalid UTF-8 is
+// replaced with U+FFFD, matching encoding/json.
+func appendJSONString(buf []byte, s string) []byte {
+	buf = append(buf, '"')
+	start := 0
+	for i := 0; i < len(s); {
+		c := s[i]
+		if c < utf8.RuneSelf {
+			if c >= 0x20 && c != '"' && c != '\\' {
+				i++
+				continue
+			}
+			buf = append(buf, s[start:i]...)
+			switch c {
+			case '"', '\\':
+				buf = append(buf, '\\', c)
+			case '\n':
+				buf = append(buf, '\\', 'n')
+			case '\r':
+				buf = append(buf, '\\', 'r')
+			case '\t':
+				buf = append(buf, '\\', 't')
+			default:
+				buf = append(buf, '\\', 'u', '0', '0', hexDigits[c>>4], hexDigits[c&0xF])
+			}
+			i++
+			start = i
+			continue
+		}
+		r, size := utf8.DecodeRuneInString(s[i:])
+		if r == utf8.RuneError && size == 1 {
+			buf = append(buf, s[start:i]...)
+			buf = append(buf, "\ufffd"...)
+			i += size
+			start = i
+			continue
+		}
+		i += size
+	}
+	buf = append(buf, s[start:]...)
+	return append(buf, '"')
+}
@@ -13,14 +13,20 @@ import (
 )
 
 type fileEntry struct {
-	Name     string  `json:"name"`
-	Type     string  `json:"type"`
-	Size     *int64  `json:"size,omitempty"`
-	Modified string  `json:"modified"`
+	Name     string `json:"name"`
+	Type     string `json:"type"`
+	Size     *int64 `json:"size,omitempty"`
+	Modified string `json:"modified"`
+	// Optional content metadata, only present when requested with fields
+	Lines    *int64 `json:"lines,omitempty"`
+	Encoding string `json:"encoding,omitempty"`
+	IsBinary *bool  `json:"is_binary,omitempty"`
+	MIME     string `json:"mime,omitempty"`
 }
 
 type listFilesResponse struct {
-	Files []fileEntry `json:"files"`
+	Files      []fileEntry `json:"files"`
+	NextCursor string      `json:"next_cursor,omitempty"`
 }
 
 func handleListFiles(ctx context.Context, req *mcp.CallToolRequest, input ListFilesRequest) (
@@ -32,7 +38,7 @@ func handleListFiles(ctx context.Context, req *mcp.CallToolRequest, input ListFi
 	if logger != nil {
 		reqJSON, _ := json.MarshalIndent(req, "", "  ")
 		logger.Debug("list_files REQUEST", "request", string(reqJSON))
-		logger.Debug("list_files called", "path", input.Path, "pattern", input.Pattern, "recursive", input.Recursive, "show_hidden", input.ShowHidden, "max_depth", input.MaxDepth)
+		logger.Debug("list_files called", "path", input.Path, "pattern", input.Pattern, "recursive", input.Recursive, "show_hidden", input.ShowHidden, "max_depth", input.MaxDepth, "limit", input.Limit, "cursor", input.Cursor, "respect_gitignore", input.RespectGitignore, "exclude", input.Exclude, "summary", input.Summary, "format", input.Format, "top_k", input.TopK, "sort_by", input.SortBy, "fields", input.Fields)
 	}
 
 	// Check if path exists
@@ -41,23 +47,39 @@ func handleListFiles(ctx context.Context, req *mcp.CallToolRequest, input ListFi
 		return nil, nil, fmt.Errorf("failed to access path %q: %v", input.Path, err)
 	}
 
-	files := []fileEntry{} // Initialize as empty slice, not nil
+	format := ""
+	if input.Format != nil {
+		format = *input.Format
+	}
+	enc, err := newListEncoder(format)
+	if err != nil {
+		return nil, nil, err
+	}
+
+	// Optional per-file content metadata (entries format only)
+	if len(input.Fields) > 0 {
+		fields, err := parseMetadataFields(input.Fields)
+		if err != nil {
+			return nil, nil, err
+		}
+		entries, ok := enc.(*entriesEncoder)
+		if !ok {
+			return nil, nil, fmt.Errorf("invalid arguments: fields is only supported with the entries format")
+		}
+		entries.fields = fields
+		entries.root = input.Path
+		if !info.IsDir() {
+			entries.root = filepath.Dir(input.Path)
+		}
+	}
 
 	// If path is a file, return single file entry
 	if !info.IsDir() {
-		file := fileEntry{
-			Name:     filepath.Base(input.Path),
-			Type:     "file",
-			Modified: info.ModTime().Format(time.RFC3339),
-		}
-		size := info.Size()
-		file.Size = &size
-		files = []fileEntry{file}
+		enc.add(walkEntry{Rel: filepath.Base(input.Path), Depth: 1, Info: info})
 
-		resultJSON, _ := json.Marshal(listFilesResponse{Files: files})
 		result := &mcp.CallToolResult{
 			Content: []mcp.Content{
-				&mcp.TextContent{Text: string(resultJSON)},
+				&mcp.TextContent{Text: string(enc.finish(""))},
 			},
 		}
 
@@ -93,145 +115,159 @@ func handleListFiles(ctx context.Context, req *mcp.CallToolRequest, input ListFi
 		}
 	}
 
-	// Determine if we should use pattern matching
-	var patternMatch func(string) bool
-	if input.Pattern != nil && *input.Pattern != "" {
-		pattern := *input.Pattern
-		patternMatch = func(name string) bool {
-			matched, err := filepath.Match(pattern, name)
-			return err == nil && matched
-		}
-	}
-
-	// Walk directory
-	if recursive {
-		err = filepath.Walk(input.Path, func(path string, info os.FileInfo, err error) error {
-			if err != nil {
-				// Skip files/directories we can't access
-				return nil
-			}
-
-			// Calculate depth relative to base path
-			relPath, err := filepath.Rel(input.Path, path)
-			if err != nil {
-				return nil
-			}
-
-			// Count depth (number of separators + 1 for the file itself)
-			depth := 1
-			if relPath != "." {
-				depth = strings.Count(relPath, string(filepath.Separator)) + 1
-			}
-
-			// Check max depth
-			if maxDepth > 0 && depth > maxDepth {
-				if info.IsDir() {
-					return filepath.SkipDir
-				}
-				return nil
-			}
-
-			// Get base name
-			name := filepath.Base(path)
-
-			// Filter hidden files
-			if !showHidden && strings.HasPrefix(name, ".") {
-				if info.IsDir() {
-					return filepath.SkipDir
-				}
-				return nil
-			}
-
-			// Filter by pattern (only match against base name)
-			// Note: We still traverse directories even if they don't match pattern
-			// to find matching files inside them
-			if patternMatch != nil && !patternMatch(name) {
-				if info.IsDir() {
-					// Still traverse the directory to find matching files inside
-					return nil
-				}
-				// Skip this file if it doesn't match
-				return nil
-			}
-
-			// Create entry
-			entry := fileEntry{
-				Name:     name,
-				Type:     "directory",
-				Modified: info.ModTime().Format(time.RFC3339),
-			}
-
-			if !info.IsDir() {
-				entry.Type = "file"
-				size := info.Size()
-				entry.Size = &size
-			}
-
-			// Skip the root directory itself
-			if relPath != "." {
-				files = append(files, entry)
-			}
-
-			return nil
-		})
-	} else {
-		// Non-recursive: only list immediate children
-		entries, err := os.ReadDir(input.Path)
+	limit := 0 // 0 means no limit
+	if input.Limit != nil {
+		if *input.Limit < 1 {
+			return nil, nil, fmt.Errorf("invalid limit: must be >= 1, got %d", *input.Limit)
+		}
+		limit = *input.Limit
+	}
+
+	opts := &walkOptions{
+		recursive:     recursive,
+		showHidden:    showHidden,
+		maxDepth:      maxDepth,
+		respectIgnore: input.RespectGitignore != nil && *input.RespectGitignore,
+	}
+	if len(input.Exclude) > 0 {
+		opts.exclude, err = newIgnoreScope(input.Exclude)
 		if err != nil {
-			return nil, nil, fmt.Errorf("failed to read directory %q: %v", input.Path, err)
+			return nil, nil, err
 		}
+	}
 
-		for _, entry := range entries {
-			// Filter hidden files
-			if !showHidden && strings.HasPrefix(entry.Name(), ".") {
-				continue
-			}
+	// Metadata predicates
+	if input.LargerThan != nil {
+		if *input.LargerThan < 0 {
+			return nil, nil, fmt.Errorf("invalid larger_than: must be >= 0, got %d", *input.LargerThan)
+		}
+		opts.largerThan = *input.LargerThan
+	}
+	if input.SmallerThan != nil {
+		if *input.SmallerThan < 1 {
+			return nil, nil, fmt.Errorf("invalid smaller_than: must be >= 1, got %d", *input.SmallerThan)
+		}
+		opts.smallerThan = *input.SmallerThan
+	}
+	if input.ModifiedAfter != nil {
+		opts.modifiedAfter, err = time.Parse(time.RFC3339, *input.ModifiedAfter)
+		if err != nil {
+			return nil, nil, fmt.Errorf("invalid modified_after %q: must be an RFC3339 timestamp", *input.ModifiedAfter)
+		}
+	}
+	if input.ModifiedBefore != nil {
+		opts.modifiedBefore, err = time.Parse(time.RFC3339, *input.ModifiedBefore)
+		if err != nil {
+			return nil, nil, fmt.Errorf("invalid modified_before %q: must be an RFC3339 timestamp", *input.ModifiedBefore)
+		}
+	}
 
-			// Filter by pattern
-			if patternMatch != nil && !patternMatch(entry.Name()) {
-				continue
-			}
+	// Top-k selection keeps a bounded heap of files instead of every entry
+	var topK *topKCollector
+	if input.TopK != nil {
+		if *input.TopK < 1 {
+			return nil, nil, fmt.Errorf("invalid top_k: must be >= 1, got %d", *input.TopK)
+		}
+		if input.Limit != nil || input.Cursor != nil {
+			return nil, nil, fmt.Errorf("invalid arguments: top_k cannot be combined with limit or cursor")
+		}
+		sortBy := ""
+		if input.SortBy != nil {
+			sortBy = *input.SortBy
+		}
+		topK, err = newTopKCollector(*input.TopK, sortBy)
+		if err != nil {
+			return nil, nil, err
+		}
+		opts.filesOnly = true
+	} else if input.SortBy != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: sort_by requires top_k")
+	}
 
-			info, err := entry.Info()
-			if err != nil {
-				continue
-			}
+	// Determine if we should use pattern matching. Patterns containing a
+	// '/' or '**' are matched against the path relative to input.Path,
+	// other patterns against the entry name only.
+	if input.Pattern != nil && *input.Pattern != "" {
+		pattern := strings.TrimPrefix(*input.Pattern, "./")
+		opts.pattern, err = compileGlob(pattern)
+		if err != nil {
+			return nil, nil, err
+		}
+		opts.pathPattern = strings.Contains(pattern, "/") || strings.Contains(pattern, "**")
+	}
 
-			file := fileEntry{
-				Name:     entry.Name(),
-				Type:     "directory",
-				Modified: info.ModTime().Format(time.RFC3339),
-			}
+	// Summary mode: aggregate statistics instead of entries
+	if input.Summary != nil && *input.Summary {
+		if input.Limit != nil || input.Cursor != nil {
+			return nil, nil, fmt.Errorf("invalid arguments: summary cannot be combined with limit or cursor")
+		}
+		if input.TopK != nil {
+			return nil, nil, fmt.Errorf("invalid arguments: summary cannot be combined with top_k")
+		}
+		if input.Format != nil || len(input.Fields) > 0 {
+			return nil, nil, fmt.Errorf("invalid arguments: summary cannot be combined with format or fields")
+		}
+		summary, err := summarizeTree(ctx, input.Path, opts)
+		if err != nil {
+			return nil, nil, err
+		}
 
-			if !entry.IsDir() {
-				file.Type = "file"
-				size := info.Size()
-				file.Size = &size
-			}
+		resultJSON, _ := json.Marshal(listFilesSummaryResponse{Summary: *summary})
+		result := &mcp.CallToolResult{
+			Content: []mcp.Content{
+				&mcp.TextContent{Text: string(resultJSON)},
+			},
+		}
+
+		if logger != nil {
+			logger.Debug("list_files completed", "path", input.Path, "summary_files", summary.Files, "summary_directories", summary.Directories)
+			resultJSON, _ := json.MarshalIndent(result, "", "  ")
+			logger.Debug("list_files RESPONSE", "response", string(resultJSON))
+		}
 
-			files = append(files, file)
+		return result, nil, nil
+	}
+
+	// Walk directory with batched reads, resuming from the cursor if given
+	walker := newDirWalker(input.Path, opts)
+	if input.Cursor != nil && *input.Cursor != "" {
+		if err := walker.resume(*input.Cursor); err != nil {
+			return nil, nil, err
 		}
 	}
+	defer walker.close()
 
+	emit := enc.add
+	if topK != nil {
+		emit = topK.add
+	}
+	more, err := walker.run(limit, emit)
 	if err != nil {
-		return nil, nil, fmt.Errorf("error walking directory: %v", err)
+		return nil, nil, err
+	}
+	if topK != nil {
+		for _, e := range topK.sorted(format) {
+			enc.add(e)
+		}
 	}
 
-	// Ensure files is never nil (use empty slice)
-	if files == nil {
-		files = []fileEntry{}
+	nextCursor := ""
+	if more {
+		nextCursor = walker.cursor()
 	}
 
-	resultJSON, _ := json.Marshal(listFilesResponse{Files: files})
 	result := &mcp.CallToolResult{
 		Content: []mcp.Content{
-			&mcp.TextContent{Text: string(resultJSON)},
+			&mcp.TextContent{Text: string(enc.finish(nextCursor))},
 		},
 	}
 
 	// Log full response if debug mode
 	if logger != nil {
-		logger.Debug("list_files completed", "path", input.Path, "files_count", len(files))
+		logger.Debug("list_files completed", "path", input.Path, "files_count", enc.count())
+		if listCache != nil {
+			logger.Debug("list_files cache", "hits", listCache.hits.Load(), "misses", listCache.misses.Load())
+		}
 		resultJSON, _ := json.MarshalIndent(result, "", "  ")
 		logger.Debug("list_files RESPONSE", "response", string(resultJSON))
 	}
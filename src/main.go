@@ -15,6 +15,10 @@ import (
 func main() {
 	// Parse command line flags
 	flag.BoolVar(&debugMode, "debug", false, "Enable debug logging to mcp.log")
+	listCacheEntries := flag.Int("list-cache-entries", 200000, "Maximum number of directory entries kept by the list_files cache (0 disables it)")
+	journalSize := flag.Int("journal-size", 32, "Maximum memory in MB used by the edit journal for undo (0 disables it)")
+	journalDir := flag.String("journal-dir", "", "Directory where journal deltas evicted from memory are kept (default: they are dropped)")
+	journalDiskSize := flag.Int("journal-disk-size", 1024, "Maximum size in MB of the on-disk journal")
 	flag.Parse()
 
 	// Initialize debug logging if enabled
@@ -34,6 +38,20 @@ func main() {
 		logger.Info("=== MCP Server started in debug mode ===")
 	}
 
+	if *listCacheEntries > 0 {
+		listCache = newDirCache(*listCacheEntries)
+	}
+
+	if *journalSize > 0 {
+		journal, err := newChangeJournal(int64(*journalSize)<<20, *journalDir, int64(*journalDiskSize)<<20)
+		if err != nil {
+			fmt.Fprintf(os.Stderr, "Failed to create edit journal: %v\n", err)
+			os.Exit(1)
+		}
+		editJournal = journal
+		defer editJournal.close()
+	}
+
 	// Create root context for graceful shutdown
 	ctx, cancel := context.WithCancel(context.Background())
 	defer cancel()
@@ -59,12 +77,12 @@ func main() {
 	// Register tools
 	mcp.AddTool(server, &mcp.Tool{
 		Name:        "edit_file",
-		Description: "Edit or create a file. Supports three modes: 1) Full write with 'content', 2) Text replacement with 'old_string' and 'new_string', 3) Append with 'new_string' only",
+		Description: "Edit or create a file. Supports these modes: 1) Full write with 'content', 2) Text replacement with 'old_string' and 'new_string', 3) Append with 'new_string' only (in place, concurrent appends are written together), 4) Batch of 'edits' ([{filename?, old_string, new_string}]) applied in one pass per file, all files written together or none, 5) Range: replace lines 'start_line'..'end_line' or bytes 'start_byte'..'end_byte' with 'new_string', 6) Regex: with 'regex' true, 'old_string' is a regular expression and 'new_string' a template ($1, ${name}). 'count' limits the replacements to the first N matches; 'expect_unique' fails unless there is exactly one. 7) Fuzzy: with 'fuzzy' true, 'old_string' also matches with different whitespace or within 'max_distance' edits; the result reports how it matched. Other writes are atomic (temporary file + rename); 'durability' selects none (default), fdatasync or fsync. 'expected_hash'/'expected_mtime' reject the write if the file changed since it was read; the result reports the new Hash and Modified time. 'return_diff' adds a unified diff of the change with 'diff_context' lines of context (default 3)",
 	}, handleEditFile)
 
 	mcp.AddTool(server, &mcp.Tool{
 		Name:        "read_file",
-		Description: "Read content of a file with optional parameters: start_line, end_line, encoding, line_numbers, skip_empty, max_lines, pattern (regex filter)",
+		Description: "Read content of a file with optional parameters: start_line, end_line, encoding, line_numbers, skip_empty, max_lines, pattern (regex filter). A second text item reports the file Hash and Modified time for expected_hash/expected_mtime",
 	}, handleReadFile)
 
 	mcp.AddTool(server, &mcp.Tool{
@@ -79,12 +97,52 @@ func main() {
 
 	mcp.AddTool(server, &mcp.Tool{
 		Name:        "write_file",
-		Description: "Write content to a file. Creates the file if it doesn't exist, overwrites if it does.",
+		Description: "Write content to a file. Creates the file if it doesn't exist, overwrites if it does. 'encoding' base64 writes binary content, decoded as it is written. The write is atomic (temporary file + rename); 'durability' selects none (default), fdatasync or fsync. 'expected_hash'/'expected_mtime' reject the write if the file changed since it was read; the result reports the new Hash and Modified time",
 	}, handleWriteFile)
 
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "write_files",
+		Description: "Write many files in one call: 'files' is [{filename, content, encoding?}]. Files are written in parallel, each atomically like write_file, and missing directories are created once. Returns per-file results (bytes, hash, modified or error). With 'atomic' true every file is replaced or none is. 'durability' as in write_file",
+	}, handleWriteFiles)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "upload_file",
+		Description: "Write a large file in chunks without sending it in one message. 'action' begin (optional total 'size') returns an upload ID; chunk writes 'content' ('encoding' utf-8 or base64) at 'offset' (chunks may arrive in any order or be re-sent); status lists the byte ranges received and missing; commit atomically replaces the file once every byte is received ('durability', 'expected_hash'/'expected_mtime' as in write_file); abort discards the upload. Chunks go straight to a temporary file next to the target, so an interrupted upload can be resumed, even after a restart",
+	}, handleUploadFile)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "apply_patch",
+		Description: "Apply a unified diff ('patch', as produced by diff -u or git diff) to one or more files: every file is changed or none is. Each hunk is applied nearest to the line its header gives, at any offset, and if need be with up to 'fuzz' (default 2) context lines at either end ignored; the result notes where hunks moved. /dev/null headers create or delete files. File names are relative to 'directory' (default: the server's working directory) after removing 'strip' leading components (default: git's a/ and b/). 'durability' as in write_file",
+	}, handleApplyPatch)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "diff_files",
+		Description: "Compare 'old_file' with 'new_file', or with 'new_content', and return a unified diff with 'diff_context' lines of context (default 3) that apply_patch can apply. The first text item summarizes the changes; the diff is capped at 'max_bytes' (default 65536) and the hunks past it are counted. Files are compared by line hashes with a linear-space Myers diff, so large files don't need to be read into the context",
+	}, handleDiffFiles)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "copy_file",
+		Description: "Copy a file, symlink or directory tree from 'source' to 'destination' on the server. Files are cloned with reflinks where the filesystem supports them (copy-on-write, no data copied) and copied in the kernel with copy_file_range otherwise; the files of a tree are copied in parallel, each atomically. Fails if the destination exists unless 'overwrite' is true. 'durability' as in write_file",
+	}, handleCopyFile)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "move_file",
+		Description: "Move or rename a file, symlink or directory tree from 'source' to 'destination'. A rename on the same filesystem; across filesystems it is copied like copy_file and the source then removed. Fails if the destination exists unless 'overwrite' is true. 'durability' as in write_file",
+	}, handleMoveFile)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "undo",
+		Description: "Undo the latest change made to a file by edit_file, write_file, write_files, upload_file, copy_file or apply_patch, restoring its previous content from the server's edit journal. Fails if the file was modified since. Repeat to undo earlier changes",
+	}, handleUndo)
+
+	mcp.AddTool(server, &mcp.Tool{
+		Name:        "history",
+		Description: "List the changes recorded in the edit journal, newest first, optionally only for 'filename' (limit: default 50), with the journal's memory use",
+	}, handleHistory)
+
 	mcp.AddTool(server, &mcp.Tool{
 		Name:        "list_files",
-		Description: "List files and directories in a specified path with optional filtering (pattern, recursive, show_hidden, max_depth)",
+		Description: "List files and directories in a specified path with optional filtering (pattern, recursive, show_hidden, max_depth), ignore rules (respect_gitignore, exclude), paging (limit, cursor), metadata filters (larger_than, smaller_than, modified_after, modified_before), top-k selection (top_k, sort_by), output encodings (format: entries, compact, tree), aggregate statistics (summary) and content metadata (fields: lines, encoding, is_binary, mime)",
 	}, handleListFiles)
 
 	// Run server (blocks until context cancelled)
@@ -94,4 +152,14 @@ func main() {
 		}
 		os.Exit(1)
 	}
+
+	if logger != nil {
+		stats := fileLocks.stats()
+		logger.Info("file lock statistics", "acquisitions", stats.Acquisitions, "contended", stats.Contended, "wait", stats.Wait)
+		if editJournal != nil {
+			js := editJournal.stats()
+			logger.Info("edit journal statistics", "entries", js.Entries, "memory_bytes", js.MemoryBytes, "disk_bytes", js.DiskBytes,
+				"recorded", js.Recorded, "spilled", js.Spilled, "dropped", js.Dropped, "undone", js.Undone)
+		}
+	}
 }
@@ -0,0 +1,194 @@
+package main
+
+import (
+	"container/heap"
+	"sort"
+)
+
+// multiReplacer replaces several patterns in a single pass over the input
+// using an Aho-Corasick automaton. Matches never overlap: the leftmost match
+// wins, and among matches starting at the same position the pattern listed
+// first wins. Replaced text is not scanned again.
+type multiReplacer struct {
+	patterns     []string
+	replacements []string
+	nodes        []acNode
+	maxLen       int
+	onReplace    func(m acMatch) // if set, called for every replaced match, in order
+}
+
+type acEdge struct {
+	b  byte
+	to int32
+}
+
+type acNode struct {
+	edges   []acEdge // sorted by byte
+	fail    int32
+	out     int32 // index of the first pattern ending here, -1 if none
+	outLink int32 // nearest node on the fail chain with a pattern, -1 if none
+}
+
+// newMultiReplacer builds the automaton. Patterns must not be empty.
+func newMultiReplacer(patterns, replacements []string) *multiReplacer {
+	r := &multiReplacer{
+		patterns:     patterns,
+		replacements: replacements,
+		nodes:        []acNode{{out: -1, outLink: -1}},
+	}
+
+	// Trie of all patterns
+	for p, pattern := range patterns {
+		if len(pattern) > r.maxLen {
+			r.maxLen = len(pattern)
+		}
+		node := int32(0)
+		for i := 0; i < len(pattern); i++ {
+			next, ok := r.child(node, pattern[i])
+			if !ok {
+				next = int32(len(r.nodes))
+				r.nodes = append(r.nodes, acNode{out: -1, outLink: -1})
+				r.addEdge(node, pattern[i], next)
+			}
+			node = next
+		}
+		if r.nodes[node].out < 0 {
+			r.nodes[node].out = int32(p)
+		}
+	}
+
+	// Failure and output links, breadth first
+	queue := make([]int32, 0, len(r.nodes))
+	for _, e := range r.nodes[0].edges {
+		queue = append(queue, e.to)
+	}
+	for len(queue) > 0 {
+		node := queue[0]
+		queue = queue[1:]
+		for _, e := range r.nodes[node].edges {
+			fail := r.nodes[node].fail
+			for {
+				if next, ok := r.child(fail, e.b); ok {
+					r.nodes[e.to].fail = next
+					break
+				}
+				if fail == 0 {
+					break
+				}
+				fail = r.nodes[fail].fail
+			}
+			f := r.nodes[e.to].fail
+			if r.nodes[f].out >= 0 {
+				r.nodes[e.to].outLink = f
+			} else {
+				r.nodes[e.to].outLink = r.nodes[f].outLink
+			}
+			queue = append(queue, e.to)
+		}
+	}
+	return r
+}
+
+func (r *multiReplacer) child(node int32, b byte) (int32, bool) {
+	edges := r.nodes[node].edges
+	i := sort.Search(len(edges), func(i int) bool { return edges[i].b >= b })
+	if i < len(edges) && edges[i].b == b {
+		return edges[i].to, true
+	}
+	return 0, false
+}
+
+func (r *multiReplacer) addEdge(node int32, b byte, to int32) {
+	edges := r.nodes[node].edges
+	i := sort.Search(len(edges), func(i int) bool { return edges[i].b >= b })
+	edges = append(edges, acEdge{})
+	copy(edges[i+1:], edges[i:])
+	edges[i] = acEdge{b: b, to: to}
+	r.nodes[node].edges = edges
+}
+
+// acMatch is a candidate match; pattern breaks ties between equal starts
+type acMatch struct {
+	start, end int
+	pattern    int32
+}
+
+type acMatchHeap []acMatch
+
+func (h acMatchHeap) Len() int { return len(h) }
+func (h acMatchHeap) Less(i, j int) bool {
+	if h[i].start != h[j].start {
+		return h[i].start < h[j].start
+	}
+	return h[i].pattern < h[j].pattern
+}
+func (h acMatchHeap) Swap(i, j int) { h[i], h[j] = h[j], h[i] }
+func (h *acMatchHeap) Push(x any)   { *h = append(*h, x.(acMatch)) }
+func (h *acMatchHeap) Pop() any {
+	old := *h
+	x := old[len(old)-1]
+	*h = old[:len(old)-1]
+	return x
+}
+
+// replace returns content with all selected matches replaced and the number
+// of replacements made for each pattern
+func (r *multiReplacer) replace(content []byte) ([]byte, []int) {
+	counts := make([]int, len(r.patterns))
+	out := make([]byte, 0, len(content))
+	copied := 0 // content before this offset has been written to out
+	var pending acMatchHeap
+
+	// commit selects pending candidates that no later match can precede
+	commit := func(limit int) {
+		for len(pending) > 0 && pending[0].start < limit {
+			m := heap.Pop(&pending).(acMatch)
+			if m.start < copied {
+				// Overlaps a match that was already replaced
+				continue
+			}
+			out = append(out, content[copied:m.start]...)
+			out = append(out, r.replacements[m.pattern]...)
+			copied = m.end
+			counts[m.pattern]++
+			if r.onReplace != nil {
+				r.onReplace(m)
+			}
+		}
+	}
+
+	state := int32(0)
+	for i := 0; i < len(content); i++ {
+		c := content[i]
+		for {
+			if next, ok := r.child(state, c); ok {
+				state = next
+				break
+			}
+			if state == 0 {
+				break
+			}
+			state = r.nodes[state].fail
+		}
+
+		node := state
+		if r.nodes[node].out < 0 {
+			node = r.nodes[node].outLink
+		}
+		for node >= 0 {
+			p := r.nodes[node].out
+			start := i + 1 - len(r.patterns[p])
+			if start >= copied {
+				heap.Push(&pending, acMatch{start: start, end: i + 1, pattern: p})
+			}
+			node = r.nodes[node].outLink
+		}
+
+		// Later matches end after i+1, so they start at i+2-maxLen or later
+		commit(i + 2 - r.maxLen)
+	}
+	commit(len(content) + 1)
+
+	out = append(out, content[copied:]...)
+	return out, counts
+}
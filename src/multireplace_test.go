@@ -0,0 +1,70 @@
+package main
+
+import (
+	"math/rand"
+	"strings"
+	"testing"
+)
+
+// naiveReplace is the reference: at each position the first listed pattern
+// that matches is replaced, otherwise one byte is kept
+func naiveReplace(s string, patterns, replacements []string) (string, []int) {
+	counts := make([]int, len(patterns))
+	var b strings.Builder
+	for i := 0; i < len(s); {
+		hit := -1
+		for p, pattern := range patterns {
+			if strings.HasPrefix(s[i:], pattern) {
+				hit = p
+				break
+			}
+		}
+		if hit < 0 {
+			b.WriteByte(s[i])
+			i++
+			continue
+		}
+		b.WriteString(replacements[hit])
+		counts[hit]++
+		i += len(patterns[hit])
+	}
+	return b.String(), counts
+}
+
+func TestMultiReplacerMatchesReference(t *testing.T) {
+	rng := rand.New(rand.NewSource(1))
+	gen := func(n int) string {
+		b := make([]byte, n)
+		for i := range b {
+			b[i] = "abc"[rng.Intn(3)]
+		}
+		return string(b)
+	}
+	for iter := 0; iter < 20000; iter++ {
+		var patterns, replacements []string
+		for i := 0; i < 1+rng.Intn(5); i++ {
+			patterns = append(patterns, gen(1+rng.Intn(4)))
+			replacements = append(replacements, strings.ToUpper(gen(rng.Intn(3))))
+		}
+		s := gen(rng.Intn(40))
+
+		want, wantCounts := naiveReplace(s, patterns, replacements)
+		got, counts := newMultiReplacer(patterns, replacements).replace([]byte(s))
+		if string(got) != want {
+			t.Fatalf("replace(%q, %q -> %q) = %q, want %q", s, patterns, replacements, got, want)
+		}
+		for i := range wantCounts {
+			if counts[i] != wantCounts[i] {
+				t.Fatalf("replace(%q, %q): counts %v, want %v", s, patterns, counts, wantCounts)
+			}
+		}
+	}
+}
+
+func TestMultiReplacerDoesNotRescan(t *testing.T) {
+	r := newMultiReplacer([]string{"foo", "bar"}, []string{"bar", "baz"})
+	got, counts := r.replace([]byte("foo bar foo"))
+	if string(got) != "bar baz bar" || counts[0] != 2 || counts[1] != 1 {
+		t.Fatalf("got %q %v", got, counts)
+	}
+}
@@ -0,0 +1,77 @@
+package main
+
+import (
+	"errors"
+	"fmt"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"sync"
+)
+
+// createdDirEntries caps the number of directories remembered as existing
+const createdDirEntries = 4096
+
+// dirCreator creates the directories of written files and remembers the ones
+// that exist, so that writing many files into the same directories doesn't
+// walk each path with os.MkdirAll again. A directory removed behind the
+// server's back is noticed by the write that fails in it, which forgets it
+// and creates it again (see stale).
+type dirCreator struct {
+	mu   sync.Mutex
+	max  int
+	dirs map[string]struct{}
+}
+
+func newDirCreator(max int) *dirCreator {
+	return &dirCreator{max: max, dirs: make(map[string]struct{})}
+}
+
+// ensure creates dir and its parents unless dir is known to exist
+func (c *dirCreator) ensure(dir string) error {
+	if dir == "." || dir == "" {
+		return nil
+	}
+	c.mu.Lock()
+	_, ok := c.dirs[dir]
+	c.mu.Unlock()
+	if ok {
+		return nil
+	}
+	err := os.MkdirAll(dir, 0755)
+	dirsCreated(dir)
+	if err != nil {
+		return fmt.Errorf("failed to create directory %q: %v", dir, err)
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if len(c.dirs) >= c.max {
+		evictHalf(c.dirs)
+	}
+	c.dirs[dir] = struct{}{}
+	return nil
+}
+
+// ensureParent creates the directory filename is in
+func (c *dirCreator) ensureParent(filename string) error {
+	return c.ensure(filepath.Dir(filename))
+}
+
+// stale reports whether dir was remembered but no longer exists, and
+// forgets it if so. Writes that fail to create a file call it to tell
+// whether creating the directory again and retrying can help.
+func (c *dirCreator) stale(dir string) bool {
+	c.mu.Lock()
+	_, ok := c.dirs[dir]
+	c.mu.Unlock()
+	if !ok {
+		return false
+	}
+	if _, err := os.Stat(dir); !errors.Is(err, fs.ErrNotExist) {
+		return false
+	}
+	c.mu.Lock()
+	delete(c.dirs, dir)
+	c.mu.Unlock()
+	return true
+}
@@ -0,0 +1,363 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"regexp"
+	"strconv"
+	"strings"
+)
+
+const (
+	// patchDefaultFuzz is how many context lines at each end of a hunk may
+	// be ignored to find where it applies, as with patch(1)
+	patchDefaultFuzz = 2
+	// devNull names the missing side of a created or deleted file
+	devNull = "/dev/null"
+)
+
+var hunkHeader = regexp.MustCompile(`^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@`)
+
+// filePatch is the part of a unified diff that changes one file
+type filePatch struct {
+	oldName, newName string
+	hunks            []diffHunk
+}
+
+// parsePatch splits a unified diff into the changes of each file. Anything
+// outside the ---/+++ headers and their hunks (git headers, commentary) is
+// skipped. strip removes that many leading components from the file names;
+// a negative strip removes the a/ and b/ prefixes of git diffs only.
+func parsePatch(patch string, strip int) ([]*filePatch, error) {
+	lines := splitDiffLines([]byte(patch))
+	var files []*filePatch
+	for i := 0; i < len(lines); {
+		if !bytes.HasPrefix(lines[i], []byte("--- ")) || i+1 == len(lines) || !bytes.HasPrefix(lines[i+1], []byte("+++ ")) {
+			i++
+			continue
+		}
+		oldName, err := patchName(lines[i][4:])
+		if err != nil {
+			return nil, err
+		}
+		newName, err := patchName(lines[i+1][4:])
+		if err != nil {
+			return nil, err
+		}
+		fp := &filePatch{oldName: oldName, newName: newName}
+		if err := fp.strip(strip); err != nil {
+			return nil, err
+		}
+		for i += 2; i < len(lines) && bytes.HasPrefix(lines[i], []byte("@@ ")); {
+			h, n, err := parseHunk(lines[i:])
+			if err != nil {
+				return nil, fmt.Errorf("invalid arguments: %s: hunk #%d: %v", fp.name(), len(fp.hunks)+1, err)
+			}
+			fp.hunks = append(fp.hunks, h)
+			i += n
+		}
+		if len(fp.hunks) == 0 {
+			return nil, fmt.Errorf("invalid arguments: %s: no hunks after the file header", fp.name())
+		}
+		files = append(files, fp)
+	}
+	if len(files) == 0 {
+		return nil, fmt.Errorf("invalid arguments: patch contains no file changes (---/+++ headers followed by @@ hunks)")
+	}
+	return files, nil
+}
+
+// patchName extracts the file name of a ---/+++ header, without the
+// timestamp diff(1) may append after a tab
+func patchName(field []byte) (string, error) {
+	name := strings.TrimRight(string(field), "\r\n")
+	if i := strings.IndexByte(name, '\t'); i >= 0 {
+		name = name[:i]
+	}
+	name = strings.TrimRight(name, " ")
+	if strings.HasPrefix(name, `"`) {
+		unquoted, err := strconv.Unquote(name)
+		if err != nil {
+			return "", fmt.Errorf("invalid arguments: malformed file name %s in patch", name)
+		}
+		name = unquoted
+	}
+	if name == "" {
+		return "", fmt.Errorf("invalid arguments: missing file name in patch header")
+	}
+	return name, nil
+}
+
+// name is the file the patch is about, for messages
+func (fp *filePatch) name() string {
+	if fp.newName == devNull {
+		return fp.oldName
+	}
+	return fp.newName
+}
+
+func (fp *filePatch) strip(n int) error {
+	if n < 0 {
+		// Only git's a/ and b/ prefixes
+		if (fp.oldName == devNull || strings.HasPrefix(fp.oldName, "a/")) && (fp.newName == devNull || strings.HasPrefix(fp.newName, "b/")) {
+			n = 1
+		} else {
+			n = 0
+		}
+	}
+	for _, name := range []*string{&fp.oldName, &fp.newName} {
+		if *name == devNull {
+			continue
+		}
+		stripped := *name
+		for i := 0; i < n; i++ {
+			j := strings.IndexByte(stripped, '/')
+			if j < 0 {
+				return fmt.Errorf("invalid arguments: cannot strip %d components from %q", n, *name)
+			}
+			stripped = stripped[j+1:]
+		}
+		*name = stripped
+	}
+	if fp.oldName == devNull && fp.newName == devNull {
+		return fmt.Errorf("invalid arguments: patch header names no file")
+	}
+	return nil
+}
+
+// parseHunk parses the hunk starting at lines[0], its @@ header, and returns
+// it with the number of lines it takes. The header counts are trusted: a
+// line starting with "---" inside a hunk is a removed line.
+func parseHunk(lines [][]byte) (diffHunk, int, error) {
+	m := hunkHeader.FindSubmatch(lines[0])
+	if m == nil {
+		return diffHunk{}, 0, fmt.Errorf("malformed header %q", strings.TrimRight(string(lines[0]), "\r\n"))
+	}
+	count := func(s []byte) int {
+		if s == nil {
+			return 1
+		}
+		n, _ := strconv.Atoi(string(s))
+		return n
+	}
+	h := diffHunk{}
+	h.oldStart, _ = strconv.Atoi(string(m[1]))
+	h.newStart, _ = strconv.Atoi(string(m[3]))
+	oldLeft, newLeft := count(m[2]), count(m[4])
+
+	n := 1
+	for ; n < len(lines) && (oldLeft > 0 || newLeft > 0); n++ {
+		l := lines[n]
+		line := diffLine{kind: ' ', text: l}
+		switch {
+		case l[0] == '\\':
+			noNewline(&h)
+			continue
+		case l[0] == ' ' || l[0] == '-' || l[0] == '+':
+			line = diffLine{kind: l[0], text: l[1:]}
+		case len(bytes.TrimRight(l, "\r\n")) == 0:
+			// A blank context line whose leading space was lost
+		default:
+			return diffHunk{}, 0, fmt.Errorf("expected %d more old and %d more new lines, found %q", oldLeft, newLeft, strings.TrimRight(string(l), "\r\n"))
+		}
+		if line.kind != '+' {
+			oldLeft--
+		}
+		if line.kind != '-' {
+			newLeft--
+		}
+		if oldLeft < 0 || newLeft < 0 {
+			return diffHunk{}, 0, fmt.Errorf("more lines than the header %q counts", strings.TrimRight(string(lines[0]), "\r\n"))
+		}
+		h.lines = append(h.lines, line)
+	}
+	if oldLeft > 0 || newLeft > 0 {
+		return diffHunk{}, 0, fmt.Errorf("truncated: expected %d more old and %d more new lines", oldLeft, newLeft)
+	}
+	if n < len(lines) && len(lines[n]) > 0 && lines[n][0] == '\\' {
+		noNewline(&h)
+		n++
+	}
+	return h, n, nil
+}
+
+// noNewline applies a "\ No newline at end of file" marker to the line
+// before it
+func noNewline(h *diffHunk) {
+	if len(h.lines) == 0 {
+		return
+	}
+	last := &h.lines[len(h.lines)-1]
+	last.text = bytes.TrimSuffix(last.text, []byte{'\n'})
+}
+
+// lineKey is a line without its line ending, so that a patch with \n
+// endings applies to a file with \r\n ones
+func lineKey(line []byte) []byte {
+	line = bytes.TrimSuffix(line, []byte{'\n'})
+	return bytes.TrimSuffix(line, []byte{'\r'})
+}
+
+// lineIndex maps each line that occurs on the old side of a file's hunks to
+// where it occurs in the file, in order. Hunks are located by looking up
+// their rarest line rather than by searching the file for their text.
+type lineIndex map[string][]int
+
+// newLineIndex indexes lines, only for the lines hunks look for
+func newLineIndex(lines [][]byte, hunks []diffHunk) lineIndex {
+	idx := make(lineIndex)
+	for _, h := range hunks {
+		for _, l := range h.lines {
+			if l.kind != '+' {
+				idx[string(lineKey(l.text))] = nil
+			}
+		}
+	}
+	for i, l := range lines {
+		key := lineKey(l)
+		if occ, ok := idx[string(key)]; ok {
+			idx[string(key)] = append(occ, i)
+		}
+	}
+	return idx
+}
+
+// locate returns where old, a run of lines, occurs in lines at or after
+// from, the occurrence nearest to want; -1 if it doesn't occur
+func (idx lineIndex) locate(lines [][]byte, old [][]byte, from, want int) int {
+	if len(old) == 0 {
+		if want < from {
+			return from
+		}
+		if want > len(lines) {
+			return len(lines)
+		}
+		return want
+	}
+	anchor := 0
+	for j := range old {
+		if len(idx[string(lineKey(old[j]))]) < len(idx[string(lineKey(old[anchor]))]) {
+			anchor = j
+		}
+	}
+	best, bestDistance := -1, 0
+	for _, p := range idx[string(lineKey(old[anchor]))] {
+		start := p - anchor
+		if start < from || start+len(old) > len(lines) {
+			continue
+		}
+		distance := start - want
+		if distance < 0 {
+			distance = -distance
+		}
+		if best >= 0 && distance >= bestDistance {
+			if start > want {
+				break // occurrences are in order: the rest are further away
+			}
+			continue
+		}
+		if linesMatch(lines[start:start+len(old)], old) {
+			best, bestDistance = start, distance
+		}
+	}
+	return best
+}
+
+func linesMatch(lines, old [][]byte) bool {
+	for i := range old {
+		if !bytes.Equal(lineKey(lines[i]), lineKey(old[i])) {
+			return false
+		}
+	}
+	return true
+}
+
+// patchedContent applies the hunks of a file to content in order. Each
+// hunk is looked for nearest to where its header says, shifted by the
+// offset of the hunk before; failing that, with up to fuzz context lines at
+// either end ignored. It returns the new content and a note for each hunk
+// that applied elsewhere or with fuzz.
+func patchedContent(content []byte, hunks []diffHunk, fuzz int) ([]byte, []string, error) {
+	lines := splitDiffLines(content)
+	idx := newLineIndex(lines, hunks)
+	var out bytes.Buffer
+	out.Grow(len(content))
+	emit := func(text []byte) {
+		if out.Len() > 0 && out.Bytes()[out.Len()-1] != '\n' {
+			// The file's last line had no newline and now has lines after it
+			out.WriteByte('\n')
+		}
+		out.Write(text)
+	}
+
+	var notes []string
+	cursor, offset := 0, 0
+	for n, h := range hunks {
+		leading, trailing := 0, 0
+		for leading < len(h.lines) && h.lines[leading].kind == ' ' {
+			leading++
+		}
+		for trailing < len(h.lines)-leading && h.lines[len(h.lines)-1-trailing].kind == ' ' {
+			trailing++
+		}
+		pos, usedFuzz := -1, 0
+		var body []diffLine
+		for f := 0; f <= fuzz && pos < 0; f++ {
+			lead, trail := min(f, leading), min(f, trailing)
+			if f > 0 && lead < f && trail < f {
+				break // nothing more to ignore
+			}
+			body = h.lines[lead : len(h.lines)-trail]
+			var old [][]byte
+			for _, l := range body {
+				if l.kind != '+' {
+					old = append(old, l.text)
+				}
+			}
+			if len(old) == 0 && len(body) < len(h.lines) {
+				break // no line left to locate it by
+			}
+			start := h.oldStart - 1
+			if len(old) == 0 {
+				start = h.oldStart // an insertion after line oldStart
+			}
+			pos, usedFuzz = idx.locate(lines, old, cursor, start+lead+offset), f
+			if pos >= 0 {
+				offset = pos - start - lead
+			}
+		}
+		if pos < 0 {
+			return nil, nil, fmt.Errorf("hunk #%d (@@ -%d +%d @@) does not apply: its context and removed lines were not found after line %d", n+1, h.oldStart, h.newStart, cursor)
+		}
+		var how []string
+		if offset != 0 {
+			how = append(how, fmt.Sprintf("offset %d lines", offset))
+		}
+		if usedFuzz > 0 {
+			how = append(how, fmt.Sprintf("fuzz %d", usedFuzz))
+		}
+		if len(how) > 0 {
+			notes = append(notes, fmt.Sprintf("hunk #%d applied at line %d (%s)", n+1, pos+1, strings.Join(how, ", ")))
+		}
+
+		for _, l := range lines[cursor:pos] {
+			emit(l)
+		}
+		cursor = pos
+		for _, l := range body {
+			switch l.kind {
+			case ' ':
+				emit(lines[cursor])
+				cursor++
+			case '-':
+				cursor++
+			case '+':
+				emit(l.text)
+			}
+		}
+	}
+	for _, l := range lines[cursor:] {
+		emit(l)
+	}
+	return out.Bytes(), notes, nil
+}
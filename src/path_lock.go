@@ -0,0 +1,100 @@
+package main
+
+import (
+	"hash/maphash"
+	"sort"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+// pathLockStripes is the number of mutexes file paths are spread over
+const pathLockStripes = 1024
+
+// pathLockStripe is padded to a cache line so neighbouring stripes don't
+// share one
+type pathLockStripe struct {
+	mu sync.Mutex
+	_  [56]byte
+}
+
+// pathLockManager serializes mutations of the same file. Paths are hashed
+// onto a fixed set of mutexes, so memory stays bounded however many files are
+// touched; calls on different files run in parallel unless their paths happen
+// to share a stripe.
+type pathLockManager struct {
+	seed    maphash.Seed
+	stripes [pathLockStripes]pathLockStripe
+
+	acquisitions atomic.Int64 // lock calls
+	contended    atomic.Int64 // lock calls that had to wait
+	waitNanos    atomic.Int64 // total time spent waiting
+}
+
+func newPathLockManager() *pathLockManager {
+	return &pathLockManager{seed: maphash.MakeSeed()}
+}
+
+// stripeOf returns the stripe of a file
+func (m *pathLockManager) stripeOf(path string) uint64 {
+	return maphash.String(m.seed, canonicalPath(path)) % pathLockStripes
+}
+
+// lock locks every given file, identified by its absolute path with symlinks
+// resolved, and returns the function that unlocks them. Stripes are locked in
+// ascending order so calls locking several files can't deadlock.
+func (m *pathLockManager) lock(paths ...string) func() {
+	stripes := make([]int, 0, len(paths))
+	for _, path := range paths {
+		stripes = append(stripes, int(m.stripeOf(path)))
+	}
+	sort.Ints(stripes)
+	n := 0
+	for i, s := range stripes {
+		if i == 0 || s != stripes[n-1] {
+			stripes[n] = s
+			n++
+		}
+	}
+	stripes = stripes[:n]
+
+	m.acquisitions.Add(1)
+	var waited time.Duration
+	for _, s := range stripes {
+		mu := &m.stripes[s].mu
+		if mu.TryLock() {
+			continue
+		}
+		start := time.Now()
+		mu.Lock()
+		waited += time.Since(start)
+	}
+	if waited > 0 {
+		m.contended.Add(1)
+		m.waitNanos.Add(int64(waited))
+		if logger != nil {
+			logger.Debug("path lock contended", "paths", paths, "wait", waited)
+		}
+	}
+
+	return func() {
+		for i := len(stripes) - 1; i >= 0; i-- {
+			m.stripes[stripes[i]].mu.Unlock()
+		}
+	}
+}
+
+// pathLockStats is a snapshot of the contention counters
+type pathLockStats struct {
+	Acquisitions int64
+	Contended    int64
+	Wait         time.Duration
+}
+
+func (m *pathLockManager) stats() pathLockStats {
+	return pathLockStats{
+		Acquisitions: m.acquisitions.Load(),
+		Contended:    m.contended.Load(),
+		Wait:         time.Duration(m.waitNanos.Load()),
+	}
+}
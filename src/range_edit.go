@@ -0,0 +1,289 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"os"
+)
+
+// rangeEdit is a replacement of a known region of a file, in bytes
+type rangeEdit struct {
+	start, end int64 // replaced bytes [start, end)
+	text       []byte
+	line       int // 1-based line of start, 0 until counted
+}
+
+// hasRangeArgs reports whether the request selects a line or byte range
+func hasRangeArgs(input EditFileRequest) bool {
+	return input.StartLine != nil || input.EndLine != nil || input.StartByte != nil || input.EndByte != nil
+}
+
+// applyRangeEdit replaces lines start_line..end_line or bytes
+// [start_byte, end_byte) with new_string. The unchanged prefix and suffix are
+// copied by the kernel and only the new text is written from user space. It
+// returns the new file size and version. The replaced region is recorded in
+// diff.
+func applyRangeEdit(input EditFileRequest, durability string, precondition *writePrecondition, diff *editDiff) (int64, fileVersion, error) {
+	if input.Content != nil || input.OldString != nil || input.OldText != nil || len(input.Edits) > 0 {
+		return 0, fileVersion{}, fmt.Errorf("invalid arguments: line and byte ranges cannot be combined with 'content', 'old_string' or 'edits'")
+	}
+	lineMode := input.StartLine != nil || input.EndLine != nil
+	if lineMode && (input.StartByte != nil || input.EndByte != nil) {
+		return 0, fileVersion{}, fmt.Errorf("invalid arguments: use either start_line/end_line or start_byte/end_byte")
+	}
+	newText := ""
+	if input.NewString != nil {
+		newText = *input.NewString
+	} else if input.NewText != nil {
+		newText = *input.NewText
+	}
+
+	f, err := os.Open(input.Filename)
+	if err != nil {
+		return 0, fileVersion{}, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return 0, fileVersion{}, fmt.Errorf("failed to access file %q: %v", input.Filename, err)
+	}
+	size := info.Size()
+
+	var edit *rangeEdit
+	if lineMode {
+		edit, err = lineRangeEdit(f, size, input.StartLine, input.EndLine, newText)
+	} else {
+		edit, err = byteRangeEdit(size, input.StartByte, input.EndByte, newText)
+	}
+	if err != nil {
+		return 0, fileVersion{}, err
+	}
+
+	// The data is copied in the kernel, so the hashes take a separate
+	// (read-only, constant memory) pass over the original. It is only made
+	// when expected_hash needs the old hash or the diff the line of a byte
+	// range; otherwise the result has no hash, like a reflinked copy.
+	hashed := precondition.needsHash() || (diff != nil && edit.line == 0)
+	var oldHash, newHash uint64
+	before := ""
+	if hashed {
+		if oldHash, newHash, err = hashSplice(f, size, edit); err != nil {
+			return 0, fileVersion{}, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+		}
+		before = formatSum(oldHash)
+		if err := precondition.checkHash(input.Filename, before); err != nil {
+			return 0, fileVersion{}, err
+		}
+	}
+	change := editJournal.begin(input.Filename, true, before)
+	keepDiff := diff != nil && edit.end-edit.start <= diffMaxBytes
+	if change.reserve(edit.end-edit.start) || keepDiff {
+		old := make([]byte, edit.end-edit.start)
+		if _, err := f.ReadAt(old, edit.start); err != nil {
+			return 0, fileVersion{}, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+		}
+		change.replaced(edit.start, old, int64(len(edit.text)))
+		diff.replaced(edit.start, edit.line, old, edit.text)
+	} else {
+		diff.skipped(edit.start)
+	}
+
+	s, err := stageWrite(input.Filename, durability)
+	if err != nil {
+		return 0, fileVersion{}, err
+	}
+	if err := s.copyRange(f, 0, edit.start); err != nil {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("failed to copy file %q: %v", input.Filename, err)
+	}
+	if _, err := s.Write(edit.text); err != nil {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("failed to write file %q: %v", input.Filename, err)
+	}
+	if err := s.copyRange(f, edit.end, size-edit.end); err != nil {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("failed to copy file %q: %v", input.Filename, err)
+	}
+	expected := size - (edit.end - edit.start) + int64(len(edit.text))
+	if s.written != expected {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", input.Filename, expected, s.written)
+	}
+	if err := s.Commit(); err != nil {
+		return 0, fileVersion{}, err
+	}
+	version := s.version()
+	if hashed {
+		s.remember(newHash)
+		version.hash = formatSum(newHash)
+	}
+	editJournal.record("edit_file", change, version)
+	return expected, version, nil
+}
+
+func byteRangeEdit(size int64, startByte, endByte *int64, newText string) (*rangeEdit, error) {
+	start, end := int64(0), size
+	if startByte != nil {
+		start = *startByte
+	}
+	if endByte != nil {
+		end = *endByte
+	}
+	if start < 0 || end < start || end > size {
+		return nil, fmt.Errorf("invalid arguments: byte range [%d, %d) is outside the file (%d bytes)", start, end, size)
+	}
+	return &rangeEdit{start: start, end: end, text: []byte(newText)}, nil
+}
+
+// lineRangeEdit locates lines start_line..end_line (1-based, inclusive). An
+// end_line of start_line-1 inserts before start_line; end_line past the end
+// of the file is clamped. A trailing newline is added to the new text when
+// it is followed by more lines or the file was newline-terminated.
+func lineRangeEdit(f *os.File, size int64, startLine, endLine *int, newText string) (*rangeEdit, error) {
+	if startLine == nil {
+		return nil, fmt.Errorf("invalid arguments: start_line is required with end_line")
+	}
+	first := *startLine
+	last := first
+	if endLine != nil {
+		last = *endLine
+	}
+	if first < 1 || last < first-1 {
+		return nil, fmt.Errorf("invalid arguments: invalid line range %d-%d", first, last)
+	}
+
+	idx := &lineScanner{r: f, buf: make([]byte, 64*1024)}
+	start := int64(0)
+	if first > 1 {
+		off, ok, err := idx.advance(first - 1)
+		if err != nil {
+			return nil, err
+		}
+		if !ok {
+			// first-1 is past the last newline: only the end of an
+			// unterminated last line is still a valid position
+			if first-1 != idx.seen+1 || size == idx.lastLine {
+				lines := idx.seen
+				if size > idx.lastLine {
+					lines++
+				}
+				return nil, fmt.Errorf("invalid arguments: start_line %d is beyond the end of file (%d lines)", first, lines)
+			}
+			off = size
+		}
+		start = off
+	}
+	line := first
+	if start == size && idx.seen < first-1 {
+		line = idx.seen + 1
+	}
+	end := start
+	if last >= first {
+		off, ok, err := idx.advance(last)
+		if err != nil {
+			return nil, err
+		}
+		if !ok {
+			off = size
+		}
+		end = off
+	}
+
+	text := []byte(newText)
+	if len(text) > 0 && text[len(text)-1] != '\n' && (end < size || (size > 0 && idx.lastLine == size)) {
+		// Keep the next line separate, or the file newline-terminated
+		text = append(text, '\n')
+	}
+	if len(text) > 0 && start == size && size > 0 && start != idx.lastLine {
+		// Inserting after an unterminated last line
+		text = append([]byte{'\n'}, text...)
+	}
+	return &rangeEdit{start: start, end: end, text: text, line: line}, nil
+}
+
+// lineScanner finds line offsets reading a file sequentially
+type lineScanner struct {
+	r        io.Reader
+	buf      []byte
+	data     []byte // read but not yet scanned
+	pos      int64  // file offset of data
+	seen     int    // newlines scanned so far
+	lastLine int64  // offset just after the last newline scanned
+	eof      bool
+}
+
+// advance scans until newline n and returns the offset just after it, or
+// ok=false if the file has fewer newlines
+func (l *lineScanner) advance(n int) (int64, bool, error) {
+	for l.seen < n {
+		if len(l.data) == 0 {
+			if l.eof {
+				return l.pos, false, nil
+			}
+			m, err := l.r.Read(l.buf)
+			if err == io.EOF {
+				l.eof = true
+			} else if err != nil {
+				return 0, false, err
+			}
+			l.data = l.buf[:m]
+			continue
+		}
+		i := bytes.IndexByte(l.data, '\n')
+		if i < 0 {
+			l.pos += int64(len(l.data))
+			l.data = nil
+			continue
+		}
+		l.pos += int64(i + 1)
+		l.data = l.data[i+1:]
+		l.seen++
+		l.lastLine = l.pos
+	}
+	return l.lastLine, true, nil
+}
+
+// hashSplice hashes the original file and the spliced result in one pass
+// over the original, counting the line of the edit if it isn't known
+func hashSplice(f *os.File, size int64, edit *rangeEdit) (uint64, uint64, error) {
+	oldHash, newHash := newContentHash(), newContentHash()
+	r := io.NewSectionReader(f, 0, size)
+	buf := make([]byte, 64*1024)
+	inserted := false
+	count, newlines := edit.line == 0, 0
+	for off := int64(0); ; {
+		n, err := r.Read(buf)
+		chunk := buf[:n]
+		oldHash.Write(chunk)
+		// Prefix part of the chunk, then the new text, then the suffix part
+		if off < edit.start {
+			prefix := chunk[:min(int64(n), edit.start-off)]
+			newHash.Write(prefix)
+			if count {
+				newlines += bytes.Count(prefix, []byte{'\n'})
+			}
+		}
+		if !inserted && off+int64(n) >= edit.start {
+			newHash.Write(edit.text)
+			inserted = true
+		}
+		if off+int64(n) > edit.end {
+			newHash.Write(chunk[max(0, edit.end-off):])
+		}
+		off += int64(n)
+		if err == io.EOF {
+			break
+		}
+		if err != nil {
+			return 0, 0, err
+		}
+	}
+	if !inserted {
+		newHash.Write(edit.text)
+	}
+	if count {
+		edit.line = newlines + 1
+	}
+	return oldHash.Sum64(), newHash.Sum64(), nil
+}
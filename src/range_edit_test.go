@@ -0,0 +1,55 @@
+package main
+
+import (
+	"context"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+// TestRangeEditHashOnlyWhenNeeded checks that a range edit reads the file to
+// hash it only for expected_hash, and that its journal entry can be undone
+// either way
+func TestRangeEditHashOnlyWhenNeeded(t *testing.T) {
+	useJournal(t, 1<<20, "", 0)
+	ctx := context.Background()
+	name := filepath.Join(t.TempDir(), "a.txt")
+	if err := os.WriteFile(name, []byte("one\ntwo\nthree\n"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	str := func(s string) *string { return &s }
+	num := func(n int) *int { return &n }
+
+	result, _, err := handleEditFile(ctx, nil, EditFileRequest{Filename: name, StartLine: num(2), NewString: str("TWO")})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if text := resultText(result); strings.Contains(text, "Hash:") {
+		t.Fatalf("unrequested hash in %q", text)
+	}
+
+	current, err := hashFile(name)
+	if err != nil {
+		t.Fatal(err)
+	}
+	result, _, err = handleEditFile(ctx, nil, EditFileRequest{Filename: name, StartLine: num(1), NewString: str("ONE"), ExpectedHash: &current})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if after, err := hashFile(name); err != nil || !strings.Contains(resultText(result), "Hash: "+after) {
+		t.Fatalf("result %q does not report the hash %s (%v)", resultText(result), after, err)
+	}
+	if _, _, err := handleEditFile(ctx, nil, EditFileRequest{Filename: name, StartLine: num(1), NewString: str("x"), ExpectedHash: &current}); err == nil {
+		t.Fatal("stale expected_hash accepted")
+	}
+
+	for _, want := range []string{"one\nTWO\nthree\n", "one\ntwo\nthree\n"} {
+		if _, _, err := handleUndo(ctx, nil, UndoRequest{Filename: name}); err != nil {
+			t.Fatal(err)
+		}
+		if got, _ := os.ReadFile(name); string(got) != want {
+			t.Fatalf("undo left %q, want %q", got, want)
+		}
+	}
+}
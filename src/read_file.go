@@ -4,7 +4,6 @@ import (
 	"context"
 	"encoding/json"
 	"fmt"
-	"os"
 	"regexp"
 	"strconv"
 	"strings"
@@ -105,14 +104,14 @@ func handleReadFile(ctx context.Context, req *mcp.CallToolRequest, input ReadFil
 	var patternRegex *regexp.Regexp
 	if input.Pattern != nil {
 		var err error
-		patternRegex, err = regexp.Compile(*input.Pattern)
+		patternRegex, err = patternCache.compile(*input.Pattern)
 		if err != nil {
 			return nil, nil, fmt.Errorf("invalid regex pattern %q: %v", *input.Pattern, err)
 		}
 	}
 
-	// Read file
-	content, err := os.ReadFile(input.Filename)
+	// Read file, hashing it in the same pass
+	content, version, err := readFileHashed(input.Filename)
 	if err != nil {
 		return nil, nil, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
 	}
@@ -136,6 +135,7 @@ func handleReadFile(ctx context.Context, req *mcp.CallToolRequest, input ReadFil
 		result := &mcp.CallToolResult{
 			Content: []mcp.Content{
 				&mcp.TextContent{Text: ""},
+				&mcp.TextContent{Text: version.String()},
 			},
 		}
 		if logger != nil {
@@ -157,6 +157,7 @@ func handleReadFile(ctx context.Context, req *mcp.CallToolRequest, input ReadFil
 			result := &mcp.CallToolResult{
 				Content: []mcp.Content{
 					&mcp.TextContent{Text: ""},
+					&mcp.TextContent{Text: version.String()},
 				},
 			}
 			if logger != nil {
@@ -175,6 +176,7 @@ func handleReadFile(ctx context.Context, req *mcp.CallToolRequest, input ReadFil
 			result := &mcp.CallToolResult{
 				Content: []mcp.Content{
 					&mcp.TextContent{Text: ""},
+					&mcp.TextContent{Text: version.String()},
 				},
 			}
 			if logger != nil {
@@ -260,6 +262,7 @@ func handleReadFile(ctx context.Context, req *mcp.CallToolRequest, input ReadFil
 	result := &mcp.CallToolResult{
 		Content: []mcp.Content{
 			&mcp.TextContent{Text: resultText},
+			&mcp.TextContent{Text: version.String()},
 		},
 	}
 
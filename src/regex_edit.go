@@ -0,0 +1,155 @@
+package main
+
+import (
+	"fmt"
+	"regexp"
+	"sync"
+)
+
+// regexCacheEntries caps the number of compiled patterns kept between calls
+const regexCacheEntries = 256
+
+// regexCache keeps compiled regular expressions by pattern, so that agents
+// repeating the same replacement or filter don't recompile it on every call
+type regexCache struct {
+	mu      sync.Mutex
+	max     int
+	entries map[string]*regexp.Regexp
+}
+
+func newRegexCache(max int) *regexCache {
+	return &regexCache{max: max, entries: make(map[string]*regexp.Regexp)}
+}
+
+// compile returns the compiled pattern, compiling it on first use. A
+// *regexp.Regexp is safe for concurrent use, so callers share it.
+func (c *regexCache) compile(pattern string) (*regexp.Regexp, error) {
+	c.mu.Lock()
+	re, ok := c.entries[pattern]
+	c.mu.Unlock()
+	if ok {
+		return re, nil
+	}
+	re, err := regexp.Compile(pattern)
+	if err != nil {
+		return nil, err
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if len(c.entries) >= c.max {
+		evictHalf(c.entries)
+	}
+	c.entries[pattern] = re
+	return re, nil
+}
+
+// occurrences selects which matches of old_string a replacement changes
+type occurrences struct {
+	limit  int  // replace at most this many matches, 0 for all
+	unique bool // fail unless there is exactly one match
+}
+
+// parseOccurrences validates the count and expect_unique arguments
+func parseOccurrences(input EditFileRequest) (occurrences, error) {
+	var occ occurrences
+	if input.Count != nil {
+		if *input.Count < 1 {
+			return occ, fmt.Errorf("invalid arguments: count must be positive")
+		}
+		occ.limit = *input.Count
+	}
+	if input.ExpectUnique != nil && *input.ExpectUnique {
+		if input.Count != nil {
+			return occ, fmt.Errorf("invalid arguments: count cannot be combined with expect_unique")
+		}
+		occ.unique = true
+	}
+	if occ != (occurrences{}) && input.OldString == nil && input.OldText == nil {
+		return occ, fmt.Errorf("invalid arguments: count and expect_unique require old_string")
+	}
+	return occ, nil
+}
+
+// check reports whether the number of matches found is acceptable
+func (o occurrences) check(filename, old string, matches int) error {
+	if o.unique && matches != 1 {
+		if matches == 0 {
+			return fmt.Errorf("%q not found in %q", old, filename)
+		}
+		return fmt.Errorf("%q is not unique in %q: found more than once", old, filename)
+	}
+	return nil
+}
+
+// isRegexRequest reports whether old_string is a regular expression
+func isRegexRequest(input EditFileRequest) bool {
+	return input.Regex != nil && *input.Regex
+}
+
+// applyRegexEdit replaces the matches of the regular expression old_string
+// with new_string, in which $1, ${name} and $$ expand to submatches as in
+// regexp.Expand. The file is read once and the matches are found in a
+// single pass over it; occ selects how many are replaced. It returns the new
+// file size, the number of replacements and the version.
+func applyRegexEdit(input EditFileRequest, durability string, precondition *writePrecondition, occ occurrences, diff *editDiff) (int64, int, fileVersion, error) {
+	if input.Content != nil || len(input.Edits) > 0 || hasRangeArgs(input) {
+		return 0, 0, fileVersion{}, fmt.Errorf("invalid arguments: 'regex' cannot be combined with 'content', 'edits' or a range")
+	}
+	pattern := ""
+	if input.OldString != nil {
+		pattern = *input.OldString
+	} else if input.OldText != nil {
+		pattern = *input.OldText
+	}
+	if pattern == "" {
+		return 0, 0, fileVersion{}, fmt.Errorf("invalid arguments: old_string (the pattern) is required with regex")
+	}
+	template := ""
+	if input.NewString != nil {
+		template = *input.NewString
+	} else if input.NewText != nil {
+		template = *input.NewText
+	}
+	re, err := patternCache.compile(pattern)
+	if err != nil {
+		return 0, 0, fileVersion{}, fmt.Errorf("invalid regex pattern %q: %v", pattern, err)
+	}
+
+	content, current, err := readFileHashed(input.Filename)
+	if err != nil {
+		return 0, 0, fileVersion{}, fmt.Errorf("failed to read file %q: %v", input.Filename, err)
+	}
+	if err := precondition.checkHash(input.Filename, current.hash); err != nil {
+		return 0, 0, fileVersion{}, err
+	}
+
+	limit := -1
+	switch {
+	case occ.unique:
+		limit = 2 // enough to tell that a match is not unique
+	case occ.limit > 0:
+		limit = occ.limit
+	}
+	matches := re.FindAllSubmatchIndex(content, limit)
+	if len(matches) == 0 {
+		return 0, 0, fileVersion{}, fmt.Errorf("pattern %q not found in %q", pattern, input.Filename)
+	}
+	if err := occ.check(input.Filename, pattern, len(matches)); err != nil {
+		return 0, 0, fileVersion{}, err
+	}
+
+	expansion := []byte(template)
+	regions := make([]textRegion, len(matches))
+	for i, m := range matches {
+		regions[i] = textRegion{start: m[0], end: m[1], text: re.Expand(nil, expansion, content, m)}
+	}
+	change := editJournal.begin(input.Filename, true, current.hash)
+	updated := spliceRegions(content, regions, change, diff)
+
+	version, err := writeFileAtomic(input.Filename, updated, durability)
+	if err != nil {
+		return 0, 0, fileVersion{}, err
+	}
+	editJournal.record("edit_file", change, version)
+	return int64(len(updated)), len(matches), version, nil
+}
@@ -0,0 +1,189 @@
+package main
+
+import (
+	"bufio"
+	"bytes"
+	"fmt"
+	"io"
+	"os"
+)
+
+const (
+	// streamChunkSize is how much of a file the streaming replacement reads at a time
+	streamChunkSize = 1 << 20
+	// streamWriteBuffer batches the small writes around each replacement
+	streamWriteBuffer = 256 << 10
+)
+
+// streamReplace copies r to w replacing every non-overlapping occurrence of
+// old with new, scanning left to right like strings.ReplaceAll. The file is
+// read in chunks; the last len(old)-1 bytes of each chunk are carried over to
+// the next one so matches spanning chunk boundaries are found. Memory use is
+// fixed by chunkSize, whatever the size of the input. old must not be empty.
+// If limit is positive only the first limit matches are replaced. If onMatch
+// is not nil it is called with the input offset and 1-based line of every
+// replaced match; lines are only counted then.
+func streamReplace(w io.Writer, r io.Reader, old, new []byte, chunkSize, limit int, onMatch func(offset int64, line int)) (count int, last byte, err error) {
+	overlap := len(old) - 1
+	buf := make([]byte, chunkSize+overlap)
+	keep := 0        // carried-over bytes at the start of buf
+	base := int64(0) // input offset of buf[0]
+	lines := 0       // newlines before the unconsumed input, when counted
+	oldLines := bytes.Count(old, []byte{'\n'})
+	for {
+		n, readErr := io.ReadFull(r, buf[keep:])
+		eof := readErr == io.EOF || readErr == io.ErrUnexpectedEOF
+		if readErr != nil && !eof {
+			return count, last, readErr
+		}
+		data := buf[:keep+n]
+		if len(data) > 0 {
+			last = data[len(data)-1]
+		}
+
+		i := 0
+		for limit <= 0 || count < limit {
+			j := bytes.Index(data[i:], old)
+			if j < 0 {
+				break
+			}
+			if _, err := w.Write(data[i : i+j]); err != nil {
+				return count, last, err
+			}
+			if _, err := w.Write(new); err != nil {
+				return count, last, err
+			}
+			count++
+			if onMatch != nil {
+				lines += bytes.Count(data[i:i+j], []byte{'\n'})
+				onMatch(base+int64(i+j), lines+1)
+				lines += oldLines
+			}
+			i += j + len(old)
+		}
+
+		rest := data[i:]
+		if eof {
+			_, err := w.Write(rest)
+			return count, last, err
+		}
+		// A match may start in the last len(old)-1 bytes: keep them for the next chunk
+		keep = overlap
+		if keep > len(rest) {
+			keep = len(rest)
+		}
+		if _, err := w.Write(rest[:len(rest)-keep]); err != nil {
+			return count, last, err
+		}
+		if onMatch != nil {
+			lines += bytes.Count(rest[:len(rest)-keep], []byte{'\n'})
+		}
+		copy(buf, rest[len(rest)-keep:])
+		base += int64(len(data) - keep)
+	}
+}
+
+// countingWriter counts the bytes passed to the underlying writer
+type countingWriter struct {
+	w io.Writer
+	n int64
+}
+
+func (c *countingWriter) Write(p []byte) (int, error) {
+	n, err := c.w.Write(p)
+	c.n += int64(n)
+	return n, err
+}
+
+// lineCounter counts the newlines written to it
+type lineCounter struct {
+	n int
+}
+
+func (c *lineCounter) Write(p []byte) (int, error) {
+	c.n += bytes.Count(p, []byte{'\n'})
+	return len(p), nil
+}
+
+// streamReplaceFile replaces old with new in an existing file without loading
+// it into memory. As in the in-memory mode, when old is not found a non-empty
+// new is appended on a new line, unless occ requires a unique match. The
+// result goes to a temporary file that is renamed over the original once the
+// original matched the precondition. It returns the size of the new content,
+// the number of replacements and the version. The replaced regions are
+// recorded in diff.
+func streamReplaceFile(f *os.File, filename, old, new, durability string, precondition *writePrecondition, occ occurrences, diff *editDiff) (int64, int, fileVersion, error) {
+	// Small files don't need full-size buffers
+	chunkSize, bufSize := streamChunkSize, streamWriteBuffer
+	if info, err := f.Stat(); err == nil && info.Size() < int64(chunkSize) {
+		chunkSize = int(info.Size()) + 1
+		if chunkSize < bufSize {
+			bufSize = chunkSize + len(new)
+		}
+	}
+
+	s, err := stageWrite(filename, durability)
+	if err != nil {
+		return 0, 0, fileVersion{}, err
+	}
+	bw := bufio.NewWriterSize(s, bufSize)
+	out := &countingWriter{w: bw}
+
+	// The original is hashed in the same pass
+	h := newContentHash()
+	var hashed io.Writer = h
+	lines := &lineCounter{}
+	if diff != nil {
+		// The line of an append to the end is needed
+		hashed = io.MultiWriter(h, lines)
+	}
+	oldBytes, newBytes := []byte(old), []byte(new)
+	var onMatch func(int64, int)
+	change := editJournal.begin(filename, true, "")
+	if change != nil || diff != nil {
+		onMatch = func(offset int64, line int) {
+			change.replaced(offset, oldBytes, int64(len(new)))
+			diff.replaced(offset, line, oldBytes, newBytes)
+		}
+	}
+	count, last, err := streamReplace(out, io.TeeReader(f, hashed), oldBytes, newBytes, chunkSize, occ.limit, onMatch)
+	if err != nil {
+		s.Abort()
+		return 0, 0, fileVersion{}, fmt.Errorf("failed to replace text in %q: %v", filename, err)
+	}
+	if err := precondition.checkHash(filename, formatHash(h)); err != nil {
+		s.Abort()
+		return 0, 0, fileVersion{}, err
+	}
+	if err := occ.check(filename, old, count); err != nil {
+		s.Abort()
+		return 0, 0, fileVersion{}, err
+	}
+	if count == 0 && new != "" {
+		size := out.n
+		appended := newBytes
+		if out.n > 0 && last != '\n' {
+			appended = append([]byte{'\n'}, newBytes...)
+		}
+		out.Write(appended)
+		change.replaced(size, nil, out.n-size)
+		diff.replaced(size, lines.n+1, nil, appended)
+	}
+	if err := bw.Flush(); err != nil {
+		s.Abort()
+		return 0, 0, fileVersion{}, fmt.Errorf("failed to write file %q: %v", filename, err)
+	}
+	if s.written != out.n {
+		s.Abort()
+		return 0, 0, fileVersion{}, fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", filename, out.n, s.written)
+	}
+	if err := s.Commit(); err != nil {
+		return 0, 0, fileVersion{}, err
+	}
+	version := s.version()
+	if change != nil {
+		change.before = formatHash(h)
+		editJournal.record("edit_file", change, version)
+	}
+	return out.n, count, version, nil
+}
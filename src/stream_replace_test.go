@@ -0,0 +1,163 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"testing"
+)
+
+func TestStreamReplaceMatchesReplaceAll(t *testing.T) {
+	rng := rand.New(rand.NewSource(1))
+	gen := func(n int) []byte {
+		b := make([]byte, n)
+		for i := range b {
+			b[i] = "ab\n"[rng.Intn(3)]
+		}
+		return b
+	}
+	for iter := 0; iter < 5000; iter++ {
+		input := gen(rng.Intn(200))
+		old := gen(1 + rng.Intn(5))
+		new := gen(rng.Intn(4))
+		chunkSize := 1 + rng.Intn(16)
+		limit := rng.Intn(3) // 0 replaces every match
+
+		var out bytes.Buffer
+		var offsets []int64
+		var lines []int
+		count, _, err := streamReplace(&out, bytes.NewReader(input), old, new, chunkSize, limit, func(offset int64, line int) {
+			offsets = append(offsets, offset)
+			lines = append(lines, line)
+		})
+		if err != nil {
+			t.Fatal(err)
+		}
+		n, wantCount := -1, bytes.Count(input, old)
+		if limit > 0 {
+			n = limit
+			if wantCount > limit {
+				wantCount = limit
+			}
+		}
+		want := bytes.Replace(input, old, new, n)
+		if !bytes.Equal(out.Bytes(), want) {
+			t.Fatalf("chunk %d limit %d: replace %q -> %q in %q: got %q, want %q", chunkSize, limit, old, new, input, out.Bytes(), want)
+		}
+		if count != wantCount {
+			t.Fatalf("count %d, want %d", count, wantCount)
+		}
+		var wantOffsets []int64
+		var wantLines []int
+		for i := 0; len(wantOffsets) < wantCount; {
+			j := bytes.Index(input[i:], old)
+			if j < 0 {
+				break
+			}
+			wantOffsets = append(wantOffsets, int64(i+j))
+			wantLines = append(wantLines, bytes.Count(input[:i+j], []byte{'\n'})+1)
+			i += j + len(old)
+		}
+		if fmt.Sprint(offsets) != fmt.Sprint(wantOffsets) {
+			t.Fatalf("chunk %d: offsets of %q in %q: got %v, want %v", chunkSize, old, input, offsets, wantOffsets)
+		}
+		if fmt.Sprint(lines) != fmt.Sprint(wantLines) {
+			t.Fatalf("chunk %d: lines of %q in %q: got %v, want %v", chunkSize, old, input, lines, wantLines)
+		}
+	}
+}
+
+func TestStreamReplaceFileAppendsWhenNotFound(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "file.txt")
+	if err := os.WriteFile(path, []byte("first line"), 0644); err != nil {
+		t.Fatal(err)
+	}
+	f, err := os.Open(path)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer f.Close()
+	n, _, _, err := streamReplaceFile(f, path, "missing", "second line", durabilityNone, nil, occurrences{}, nil)
+	if err != nil {
+		t.Fatal(err)
+	}
+	got, _ := os.ReadFile(path)
+	if string(got) != "first line\nsecond line" || n != int64(len(got)) {
+		t.Fatalf("got %q (%d bytes)", got, n)
+	}
+}
+
+// benchmarkReplaceSize returns the input size of the replacement benchmarks,
+// 64 MB unless set in bytes with STREAM_BENCH_SIZE (e.g. 4294967296 for 4 GB)
+func benchmarkReplaceSize(b *testing.B) int64 {
+	if v := os.Getenv("STREAM_BENCH_SIZE"); v != "" {
+		size, err := strconv.ParseInt(v, 10, 64)
+		if err != nil {
+			b.Fatalf("invalid STREAM_BENCH_SIZE %q", v)
+		}
+		return size
+	}
+	return 64 << 20
+}
+
+func writeBenchmarkInput(b *testing.B, size int64) string {
+	path := filepath.Join(b.TempDir(), "input.sql")
+	f, err := os.Create(path)
+	if err != nil {
+		b.Fatal(err)
+	}
+	line := []byte("INSERT INTO users VALUES (1, 'old_value', 'some padding text to fill the line');\n")
+	block := bytes.Repeat(line, (1<<20)/len(line))
+	for written := int64(0); written < size; written += int64(len(block)) {
+		if _, err := f.Write(block); err != nil {
+			b.Fatal(err)
+		}
+	}
+	if err := f.Close(); err != nil {
+		b.Fatal(err)
+	}
+	return path
+}
+
+// BenchmarkReplace compares the streaming replacement with the in-memory one
+// it replaces. B/op shows memory: fixed for streaming, ~3x the file in memory.
+// Run with: STREAM_BENCH_SIZE=2147483648 go test ./src -run '^$' -bench Replace/stream -benchtime 1x
+func BenchmarkReplace(b *testing.B) {
+	size := benchmarkReplaceSize(b)
+	path := writeBenchmarkInput(b, size)
+
+	b.Run("stream", func(b *testing.B) {
+		b.ReportAllocs()
+		b.SetBytes(size)
+		for i := 0; i < b.N; i++ {
+			f, err := os.Open(path)
+			if err != nil {
+				b.Fatal(err)
+			}
+			_, _, err = streamReplace(io.Discard, f, []byte("old_value"), []byte("new_value"), streamChunkSize, 0, nil)
+			f.Close()
+			if err != nil {
+				b.Fatal(err)
+			}
+		}
+	})
+	b.Run("memory", func(b *testing.B) {
+		b.ReportAllocs()
+		b.SetBytes(size)
+		for i := 0; i < b.N; i++ {
+			content, err := os.ReadFile(path)
+			if err != nil {
+				b.Fatal(err)
+			}
+			out := []byte(strings.ReplaceAll(string(content), "old_value", "new_value"))
+			if _, err := io.Discard.Write(out); err != nil {
+				b.Fatal(err)
+			}
+		}
+	})
+}
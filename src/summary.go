@@ -0,0 +1,307 @@
+package main
+
+import (
+	"container/heap"
+	"context"
+	"fmt"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"runtime"
+	"sort"
+	"strings"
+	"sync"
+	"sync/atomic"
+)
+
+const (
+	// summaryTopDirs is the number of largest directories reported by summary mode
+	summaryTopDirs = 10
+	// summaryMaxExtensions caps the per-extension table; the rest is merged into "(other)"
+	summaryMaxExtensions = 20
+)
+
+type extensionStat struct {
+	Extension string `json:"extension"`
+	Files     int64  `json:"files"`
+	Bytes     int64  `json:"bytes"`
+}
+
+type dirStat struct {
+	Path  string `json:"path"`
+	Files int64  `json:"files"`
+	Bytes int64  `json:"bytes"`
+}
+
+type listSummary struct {
+	TotalSize      int64           `json:"total_size"`
+	Files          int64           `json:"files"`
+	Directories    int64           `json:"directories"`
+	Extensions     []extensionStat `json:"extensions"`
+	TopDirectories []dirStat       `json:"top_directories"`
+}
+
+type listFilesSummaryResponse struct {
+	Summary listSummary `json:"summary"`
+}
+
+// summaryDir tracks one directory until its whole subtree has been counted.
+// pending is 1 for the directory's own listing plus one per queued child;
+// when it drops to zero the totals are final and are folded into the parent.
+type summaryDir struct {
+	parent  *summaryDir
+	rel     string
+	depth   int
+	scope   *ignoreScope
+	bytes   atomic.Int64
+	files   atomic.Int64
+	pending atomic.Int32
+}
+
+// summaryCounts are per-worker aggregates merged once the walk finishes
+type summaryCounts struct {
+	files       int64
+	directories int64
+	bytes       int64
+	extensions  map[string]*extensionStat
+}
+
+// dirStatHeap is a min-heap on Bytes holding the largest directories seen so far
+type dirStatHeap []dirStat
+
+func (h dirStatHeap) Len() int           { return len(h) }
+func (h dirStatHeap) Less(i, j int) bool { return h[i].Bytes < h[j].Bytes }
+func (h dirStatHeap) Swap(i, j int)      { h[i], h[j] = h[j], h[i] }
+func (h *dirStatHeap) Push(x any)        { *h = append(*h, x.(dirStat)) }
+func (h *dirStatHeap) Pop() any {
+	old := *h
+	x := old[len(old)-1]
+	*h = old[:len(old)-1]
+	return x
+}
+
+// summaryWalker computes du-style aggregates with a pool of workers that
+// read directories in parallel. Only counters are kept, never entries.
+type summaryWalker struct {
+	root    string
+	absRoot string
+	opts    *walkOptions
+
+	mu     sync.Mutex
+	cond   *sync.Cond
+	queue  []*summaryDir
+	active int
+
+	topMu sync.Mutex
+	top   dirStatHeap
+}
+
+// summarizeTree walks root and returns aggregate statistics
+func summarizeTree(ctx context.Context, root string, opts *walkOptions) (*listSummary, error) {
+	// Fail early if the root itself can't be read
+	f, err := os.Open(root)
+	if err != nil {
+		return nil, fmt.Errorf("failed to read directory %q: %v", root, err)
+	}
+	f.Close()
+
+	w := &summaryWalker{root: root, absRoot: absPath(root), opts: opts}
+	w.cond = sync.NewCond(&w.mu)
+	rootDir := &summaryDir{rel: ".", depth: 1, scope: opts.scopeFor(nil, root, ".")}
+	rootDir.pending.Store(1)
+	w.queue = append(w.queue, rootDir)
+
+	workers := runtime.GOMAXPROCS(0) * 2
+	if workers > 16 {
+		workers = 16
+	}
+	counts := make([]summaryCounts, workers)
+	var wg sync.WaitGroup
+	for i := 0; i < workers; i++ {
+		counts[i].extensions = make(map[string]*extensionStat)
+		wg.Add(1)
+		go func(c *summaryCounts) {
+			defer wg.Done()
+			w.work(ctx, c)
+		}(&counts[i])
+	}
+	wg.Wait()
+	if err := ctx.Err(); err != nil {
+		return nil, err
+	}
+
+	// Merge per-worker counters
+	summary := &listSummary{}
+	extensions := make(map[string]*extensionStat)
+	for _, c := range counts {
+		summary.Files += c.files
+		summary.Directories += c.directories
+		summary.TotalSize += c.bytes
+		for ext, st := range c.extensions {
+			if total, ok := extensions[ext]; ok {
+				total.Files += st.Files
+				total.Bytes += st.Bytes
+			} else {
+				extensions[ext] = st
+			}
+		}
+	}
+	summary.Extensions = topExtensions(extensions)
+
+	summary.TopDirectories = make([]dirStat, len(w.top))
+	copy(summary.TopDirectories, w.top)
+	sort.Slice(summary.TopDirectories, func(i, j int) bool {
+		return summary.TopDirectories[i].Bytes > summary.TopDirectories[j].Bytes
+	})
+	return summary, nil
+}
+
+// work takes directories from the queue until the whole tree is done
+func (w *summaryWalker) work(ctx context.Context, c *summaryCounts) {
+	for {
+		w.mu.Lock()
+		for len(w.queue) == 0 && w.active > 0 {
+			w.cond.Wait()
+		}
+		if len(w.queue) == 0 || ctx.Err() != nil {
+			w.queue = nil
+			w.cond.Broadcast()
+			w.mu.Unlock()
+			return
+		}
+		dir := w.queue[len(w.queue)-1]
+		w.queue = w.queue[:len(w.queue)-1]
+		w.active++
+		w.mu.Unlock()
+
+		w.scan(dir, c)
+		w.finish(dir)
+
+		w.mu.Lock()
+		w.active--
+		if w.active == 0 && len(w.queue) == 0 {
+			w.cond.Broadcast()
+		}
+		w.mu.Unlock()
+	}
+}
+
+// scan counts the entries of one directory and queues its subdirectories
+func (w *summaryWalker) scan(dir *summaryDir, c *summaryCounts) {
+	f, err := openDir(filepath.Join(w.absRoot, dir.rel))
+	if err != nil {
+		// Skip directories we can't access
+		return
+	}
+	defer f.Close()
+
+	for {
+		batch, err := f.ReadDir(readDirBatch)
+		for _, d := range batch {
+			rel := d.Name()
+			if dir.rel != "." {
+				rel = dir.rel + string(filepath.Separator) + d.Name()
+			}
+			report, descend := w.opts.visit(dir.scope, rel, d.Name(), d.IsDir(), dir.depth)
+			if report {
+				countEntry(dir, d, w.opts, c)
+			}
+			if descend {
+				child := &summaryDir{
+					parent: dir,
+					rel:    rel,
+					depth:  dir.depth + 1,
+					scope:  w.opts.scopeFor(dir.scope, w.root, rel),
+				}
+				child.pending.Store(1)
+				dir.pending.Add(1)
+				w.mu.Lock()
+				w.queue = append(w.queue, child)
+				w.cond.Signal()
+				w.mu.Unlock()
+			}
+		}
+		if err != nil || len(batch) == 0 {
+			return
+		}
+	}
+}
+
+// countEntry adds a reported entry to the worker and directory totals
+func countEntry(dir *summaryDir, d fs.DirEntry, opts *walkOptions, c *summaryCounts) {
+	info, err := d.Info()
+	if err != nil || !opts.accept(info) {
+		// Entry vanished, can't be accessed or is filtered out
+		return
+	}
+	if info.IsDir() {
+		c.directories++
+		return
+	}
+
+	size := info.Size()
+	c.files++
+	c.bytes += size
+	dir.files.Add(1)
+	dir.bytes.Add(size)
+
+	ext := strings.ToLower(filepath.Ext(d.Name()))
+	st, ok := c.extensions[ext]
+	if !ok {
+		st = &extensionStat{Extension: ext}
+		c.extensions[ext] = st
+	}
+	st.Files++
+	st.Bytes += size
+}
+
+// finish releases one pending reference of dir and, once its subtree is
+// complete, records it and folds its totals into the parent
+func (w *summaryWalker) finish(dir *summaryDir) {
+	for dir != nil && dir.pending.Add(-1) == 0 {
+		if dir.parent == nil {
+			return
+		}
+		w.record(dirStat{Path: filepath.ToSlash(dir.rel), Files: dir.files.Load(), Bytes: dir.bytes.Load()})
+		dir.parent.files.Add(dir.files.Load())
+		dir.parent.bytes.Add(dir.bytes.Load())
+		dir = dir.parent
+	}
+}
+
+func (w *summaryWalker) record(st dirStat) {
+	w.topMu.Lock()
+	defer w.topMu.Unlock()
+	if len(w.top) < summaryTopDirs {
+		heap.Push(&w.top, st)
+	} else if st.Bytes > w.top[0].Bytes {
+		w.top[0] = st
+		heap.Fix(&w.top, 0)
+	}
+}
+
+// topExtensions returns the extensions with the most bytes, merging the tail into "(other)"
+func topExtensions(extensions map[string]*extensionStat) []extensionStat {
+	stats := make([]extensionStat, 0, len(extensions))
+	for _, st := range extensions {
+		if st.Extension == "" {
+			st.Extension = "(none)"
+		}
+		stats = append(stats, *st)
+	}
+	sort.Slice(stats, func(i, j int) bool {
+		if stats[i].Bytes != stats[j].Bytes {
+			return stats[i].Bytes > stats[j].Bytes
+		}
+		return stats[i].Extension < stats[j].Extension
+	})
+	if len(stats) > summaryMaxExtensions {
+		other := extensionStat{Extension: "(other)"}
+		for _, st := range stats[summaryMaxExtensions-1:] {
+			other.Files += st.Files
+			other.Bytes += st.Bytes
+		}
+		stats = append(stats[:summaryMaxExtensions-1], other)
+	}
+	return stats
+}
@@ -0,0 +1,93 @@
+package main
+
+import (
+	"container/heap"
+	"fmt"
+	"path/filepath"
+	"sort"
+)
+
+// Sort keys for top_k selection
+const (
+	sortBySize  = "size"
+	sortByMtime = "mtime"
+)
+
+// topKCollector keeps the k greatest entries by size or mtime in a min-heap,
+// so selecting from n entries takes O(n log k) time and O(k) memory
+type topKCollector struct {
+	k       int
+	byMtime bool
+	entries []walkEntry
+}
+
+func newTopKCollector(k int, sortBy string) (*topKCollector, error) {
+	switch sortBy {
+	case "", sortBySize:
+		return &topKCollector{k: k}, nil
+	case sortByMtime:
+		return &topKCollector{k: k, byMtime: true}, nil
+	default:
+		return nil, fmt.Errorf("invalid sort_by %q: must be size or mtime", sortBy)
+	}
+}
+
+func (c *topKCollector) Len() int      { return len(c.entries) }
+func (c *topKCollector) Swap(i, j int) { c.entries[i], c.entries[j] = c.entries[j], c.entries[i] }
+func (c *topKCollector) Less(i, j int) bool {
+	return c.less(c.entries[i], c.entries[j])
+}
+func (c *topKCollector) Push(x any) { c.entries = append(c.entries, x.(walkEntry)) }
+func (c *topKCollector) Pop() any {
+	x := c.entries[len(c.entries)-1]
+	c.entries = c.entries[:len(c.entries)-1]
+	return x
+}
+
+func (c *topKCollector) less(a, b walkEntry) bool {
+	if c.byMtime {
+		return a.Info.ModTime().Before(b.Info.ModTime())
+	}
+	return a.Info.Size() < b.Info.Size()
+}
+
+// add offers an entry; it is kept only if it ranks among the top k so far
+func (c *topKCollector) add(e walkEntry) {
+	if len(c.entries) < c.k {
+		heap.Push(c, e)
+	} else if c.less(c.entries[0], e) {
+		c.entries[0] = e
+		heap.Fix(c, 0)
+	}
+}
+
+// sorted returns the selected entries, greatest first. The tree format needs
+// entries grouped by directory, so it gets them in path order instead.
+func (c *topKCollector) sorted(format string) []walkEntry {
+	entries := c.entries
+	if format == listFormatTree {
+		sort.Slice(entries, func(i, j int) bool {
+			return pathLess(entries[i].Rel, entries[j].Rel)
+		})
+		return entries
+	}
+	sort.Slice(entries, func(i, j int) bool {
+		return c.less(entries[j], entries[i])
+	})
+	return entries
+}
+
+// pathLess orders paths component by component, so that a directory's
+// descendants sort directly after it
+func pathLess(a, b string) bool {
+	a, b = filepath.ToSlash(a), filepath.ToSlash(b)
+	for a != "" && b != "" {
+		ca, ra := splitComponent(a)
+		cb, rb := splitComponent(b)
+		if ca != cb {
+			return ca < cb
+		}
+		a, b = ra, rb
+	}
+	return a == "" && b != ""
+}
@@ -14,6 +14,36 @@ type EditFileRequest struct {
 	// Backward compatibility
 	OldText *string `json:"old_text,omitempty"`
 	NewText *string `json:"new_text,omitempty"`
+	// Sync mode before the atomic rename: none (default), fdatasync or fsync
+	Durability *string `json:"durability,omitempty"`
+	// Reject the edit unless the file still has this hash ("" = must not exist) or modification time
+	ExpectedHash  *string `json:"expected_hash,omitempty"`
+	ExpectedMtime *string `json:"expected_mtime,omitempty"`
+	// Ordered replacements applied with one read and one write per file
+	Edits []EditOperation `json:"edits,omitempty"`
+	// Replace lines start_line..end_line (1-based, inclusive) or bytes [start_byte, end_byte) with new_string
+	StartLine *int   `json:"start_line,omitempty"`
+	EndLine   *int   `json:"end_line,omitempty"`
+	StartByte *int64 `json:"start_byte,omitempty"`
+	EndByte   *int64 `json:"end_byte,omitempty"`
+	// Treat old_string as a regular expression and new_string as a template ($1, ${name})
+	Regex *bool `json:"regex,omitempty"`
+	// Match old_string with whitespace normalized, then within max_distance edits (default: 1 per 10 bytes)
+	Fuzzy       *bool `json:"fuzzy,omitempty"`
+	MaxDistance *int  `json:"max_distance,omitempty"`
+	// Replace only the first count matches, or fail unless old_string matches exactly once
+	Count        *int  `json:"count,omitempty"`
+	ExpectUnique *bool `json:"expect_unique,omitempty"`
+	// Also return a unified diff of the change with diff_context lines of context (default 3)
+	ReturnDiff  *bool `json:"return_diff,omitempty"`
+	DiffContext *int  `json:"diff_context,omitempty"`
+}
+
+// EditOperation is one replacement of an edit_file batch
+type EditOperation struct {
+	Filename  string `json:"filename,omitempty"` // Defaults to the request filename
+	OldString string `json:"old_string"`
+	NewString string `json:"new_string,omitempty"` // Empty to remove old_string
 }
 
 type ReadFileRequest struct {
@@ -29,13 +59,81 @@ type ReadFileRequest struct {
 
 type ExecRequest struct {
 	Command string  `json:"command"`
-	Timeout *int    `json:"timeout,omitempty"` // Default: 300 seconds
+	Timeout *int    `json:"timeout,omitempty"`  // Default: 300 seconds
 	WorkDir *string `json:"work_dir,omitempty"` // Working directory for command execution (default: current working directory)
 }
 
 type WriteFileRequest struct {
+	Filename   string  `json:"filename"`
+	Content    string  `json:"content"`
+	Durability *string `json:"durability,omitempty"` // none (default), fdatasync or fsync
+	Encoding   *string `json:"encoding,omitempty"`   // How content is encoded: utf-8 (default) or base64
+	// Reject the write unless the file still has this hash ("" = must not exist) or modification time
+	ExpectedHash  *string `json:"expected_hash,omitempty"`
+	ExpectedMtime *string `json:"expected_mtime,omitempty"`
+}
+
+type WriteFilesRequest struct {
+	Files      []FileWrite `json:"files"`
+	Durability *string     `json:"durability,omitempty"` // none (default), fdatasync or fsync
+	// Replace every file or none (default: each file is written on its own)
+	Atomic *bool `json:"atomic,omitempty"`
+}
+
+// FileWrite is one file of a write_files call
+type FileWrite struct {
+	Filename string  `json:"filename"`
+	Content  string  `json:"content"`
+	Encoding *string `json:"encoding,omitempty"` // utf-8 (default) or base64
+}
+
+type UploadFileRequest struct {
 	Filename string `json:"filename"`
-	Content  string `json:"content"`
+	// begin (with the total size, optional), chunk (content at offset), status, commit or abort
+	Action     string  `json:"action"`
+	UploadID   *string `json:"upload_id,omitempty"` // Returned by begin, required by the other actions
+	Offset     *int64  `json:"offset,omitempty"`
+	Size       *int64  `json:"size,omitempty"`
+	Content    *string `json:"content,omitempty"`    // The chunk
+	Encoding   *string `json:"encoding,omitempty"`   // How content is encoded: utf-8 (default) or base64
+	Durability *string `json:"durability,omitempty"` // none (default), fdatasync or fsync
+	// Reject the commit unless the file still has this hash ("" = must not exist) or modification time
+	ExpectedHash  *string `json:"expected_hash,omitempty"`
+	ExpectedMtime *string `json:"expected_mtime,omitempty"`
+}
+
+type CopyFileRequest struct {
+	Source      string  `json:"source"`               // A file, symlink or directory
+	Destination string  `json:"destination"`          // Its new path, not the directory to put it in
+	Overwrite   *bool   `json:"overwrite,omitempty"`  // Replace existing files (default: fail if the destination exists)
+	Durability  *string `json:"durability,omitempty"` // none (default), fdatasync or fsync
+}
+
+type ApplyPatchRequest struct {
+	Patch     string  `json:"patch"`               // Unified diff of one or more files
+	Directory *string `json:"directory,omitempty"` // Resolve the file names of the patch relative to this directory
+	// Leading path components to remove from the file names, like patch -p (default: a/ and b/ prefixes only)
+	Strip      *int    `json:"strip,omitempty"`
+	Fuzz       *int    `json:"fuzz,omitempty"`       // Context lines at each end of a hunk that may mismatch (default: 2)
+	Durability *string `json:"durability,omitempty"` // none (default), fdatasync or fsync
+}
+
+type DiffFilesRequest struct {
+	OldFile     string  `json:"old_file"`
+	NewFile     *string `json:"new_file,omitempty"`     // The file to compare with, or
+	NewContent  *string `json:"new_content,omitempty"`  // the content to compare with
+	DiffContext *int    `json:"diff_context,omitempty"` // Unchanged lines around each change (default: 3)
+	MaxBytes    *int64  `json:"max_bytes,omitempty"`    // Cap on the diff text; further hunks are only counted (default: 65536)
+}
+
+type UndoRequest struct {
+	Filename   string  `json:"filename"`
+	Durability *string `json:"durability,omitempty"` // none (default), fdatasync or fsync
+}
+
+type HistoryRequest struct {
+	Filename *string `json:"filename,omitempty"` // Only changes of this file (default: all files)
+	Limit    *int    `json:"limit,omitempty"`    // Maximum entries, newest first (default: 50)
 }
 
 type ListFilesRequest struct {
@@ -44,6 +142,20 @@ type ListFilesRequest struct {
 	Recursive  *bool   `json:"recursive,omitempty"`
 	ShowHidden *bool   `json:"show_hidden,omitempty"`
 	MaxDepth   *int    `json:"max_depth,omitempty"`
+	Limit      *int    `json:"limit,omitempty"`  // Maximum entries per page (default: no limit)
+	Cursor     *string `json:"cursor,omitempty"` // Opaque next_cursor from a previous page
+	// Skip paths matched by .gitignore/.ignore files found during the walk
+	RespectGitignore *bool    `json:"respect_gitignore,omitempty"`
+	Exclude          []string `json:"exclude,omitempty"`         // .gitignore-style patterns relative to path
+	Summary          *bool    `json:"summary,omitempty"`         // Return aggregate statistics instead of entries
+	Format           *string  `json:"format,omitempty"`          // Output encoding: entries (default), compact or tree
+	LargerThan       *int64   `json:"larger_than,omitempty"`     // Only files larger than this many bytes
+	SmallerThan      *int64   `json:"smaller_than,omitempty"`    // Only files smaller than this many bytes
+	ModifiedAfter    *string  `json:"modified_after,omitempty"`  // RFC3339 timestamp
+	ModifiedBefore   *string  `json:"modified_before,omitempty"` // RFC3339 timestamp
+	TopK             *int     `json:"top_k,omitempty"`           // Return only the k greatest files by sort_by
+	SortBy           *string  `json:"sort_by,omitempty"`         // size (default) or mtime, used with top_k
+	Fields           []string `json:"fields,omitempty"`          // Extra file fields: lines, encoding, is_binary, mime
 }
 
 type commandTracker struct {
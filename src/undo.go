@@ -0,0 +1,172 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"io/fs"
+	"os"
+	"strconv"
+	"time"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+func handleUndo(ctx context.Context, req *mcp.CallToolRequest, input UndoRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log full request if debug mode
+	if logger != nil {
+		reqJSON, _ := json.MarshalIndent(req, "", "  ")
+		logger.Debug("undo REQUEST", "request", string(reqJSON))
+		logger.Debug("undo called", "filename", input.Filename)
+	}
+
+	if editJournal == nil {
+		return nil, nil, fmt.Errorf("the edit journal is disabled (start the server with -journal-size greater than 0)")
+	}
+	if input.Filename == "" {
+		return nil, nil, fmt.Errorf("invalid arguments: filename is required")
+	}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+
+	// Serialize with other mutations of this file
+	unlock := fileLocks.lock(input.Filename)
+	defer unlock()
+
+	entry := editJournal.latest(canonicalPath(input.Filename))
+	if entry == nil {
+		return nil, nil, fmt.Errorf("no journaled change of %q to undo", input.Filename)
+	}
+	if !entry.journaled {
+		return nil, nil, fmt.Errorf("cannot undo the last change of %q: it was too large to be journaled", input.Filename)
+	}
+	if err := checkUndoable(input.Filename, entry); err != nil {
+		return nil, nil, err
+	}
+
+	var message string
+	var written int64
+	if entry.created {
+		// The change created the file
+		if err := os.Remove(input.Filename); err != nil {
+			return nil, nil, fmt.Errorf("failed to remove file %q: %v", input.Filename, err)
+		}
+		dirChanged(input.Filename)
+		editJournal.undone(entry, fileVersion{})
+		message = fmt.Sprintf("File %s removed: it was created by the %s call at %s", input.Filename, entry.tool, entry.time.Format(time.RFC3339Nano))
+	} else {
+		delta, err := editJournal.loadDelta(entry)
+		if err != nil {
+			return nil, nil, err
+		}
+		var version fileVersion
+		written, version, err = applyReverseDelta(input.Filename, delta, entry.before, durability)
+		if err != nil {
+			return nil, nil, err
+		}
+		editJournal.undone(entry, version)
+		message = fmt.Sprintf("File %s restored to its content before the %s call at %s. Bytes written: %d. %s",
+			input.Filename, entry.tool, entry.time.Format(time.RFC3339Nano), written, version)
+	}
+
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: message},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		logger.Debug("undo completed", "filename", input.Filename, "entry", entry.id, "bytes_written", written)
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("undo RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
+
+// checkUndoable verifies that the file is still as the journaled change left
+// it. The file identity, size and mtime are enough when they are unchanged;
+// otherwise the content hash must match.
+func checkUndoable(filename string, entry *journalEntry) error {
+	info, err := os.Stat(filename)
+	if errors.Is(err, fs.ErrNotExist) {
+		return fmt.Errorf("cannot undo the last change of %q: the file no longer exists", filename)
+	}
+	if err != nil {
+		return fmt.Errorf("failed to access file %q: %v", filename, err)
+	}
+	key := fileKeyOf(canonicalPath(filename), info)
+	if key == entry.after.key {
+		return nil
+	}
+	if entry.after.hash != "" {
+		current := ""
+		if sum, ok := contentHashes.get(key); ok {
+			current = formatSum(sum)
+		} else if current, err = hashFile(filename); err != nil {
+			return fmt.Errorf("failed to read file %q: %v", filename, err)
+		}
+		if current == entry.after.hash {
+			return nil
+		}
+	}
+	return fmt.Errorf("cannot undo the last change of %q: the file was modified since", filename)
+}
+
+// applyReverseDelta rewrites filename with the delta applied. The unchanged
+// regions are copied by the kernel; only the text put back is written. before
+// is the hash of the restored content when it is known.
+func applyReverseDelta(filename string, delta *reverseDelta, before, durability string) (int64, fileVersion, error) {
+	f, err := os.Open(filename)
+	if err != nil {
+		return 0, fileVersion{}, fmt.Errorf("failed to read file %q: %v", filename, err)
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return 0, fileVersion{}, fmt.Errorf("failed to access file %q: %v", filename, err)
+	}
+	size := info.Size()
+
+	s, err := stageWrite(filename, durability)
+	if err != nil {
+		return 0, fileVersion{}, err
+	}
+	pos := int64(0)
+	for _, op := range delta.ops {
+		if op.offset < pos || op.offset+op.length > size {
+			s.Abort()
+			return 0, fileVersion{}, fmt.Errorf("journaled change does not match the content of %q", filename)
+		}
+		if err := s.copyRange(f, pos, op.offset-pos); err != nil {
+			s.Abort()
+			return 0, fileVersion{}, fmt.Errorf("failed to copy file %q: %v", filename, err)
+		}
+		if _, err := s.Write(op.text); err != nil {
+			s.Abort()
+			return 0, fileVersion{}, fmt.Errorf("failed to write file %q: %v", filename, err)
+		}
+		pos = op.offset + op.length
+	}
+	if err := s.copyRange(f, pos, size-pos); err != nil {
+		s.Abort()
+		return 0, fileVersion{}, fmt.Errorf("failed to copy file %q: %v", filename, err)
+	}
+	if err := s.Commit(); err != nil {
+		return 0, fileVersion{}, err
+	}
+	version := s.version()
+	if sum, err := strconv.ParseUint(before, 16, 64); err == nil {
+		s.remember(sum)
+		version.hash = before
+	}
+	return s.written, version, nil
+}
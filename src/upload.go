@@ -0,0 +1,402 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"io"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"strings"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// Actions of upload_file
+const (
+	uploadBegin  = "begin"
+	uploadChunk  = "chunk"
+	uploadStatus = "status"
+	uploadCommit = "commit"
+	uploadAbort  = "abort"
+)
+
+// uploadSession is a file being uploaded in chunks. The chunks are written
+// straight into a temporary file next to the target, and the byte ranges
+// received so far are kept in a small manifest beside it, so a session
+// survives a restart of the server and an interrupted upload can resume.
+type uploadSession struct {
+	path     string // target (symlinks resolved)
+	data     string // temporary file holding the chunks
+	manifest string
+}
+
+// uploadManifest is the persisted state of a session
+type uploadManifest struct {
+	Size   *int64     `json:"size,omitempty"` // total size, if given at begin
+	Ranges [][2]int64 `json:"ranges"`         // received [start, end), sorted and merged
+}
+
+// openUploadSession locates the session id of filename. Ids are the random
+// suffix of the temporary file's name, so they can't point anywhere else.
+func openUploadSession(filename, id string) (*uploadSession, error) {
+	if id == "" || strings.Trim(id, "0123456789") != "" {
+		return nil, fmt.Errorf("invalid arguments: invalid upload_id %q", id)
+	}
+	path := filename
+	if resolved, err := filepath.EvalSymlinks(path); err == nil {
+		path = resolved
+	}
+	data := filepath.Join(filepath.Dir(path), "."+filepath.Base(path)+".tmp-"+id)
+	return &uploadSession{path: path, data: data, manifest: data + ".upload"}, nil
+}
+
+func (u *uploadSession) load() (*uploadManifest, error) {
+	raw, err := os.ReadFile(u.manifest)
+	if errors.Is(err, fs.ErrNotExist) {
+		return nil, fmt.Errorf("no upload session %q for %q: it was committed, aborted or never begun", u.id(), u.path)
+	}
+	if err != nil {
+		return nil, fmt.Errorf("failed to read upload session %q: %v", u.id(), err)
+	}
+	var m uploadManifest
+	if err := json.Unmarshal(raw, &m); err != nil {
+		return nil, fmt.Errorf("corrupt upload session %q: %v", u.id(), err)
+	}
+	return &m, nil
+}
+
+func (u *uploadSession) save(m *uploadManifest) error {
+	raw, err := json.Marshal(m)
+	if err != nil {
+		return err
+	}
+	if _, err := writeFileAtomic(u.manifest, raw, durabilityNone); err != nil {
+		return fmt.Errorf("failed to save upload session %q: %v", u.id(), err)
+	}
+	return nil
+}
+
+func (u *uploadSession) id() string {
+	return u.data[strings.LastIndex(u.data, ".tmp-")+len(".tmp-"):]
+}
+
+func (u *uploadSession) remove() {
+	os.Remove(u.data)
+	os.Remove(u.manifest)
+	dirChanged(u.data)
+}
+
+// add records that [start, end) was received, merging it with the ranges
+// it overlaps or touches
+func (m *uploadManifest) add(start, end int64) {
+	merged := make([][2]int64, 0, len(m.Ranges)+1)
+	placed := false
+	for _, r := range m.Ranges {
+		switch {
+		case r[1] < start:
+			merged = append(merged, r)
+		case r[0] > end:
+			if !placed {
+				merged = append(merged, [2]int64{start, end})
+				placed = true
+			}
+			merged = append(merged, r)
+		default:
+			if r[0] < start {
+				start = r[0]
+			}
+			if r[1] > end {
+				end = r[1]
+			}
+		}
+	}
+	if !placed {
+		merged = append(merged, [2]int64{start, end})
+	}
+	m.Ranges = merged
+}
+
+// received returns the number of bytes received
+func (m *uploadManifest) received() int64 {
+	var n int64
+	for _, r := range m.Ranges {
+		n += r[1] - r[0]
+	}
+	return n
+}
+
+// missing returns the gaps between the received ranges, and after them up
+// to the total size if it is known
+func (m *uploadManifest) missing() [][2]int64 {
+	var gaps [][2]int64
+	pos := int64(0)
+	for _, r := range m.Ranges {
+		if r[0] > pos {
+			gaps = append(gaps, [2]int64{pos, r[0]})
+		}
+		pos = r[1]
+	}
+	if m.Size != nil && pos < *m.Size {
+		gaps = append(gaps, [2]int64{pos, *m.Size})
+	}
+	return gaps
+}
+
+// size returns the size of the uploaded file
+func (m *uploadManifest) size() int64 {
+	if m.Size != nil {
+		return *m.Size
+	}
+	if len(m.Ranges) == 0 {
+		return 0
+	}
+	return m.Ranges[len(m.Ranges)-1][1]
+}
+
+func formatRanges(ranges [][2]int64) string {
+	if len(ranges) == 0 {
+		return "none"
+	}
+	parts := make([]string, len(ranges))
+	for i, r := range ranges {
+		parts[i] = fmt.Sprintf("%d-%d", r[0], r[1])
+	}
+	return strings.Join(parts, ", ")
+}
+
+func handleUploadFile(ctx context.Context, req *mcp.CallToolRequest, input UploadFileRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log full request if debug mode, without the chunk itself
+	if logger != nil {
+		logger.Debug("upload_file called", "filename", input.Filename, "action", input.Action, "offset", input.Offset)
+	}
+
+	if input.Filename == "" {
+		return nil, nil, fmt.Errorf("invalid arguments: filename is required")
+	}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	precondition, err := parsePrecondition(input.ExpectedHash, input.ExpectedMtime)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	message, err := applyUpload(input, durability, precondition)
+	if err != nil {
+		return nil, nil, err
+	}
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: message},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("upload_file RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
+
+// applyUpload runs one action of an upload session and returns the message
+// of the result
+func applyUpload(input UploadFileRequest, durability string, precondition *writePrecondition) (string, error) {
+	action := input.Action
+	if action != uploadBegin && (input.UploadID == nil || *input.UploadID == "") {
+		return "", fmt.Errorf("invalid arguments: action %q requires upload_id", action)
+	}
+	if input.Offset != nil && action != uploadChunk {
+		return "", fmt.Errorf("invalid arguments: offset is only used with action \"chunk\"")
+	}
+	if input.Size != nil && action != uploadBegin {
+		return "", fmt.Errorf("invalid arguments: size is only used with action \"begin\"")
+	}
+	if (input.Content != nil || input.Encoding != nil) && action != uploadChunk {
+		return "", fmt.Errorf("invalid arguments: content and encoding are only sent with action \"chunk\"")
+	}
+	if precondition != nil && action != uploadCommit {
+		return "", fmt.Errorf("invalid arguments: expected_hash and expected_mtime are checked by action \"commit\"")
+	}
+
+	switch action {
+	case uploadBegin:
+		return beginUpload(input.Filename, input.Size)
+	case uploadChunk:
+		return writeUploadChunk(input, durability)
+	case uploadStatus, uploadCommit, uploadAbort:
+	default:
+		return "", fmt.Errorf("invalid arguments: invalid action %q: must be one of begin, chunk, status, commit, abort", action)
+	}
+
+	u, err := openUploadSession(input.Filename, *input.UploadID)
+	if err != nil {
+		return "", err
+	}
+	// The target is locked with the manifest in one call: locking it again
+	// in commitUpload would deadlock when both share a stripe
+	unlock := fileLocks.lock(u.manifest, input.Filename)
+	defer unlock()
+	m, err := u.load()
+	if err != nil {
+		return "", err
+	}
+	switch action {
+	case uploadStatus:
+		return fmt.Sprintf("Upload %s to %s: %d bytes received (%s). Missing: %s",
+			u.id(), input.Filename, m.received(), formatRanges(m.Ranges), formatRanges(m.missing())), nil
+	case uploadAbort:
+		u.remove()
+		return fmt.Sprintf("Upload %s to %s aborted", u.id(), input.Filename), nil
+	}
+	return commitUpload(u, m, input.Filename, durability, precondition)
+}
+
+// beginUpload creates the temporary file and the manifest of a new session.
+// A known size is allocated up front so chunks arriving out of order don't
+// extend the file piecemeal.
+func beginUpload(filename string, size *int64) (string, error) {
+	if size != nil && *size < 0 {
+		return "", fmt.Errorf("invalid arguments: size must not be negative")
+	}
+	if err := createdDirs.ensureParent(filename); err != nil {
+		return "", err
+	}
+	s, err := stageWrite(filename, durabilityNone)
+	if err != nil {
+		return "", err
+	}
+	if size != nil {
+		if err := s.tmp.Truncate(*size); err != nil {
+			s.Abort()
+			return "", fmt.Errorf("failed to allocate %d bytes for %q: %v", *size, filename, err)
+		}
+	}
+	if err := s.tmp.Close(); err != nil {
+		os.Remove(s.tmp.Name())
+		return "", fmt.Errorf("failed to create upload for %q: %v", filename, err)
+	}
+	u := &uploadSession{path: s.path, data: s.tmp.Name(), manifest: s.tmp.Name() + ".upload"}
+	if err := u.save(&uploadManifest{Size: size, Ranges: [][2]int64{}}); err != nil {
+		os.Remove(u.data)
+		return "", err
+	}
+	return fmt.Sprintf("Upload to %s started. Upload ID: %s", filename, u.id()), nil
+}
+
+// writeUploadChunk writes content at offset of the session's temporary
+// file and records the range once the data is written, so a chunk is either
+// received or has to be sent again. Chunks of a session are written one at a
+// time, which also keeps them from racing a commit.
+func writeUploadChunk(input UploadFileRequest, durability string) (string, error) {
+	if input.Offset == nil || *input.Offset < 0 {
+		return "", fmt.Errorf("invalid arguments: action \"chunk\" requires a non-negative offset")
+	}
+	if input.Content == nil || *input.Content == "" {
+		return "", fmt.Errorf("invalid arguments: action \"chunk\" requires content")
+	}
+	encoding, err := parseContentEncoding(input.Encoding)
+	if err != nil {
+		return "", fmt.Errorf("invalid arguments: %v", err)
+	}
+	u, err := openUploadSession(input.Filename, *input.UploadID)
+	if err != nil {
+		return "", err
+	}
+	unlock := fileLocks.lock(u.manifest)
+	defer unlock()
+	m, err := u.load()
+	if err != nil {
+		return "", err
+	}
+	// A base64 chunk is decoded once before it is written, to know its length
+	// and so that invalid content can't overwrite bytes already received
+	offset, n := *input.Offset, int64(len(*input.Content))
+	if encoding == contentBase64 {
+		if n, err = io.Copy(io.Discard, contentReader(*input.Content, encoding)); err != nil {
+			return "", contentError(err)
+		}
+	}
+	end := offset + n
+	if m.Size != nil && end > *m.Size {
+		return "", fmt.Errorf("invalid arguments: chunk %d-%d ends past the upload size %d", offset, end, *m.Size)
+	}
+
+	f, err := os.OpenFile(u.data, os.O_WRONLY, 0)
+	if err != nil {
+		return "", fmt.Errorf("failed to open upload %q: %v", u.id(), err)
+	}
+	_, err = io.Copy(io.NewOffsetWriter(f, offset), contentReader(*input.Content, encoding))
+	dirChanged(u.data)
+	if err == nil && durability != durabilityNone {
+		err = fdatasync(f)
+	}
+	if closeErr := f.Close(); err == nil {
+		err = closeErr
+	}
+	if err != nil {
+		return "", fmt.Errorf("failed to write chunk of upload %q: %v", u.id(), err)
+	}
+	m.add(offset, end)
+	if err := u.save(m); err != nil {
+		return "", err
+	}
+	return fmt.Sprintf("Chunk %d-%d of upload %s written. Received: %d bytes", offset, end, u.id(), m.received()), nil
+}
+
+// commitUpload renames the complete temporary file over the target like
+// write_file does. It is hashed on the way, reading it once more with a
+// fixed buffer rather than into memory. A commit that fails before the
+// rename keeps the session, so it can be sent again. The caller holds the
+// locks of the manifest and of the target.
+func commitUpload(u *uploadSession, m *uploadManifest, filename, durability string, precondition *writePrecondition) (string, error) {
+	if gaps := m.missing(); len(gaps) > 0 {
+		return "", fmt.Errorf("upload %s to %q is incomplete: missing %s", u.id(), filename, formatRanges(gaps))
+	}
+	if err := precondition.checkMtime(filename); err != nil {
+		return "", err
+	}
+	if err := precondition.checkFileHash(filename); err != nil {
+		return "", err
+	}
+
+	f, err := os.OpenFile(u.data, os.O_RDWR, 0)
+	if err != nil {
+		return "", fmt.Errorf("failed to open upload %q: %v", u.id(), err)
+	}
+	s := &stagedWrite{path: u.path, tmp: f, durability: durability, hash: newContentHash(), keep: true}
+	size := m.size()
+	if err := f.Truncate(size); err != nil {
+		f.Close()
+		return "", fmt.Errorf("failed to write file %q: %v", filename, err)
+	}
+	if s.written, err = io.Copy(s.hash, f); err != nil || s.written != size {
+		f.Close()
+		return "", fmt.Errorf("failed to read upload %q: %d of %d bytes, %v", u.id(), s.written, size, err)
+	}
+
+	change := editJournal.beginRewrite(filename)
+	if err := s.Commit(); err != nil {
+		if _, statErr := os.Lstat(u.data); statErr == nil {
+			// Not renamed: the session stays for the client to commit again
+			return "", err
+		}
+		os.Remove(u.manifest)
+		dirChanged(u.manifest)
+		return "", err
+	}
+	os.Remove(u.manifest)
+	dirChanged(u.manifest)
+	change.rewrittenAll(size)
+	version := s.version()
+	editJournal.record("upload_file", change, version)
+	return fmt.Sprintf("File %s written successfully. Bytes written: %d. %s", filename, size, version), nil
+}
@@ -0,0 +1,228 @@
+package main
+
+import (
+	"bytes"
+	"context"
+	"encoding/base64"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"regexp"
+	"strings"
+	"testing"
+	"time"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+func uploadCall(t *testing.T, input UploadFileRequest) (string, error) {
+	t.Helper()
+	result, _, err := handleUploadFile(context.Background(), nil, input)
+	if err != nil {
+		return "", err
+	}
+	return result.Content[0].(*mcp.TextContent).Text, nil
+}
+
+func TestUploadOutOfOrderChunks(t *testing.T) {
+	dir := t.TempDir()
+	name := filepath.Join(dir, "sub", "upload.bin")
+	str := func(s string) *string { return &s }
+	num := func(n int64) *int64 { return &n }
+
+	rng := rand.New(rand.NewSource(1))
+	content := make([]byte, 10000)
+	for i := range content {
+		content[i] = "abcdef\n"[rng.Intn(7)]
+	}
+	text, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadBegin, Size: num(int64(len(content)))})
+	if err != nil {
+		t.Fatal(err)
+	}
+	id := regexp.MustCompile(`Upload ID: (\d+)`).FindStringSubmatch(text)[1]
+
+	// Send overlapping chunks in a random order, holding one back
+	var offsets []int64
+	for off := int64(0); off < int64(len(content)); off += 700 {
+		offsets = append(offsets, off)
+	}
+	rng.Shuffle(len(offsets), func(i, j int) { offsets[i], offsets[j] = offsets[j], offsets[i] })
+	for _, off := range offsets[1:] {
+		end := off + 700 + int64(rng.Intn(100))
+		if end > int64(len(content)) {
+			end = int64(len(content))
+		}
+		if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: num(off), Content: str(string(content[off:end]))}); err != nil {
+			t.Fatal(err)
+		}
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id}); err == nil || !strings.Contains(err.Error(), "incomplete") {
+		t.Fatalf("commit of an incomplete upload: %v", err)
+	}
+	status, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadStatus, UploadID: &id})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if !strings.Contains(status, "Missing: ") || strings.Contains(status, "Missing: none") {
+		t.Fatalf("status: %s", status)
+	}
+	if _, err := os.Stat(name); err == nil {
+		t.Fatal("target created before the commit")
+	}
+
+	off := offsets[0]
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: num(off), Content: str(string(content[off:]))}); err != nil {
+		t.Fatal(err)
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id, Durability: str(durabilityFsync)}); err != nil {
+		t.Fatal(err)
+	}
+	got, err := os.ReadFile(name)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if string(got) != string(content) {
+		t.Fatal("committed content differs from the uploaded chunks")
+	}
+	entries, _ := os.ReadDir(filepath.Dir(name))
+	if len(entries) != 1 {
+		t.Fatalf("%d files left in the directory", len(entries))
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadStatus, UploadID: &id}); err == nil {
+		t.Fatal("session still open after the commit")
+	}
+}
+
+func TestUploadManifestRanges(t *testing.T) {
+	var m uploadManifest
+	size := int64(100)
+	m.Size = &size
+	for _, r := range [][2]int64{{50, 60}, {10, 20}, {20, 30}, {55, 70}, {0, 5}} {
+		m.add(r[0], r[1])
+	}
+	if got := formatRanges(m.Ranges); got != "0-5, 10-30, 50-70" {
+		t.Fatalf("ranges %s", got)
+	}
+	if got := formatRanges(m.missing()); got != "5-10, 30-50, 70-100" {
+		t.Fatalf("missing %s", got)
+	}
+	if m.received() != 45 {
+		t.Fatalf("received %d", m.received())
+	}
+}
+
+func TestUploadBase64Chunks(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "image.bin")
+	str := func(s string) *string { return &s }
+	num := func(n int64) *int64 { return &n }
+	content := make([]byte, 3000)
+	for i := range content {
+		content[i] = byte(i * 7)
+	}
+	text, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadBegin, Size: num(int64(len(content)))})
+	if err != nil {
+		t.Fatal(err)
+	}
+	id := regexp.MustCompile(`Upload ID: (\d+)`).FindStringSubmatch(text)[1]
+	for _, off := range []int64{1500, 0} {
+		chunk := base64.StdEncoding.EncodeToString(content[off : off+1500])
+		if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: num(off), Content: &chunk, Encoding: str(contentBase64)}); err != nil {
+			t.Fatal(err)
+		}
+	}
+	// A chunk decoding to more than fits is rejected
+	tooLong := base64.StdEncoding.EncodeToString(content[:3])
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: num(2998), Content: &tooLong, Encoding: str(contentBase64)}); err == nil {
+		t.Fatal("chunk past the size accepted")
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id}); err != nil {
+		t.Fatal(err)
+	}
+	if got, _ := os.ReadFile(name); !bytes.Equal(got, content) {
+		t.Fatal("committed content differs from the decoded chunks")
+	}
+}
+
+// TestUploadCommitSharedStripe commits an upload whose target and manifest
+// hash to the same lock stripe, which must not deadlock
+func TestUploadCommitSharedStripe(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "shared.bin")
+	text, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadBegin})
+	if err != nil {
+		t.Fatal(err)
+	}
+	id := regexp.MustCompile(`Upload ID: (\d+)`).FindStringSubmatch(text)[1]
+	u, err := openUploadSession(name, id)
+	if err != nil {
+		t.Fatal(err)
+	}
+
+	// Draw lock managers until the two paths collide
+	saved := fileLocks
+	defer func() { fileLocks = saved }()
+	for {
+		fileLocks = newPathLockManager()
+		if fileLocks.stripeOf(name) == fileLocks.stripeOf(u.manifest) {
+			break
+		}
+	}
+
+	content, offset := "collide", int64(0)
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: &offset, Content: &content}); err != nil {
+		t.Fatal(err)
+	}
+	done := make(chan error, 1)
+	go func() {
+		_, _, err := handleUploadFile(context.Background(), nil, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id})
+		done <- err
+	}()
+	select {
+	case err := <-done:
+		if err != nil {
+			t.Fatal(err)
+		}
+	case <-time.After(10 * time.Second):
+		t.Fatal("commit deadlocked on a shared lock stripe")
+	}
+	if got, _ := os.ReadFile(name); string(got) != content {
+		t.Fatalf("content: %q", got)
+	}
+}
+
+// TestUploadCommitRetry fails a commit at the rename and checks that the
+// session and its data are kept for the commit to be sent again
+func TestUploadCommitRetry(t *testing.T) {
+	name := filepath.Join(t.TempDir(), "retry.bin")
+	text, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadBegin})
+	if err != nil {
+		t.Fatal(err)
+	}
+	id := regexp.MustCompile(`Upload ID: (\d+)`).FindStringSubmatch(text)[1]
+	content, offset := "retried", int64(0)
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadChunk, UploadID: &id, Offset: &offset, Content: &content}); err != nil {
+		t.Fatal(err)
+	}
+
+	// A directory that isn't empty can't be replaced by the rename
+	writeTestFile(t, filepath.Join(name, "blocker"), "")
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id}); err == nil {
+		t.Fatal("commit over a directory succeeded")
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadStatus, UploadID: &id}); err != nil {
+		t.Fatalf("session lost by the failed commit: %v", err)
+	}
+
+	if err := os.RemoveAll(name); err != nil {
+		t.Fatal(err)
+	}
+	if _, err := uploadCall(t, UploadFileRequest{Filename: name, Action: uploadCommit, UploadID: &id}); err != nil {
+		t.Fatal(err)
+	}
+	if got, _ := os.ReadFile(name); string(got) != content {
+		t.Fatalf("content: %q", got)
+	}
+	entries, _ := os.ReadDir(filepath.Dir(name))
+	if len(entries) != 1 {
+		t.Fatalf("%d files left in the directory", len(entries))
+	}
+}
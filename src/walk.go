@@ -0,0 +1,307 @@
+package main
+
+import (
+	"encoding/base64"
+	"encoding/json"
+	"fmt"
+	"io"
+	"io/fs"
+	"path/filepath"
+	"sort"
+	"strings"
+	"time"
+)
+
+// readDirBatch is the number of directory entries read per File.ReadDir call.
+// It bounds the memory held per open directory during a walk.
+const readDirBatch = 256
+
+// walkOptions holds the filters shared by tree-walking tools
+type walkOptions struct {
+	recursive     bool
+	showHidden    bool
+	maxDepth      int // -1 means no limit
+	pattern       *globPattern
+	pathPattern   bool         // pattern is matched against the relative path instead of the name
+	respectIgnore bool         // honour .gitignore/.ignore files found during the walk
+	exclude       *ignoreScope // explicit exclusions anchored at the walk root
+
+	// Metadata predicates checked on reported entries; zero values disable them
+	largerThan     int64 // files only, size in bytes must be > largerThan
+	smallerThan    int64 // files only, size in bytes must be < smallerThan
+	modifiedAfter  time.Time
+	modifiedBefore time.Time
+	filesOnly      bool // directories are walked but never reported
+}
+
+// sizeFiltered reports whether size predicates restrict the entries to files
+func (o *walkOptions) sizeFiltered() bool {
+	return o.largerThan > 0 || o.smallerThan > 0
+}
+
+// accept applies the metadata predicates to an entry that passed visit
+func (o *walkOptions) accept(info fs.FileInfo) bool {
+	if info.IsDir() && (o.filesOnly || o.sizeFiltered()) {
+		return false
+	}
+	if o.largerThan > 0 && info.Size() <= o.largerThan {
+		return false
+	}
+	if o.smallerThan > 0 && info.Size() >= o.smallerThan {
+		return false
+	}
+	if !o.modifiedAfter.IsZero() && !info.ModTime().After(o.modifiedAfter) {
+		return false
+	}
+	if !o.modifiedBefore.IsZero() && !info.ModTime().Before(o.modifiedBefore) {
+		return false
+	}
+	return true
+}
+
+// scopeFor returns the ignore scope for the directory rel given its parent's scope
+func (o *walkOptions) scopeFor(parent *ignoreScope, root, rel string) *ignoreScope {
+	if !o.respectIgnore {
+		return nil
+	}
+	return loadIgnoreScope(parent, root, rel)
+}
+
+// visit decides whether an entry at the given depth is reported and whether
+// the walker descends into it. Depth 1 is an immediate child of the root.
+// Ignored directories are pruned before they are opened.
+func (o *walkOptions) visit(scope *ignoreScope, rel, name string, isDir bool, depth int) (emit, descend bool) {
+	// Filter hidden files (hidden directories are pruned entirely)
+	if !o.showHidden && strings.HasPrefix(name, ".") {
+		return false, false
+	}
+	if o.maxDepth > 0 && depth > o.maxDepth {
+		return false, false
+	}
+	if o.exclude != nil && o.exclude.ignored(rel, isDir) {
+		return false, false
+	}
+	if o.respectIgnore {
+		if isDir && name == ".git" {
+			return false, false
+		}
+		if scope.ignored(rel, isDir) {
+			return false, false
+		}
+	}
+	// Directories are traversed even if they don't match the pattern
+	// to find matching files inside them, unless a path pattern rules out
+	// everything below them
+	descend = isDir && o.recursive && (o.maxDepth < 0 || depth < o.maxDepth)
+	if o.pattern == nil {
+		return true, descend
+	}
+	if !o.pathPattern {
+		return o.pattern.match(name), descend
+	}
+	if descend {
+		descend = o.pattern.canMatchBelow(rel)
+	}
+	return o.pattern.match(rel), descend
+}
+
+// walkEntry is a single entry produced by dirWalker
+type walkEntry struct {
+	Rel   string // path relative to the walk root
+	Depth int
+	Info  fs.FileInfo
+}
+
+// walkFrame is an open directory on the walker stack. Entries are read in
+// batches, so memory per frame is bounded by readDirBatch, and each batch is
+// sorted by name: a directory that fits in one batch is listed in the same
+// order as os.ReadDir lists it.
+type walkFrame struct {
+	rel      string // directory path relative to the walk root ("." for the root)
+	depth    int    // depth of the entries inside this directory
+	consumed int    // number of raw entries already taken from the directory
+	skip     int    // entries to discard when the directory is (re)opened
+	scope    *ignoreScope
+	dir      dirReader
+	batch    []fs.DirEntry
+	eof      bool
+}
+
+// next returns the next raw entry of the directory or io.EOF
+func (f *walkFrame) next(root string) (fs.DirEntry, error) {
+	for len(f.batch) == 0 {
+		if f.eof {
+			return nil, io.EOF
+		}
+		if f.dir == nil {
+			dir, err := openDir(filepath.Join(root, f.rel))
+			if err != nil {
+				return nil, err
+			}
+			f.dir = dir
+		}
+		batch, err := f.dir.ReadDir(readDirBatch)
+		if err == io.EOF || (err == nil && len(batch) == 0) {
+			f.eof = true
+			continue
+		}
+		if err != nil && len(batch) == 0 {
+			return nil, err
+		}
+		// Sorted before the skip: the batches read again are the same, so
+		// their sorted prefixes are the entries of the previous pages
+		sort.Slice(batch, func(i, j int) bool { return batch[i].Name() < batch[j].Name() })
+		// Resuming from a cursor: discard entries returned by previous pages
+		if f.skip > 0 {
+			n := f.skip
+			if n > len(batch) {
+				n = len(batch)
+			}
+			batch = batch[n:]
+			f.skip -= n
+		}
+		f.batch = batch
+	}
+	entry := f.batch[0]
+	f.batch[0] = nil
+	f.batch = f.batch[1:]
+	f.consumed++
+	return entry, nil
+}
+
+func (f *walkFrame) close() {
+	if f.dir != nil {
+		f.dir.Close()
+		f.dir = nil
+	}
+	f.batch = nil
+}
+
+// dirWalker performs a depth-first, pre-order walk of a directory tree using
+// batched reads. It can stop after a number of entries and resume later from
+// an opaque cursor, so arbitrarily large directories are listed with bounded
+// server memory.
+type dirWalker struct {
+	root    string
+	absRoot string // directories are opened by absolute path so cache keys are stable
+	opts    *walkOptions
+	stack   []*walkFrame
+}
+
+func newDirWalker(root string, opts *walkOptions) *dirWalker {
+	return &dirWalker{
+		root:    root,
+		absRoot: absPath(root),
+		opts:    opts,
+		stack:   []*walkFrame{{rel: ".", depth: 1, scope: opts.scopeFor(nil, root, ".")}},
+	}
+}
+
+// absPath returns the absolute form of path, or path itself if it can't be resolved
+func absPath(path string) string {
+	if abs, err := filepath.Abs(path); err == nil {
+		return abs
+	}
+	return path
+}
+
+// run walks the tree calling emit for every reported entry. When limit > 0
+// the walk stops after limit entries; more reports whether unfinished
+// directories remain (the next page may still turn out to be empty).
+func (w *dirWalker) run(limit int, emit func(walkEntry)) (more bool, err error) {
+	emitted := 0
+	for len(w.stack) > 0 {
+		top := w.stack[len(w.stack)-1]
+		d, err := top.next(w.absRoot)
+		if err != nil {
+			if err != io.EOF && top.rel == "." {
+				w.close()
+				return false, fmt.Errorf("failed to read directory %q: %v", w.root, err)
+			}
+			// Skip directories we can't access
+			top.close()
+			w.stack = w.stack[:len(w.stack)-1]
+			continue
+		}
+
+		rel := d.Name()
+		if top.rel != "." {
+			rel = top.rel + string(filepath.Separator) + d.Name()
+		}
+
+		report, descend := w.opts.visit(top.scope, rel, d.Name(), d.IsDir(), top.depth)
+		if report {
+			info, err := d.Info()
+			if err == nil && w.opts.accept(info) {
+				emit(walkEntry{Rel: rel, Depth: top.depth, Info: info})
+				emitted++
+			}
+		}
+		if descend {
+			w.stack = append(w.stack, &walkFrame{
+				rel:   rel,
+				depth: top.depth + 1,
+				scope: w.opts.scopeFor(top.scope, w.root, rel),
+			})
+		}
+
+		if limit > 0 && emitted >= limit {
+			return len(w.stack) > 0, nil
+		}
+	}
+	return false, nil
+}
+
+// close releases all open directory handles
+func (w *dirWalker) close() {
+	for _, f := range w.stack {
+		f.close()
+	}
+}
+
+type cursorFrame struct {
+	Dir      string `json:"d"`
+	Consumed int    `json:"n"`
+}
+
+// cursor encodes the walker position as an opaque string
+func (w *dirWalker) cursor() string {
+	frames := make([]cursorFrame, len(w.stack))
+	for i, f := range w.stack {
+		frames[i] = cursorFrame{Dir: filepath.ToSlash(f.rel), Consumed: f.consumed}
+	}
+	data, _ := json.Marshal(frames)
+	return base64.RawURLEncoding.EncodeToString(data)
+}
+
+// resume restores the walker position from a cursor returned by a previous page
+func (w *dirWalker) resume(cursor string) error {
+	data, err := base64.RawURLEncoding.DecodeString(cursor)
+	if err != nil {
+		return fmt.Errorf("invalid cursor: %v", err)
+	}
+	var frames []cursorFrame
+	if err := json.Unmarshal(data, &frames); err != nil {
+		return fmt.Errorf("invalid cursor: %v", err)
+	}
+	if len(frames) == 0 || frames[0].Dir != "." {
+		return fmt.Errorf("invalid cursor: missing root frame")
+	}
+
+	stack := make([]*walkFrame, 0, len(frames))
+	var scope *ignoreScope
+	for _, cf := range frames {
+		rel := filepath.Clean(filepath.FromSlash(cf.Dir))
+		if cf.Consumed < 0 || filepath.IsAbs(rel) || rel == ".." || strings.HasPrefix(rel, ".."+string(filepath.Separator)) {
+			return fmt.Errorf("invalid cursor: bad frame %q", cf.Dir)
+		}
+		depth := 1
+		if rel != "." {
+			depth = strings.Count(rel, string(filepath.Separator)) + 2
+		}
+		scope = w.opts.scopeFor(scope, w.root, rel)
+		stack = append(stack, &walkFrame{rel: rel, depth: depth, consumed: cf.Consumed, skip: cf.Consumed, scope: scope})
+	}
+	w.stack = stack
+	return nil
+}
@@ -0,0 +1,84 @@
+package main
+
+import (
+	"fmt"
+	"math/rand"
+	"path/filepath"
+	"sort"
+	"strings"
+	"testing"
+)
+
+// walkNames walks root in pages of limit entries (0 for one page), resuming
+// each page from the cursor of the previous one as list_files does
+func walkNames(t *testing.T, root string, limit int) []string {
+	t.Helper()
+	var names []string
+	cursor := ""
+	for {
+		w := newDirWalker(root, &walkOptions{recursive: true, maxDepth: -1})
+		if cursor != "" {
+			if err := w.resume(cursor); err != nil {
+				t.Fatal(err)
+			}
+		}
+		more, err := w.run(limit, func(e walkEntry) { names = append(names, filepath.ToSlash(e.Rel)) })
+		if err != nil {
+			t.Fatal(err)
+		}
+		if !more {
+			return names
+		}
+		cursor = w.cursor()
+		w.close()
+	}
+}
+
+func TestDirWalkerSortedOrder(t *testing.T) {
+	root := t.TempDir()
+	rng := rand.New(rand.NewSource(1))
+	var small []string
+	for _, i := range rng.Perm(20) {
+		small = append(small, fmt.Sprintf("f%02d", i))
+	}
+	for _, name := range small {
+		writeTestFile(t, filepath.Join(root, "small", name), "")
+	}
+	writeTestFile(t, filepath.Join(root, "a.txt"), "")
+	writeTestFile(t, filepath.Join(root, "z.txt"), "")
+	for i := 0; i < 3*readDirBatch; i++ {
+		writeTestFile(t, filepath.Join(root, "large", fmt.Sprintf("%08x", rng.Uint32())), "")
+	}
+
+	names := walkNames(t, root, 0)
+	// A directory that fits in a batch is sorted, and listed before the
+	// entries that follow it
+	sort.Strings(small)
+	want := []string{"a.txt", "large"}
+	if strings.Join(names[:2], ",") != strings.Join(want, ",") {
+		t.Fatalf("listing starts with %v, want %v", names[:2], want)
+	}
+	rest := names[2+3*readDirBatch:]
+	want = []string{"small"}
+	for _, name := range small {
+		want = append(want, "small/"+name)
+	}
+	want = append(want, "z.txt")
+	if strings.Join(rest, ",") != strings.Join(want, ",") {
+		t.Fatalf("got %v\nwant %v", rest, want)
+	}
+	// A larger directory is sorted in runs of a batch
+	large := names[2 : 2+3*readDirBatch]
+	for i := 0; i < len(large); i += readDirBatch {
+		if run := large[i : i+readDirBatch]; !sort.StringsAreSorted(run) {
+			t.Fatalf("batch %d of large is not sorted", i/readDirBatch)
+		}
+	}
+
+	// Pages resumed from cursors list the same entries in the same order
+	for _, limit := range []int{1, 7, 100, readDirBatch} {
+		if paged := walkNames(t, root, limit); strings.Join(paged, ",") != strings.Join(names, ",") {
+			t.Fatalf("pages of %d differ from the single listing", limit)
+		}
+	}
+}
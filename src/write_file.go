@@ -2,10 +2,12 @@ package main
 
 import (
 	"context"
+	"encoding/base64"
 	"encoding/json"
+	"errors"
 	"fmt"
-	"os"
-	"path/filepath"
+	"io"
+	"strings"
 
 	"github.com/modelcontextprotocol/go-sdk/mcp"
 )
@@ -22,33 +24,41 @@ func handleWriteFile(ctx context.Context, req *mcp.CallToolRequest, input WriteF
 		logger.Debug("write_file called", "filename", input.Filename)
 	}
 
-	// Create directories if needed
-	dir := filepath.Dir(input.Filename)
-	if dir != "." && dir != "" {
-		if err := os.MkdirAll(dir, 0755); err != nil {
-			return nil, nil, fmt.Errorf("failed to create directory %q: %v", dir, err)
-		}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
 	}
-
-	// Write file with atomic operation
-	content := []byte(input.Content)
-	err := os.WriteFile(input.Filename, content, 0644)
+	precondition, err := parsePrecondition(input.ExpectedHash, input.ExpectedMtime)
 	if err != nil {
-		return nil, nil, fmt.Errorf("failed to write file %q: %v", input.Filename, err)
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
 	}
-
-	// Verify the write was successful by checking file size
-	info, err := os.Stat(input.Filename)
+	encoding, err := parseContentEncoding(input.Encoding)
 	if err != nil {
-		return nil, nil, fmt.Errorf("failed to verify file write for %q: %v", input.Filename, err)
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
 	}
 
-	// Check if written size matches expected size
-	if info.Size() != int64(len(content)) {
-		return nil, nil, fmt.Errorf("file size mismatch for %q: expected %d bytes, got %d bytes", input.Filename, len(content), info.Size())
+	// Serialize with other mutations of this file
+	unlock := fileLocks.lock(input.Filename)
+	defer unlock()
+	if err := precondition.checkMtime(input.Filename); err != nil {
+		return nil, nil, err
+	}
+	if err := precondition.checkFileHash(input.Filename); err != nil {
+		return nil, nil, err
 	}
 
-	message := fmt.Sprintf("File %s written successfully. Bytes written: %d", input.Filename, len(content))
+	// Create directories if needed
+	if err := createdDirs.ensureParent(input.Filename); err != nil {
+		return nil, nil, err
+	}
+
+	// Write to a temporary file and rename it into place
+	written, version, err := writeContent("write_file", input.Filename, input.Content, encoding, durability)
+	if err != nil {
+		return nil, nil, err
+	}
+
+	message := fmt.Sprintf("File %s written successfully. Bytes written: %d. %s", input.Filename, written, version)
 	result := &mcp.CallToolResult{
 		Content: []mcp.Content{
 			&mcp.TextContent{Text: message},
@@ -57,10 +67,76 @@ func handleWriteFile(ctx context.Context, req *mcp.CallToolRequest, input WriteF
 
 	// Log full response if debug mode
 	if logger != nil {
-		logger.Debug("write_file completed", "filename", input.Filename, "bytes_written", len(content))
+		logger.Debug("write_file completed", "filename", input.Filename, "bytes_written", written)
 		resultJSON, _ := json.MarshalIndent(result, "", "  ")
 		logger.Debug("write_file RESPONSE", "response", string(resultJSON))
 	}
 
 	return result, nil, nil
 }
+
+// writeContent atomically replaces filename with content, decoded according
+// to encoding, and records the change in the journal under tool. The caller
+// holds the file's lock and has created its directory.
+func writeContent(tool, filename, content, encoding, durability string) (int64, fileVersion, error) {
+	change := editJournal.beginRewrite(filename)
+	if encoding == contentBase64 {
+		// Decoded as it is written, never held whole
+		written, version, err := writeFileFrom(filename, contentReader(content, encoding), durability)
+		if err != nil {
+			return 0, fileVersion{}, contentError(err)
+		}
+		change.rewrittenAll(written)
+		editJournal.record(tool, change, version)
+		return written, version, nil
+	}
+	data := []byte(content)
+	version, err := writeFileAtomic(filename, data, durability)
+	if err != nil {
+		return 0, fileVersion{}, err
+	}
+	change.rewrittenTo(data)
+	editJournal.record(tool, change, version)
+	return int64(len(data)), version, nil
+}
+
+// Encodings of the content of write_file and upload_file
+const (
+	contentUTF8   = "utf-8"
+	contentBase64 = "base64"
+)
+
+// parseContentEncoding validates the encoding argument of a write
+func parseContentEncoding(value *string) (string, error) {
+	if value == nil || *value == "" {
+		return contentUTF8, nil
+	}
+	switch strings.ToLower(*value) {
+	case contentUTF8, "utf8":
+		return contentUTF8, nil
+	case contentBase64:
+		return contentBase64, nil
+	default:
+		return "", fmt.Errorf("invalid encoding %q: must be utf-8 or base64", *value)
+	}
+}
+
+// contentReader returns the bytes content stands for. Base64 is decoded as
+// it is read, a block at a time, so binary content is written without a
+// decoded copy of the whole of it; line breaks in it are ignored.
+func contentReader(content, encoding string) io.Reader {
+	if encoding == contentBase64 {
+		return base64.NewDecoder(base64.StdEncoding, strings.NewReader(content))
+	}
+	return strings.NewReader(content)
+}
+
+// contentError turns the error of a failed write into invalid arguments when
+// the content was not valid base64
+func contentError(err error) error {
+	var corrupt base64.CorruptInputError
+	if errors.As(err, &corrupt) {
+		return fmt.Errorf("invalid arguments: content is not valid base64: %v", corrupt)
+	}
+	return err
+}
@@ -0,0 +1,210 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"io"
+	"sync"
+	"time"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+// writeFilesWorkers bounds the number of files written at once. Writes wait
+// on the disk more than on the CPU, so this doesn't follow GOMAXPROCS.
+const writeFilesWorkers = 16
+
+type writeFilesResult struct {
+	Filename string `json:"filename"`
+	Bytes    int64  `json:"bytes"`
+	Hash     string `json:"hash,omitempty"`
+	Modified string `json:"modified,omitempty"`
+	Error    string `json:"error,omitempty"`
+}
+
+type writeFilesResponse struct {
+	Files   []writeFilesResult `json:"files"`
+	Written int                `json:"written"`
+	Failed  int                `json:"failed"`
+}
+
+func handleWriteFiles(ctx context.Context, req *mcp.CallToolRequest, input WriteFilesRequest) (
+	*mcp.CallToolResult,
+	interface{},
+	error,
+) {
+	// Log the files if debug mode, without their content
+	if logger != nil {
+		logger.Debug("write_files called", "files", len(input.Files), "atomic", input.Atomic)
+	}
+
+	if len(input.Files) == 0 {
+		return nil, nil, fmt.Errorf("invalid arguments: files must not be empty")
+	}
+	durability, err := parseDurability(input.Durability)
+	if err != nil {
+		return nil, nil, fmt.Errorf("invalid arguments: %v", err)
+	}
+	encodings := make([]string, len(input.Files))
+	seen := make(map[string]int, len(input.Files))
+	for i, f := range input.Files {
+		if f.Filename == "" {
+			return nil, nil, fmt.Errorf("invalid arguments: files[%d] has no filename", i)
+		}
+		if encodings[i], err = parseContentEncoding(f.Encoding); err != nil {
+			return nil, nil, fmt.Errorf("invalid arguments: files[%d]: %v", i, err)
+		}
+		key := canonicalPath(f.Filename)
+		if j, ok := seen[key]; ok {
+			return nil, nil, fmt.Errorf("invalid arguments: files[%d] and files[%d] are the same file %q", j, i, f.Filename)
+		}
+		seen[key] = i
+	}
+
+	results := make([]writeFilesResult, len(input.Files))
+	if input.Atomic != nil && *input.Atomic {
+		writeFilesTogether(input.Files, encodings, durability, results)
+	} else {
+		forEachFile(len(input.Files), func(i int) {
+			f := input.Files[i]
+			unlock := fileLocks.lock(f.Filename)
+			defer unlock()
+			if err := createdDirs.ensureParent(f.Filename); err != nil {
+				results[i] = writeFilesResult{Filename: f.Filename, Error: err.Error()}
+				return
+			}
+			written, version, err := writeContent("write_files", f.Filename, f.Content, encodings[i], durability)
+			results[i] = newWriteFilesResult(f.Filename, written, version, err)
+		})
+	}
+
+	resp := writeFilesResponse{Files: results}
+	for _, r := range results {
+		if r.Error != "" {
+			resp.Failed++
+		} else {
+			resp.Written++
+		}
+	}
+	data, _ := json.Marshal(resp)
+	result := &mcp.CallToolResult{
+		Content: []mcp.Content{
+			&mcp.TextContent{Text: string(data)},
+		},
+	}
+
+	// Log full response if debug mode
+	if logger != nil {
+		logger.Debug("write_files completed", "written", resp.Written, "failed", resp.Failed)
+		resultJSON, _ := json.MarshalIndent(result, "", "  ")
+		logger.Debug("write_files RESPONSE", "response", string(resultJSON))
+	}
+
+	return result, nil, nil
+}
+
+func newWriteFilesResult(filename string, written int64, version fileVersion, err error) writeFilesResult {
+	if err != nil {
+		return writeFilesResult{Filename: filename, Error: err.Error()}
+	}
+	return writeFilesResult{Filename: filename, Bytes: written, Hash: version.hash, Modified: version.modTime.Format(time.RFC3339Nano)}
+}
+
+// forEachFile calls fn for 0..n-1 on a pool of at most writeFilesWorkers
+// goroutines
+func forEachFile(n int, fn func(i int)) {
+	workers := writeFilesWorkers
+	if workers > n {
+		workers = n
+	}
+	ch := make(chan int)
+	var wg sync.WaitGroup
+	for w := 0; w < workers; w++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for i := range ch {
+				fn(i)
+			}
+		}()
+	}
+	for i := 0; i < n; i++ {
+		ch <- i
+	}
+	close(ch)
+	wg.Wait()
+}
+
+// writeFilesTogether replaces every file or none. The files are locked
+// together, their temporary files are written in parallel and then renamed
+// into place by commitStaged, which puts back the files already replaced if
+// a rename fails.
+func writeFilesTogether(files []FileWrite, encodings []string, durability string, results []writeFilesResult) {
+	paths := make([]string, len(files))
+	for i, f := range files {
+		paths[i] = f.Filename
+	}
+	unlock := fileLocks.lock(paths...)
+	defer unlock()
+
+	staged := make([]*stagedWrite, len(files))
+	errs := make([]error, len(files))
+	forEachFile(len(files), func(i int) {
+		if errs[i] = createdDirs.ensureParent(files[i].Filename); errs[i] != nil {
+			return
+		}
+		s, err := stageWrite(files[i].Filename, durability)
+		if err != nil {
+			errs[i] = err
+			return
+		}
+		if _, err := io.Copy(s, contentReader(files[i].Content, encodings[i])); err != nil {
+			s.Abort()
+			errs[i] = contentError(fmt.Errorf("failed to write file %q: %w", files[i].Filename, err))
+			return
+		}
+		staged[i] = s
+	})
+	failed := ""
+	for i, err := range errs {
+		if err != nil {
+			if failed == "" {
+				failed = "not written: " + err.Error()
+			}
+			results[i] = writeFilesResult{Filename: files[i].Filename, Error: err.Error()}
+		}
+	}
+	if failed != "" {
+		for i, s := range staged {
+			if s != nil {
+				s.Abort()
+				results[i] = writeFilesResult{Filename: files[i].Filename, Error: failed}
+			}
+		}
+		return
+	}
+
+	changes := make([]*journalChange, len(files))
+	for i, f := range files {
+		changes[i] = editJournal.beginRewrite(f.Filename)
+	}
+	if err := commitStaged(staged); err != nil {
+		for i, f := range files {
+			results[i] = writeFilesResult{Filename: f.Filename, Error: err.Error()}
+		}
+		return
+	}
+	for i, s := range staged {
+		switch {
+		case changes[i] == nil:
+		case encodings[i] == contentBase64:
+			changes[i].rewrittenAll(s.written)
+		default:
+			changes[i].rewrittenTo([]byte(files[i].Content))
+		}
+		version := s.version()
+		editJournal.record("write_files", changes[i], version)
+		results[i] = newWriteFilesResult(files[i].Filename, s.written, version, nil)
+	}
+}
@@ -0,0 +1,129 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"os"
+	"path/filepath"
+	"testing"
+
+	"github.com/modelcontextprotocol/go-sdk/mcp"
+)
+
+func writeFiles(t testing.TB, input WriteFilesRequest) writeFilesResponse {
+	t.Helper()
+	result, _, err := handleWriteFiles(context.Background(), nil, input)
+	if err != nil {
+		t.Fatal(err)
+	}
+	var resp writeFilesResponse
+	if err := json.Unmarshal([]byte(result.Content[0].(*mcp.TextContent).Text), &resp); err != nil {
+		t.Fatal(err)
+	}
+	return resp
+}
+
+// scaffold returns n files spread over a few nested directories
+func scaffold(root string, n int) []FileWrite {
+	files := make([]FileWrite, n)
+	for i := range files {
+		name := filepath.Join(root, fmt.Sprintf("pkg%d", i%7), fmt.Sprintf("sub%d", i%3), fmt.Sprintf("file%d.go", i))
+		files[i] = FileWrite{Filename: name, Content: fmt.Sprintf("package pkg%d\n\n// file %d\n", i%7, i)}
+	}
+	return files
+}
+
+func TestWriteFilesReportsEachFile(t *testing.T) {
+	root := t.TempDir()
+	files := scaffold(root, 100)
+	// A directory can't be replaced: that file fails, the others are written
+	if err := os.MkdirAll(filepath.Join(root, "taken"), 0755); err != nil {
+		t.Fatal(err)
+	}
+	files = append(files, FileWrite{Filename: filepath.Join(root, "taken"), Content: "x"})
+
+	resp := writeFiles(t, WriteFilesRequest{Files: files})
+	if resp.Written != 100 || resp.Failed != 1 {
+		t.Fatalf("written %d, failed %d", resp.Written, resp.Failed)
+	}
+	for i, f := range files[:100] {
+		got, err := os.ReadFile(f.Filename)
+		if err != nil || string(got) != f.Content {
+			t.Fatalf("%s: %q, %v", f.Filename, got, err)
+		}
+		if r := resp.Files[i]; r.Filename != f.Filename || r.Bytes != int64(len(f.Content)) || r.Hash == "" || r.Error != "" {
+			t.Fatalf("result %d: %+v", i, r)
+		}
+	}
+	if resp.Files[100].Error == "" {
+		t.Fatal("writing over a directory succeeded")
+	}
+
+	// A directory removed since it was created is created again
+	if err := os.RemoveAll(filepath.Join(root, "pkg0")); err != nil {
+		t.Fatal(err)
+	}
+	if resp := writeFiles(t, WriteFilesRequest{Files: files[:14]}); resp.Written != 14 {
+		t.Fatalf("after removing a directory: %+v", resp)
+	}
+}
+
+func TestWriteFilesAtomicWritesNoneOnFailure(t *testing.T) {
+	root := t.TempDir()
+	files := scaffold(root, 20)
+	resp := writeFiles(t, WriteFilesRequest{Files: files})
+	if resp.Written != 20 {
+		t.Fatalf("written %d", resp.Written)
+	}
+
+	replaced := make([]FileWrite, len(files))
+	for i, f := range files {
+		replaced[i] = FileWrite{Filename: f.Filename, Content: "replaced"}
+	}
+	bad := "base64"
+	replaced[10].Encoding, replaced[10].Content = &bad, "not base64!"
+	yes := true
+	resp = writeFiles(t, WriteFilesRequest{Files: replaced, Atomic: &yes})
+	if resp.Written != 0 || resp.Failed != 20 {
+		t.Fatalf("written %d, failed %d", resp.Written, resp.Failed)
+	}
+	for _, f := range files {
+		if got, _ := os.ReadFile(f.Filename); string(got) != f.Content {
+			t.Fatalf("%s changed by a failed atomic batch", f.Filename)
+		}
+	}
+
+	replaced[10].Encoding, replaced[10].Content = nil, "replaced"
+	if resp = writeFiles(t, WriteFilesRequest{Files: replaced, Atomic: &yes}); resp.Written != 20 {
+		t.Fatalf("written %d: %+v", resp.Written, resp.Files)
+	}
+	for _, f := range files {
+		if got, _ := os.ReadFile(f.Filename); string(got) != "replaced" {
+			t.Fatalf("%s not replaced", f.Filename)
+		}
+	}
+}
+
+// BenchmarkWriteFiles compares scaffolding 300 files with one write_files
+// call against 300 write_file calls. Run with:
+// go test ./src -run '^$' -bench WriteFiles
+func BenchmarkWriteFiles(b *testing.B) {
+	b.Run("write_file", func(b *testing.B) {
+		for i := 0; i < b.N; i++ {
+			for _, f := range scaffold(filepath.Join(b.TempDir(), "project"), 300) {
+				if _, _, err := handleWriteFile(context.Background(), nil, WriteFileRequest{Filename: f.Filename, Content: f.Content}); err != nil {
+					b.Fatal(err)
+				}
+			}
+		}
+	})
+	b.Run("write_files", func(b *testing.B) {
+		for i := 0; i < b.N; i++ {
+			files := scaffold(filepath.Join(b.TempDir(), "project"), 300)
+			if resp := writeFiles(b, WriteFilesRequest{Files: files}); resp.Written != len(files) {
+				b.Fatalf("written %d", resp.Written)
+			}
+		}
+	})
+}
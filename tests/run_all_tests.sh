@@ -66,8 +66,16 @@ PYTHON_TEST_SCRIPTS=(
     "test_read_file.py"       # Tests for the 'read_file' command.
     "test_read_file_params.py"# Tests for 'read_file' with various parameters.
     "test_write_file.py"      # Tests for the 'write_file' command.
+    "test_edit_file_params.py"# Tests for 'edit_file' with extended parameters.
+    "test_upload_file.py"     # Tests for the 'upload_file' command.
+    "test_apply_patch.py"     # Tests for the 'apply_patch' command.
+    "test_diff_files.py"      # Tests for the 'diff_files' command.
+    "test_copy_file.py"       # Tests for the 'copy_file' and 'move_file' commands.
+    "test_undo.py"            # Tests for the 'undo' and 'history' commands.
     "test_view.py"            # Tests for the 'view' command (alias for 'read_file').
     "test_list_files.py"      # Tests for the 'list_files' command.
+    "test_list_files_params.py" # Tests for 'list_files' with extended parameters.
+    "test_list_cache.py"      # Tests for the list_files cache after server-side changes.
     "edge_cases_test.py"      # Tests covering various edge cases.
 )
 
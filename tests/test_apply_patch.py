@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Tests for the apply_patch tool"""
+
+import os
+import shutil
+import sys
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_patch_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+with open(f"{TEST_DIR}/a.txt", "w") as f:
+    f.write("extra\none\ntwo\nthree\n")
+with open(f"{TEST_DIR}/b.txt", "w") as f:
+    f.write("alpha\nbeta\n")
+
+print("=== Tests for apply_patch ===")
+print()
+
+
+def apply(patch, **args):
+    """Call apply_patch and return its text, or None on error"""
+    response = send_mcp_request({
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {"name": "apply_patch", "arguments": dict(args, patch=patch, directory=TEST_DIR)}
+    })
+    if not response or "result" not in response or response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content:
+        return None
+    return content[0].get("text", "")
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# 1. Several files patched, one created, a hunk moved by an offset
+def test_1():
+    patch = ("diff --git a/a.txt b/a.txt\n--- a/a.txt\n+++ b/a.txt\n@@ -1,3 +1,3 @@\n one\n-two\n+2\n three\n"
+             "--- a/b.txt\n+++ b/b.txt\n@@ -2 +2 @@\n-beta\n+BETA\n"
+             "--- /dev/null\n+++ b/c.txt\n@@ -0,0 +1 @@\n+new\n")
+    text = apply(patch)
+    return (text is not None and "offset 1 lines" in text
+            and read(f"{TEST_DIR}/a.txt") == "extra\none\n2\nthree\n"
+            and read(f"{TEST_DIR}/b.txt") == "alpha\nBETA\n"
+            and read(f"{TEST_DIR}/c.txt") == "new\n")
+
+test_case("1. Patch several files at once", test_1, lambda r: r)
+
+# 2. A hunk that doesn't apply leaves every file unchanged
+def test_2():
+    patch = ("--- a/b.txt\n+++ b/b.txt\n@@ -1 +1 @@\n-alpha\n+ALPHA\n"
+             "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-missing\n+x\n")
+    return (apply(patch) is None and read(f"{TEST_DIR}/b.txt") == "alpha\nBETA\n"
+            and sorted(os.listdir(TEST_DIR)) == ["a.txt", "b.txt", "c.txt"])
+
+test_case("2. A failing hunk changes nothing (error)", test_2, lambda r: r)
+
+# 3. Malformed patches
+def test_3():
+    no_files = apply("just some text\n") is None
+    truncated = apply("--- a/a.txt\n+++ b/a.txt\n@@ -1,3 +1,3 @@\n one\n") is None
+    return no_files and truncated
+
+test_case("3. Malformed patches (errors)", test_3, lambda r: r)
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
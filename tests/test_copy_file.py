@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for the copy_file and move_file tools"""
+
+import os
+import shutil
+import sys
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_copy_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(f"{TEST_DIR}/tree/sub", exist_ok=True)
+with open(f"{TEST_DIR}/tree/a.txt", "w") as f:
+    f.write("alpha")
+with open(f"{TEST_DIR}/tree/sub/b.txt", "w") as f:
+    f.write("beta")
+
+print("=== Tests for copy_file and move_file ===")
+print()
+
+
+def call(tool, args):
+    """Call a tool and return its text, or None on error"""
+    response = send_mcp_request({
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {"name": tool, "arguments": args}
+    })
+    if not response or "result" not in response or response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content:
+        return None
+    return content[0].get("text", "")
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# 1. A directory tree is copied with its files
+def test_1():
+    text = call("copy_file", {"source": f"{TEST_DIR}/tree", "destination": f"{TEST_DIR}/copy/tree"})
+    return (text is not None and "2 files" in text
+            and read(f"{TEST_DIR}/copy/tree/a.txt") == "alpha"
+            and read(f"{TEST_DIR}/copy/tree/sub/b.txt") == "beta")
+
+test_case("1. Copy a directory tree", test_1, lambda r: r)
+
+# 2. An existing destination is replaced only with overwrite
+def test_2():
+    refused = call("copy_file", {"source": f"{TEST_DIR}/tree/a.txt", "destination": f"{TEST_DIR}/tree/sub/b.txt"}) is None
+    kept = read(f"{TEST_DIR}/tree/sub/b.txt") == "beta"
+    replaced = call("copy_file", {"source": f"{TEST_DIR}/tree/a.txt", "destination": f"{TEST_DIR}/tree/sub/b.txt", "overwrite": True}) is not None
+    return refused and kept and replaced and read(f"{TEST_DIR}/tree/sub/b.txt") == "alpha"
+
+test_case("2. Overwrite only when asked", test_2, lambda r: r)
+
+# 3. A move renames the source
+def test_3():
+    text = call("move_file", {"source": f"{TEST_DIR}/copy/tree", "destination": f"{TEST_DIR}/moved"})
+    return (text is not None and "renamed" in text and not os.path.exists(f"{TEST_DIR}/copy/tree")
+            and read(f"{TEST_DIR}/moved/sub/b.txt") == "beta")
+
+test_case("3. Move a directory", test_3, lambda r: r)
+
+# 4. Invalid arguments
+def test_4():
+    missing = call("copy_file", {"source": f"{TEST_DIR}/absent", "destination": f"{TEST_DIR}/x"}) is None
+    into_itself = call("copy_file", {"source": f"{TEST_DIR}/tree", "destination": f"{TEST_DIR}/tree/sub/tree"}) is None
+    same = call("move_file", {"source": f"{TEST_DIR}/moved", "destination": f"{TEST_DIR}/moved"}) is None
+    return missing and into_itself and same
+
+test_case("4. Missing source, copy into itself, same path (errors)", test_4, lambda r: r)
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Tests for the diff_files tool"""
+
+import os
+import shutil
+import sys
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_diff_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+with open(f"{TEST_DIR}/old.txt", "w") as f:
+    f.write("one\ntwo\nthree\n")
+with open(f"{TEST_DIR}/new.txt", "w") as f:
+    f.write("one\n2\nthree\nfour\n")
+
+print("=== Tests for diff_files ===")
+print()
+
+
+def diff(args):
+    """Call diff_files and return its text items, or None on error"""
+    response = send_mcp_request({
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {"name": "diff_files", "arguments": args}
+    })
+    if not response or "result" not in response or response["result"].get("isError", False):
+        return None
+    return [item.get("text", "") for item in response["result"].get("content", [])]
+
+
+# 1. Two files
+def test_1():
+    texts = diff({"old_file": f"{TEST_DIR}/old.txt", "new_file": f"{TEST_DIR}/new.txt"})
+    return (texts is not None and len(texts) == 2
+            and "2 changes, 1 lines removed, 2 lines added" in texts[0]
+            and "-two\n+2\n" in texts[1] and "+four\n" in texts[1])
+
+test_case("1. Compare two files", test_1, lambda r: r)
+
+# 2. A file with content: identical content has no diff
+def test_2():
+    texts = diff({"old_file": f"{TEST_DIR}/old.txt", "new_content": "one\ntwo\nthree\n"})
+    return texts is not None and texts == ["Files are identical."]
+
+test_case("2. Compare a file with identical content", test_2, lambda r: r)
+
+# 3. Invalid arguments
+def test_3():
+    both = diff({"old_file": f"{TEST_DIR}/old.txt", "new_file": f"{TEST_DIR}/new.txt", "new_content": "x"}) is None
+    missing = diff({"old_file": f"{TEST_DIR}/absent.txt", "new_content": "x"}) is None
+    return both and missing
+
+test_case("3. Invalid arguments (errors)", test_3, lambda r: r)
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
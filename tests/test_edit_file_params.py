@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Tests for edit_file extended parameters"""
+
+import os
+import re
+import shutil
+import sys
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_edit_file_params_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+
+print("=== Tests for edit_file parameters ===")
+print()
+
+
+def edit_file(arguments):
+    """Call edit_file and return the response text, or None on error"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "edit_file",
+            "arguments": arguments
+        }
+    }
+    response = send_mcp_request(request)
+    if not response or "result" not in response:
+        return None
+    if response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content:
+        return None
+    return content[0].get("text", "")
+
+
+def edit_file_diff(arguments):
+    """Call edit_file with return_diff and return the diff text, or None on error"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "edit_file",
+            "arguments": dict(arguments, return_diff=True)
+        }
+    }
+    response = send_mcp_request(request)
+    if not response or "result" not in response:
+        return None
+    if response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content or len(content) < 2:
+        return None
+    return content[1].get("text", "")
+
+
+def has_error(arguments):
+    """Check that edit_file rejects the arguments"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "edit_file",
+            "arguments": arguments
+        }
+    }
+    response = send_mcp_request(request)
+    if response is None:
+        return False
+    return "error" in response or response.get("result", {}).get("isError", False)
+
+
+def call_tool(name, arguments):
+    """Call a tool and return the list of content items, or None on error"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": name,
+            "arguments": arguments
+        }
+    }
+    response = send_mcp_request(request)
+    if not response or "result" not in response or response["result"].get("isError", False):
+        return None
+    return response["result"].get("content")
+
+
+def hash_of(text):
+    """Extract the content hash reported in a response text"""
+    match = re.search(r"Hash: ([0-9a-f]{16})", text or "")
+    return match.group(1) if match else None
+
+
+def write(name, content):
+    path = f"{TEST_DIR}/{name}"
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# 1. Batch of edits on one file
+def test_1():
+    path = write("batch.txt", "alpha beta gamma\nalpha\n")
+    text = edit_file({"filename": path, "edits": [
+        {"old_string": "alpha", "new_string": "ALPHA"},
+        {"old_string": "gamma", "new_string": "GAMMA"},
+    ]})
+    return text is not None and "Replacements: 3" in text and read(path) == "ALPHA beta GAMMA\nALPHA\n"
+
+test_case("1. edits: several replacements in one file", test_1, lambda r: r)
+
+# 2. Replaced text is not matched by later edits
+def test_2():
+    path = write("swap.txt", "left right")
+    text = edit_file({"filename": path, "edits": [
+        {"old_string": "left", "new_string": "right"},
+        {"old_string": "right", "new_string": "left"},
+    ]})
+    return text is not None and read(path) == "right left"
+
+test_case("2. edits: single pass (swap)", test_2, lambda r: r)
+
+# 3. Edits spanning several files
+def test_3():
+    a = write("multi_a.txt", "foo")
+    b = write("multi_b.txt", "bar")
+    text = edit_file({"filename": a, "edits": [
+        {"old_string": "foo", "new_string": "FOO"},
+        {"filename": b, "old_string": "bar", "new_string": "BAR"},
+    ]})
+    return text is not None and read(a) == "FOO" and read(b) == "BAR"
+
+test_case("3. edits: several files", test_3, lambda r: r)
+
+# 4. A missing old_string aborts the whole batch
+def test_4():
+    a = write("atomic_a.txt", "keep me")
+    b = write("atomic_b.txt", "keep me too")
+    failed = has_error({"filename": a, "edits": [
+        {"old_string": "keep", "new_string": "lose"},
+        {"filename": b, "old_string": "missing", "new_string": "x"},
+    ]})
+    return failed and read(a) == "keep me" and read(b) == "keep me too"
+
+test_case("4. edits: all or nothing", test_4, lambda r: r)
+
+# 5. Deletion with an empty new_string
+def test_5():
+    path = write("delete.txt", "remove this, keep that")
+    text = edit_file({"filename": path, "edits": [{"old_string": "remove this, "}]})
+    return text is not None and read(path) == "keep that"
+
+test_case("5. edits: deletion", test_5, lambda r: r)
+
+# 6. edits cannot be combined with old_string
+test_case("6. edits with old_string (error)",
+          lambda: has_error({"filename": write("combined.txt", "x"), "old_string": "x",
+                             "edits": [{"old_string": "x", "new_string": "y"}]}), lambda r: r)
+
+# 7. Replacement in a file larger than the streaming chunk
+def test_7():
+    line = "0123456789 old_value abcdefghijklmnopqrstuvwxyz\n"
+    original = line * 70000  # ~3.3 MB, matches straddle chunk boundaries
+    path = write("large.sql", original)
+    text = edit_file({"filename": path, "old_string": "old_value", "new_string": "new_value"})
+    expected = original.replace("old_value", "new_value")
+    return text is not None and f"Bytes written: {len(expected)}" in text and read(path) == expected
+
+test_case("7. Streaming replacement in a large file", test_7, lambda r: r)
+
+# 8. Text not found is appended on a new line
+def test_8():
+    path = write("append.txt", "first")
+    text = edit_file({"filename": path, "old_string": "missing", "new_string": "second"})
+    return text is not None and read(path) == "first\nsecond"
+
+test_case("8. Replacement not found appends new_string", test_8, lambda r: r)
+
+# 9. Replace a line range
+def test_9():
+    path = write("lines.txt", "one\ntwo\nthree\nfour\n")
+    text = edit_file({"filename": path, "start_line": 2, "end_line": 3, "new_string": "middle"})
+    return text is not None and read(path) == "one\nmiddle\nfour\n"
+
+test_case("9. start_line/end_line replace lines", test_9, lambda r: r)
+
+# 10. Insert before a line (end_line = start_line - 1)
+def test_10():
+    path = write("insert.txt", "one\ntwo\n")
+    text = edit_file({"filename": path, "start_line": 1, "end_line": 0, "new_string": "zero"})
+    return text is not None and read(path) == "zero\none\ntwo\n"
+
+test_case("10. Insert before the first line", test_10, lambda r: r)
+
+# 11. Replace a byte range
+def test_11():
+    path = write("bytes.txt", "hello world")
+    text = edit_file({"filename": path, "start_byte": 6, "end_byte": 11, "new_string": "there"})
+    return text is not None and read(path) == "hello there"
+
+test_case("11. start_byte/end_byte replace bytes", test_11, lambda r: r)
+
+# 12. start_line past the end of the file
+test_case("12. start_line beyond end of file (error)",
+          lambda: has_error({"filename": write("short.txt", "a\n"), "start_line": 5, "new_string": "x"}), lambda r: r)
+
+# 13. Line and byte ranges cannot be mixed
+test_case("13. start_line with start_byte (error)",
+          lambda: has_error({"filename": write("mixed.txt", "a\n"), "start_line": 1, "start_byte": 0, "new_string": "x"}), lambda r: r)
+
+# 14. read_file reports the hash that edit_file accepts
+def test_14():
+    path = write("hashed.txt", "version 1\n")
+    content = call_tool("read_file", {"filename": path})
+    if not content or len(content) < 2:
+        return False
+    current = hash_of(content[1].get("text"))
+    text = edit_file({"filename": path, "old_string": "1", "new_string": "2", "expected_hash": current})
+    return current is not None and text is not None and read(path) == "version 2\n"
+
+test_case("14. expected_hash from read_file", test_14, lambda r: r)
+
+# 15. A stale hash is rejected and the file is left alone
+def test_15():
+    path = write("stale.txt", "version 1\n")
+    content = call_tool("read_file", {"filename": path})
+    stale = hash_of(content[1].get("text")) if content and len(content) > 1 else None
+    with open(path, "w") as f:
+        f.write("changed by someone else\n")
+    failed = has_error({"filename": path, "content": "mine", "expected_hash": stale})
+    return stale is not None and failed and read(path) == "changed by someone else\n"
+
+test_case("15. Stale expected_hash (error)", test_15, lambda r: r)
+
+# 16. Hashes returned by writes chain into the next edit
+def test_16():
+    path = f"{TEST_DIR}/chained.txt"
+    first = call_tool("write_file", {"filename": path, "content": "a", "expected_hash": ""})
+    current = hash_of(first[0].get("text")) if first else None
+    text = edit_file({"filename": path, "start_byte": 1, "end_byte": 1, "new_string": "b", "expected_hash": current})
+    if text is None or read(path) != "ab":
+        return False
+    return hash_of(text) != current and has_error({"filename": path, "new_string": "c", "expected_hash": current})
+
+test_case("16. Hashes from writes", test_16, lambda r: r)
+
+# 17. expected_hash "" only creates new files
+test_case("17. expected_hash '' on an existing file (error)",
+          lambda: has_error({"filename": write("exists.txt", "x"), "content": "y", "expected_hash": ""}), lambda r: r)
+
+# 18. expected_mtime
+def test_18():
+    path = write("mtime.txt", "x")
+    stale = has_error({"filename": path, "content": "y", "expected_mtime": "2000-01-01T00:00:00Z"})
+    os.utime(path, (1700000000, 1700000000))
+    text = edit_file({"filename": path, "content": "z", "expected_mtime": "2023-11-14T22:13:20Z"})
+    return stale and text is not None and read(path) == "z"
+
+test_case("18. expected_mtime", test_18, lambda r: r)
+
+# 19. return_diff shows the replaced lines with context
+def test_19():
+    path = write("diff.txt", "".join(f"line {i}\n" for i in range(1, 11)))
+    return edit_file_diff({"filename": path, "old_string": "line 5", "new_string": "five", "diff_context": 1})
+
+test_case("19. return_diff with a replacement", test_19,
+          lambda r: r is not None and "@@ -4,3 +4,3 @@\n line 4\n-line 5\n+five\n line 6\n" in r)
+
+# 20. return_diff with a line range and a batch
+def test_20():
+    path = write("diff_range.txt", "a\nb\nc\n")
+    ranged = edit_file_diff({"filename": path, "start_line": 2, "new_string": "B"})
+    batch = edit_file_diff({"filename": path, "edits": [{"old_string": "a", "new_string": "A"}], "diff_context": 0})
+    return ranged, batch
+
+test_case("20. return_diff with a line range and a batch", test_20,
+          lambda r: r[0] is not None and "-b\n+B\n" in r[0] and r[1] is not None and "@@ -1 +1 @@\n-a\n+A\n" in r[1])
+
+# 21. diff_context without return_diff
+test_case("21. diff_context without return_diff (error)",
+          lambda: has_error({"filename": write("diff_context.txt", "x"), "old_string": "x", "new_string": "y", "diff_context": 2}),
+          lambda r: r)
+
+# 22. Regex replacement with capture groups
+def test_22():
+    path = write("regex.txt", "width=10 height=20\n")
+    text = edit_file({"filename": path, "old_string": r"(\w+)=(\d+)", "new_string": "${2}_$1", "regex": True})
+    return text, read(path)
+
+test_case("22. Regex replacement with capture groups", test_22,
+          lambda r: r[0] is not None and "Replacements: 2" in r[0] and r[1] == "10_width 20_height\n")
+
+# 23. count replaces only the first occurrences
+def test_23():
+    path = write("count.txt", "x x x")
+    text = edit_file({"filename": path, "old_string": "x", "new_string": "y", "count": 2})
+    return text, read(path)
+
+test_case("23. count limits the replacements", test_23,
+          lambda r: r[0] is not None and "Replacements: 2" in r[0] and r[1] == "y y x")
+
+# 24. expect_unique
+def test_24():
+    path = write("unique.txt", "a b a")
+    duplicate = has_error({"filename": path, "old_string": "a", "new_string": "c", "expect_unique": True})
+    missing = has_error({"filename": path, "old_string": "z", "new_string": "c", "expect_unique": True})
+    unchanged = read(path) == "a b a"
+    text = edit_file({"filename": path, "old_string": "b", "new_string": "c", "expect_unique": True})
+    return duplicate and missing and unchanged and text is not None and read(path) == "a c a"
+
+test_case("24. expect_unique rejects missing and repeated text", test_24, lambda r: r)
+
+# 25. Invalid regular expression
+test_case("25. Invalid regex (error)",
+          lambda: has_error({"filename": write("bad_regex.txt", "x"), "old_string": "(", "new_string": "y", "regex": True}),
+          lambda r: r)
+
+# 26. Fuzzy match with different indentation
+def test_26():
+    path = write("fuzzy_indent.txt", "func f() {\n\tif ok {\n\t\treturn 1\n\t}\n}\n")
+    text = edit_file({"filename": path, "old_string": "if ok {\n    return 1\n}", "new_string": "if ok {\n\t\treturn 2\n\t}", "fuzzy": True})
+    return text, read(path)
+
+test_case("26. Fuzzy match ignores indentation", test_26,
+          lambda r: r[0] is not None and "whitespace-normalized at line 2" in r[0]
+          and r[1] == "func f() {\n\tif ok {\n\t\treturn 2\n\t}\n}\n")
+
+# 27. Approximate fuzzy match
+def test_27():
+    path = write("fuzzy_approx.txt", "one\nconst greeting = \"hello world\"\nthree\n")
+    text = edit_file({"filename": path, "old_string": "const greting = \"hello world\"", "new_string": "const greeting = \"hi\"", "fuzzy": True})
+    return text, read(path)
+
+test_case("27. Fuzzy match within max_distance", test_27,
+          lambda r: r[0] is not None and "approximate at line 2, edit distance 1" in r[0]
+          and r[1] == "one\nconst greeting = \"hi\"\nthree\n")
+
+# 28. Fuzzy match not found
+def test_28():
+    path = write("fuzzy_missing.txt", "alpha beta\n")
+    missing = has_error({"filename": path, "old_string": "gamma delta", "new_string": "x", "fuzzy": True, "max_distance": 2})
+    return missing and read(path) == "alpha beta\n"
+
+test_case("28. Fuzzy match not found (error, file unchanged)", test_28, lambda r: r)
+
+print()
+print("=== Test Summary ===")
+print()
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Tests for the list_files cache: listings right after the server's own changes"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from test_helper import SERVER, test_case, print_test_results
+
+TEST_DIR = "tmp/test_list_cache_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+
+print("=== Tests for the list_files cache ===")
+print()
+
+
+class Session:
+    """One server process for several requests: the list cache lives in the
+    server's memory, so a listing and the change after it must use the same
+    process"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self.next_id = 1
+        self.send({
+            "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "test", "version": "1.0.0"}
+            }
+        })
+        self.proc.stdin.write(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized", "params": {}}) + "\n")
+        self.proc.stdin.flush()
+
+    def send(self, message):
+        """Send a request and wait for its response"""
+        request_id = self.next_id
+        self.next_id += 1
+        message = dict(message, jsonrpc="2.0", id=request_id)
+        self.proc.stdin.write(json.dumps(message) + "\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                return None
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if response.get("id") == request_id:
+                return response
+
+    def call(self, name, arguments):
+        """Call a tool and return its first text, or None on error"""
+        response = self.send({"method": "tools/call", "params": {"name": name, "arguments": arguments}})
+        if not response or "result" not in response or response["result"].get("isError", False):
+            return None
+        content = response["result"].get("content")
+        if not content:
+            return None
+        return content[0].get("text", "")
+
+    def names(self, path, recursive=False):
+        """The sorted names list_files returns for path, or None on error"""
+        text = self.call("list_files", {"path": path, "recursive": recursive})
+        if text is None:
+            return None
+        return sorted(f["name"] for f in json.loads(text).get("files", []))
+
+    def close(self):
+        self.proc.stdin.close()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+# 1. Every file written is in the listing that follows
+def test_1():
+    d = f"{TEST_DIR}/writes"
+    os.makedirs(d)
+    s = Session()
+    try:
+        for i in range(200):
+            name = f"f{i:03d}.txt"
+            if s.call("write_file", {"filename": f"{d}/{name}", "content": name}) is None:
+                return False
+            names = s.names(d)
+            if names is None or name not in names:
+                print(f"    run {i}: {name} missing")
+                return False
+        return True
+    finally:
+        s.close()
+
+test_case("1. Write then list, 200 times", test_1, lambda r: r)
+
+# 2. A new subdirectory is listed with its parent
+def test_2():
+    d = f"{TEST_DIR}/subdirs"
+    os.makedirs(d)
+    s = Session()
+    try:
+        before = s.names(d)
+        s.call("write_file", {"filename": f"{d}/sub/inner/a.txt", "content": "a"})
+        return before == [] and s.names(d) == ["sub"] and s.names(d, recursive=True) == ["a.txt", "inner", "sub"]
+    finally:
+        s.close()
+
+test_case("2. Directories created for a write", test_2, lambda r: r)
+
+# 3. Files moved, patched away and undone leave the listings at once
+def test_3():
+    d = f"{TEST_DIR}/removals"
+    os.makedirs(f"{d}/src")
+    os.makedirs(f"{d}/dst")
+    s = Session()
+    try:
+        s.call("write_file", {"filename": f"{d}/src/moved.txt", "content": "m"})
+        s.call("write_file", {"filename": f"{d}/src/patched.txt", "content": "p\n"})
+        s.call("write_file", {"filename": f"{d}/src/undone.txt", "content": "u"})
+        start = s.names(f"{d}/src") == ["moved.txt", "patched.txt", "undone.txt"] and s.names(f"{d}/dst") == []
+
+        s.call("move_file", {"source": f"{d}/src/moved.txt", "destination": f"{d}/dst/moved.txt"})
+        moved = s.names(f"{d}/src") == ["patched.txt", "undone.txt"] and s.names(f"{d}/dst") == ["moved.txt"]
+        s.call("apply_patch", {"patch": "--- a/patched.txt\n+++ /dev/null\n@@ -1 +0,0 @@\n-p\n", "directory": f"{d}/src"})
+        patched = s.names(f"{d}/src") == ["undone.txt"]
+        s.call("undo", {"filename": f"{d}/src/undone.txt"})
+        undone = s.names(f"{d}/src") == []
+        return start and moved and patched and undone
+    finally:
+        s.close()
+
+test_case("3. Move, patch deletion and undo", test_3, lambda r: r)
+
+print()
+print("=== Test Summary ===")
+print()
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
@@ -301,6 +301,8 @@ def test_11():
     }
     response = send_mcp_request(request)
     files = extract_files(response)
+    # Leave TEST_DIR as the later tests expect it
+    os.rmdir(empty_dir)
     return files is not None and len(files) == 0
 
 test_case("11. Empty directory", test_11, lambda r: r)
@@ -445,6 +447,32 @@ def test_17():
 
 test_case("17. max_depth without recursive (ignored)", test_17, lambda r: r)
 
+# 18. Entries come back sorted by name, depth-first when recursive
+def test_18():
+    order_dir = f"{TEST_DIR}/order"
+    # Created out of order, so readdir order is not sorted
+    for name in ["zeta/b.txt", "alpha.txt", "zeta/a.txt", "mid/c.txt", "beta.txt"]:
+        os.makedirs(os.path.dirname(f"{order_dir}/{name}"), exist_ok=True)
+        with open(f"{order_dir}/{name}", "w") as f:
+            f.write(name)
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "list_files",
+            "arguments": {"path": order_dir, "recursive": True}
+        }
+    }
+    files = extract_files(send_mcp_request(request))
+    shutil.rmtree(order_dir)
+    if files is None:
+        return False
+    expected = ["alpha.txt", "beta.txt", "mid", "c.txt", "zeta", "a.txt", "b.txt"]
+    return [f["name"] for f in files] == expected
+
+test_case("18. Sorted depth-first order", test_18, lambda r: r)
+
 print()
 print("=== Test Summary ===")
 print()
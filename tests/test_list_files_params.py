@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Tests for list_files extended parameters"""
+
+import os
+import shutil
+import sys
+import json
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_list_files_params_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+
+print("=== Tests for list_files parameters ===")
+print()
+
+# Setup test files and directories
+print("Setting up test files and directories...")
+for i in range(3):
+    os.makedirs(f"{TEST_DIR}/dir{i}/sub", exist_ok=True)
+    for j in range(4):
+        with open(f"{TEST_DIR}/dir{i}/file{j}.txt", "w") as f:
+            f.write("x" * (j + 1))
+        with open(f"{TEST_DIR}/dir{i}/sub/code{j}.go", "w") as f:
+            f.write("package main\n")
+
+# Ignore files
+os.makedirs(f"{TEST_DIR}/dir0/node_modules/pkg", exist_ok=True)
+with open(f"{TEST_DIR}/dir0/node_modules/pkg/index.js", "w") as f:
+    f.write("module.exports = {}\n")
+with open(f"{TEST_DIR}/dir0/debug.log", "w") as f:
+    f.write("log\n")
+with open(f"{TEST_DIR}/.gitignore", "w") as f:
+    f.write("node_modules/\n*.log\n")
+
+print()
+
+
+def list_files(arguments):
+    """Call list_files and return the decoded JSON payload (or None)"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "list_files",
+            "arguments": arguments
+        }
+    }
+    response = send_mcp_request(request)
+    if not response or "result" not in response:
+        return None
+    if response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content:
+        return None
+    try:
+        return json.loads(content[0].get("text", ""))
+    except json.JSONDecodeError:
+        return None
+
+
+def has_error(arguments):
+    """Check that list_files rejects the arguments"""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "list_files",
+            "arguments": arguments
+        }
+    }
+    response = send_mcp_request(request)
+    if response is None:
+        return False
+    if "error" in response:
+        return True
+    return "result" in response and response["result"].get("isError", False)
+
+
+# 1. limit returns at most N entries and a cursor
+def test_1():
+    data = list_files({"path": TEST_DIR, "recursive": True, "limit": 5})
+    if data is None:
+        return False
+    return len(data["files"]) == 5 and data.get("next_cursor")
+
+test_case("1. limit returns a page and next_cursor", test_1, lambda r: r)
+
+# 2. Paging through with cursor returns every entry exactly once
+def test_2():
+    full = list_files({"path": TEST_DIR, "recursive": True})
+    if full is None:
+        return False
+    names = []
+    cursor = None
+    for _ in range(50):
+        args = {"path": TEST_DIR, "recursive": True, "limit": 7}
+        if cursor:
+            args["cursor"] = cursor
+        page = list_files(args)
+        if page is None:
+            return False
+        names.extend(f["name"] for f in page["files"])
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+    return sorted(names) == sorted(f["name"] for f in full["files"])
+
+test_case("2. Cursor paging covers the whole tree", test_2, lambda r: r)
+
+# 3. No cursor when everything fits in one page
+def test_3():
+    data = list_files({"path": TEST_DIR, "limit": 100})
+    if data is None:
+        return False
+    return len(data["files"]) == 3 and "next_cursor" not in data
+
+test_case("3. No next_cursor on the last page", test_3, lambda r: r)
+
+# 4. Invalid limit
+test_case("4. Invalid limit=0 (error)",
+          lambda: has_error({"path": TEST_DIR, "limit": 0}), lambda r: r)
+
+# 5. Invalid cursor
+test_case("5. Invalid cursor (error)",
+          lambda: has_error({"path": TEST_DIR, "cursor": "not-a-cursor"}), lambda r: r)
+
+# 6. respect_gitignore prunes ignored directories and files
+def test_6():
+    data = list_files({"path": TEST_DIR, "recursive": True, "respect_gitignore": True})
+    if data is None:
+        return False
+    names = {f["name"] for f in data["files"]}
+    return ("node_modules" not in names and "index.js" not in names
+            and "debug.log" not in names and "file0.txt" in names)
+
+test_case("6. respect_gitignore skips ignored paths", test_6, lambda r: r)
+
+# 7. Without respect_gitignore ignored paths are listed
+def test_7():
+    data = list_files({"path": TEST_DIR, "recursive": True})
+    if data is None:
+        return False
+    names = {f["name"] for f in data["files"]}
+    return "node_modules" in names and "debug.log" in names
+
+test_case("7. Ignore files are not used by default", test_7, lambda r: r)
+
+# 8. Explicit exclude patterns
+def test_8():
+    data = list_files({"path": TEST_DIR, "recursive": True, "exclude": ["sub/", "dir1"]})
+    if data is None:
+        return False
+    names = {f["name"] for f in data["files"]}
+    return ("sub" not in names and "code0.go" not in names
+            and "dir1" not in names and "dir2" in names)
+
+test_case("8. exclude prunes matching paths", test_8, lambda r: r)
+
+# 9. '**' pattern matched against the relative path
+def test_9():
+    data = list_files({"path": TEST_DIR, "recursive": True, "pattern": "dir1/**/*.go"})
+    if data is None:
+        return False
+    names = sorted(f["name"] for f in data["files"])
+    return names == ["code0.go", "code1.go", "code2.go", "code3.go"]
+
+test_case("9. '**' path pattern", test_9, lambda r: r)
+
+# 10. Path pattern without '**' only matches at that level
+def test_10():
+    data = list_files({"path": TEST_DIR, "recursive": True, "pattern": "dir*/file1.txt"})
+    if data is None:
+        return False
+    return len(data["files"]) == 3 and all(f["name"] == "file1.txt" for f in data["files"])
+
+test_case("10. Path pattern with wildcard directory", test_10, lambda r: r)
+
+# 11. Invalid pattern
+test_case("11. Invalid pattern (error)",
+          lambda: has_error({"path": TEST_DIR, "pattern": "dir[/*.txt"}), lambda r: r)
+
+# 12. summary mode returns aggregates instead of entries
+def test_12():
+    data = list_files({"path": TEST_DIR, "recursive": True, "summary": True,
+                       "exclude": ["node_modules/", "*.log"]})
+    if data is None or "summary" not in data or "files" in data:
+        return False
+    summary = data["summary"]
+    # 3 dirs x (4 txt files of 1..4 bytes + 4 go files of 13 bytes)
+    exts = {e["extension"]: e for e in summary["extensions"]}
+    return (summary["files"] == 24 and summary["directories"] == 6
+            and summary["total_size"] == 3 * (10 + 4 * 13)
+            and exts[".go"]["files"] == 12 and exts[".txt"]["bytes"] == 30
+            and summary["top_directories"][0]["bytes"] == 62)
+
+test_case("12. summary mode", test_12, lambda r: r)
+
+# 13. summary cannot be paged
+test_case("13. summary with limit (error)",
+          lambda: has_error({"path": TEST_DIR, "summary": True, "limit": 10}), lambda r: r)
+
+# 14. compact format returns parallel arrays of relative paths
+def test_14():
+    data = list_files({"path": TEST_DIR, "recursive": True, "format": "compact",
+                       "pattern": "dir2/**"})
+    if data is None or data.get("format") != "compact":
+        return False
+    n = len(data["paths"])
+    if not (n == len(data["types"]) == len(data["sizes"]) == len(data["mtimes"])):
+        return False
+    entries = dict(zip(data["paths"], zip(data["types"], data["sizes"])))
+    return (entries.get("dir2/sub") == ("d", None)
+            and entries.get("dir2/file3.txt") == ("f", 4)
+            and "dir2/sub/code0.go" in entries)
+
+test_case("14. compact format", test_14, lambda r: r)
+
+# 15. tree format nests entries under their directories
+def test_15():
+    data = list_files({"path": TEST_DIR, "recursive": True, "format": "tree",
+                       "pattern": "dir1/sub/*.go"})
+    if data is None or data.get("format") != "tree":
+        return False
+    tree = data["tree"]
+    if len(tree) != 1 or tree[0]["name"] != "dir1":
+        return False
+    sub = tree[0]["children"]
+    if len(sub) != 1 or sub[0]["name"] != "sub":
+        return False
+    files = sub[0]["children"]
+    return sorted(f["name"] for f in files) == ["code0.go", "code1.go", "code2.go", "code3.go"] \
+        and all(f["size"] == 13 for f in files)
+
+test_case("15. tree format", test_15, lambda r: r)
+
+# 16. Invalid format
+test_case("16. Invalid format (error)",
+          lambda: has_error({"path": TEST_DIR, "format": "xml"}), lambda r: r)
+
+# 17. Size filters only return matching files
+def test_17():
+    data = list_files({"path": TEST_DIR, "recursive": True, "larger_than": 2, "smaller_than": 10,
+                       "pattern": "*.txt"})
+    if data is None:
+        return False
+    files = data["files"]
+    return (len(files) == 6 and all(f["type"] == "file" for f in files)
+            and sorted({f["size"] for f in files}) == [3, 4])
+
+test_case("17. larger_than / smaller_than", test_17, lambda r: r)
+
+# 18. Modification time filters
+def test_18():
+    old = 946684800  # 2000-01-01T00:00:00Z
+    os.utime(f"{TEST_DIR}/dir2/file0.txt", (old, old))
+    data = list_files({"path": TEST_DIR, "recursive": True,
+                       "modified_before": "2001-01-01T00:00:00Z"})
+    newer = list_files({"path": f"{TEST_DIR}/dir2", "modified_after": "2001-01-01T00:00:00Z"})
+    if data is None or newer is None:
+        return False
+    return ([f["name"] for f in data["files"]] == ["file0.txt"]
+            and "file0.txt" not in [f["name"] for f in newer["files"]])
+
+test_case("18. modified_before / modified_after", test_18, lambda r: r)
+
+# 19. top_k by size returns the largest files, largest first
+def test_19():
+    data = list_files({"path": TEST_DIR, "recursive": True, "top_k": 4, "sort_by": "size",
+                       "pattern": "*.txt"})
+    if data is None:
+        return False
+    return [f["size"] for f in data["files"]] == [4, 4, 4, 3]
+
+test_case("19. top_k sort_by size", test_19, lambda r: r)
+
+# 20. Invalid combinations
+test_case("20. sort_by without top_k (error)",
+          lambda: has_error({"path": TEST_DIR, "sort_by": "size"}), lambda r: r)
+test_case("21. top_k with limit (error)",
+          lambda: has_error({"path": TEST_DIR, "top_k": 3, "limit": 3}), lambda r: r)
+test_case("22. Invalid modified_after (error)",
+          lambda: has_error({"path": TEST_DIR, "modified_after": "yesterday"}), lambda r: r)
+
+# 23. fields adds content metadata to file entries
+def test_23():
+    with open(f"{TEST_DIR}/dir2/sub/blob.bin", "wb") as f:
+        f.write(b"\x00\x01\x02\x03")
+    data = list_files({"path": f"{TEST_DIR}/dir2/sub",
+                       "fields": ["lines", "encoding", "is_binary", "mime"]})
+    if data is None:
+        return False
+    files = {f["name"]: f for f in data["files"]}
+    go, blob = files.get("code0.go"), files.get("blob.bin")
+    if go is None or blob is None:
+        return False
+    return (go["lines"] == 1 and go["encoding"] == "ascii" and go["is_binary"] is False
+            and "mime" in go and blob["is_binary"] is True and "lines" not in blob)
+
+test_case("23. fields: lines, encoding, is_binary, mime", test_23, lambda r: r)
+
+# 24. Invalid field
+test_case("24. Invalid field (error)",
+          lambda: has_error({"path": TEST_DIR, "fields": ["owner"]}), lambda r: r)
+
+# 25-27. summary reports the whole tree and ignores no other option
+test_case("25. summary with top_k (error)",
+          lambda: has_error({"path": TEST_DIR, "summary": True, "top_k": 5}), lambda r: r)
+test_case("26. summary with format (error)",
+          lambda: has_error({"path": TEST_DIR, "summary": True, "format": "compact"}), lambda r: r)
+test_case("27. summary with fields (error)",
+          lambda: has_error({"path": TEST_DIR, "summary": True, "fields": ["lines"]}), lambda r: r)
+
+print()
+print("=== Test Summary ===")
+print()
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
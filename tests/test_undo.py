@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Tests for the undo and history tools"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from test_helper import SERVER, test_case, print_test_results
+
+TEST_DIR = "tmp/test_undo_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+
+print("=== Tests for undo and history ===")
+print()
+
+
+class Session:
+    """One server process for several requests: the edit journal lives in
+    the server's memory, so an edit and its undo must use the same process"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self.next_id = 1
+        self.send({
+            "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "test", "version": "1.0.0"}
+            }
+        })
+        self.proc.stdin.write(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized", "params": {}}) + "\n")
+        self.proc.stdin.flush()
+
+    def send(self, message):
+        """Send a request and wait for its response"""
+        request_id = self.next_id
+        self.next_id += 1
+        message = dict(message, jsonrpc="2.0", id=request_id)
+        self.proc.stdin.write(json.dumps(message) + "\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                return None
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if response.get("id") == request_id:
+                return response
+
+    def call(self, name, arguments):
+        """Call a tool and return its first text, or None on error"""
+        response = self.send({"method": "tools/call", "params": {"name": name, "arguments": arguments}})
+        if not response or "result" not in response or response["result"].get("isError", False):
+            return None
+        content = response["result"].get("content")
+        if not content:
+            return None
+        return content[0].get("text", "")
+
+    def close(self):
+        self.proc.stdin.close()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# 1. Undo edits in reverse order, down to the file's creation
+def test_1():
+    path = f"{TEST_DIR}/undo.txt"
+    s = Session()
+    try:
+        s.call("write_file", {"filename": path, "content": "one\ntwo\nthree\n"})
+        s.call("edit_file", {"filename": path, "old_string": "two", "new_string": "TWO"})
+        s.call("edit_file", {"filename": path, "start_line": 1, "end_line": 1, "new_string": "first"})
+        states = [read(path)]
+        states.append(read(path) if s.call("undo", {"filename": path}) else None)
+        states.append(read(path) if s.call("undo", {"filename": path}) else None)
+        removed = s.call("undo", {"filename": path}) is not None and not os.path.exists(path)
+        empty = s.call("undo", {"filename": path}) is None
+    finally:
+        s.close()
+    return (states == ["first\nTWO\nthree\n", "one\nTWO\nthree\n", "one\ntwo\nthree\n"]
+            and removed and empty)
+
+test_case("1. undo restores earlier contents and removes a created file", test_1, lambda r: r)
+
+# 2. Undo an append and a batch of edits
+def test_2():
+    path = f"{TEST_DIR}/append.txt"
+    with open(path, "w") as f:
+        f.write("alpha beta")
+    s = Session()
+    try:
+        s.call("edit_file", {"filename": path, "edits": [{"old_string": "alpha", "new_string": "ALPHA"}]})
+        s.call("edit_file", {"filename": path, "new_string": "gamma"})
+        after = read(path)
+        s.call("undo", {"filename": path})
+        first = read(path)
+        s.call("undo", {"filename": path})
+        second = read(path)
+    finally:
+        s.close()
+    return after == "ALPHA beta\ngamma" and first == "ALPHA beta" and second == "alpha beta"
+
+test_case("2. undo an append and a batch", test_2, lambda r: r)
+
+# 3. A file modified outside the server is not reverted
+def test_3():
+    path = f"{TEST_DIR}/modified.txt"
+    with open(path, "w") as f:
+        f.write("original\n")
+    s = Session()
+    try:
+        s.call("edit_file", {"filename": path, "old_string": "original", "new_string": "edited"})
+        with open(path, "w") as f:
+            f.write("changed by someone else\n")
+        refused = s.call("undo", {"filename": path}) is None
+    finally:
+        s.close()
+    return refused and read(path) == "changed by someone else\n"
+
+test_case("3. undo refuses a file modified since (error)", test_3, lambda r: r)
+
+# 4. History lists changes newest first and can be filtered by file
+def test_4():
+    a = f"{TEST_DIR}/history_a.txt"
+    b = f"{TEST_DIR}/history_b.txt"
+    s = Session()
+    try:
+        s.call("write_file", {"filename": a, "content": "a"})
+        s.call("write_file", {"filename": b, "content": "b"})
+        s.call("edit_file", {"filename": a, "old_string": "a", "new_string": "A"})
+        everything = json.loads(s.call("history", {}))
+        only_a = json.loads(s.call("history", {"filename": a}))
+        latest = json.loads(s.call("history", {"limit": 1}))
+    finally:
+        s.close()
+    tools = [e["tool"] for e in everything["entries"]]
+    return (tools == ["edit_file", "write_file", "write_file"]
+            and len(only_a["entries"]) == 2
+            and latest["entries"][0]["stored"] == "memory"
+            and 0 < everything["memory_bytes"] <= everything["memory_limit"])
+
+test_case("4. history lists journaled changes", test_4, lambda r: r)
+
+# 5. Undo without any journaled change
+def test_5():
+    s = Session()
+    try:
+        return s.call("undo", {"filename": f"{TEST_DIR}/never_edited.txt"}) is None
+    finally:
+        s.close()
+
+test_case("5. undo with nothing to undo (error)", test_5, lambda r: r)
+
+print()
+print("=== Test Summary ===")
+print()
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Tests for the upload_file tool
+
+Every request starts a new server process, so these tests also check that an
+upload survives a restart of the server."""
+
+import os
+import re
+import shutil
+import sys
+from test_helper import send_mcp_request, test_case, print_test_results
+
+TEST_DIR = "tmp/test_upload_dir"
+
+# Cleanup and setup
+os.makedirs("tmp", exist_ok=True)
+if os.path.exists(TEST_DIR):
+    shutil.rmtree(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
+
+print("=== Tests for upload_file ===")
+print()
+
+
+def upload(args):
+    """Call upload_file and return its text, or None on error"""
+    response = send_mcp_request({
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {"name": "upload_file", "arguments": args}
+    })
+    if not response or "result" not in response or response["result"].get("isError", False):
+        return None
+    content = response["result"].get("content")
+    if not content:
+        return None
+    return content[0].get("text", "")
+
+
+def begin(path, **args):
+    text = upload(dict(args, filename=path, action="begin"))
+    match = re.search(r"Upload ID: (\d+)", text or "")
+    return match.group(1) if match else None
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# 1. Chunks sent out of order are committed in place
+def test_1():
+    path = f"{TEST_DIR}/ordered.txt"
+    upload_id = begin(path, size=15)
+    if upload_id is None:
+        return False
+    for offset, chunk in [(10, "chunk"), (0, "first"), (5, " and ")]:
+        if upload({"filename": path, "action": "chunk", "upload_id": upload_id, "offset": offset, "content": chunk}) is None:
+            return False
+    text = upload({"filename": path, "action": "commit", "upload_id": upload_id})
+    return (text is not None and "Bytes written: 15" in text and read(path) == "first and chunk"
+            and os.listdir(TEST_DIR) == ["ordered.txt"])
+
+test_case("1. Out-of-order chunks are committed", test_1, lambda r: r)
+
+# 2. Status reports the missing ranges and commit waits for them
+def test_2():
+    path = f"{TEST_DIR}/resume.txt"
+    upload_id = begin(path)
+    upload({"filename": path, "action": "chunk", "upload_id": upload_id, "offset": 4, "content": "5678"})
+    status = upload({"filename": path, "action": "status", "upload_id": upload_id})
+    incomplete = upload({"filename": path, "action": "commit", "upload_id": upload_id}) is None
+    absent = not os.path.exists(path)
+    upload({"filename": path, "action": "chunk", "upload_id": upload_id, "offset": 0, "content": "1234"})
+    committed = upload({"filename": path, "action": "commit", "upload_id": upload_id}) is not None
+    return (status is not None and "Missing: 0-4" in status and incomplete and absent
+            and committed and read(path) == "12345678")
+
+test_case("2. Resume an upload from its status", test_2, lambda r: r)
+
+# 3. Abort discards the upload and leaves the target alone
+def test_3():
+    path = f"{TEST_DIR}/abort.txt"
+    with open(path, "w") as f:
+        f.write("original")
+    upload_id = begin(path)
+    upload({"filename": path, "action": "chunk", "upload_id": upload_id, "offset": 0, "content": "replacement"})
+    aborted = upload({"filename": path, "action": "abort", "upload_id": upload_id}) is not None
+    gone = upload({"filename": path, "action": "status", "upload_id": upload_id}) is None
+    return aborted and gone and read(path) == "original" and not any(".tmp-" in name for name in os.listdir(TEST_DIR))
+
+test_case("3. Abort discards the upload", test_3, lambda r: r)
+
+# 4. Invalid arguments
+def test_4():
+    path = f"{TEST_DIR}/invalid.txt"
+    upload_id = begin(path, size=4)
+    past_end = upload({"filename": path, "action": "chunk", "upload_id": upload_id, "offset": 2, "content": "xyz"}) is None
+    no_offset = upload({"filename": path, "action": "chunk", "upload_id": upload_id, "content": "x"}) is None
+    bad_id = upload({"filename": path, "action": "status", "upload_id": "../x"}) is None
+    bad_action = upload({"filename": path, "action": "append", "upload_id": upload_id}) is None
+    return past_end and no_offset and bad_id and bad_action
+
+test_case("4. Invalid chunks, IDs and actions (errors)", test_4, lambda r: r)
+
+# Cleanup
+shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Print results and exit
+sys.exit(print_test_results())
@@ -2,6 +2,8 @@
 """Тесты для функции write_file
 Проверяет запись файлов с различным содержимым"""
 
+import base64
+import json
 import os
 import shutil
 import sys
@@ -380,6 +382,181 @@ def test_5_2():
 test_case("5.2 Табуляции и пробелы", test_5_2,
           lambda r: r is True)
 
+print()
+print("6. Тесты атомарной записи:")
+print()
+
+def write_file(args):
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "write_file",
+            "arguments": args
+        }
+    }
+    return send_mcp_request(request)
+
+def is_error(response):
+    if response:
+        return response.get("result", {}).get("isError") is True or "error" in response
+    return False
+
+# 6.1 Все режимы durability записывают содержимое
+def test_6_1():
+    for mode in ["none", "fdatasync", "fsync"]:
+        path = f"{TEST_DIR}/durable_{mode}.txt"
+        response = write_file({"filename": path, "content": mode, "durability": mode})
+        if is_error(response) or not os.path.exists(path):
+            return False
+        with open(path, "r") as f:
+            if f.read() != mode:
+                return False
+    return True
+
+test_case("6.1 Режимы durability", test_6_1,
+          lambda r: r is True)
+
+# 6.2 Неизвестный режим durability
+def test_6_2():
+    response = write_file({"filename": f"{TEST_DIR}/bad_durability.txt", "content": "x", "durability": "sometimes"})
+    return is_error(response) and not os.path.exists(f"{TEST_DIR}/bad_durability.txt")
+
+test_case("6.2 Неизвестный режим durability", test_6_2,
+          lambda r: r is True)
+
+# 6.3 Права доступа сохраняются при перезаписи
+def test_6_3():
+    path = f"{TEST_DIR}/mode.sh"
+    with open(path, "w") as f:
+        f.write("old")
+    os.chmod(path, 0o750)
+    response = write_file({"filename": path, "content": "new"})
+    if is_error(response):
+        return False
+    with open(path, "r") as f:
+        content = f.read()
+    return content == "new" and (os.stat(path).st_mode & 0o777) == 0o750
+
+test_case("6.3 Сохранение прав доступа", test_6_3,
+          lambda r: r is True)
+
+# 6.4 Временные файлы не остаются в директории
+def test_6_4():
+    write_file({"filename": f"{TEST_DIR}/clean.txt", "content": "data", "durability": "fsync"})
+    return not any(".tmp-" in name for name in os.listdir(TEST_DIR))
+
+test_case("6.4 Нет временных файлов после записи", test_6_4,
+          lambda r: r is True)
+
+# 6.5 Запись через символическую ссылку изменяет целевой файл
+def test_6_5():
+    target = f"{TEST_DIR}/link_target.txt"
+    link = f"{TEST_DIR}/link.txt"
+    with open(target, "w") as f:
+        f.write("old")
+    os.symlink("link_target.txt", link)
+    response = write_file({"filename": link, "content": "through link"})
+    if is_error(response) or not os.path.islink(link):
+        return False
+    with open(target, "r") as f:
+        return f.read() == "through link"
+
+test_case("6.5 Запись через символическую ссылку", test_6_5,
+          lambda r: r is True)
+
+print()
+print("7. Тесты бинарного содержимого:")
+print()
+
+# 7.1 Содержимое в base64 записывается в бинарном виде
+def test_7_1():
+    data = bytes(range(256)) * 4
+    path = f"{TEST_DIR}/binary.bin"
+    response = write_file({"filename": path, "content": base64.b64encode(data).decode(), "encoding": "base64"})
+    if is_error(response):
+        return False
+    with open(path, "rb") as f:
+        return f.read() == data
+
+test_case("7.1 Запись бинарного файла из base64", test_7_1,
+          lambda r: r is True)
+
+# 7.2 Некорректный base64 не изменяет файл
+def test_7_2():
+    path = f"{TEST_DIR}/binary_invalid.bin"
+    with open(path, "w") as f:
+        f.write("keep")
+    response = write_file({"filename": path, "content": "not base64!", "encoding": "base64"})
+    with open(path, "r") as f:
+        return is_error(response) and f.read() == "keep"
+
+test_case("7.2 Некорректный base64", test_7_2,
+          lambda r: r is True)
+
+print()
+print("8. Тесты write_files:")
+print()
+
+def write_files(args):
+    request = {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "tools/call",
+        "params": {
+            "name": "write_files",
+            "arguments": args
+        }
+    }
+    response = send_mcp_request(request)
+    if is_error(response) or not response or "result" not in response:
+        return None
+    return json.loads(response["result"]["content"][0]["text"])
+
+# 8.1 Несколько файлов во вложенных директориях
+def test_8_1():
+    files = [{"filename": f"{TEST_DIR}/project/dir{i % 3}/file{i}.txt", "content": f"file {i}"} for i in range(12)]
+    result = write_files({"files": files})
+    if result is None or result["written"] != 12 or result["failed"] != 0:
+        return False
+    for f in files:
+        with open(f["filename"], "r") as fh:
+            if fh.read() != f["content"]:
+                return False
+    return all(r["hash"] for r in result["files"])
+
+test_case("8.1 Запись нескольких файлов", test_8_1,
+          lambda r: r is True)
+
+# 8.2 Ошибка одного файла не мешает остальным
+def test_8_2():
+    os.makedirs(f"{TEST_DIR}/is_dir", exist_ok=True)
+    result = write_files({"files": [
+        {"filename": f"{TEST_DIR}/ok.txt", "content": "ok"},
+        {"filename": f"{TEST_DIR}/is_dir", "content": "x"},
+    ]})
+    return (result is not None and result["written"] == 1 and result["failed"] == 1
+            and "error" in result["files"][1] and os.path.exists(f"{TEST_DIR}/ok.txt"))
+
+test_case("8.2 Результаты по каждому файлу", test_8_2,
+          lambda r: r is True)
+
+# 8.3 atomic: при ошибке ни один файл не изменяется
+def test_8_3():
+    path = f"{TEST_DIR}/atomic.txt"
+    with open(path, "w") as f:
+        f.write("before")
+    result = write_files({"atomic": True, "files": [
+        {"filename": path, "content": "after"},
+        {"filename": f"{TEST_DIR}/is_dir", "content": "x"},
+    ]})
+    with open(path, "r") as f:
+        return result is not None and result["written"] == 0 and f.read() == "before"
+
+test_case("8.3 atomic без частичной записи", test_8_3,
+          lambda r: r is True)
+
 # Очистка
 shutil.rmtree(TEST_DIR)
 